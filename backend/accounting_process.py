@@ -1,15 +1,13 @@
 # audit_tool/backend/accounting_process.py
 import os
 import pandas as pd
-from datetime import datetime
-import re
-from dateutil.relativedelta import relativedelta
 
 # Import the new TRIAL_BALANCE_BASE_DIR from db_common
 from backend.db_common import TRIAL_BALANCE_BASE_DIR 
-
-# Define the base directory where accounting data is stored (for GL report processing)
-ACCOUNTING_BASE_DIR = r"C:\xampp\htdocs\audit_tool\ACCOUTNING\GENERAL LEDGER"
+# Typed, sorted GL rows with DR/CR come from the shared GL engine
+from backend.gl_engine import load_base_gl_data, summarize_gl_rows
+from backend.gl_names import find_latest_dated_csv, get_gl_chart, search_gl_chart
+from backend.utils.report_pagination import DEFAULT_PAGE_SIZE, frame_page_bounds
 
 # List of branches that should NOT have GL Code formatting for GL Names datalist
 BRANCHES_NO_GL_FORMATTING_GL_NAMES = ['BAYUGAN', 'BALINGASAG', 'TORIL', 'ILUSTRE', 'TUBIGON']
@@ -67,53 +65,12 @@ def _format_gl_code(gl_acc_raw):
     else:
         return gl_acc_digits # Return raw digits if not matching specific lengths
 
-def get_gl_names_and_codes_from_file(branch_name):
+def _read_gl_names_file(latest_file, sanitized_branch_name):
     """
-    Reads GL Name and GL Code from the latest dated CSV file within the
-    branch's subfolder in the TRIAL_BALANCE_BASE_DIR.
-    Returns a list of dictionaries, each with 'TITLE' (GL Name),
-    'GLACC_RAW' (unformatted GL Code), and 'GLACC_FORMATTED' (formatted GL Code).
-    The formatting of 'GLACC_FORMATTED' depends on the branch_name.
+    Parses a trial balance CSV into GL name entries: dicts with 'TITLE' (GL Name),
+    'GLACC_RAW' (unformatted GL Code) and 'GLACC_FORMATTED' (formatted GL Code, or the raw
+    code for branches in BRANCHES_NO_GL_FORMATTING_GL_NAMES).
     """
-    sanitized_branch_name = "".join([c for c in branch_name if c.isalnum() or c in (' ', '_')]).strip().replace(' ', '_').upper()
-    if not sanitized_branch_name:
-        print("Server Log (Accounting Process - GL Name): Invalid branch name provided for GL Name lookup.")
-        return []
-
-    # Construct the path to the branch's subfolder within TRIAL_BALANCE_BASE_DIR
-    branch_folder_path = os.path.join(TRIAL_BALANCE_BASE_DIR, sanitized_branch_name)
-    
-    print(f"Server Log (Accounting Process - GL Name): Looking for GL name file in: {branch_folder_path}")
-
-    if not os.path.isdir(branch_folder_path):
-        print(f"Server Log (Accounting Process - GL Name): Branch folder not found: {branch_folder_path}")
-        return []
-
-    latest_file = None
-    latest_date = None
-
-    # Regex to extract MM-DD-YYYY date from filename
-    date_pattern = re.compile(r'(\d{2}-\d{2}-\d{4})')
-
-    for filename in os.listdir(branch_folder_path):
-        if filename.lower().endswith('.csv'):
-            match = date_pattern.search(filename)
-            if match:
-                try:
-                    file_date_str = match.group(1)
-                    file_date = datetime.strptime(file_date_str, '%m-%d-%Y')
-                    
-                    if latest_date is None or file_date > latest_date:
-                        latest_date = file_date
-                        latest_file = os.path.join(branch_folder_path, filename)
-                except ValueError:
-                    print(f"Server Log (Accounting Process - GL Name): Could not parse date from filename: {filename}")
-                    continue
-    
-    if not latest_file:
-        print(f"Server Log (Accounting Process - GL Name): No CSV file with MM-DD-YYYY date format found in {branch_folder_path}.")
-        return []
-
     print(f"Server Log (Accounting Process - GL Name): Found latest file: {latest_file}")
     
     gl_data_list = []
@@ -146,22 +103,17 @@ def get_gl_names_and_codes_from_file(branch_name):
             print(f"Server Log (Accounting Process - GL Name): Found {latest_file}, but missing 'GLACC_RAW' or 'TITLE' columns. Available columns: {df.columns.tolist()}")
             return []
 
-        for index, row in df.iterrows():
-            title = str(row['TITLE']).strip() if pd.notna(row['TITLE']) else ''
-            gl_acc_raw = str(row['GLACC_RAW']).strip() if pd.notna(row['GLACC_RAW']) else ''
+        # Determine if GL Code should be formatted or left as is
+        format_codes = sanitized_branch_name not in BRANCHES_NO_GL_FORMATTING_GL_NAMES
+        for title, gl_acc_raw in zip(df['TITLE'], df['GLACC_RAW']):
+            title = str(title).strip() if pd.notna(title) else ''
+            gl_acc_raw = str(gl_acc_raw).strip() if pd.notna(gl_acc_raw) else ''
             
             if title and gl_acc_raw:
-                # Determine if GL Code should be formatted or left as is
-                if sanitized_branch_name in BRANCHES_NO_GL_FORMATTING_GL_NAMES:
-                    gl_acc_final = gl_acc_raw # "as is"
-                    print(f"DEBUG (GL Name): Branch '{sanitized_branch_name}' detected. GLACC '{gl_acc_raw}' returned as-is.")
-                else:
-                    gl_acc_final = _format_gl_code(gl_acc_raw) # Apply formatting
-                    print(f"DEBUG (GL Name): Branch '{sanitized_branch_name}' detected. GLACC '{gl_acc_raw}' formatted to '{gl_acc_final}'.")
-                
+                gl_acc_final = _format_gl_code(gl_acc_raw) if format_codes else gl_acc_raw
                 gl_data_list.append({'TITLE': title, 'GLACC_RAW': gl_acc_raw, 'GLACC_FORMATTED': gl_acc_final})
         
-        print(f"Server Log (Accounting Process - GL Name): Extracted {len(gl_data_list)} GL name entries from {latest_file}.")
+        print(f"Server Log (Accounting Process - GL Name): Extracted {len(gl_data_list)} GL name entries from {latest_file} ({'formatted' if format_codes else 'as-is'} GL codes).")
         if gl_data_list:
             print("Server Log (Accounting Process - GL Name): Sample of populated GL name entries (first 5 items):")
             for i, item in enumerate(gl_data_list):
@@ -172,168 +124,61 @@ def get_gl_names_and_codes_from_file(branch_name):
     
     return gl_data_list
 
-
-def _load_and_process_base_gl_data(branch, from_date_str, to_date_str):
+def get_gl_chart_from_tb(branch_name):
     """
-    Loads and processes base GL data for a specific branch and date range.
-    Combines data from all Excel/CSV files in the branch's GL folder,
-    filters by date range, and calculates DR/CR based on AMT and BAL.
-    Returns the processed DataFrame including original 'GLACC' for further use.
+    Returns the branch's GL chart (see gl_names.build_gl_chart) built from the latest dated
+    CSV within the branch's subfolder in the TRIAL_BALANCE_BASE_DIR, or None if there is none.
+    The chart is parsed once and reused until a newer file appears or the file's mtime changes.
     """
-    sanitized_branch_name = "".join([c for c in branch if c.isalnum() or c in (' ', '_')]).strip().replace(' ', '_')
+    sanitized_branch_name = "".join([c for c in branch_name if c.isalnum() or c in (' ', '_')]).strip().replace(' ', '_').upper()
     if not sanitized_branch_name:
-        print("Server Log (Base GL Data): Invalid branch name provided.")
-        return pd.DataFrame()
+        print("Server Log (Accounting Process - GL Name): Invalid branch name provided for GL Name lookup.")
+        return None
 
-    branch_folder_path = os.path.join(ACCOUNTING_BASE_DIR, sanitized_branch_name.upper())
-    print(f"Server Log (Base GL Data): Loading GL data for branch: {branch_folder_path}")
-    print(f"Server Log (Base GL Data): Date Range: {from_date_str} to {to_date_str}")
+    # Construct the path to the branch's subfolder within TRIAL_BALANCE_BASE_DIR
+    branch_folder_path = os.path.join(TRIAL_BALANCE_BASE_DIR, sanitized_branch_name)
 
     if not os.path.isdir(branch_folder_path):
-        print(f"Server Log (Base GL Data): Branch folder not found: {branch_folder_path}")
-        return pd.DataFrame()
-
-    all_gl_data = []
-    encodings_to_try = ['utf-8', 'latin1', 'cp1252', 'iso-8859-1', 'utf-8-sig']
-
-    try:
-        from_date = datetime.strptime(from_date_str, '%m/%d/%Y')
-        to_date = datetime.strptime(to_date_str, '%m/%d/%Y')
-    except ValueError as e:
-        print(f"Server Log (Base GL Data): Invalid date format received from frontend: {e}")
-        return pd.DataFrame()
-
-    def parse_filename_dates(filename):
-        match_month_year = re.match(r'.* - (\w{3} \d{4}) to (\w{3} \d{4})\.csv$', filename, re.IGNORECASE)
-        if match_month_year:
-            start_date_str = match_month_year.group(1)
-            end_date_str = match_month_year.group(2)
-            try:
-                file_start_date = datetime.strptime(start_date_str, '%b %Y').replace(day=1)
-                temp_end_date = datetime.strptime(end_date_str, '%b %Y').replace(day=1)
-                file_end_date = temp_end_date + relativedelta(months=1, days=-1)
-                return file_start_date, file_end_date
-            except ValueError:
-                return None, None
-
-        match_full_date = re.match(r'.* - (\d{2}-\d{2}-\d{4}) TO (\d{2}-\d{2}-\d{4})\.csv$', filename, re.IGNORECASE)
-        if match_full_date:
-            start_date_str = match_full_date.group(1)
-            end_date_str = match_full_date.group(2)
-            try:
-                file_start_date = datetime.strptime(start_date_str, '%m-%d-%Y')
-                file_end_date = datetime.strptime(end_date_str, '%m-%d-%Y')
-                return file_start_date, file_end_date
-            except ValueError:
-                return None, None
-        
-        return None, None
-
-    for filename in os.listdir(branch_folder_path):
-        lower_filename = filename.lower()
-        
-        if not (lower_filename.endswith('.csv') or lower_filename.endswith(('.xlsx', '.xls'))):
-            continue
+        print(f"Server Log (Accounting Process - GL Name): Branch folder not found: {branch_folder_path}")
+        return None
 
-        file_path = os.path.join(branch_folder_path, filename)
-        
-        file_start_date, file_end_date = parse_filename_dates(filename)
-
-        if file_start_date is None or file_end_date is None:
-            print(f"Server Log (Base GL Data): Skipping file {filename}: Could not parse date range from filename.")
-            continue
-
-        if not (file_start_date <= to_date and file_end_date >= from_date):
-            continue
-
-        df = None
-        read_success = False
-        if lower_filename.endswith(('.xlsx', '.xls')):
-            try:
-                df = pd.read_excel(file_path, dtype={'GLACC': str}) # Read GLACC as string
-                read_success = True
-            except Exception as e:
-                print(f"Server Log (Base GL Data): Error reading Excel file {filename}: {e}")
-        elif lower_filename.endswith('.csv'):
-            for encoding in encodings_to_try:
-                try:
-                    df = pd.read_csv(file_path, encoding=encoding, dtype={'GLACC': str}) # Read GLACC as string
-                    read_success = True
-                    break
-                except UnicodeDecodeError:
-                    pass
-                except Exception as e:
-                    print(f"Server Log (Base GL Data): Error reading CSV file {filename} with {encoding}: {e}")
-        
-        if read_success and df is not None:
-            df.columns = [col.strip().upper() for col in df.columns]
-
-            required_cols = ['DOCDATE', 'TRN', 'DESC', 'REF', 'AMT', 'BAL', 'GLACC'] 
-            if not all(col in df.columns for col in required_cols):
-                print(f"Server Log (Base GL Data): Skipping {filename}: Missing one or more required columns ({', '.join(required_cols)}).")
-                continue
-
-            df['DOCDATE_DT'] = pd.to_datetime(df['DOCDATE'], errors='coerce')
-            df.dropna(subset=['DOCDATE_DT'], inplace=True)
-
-            df_filtered_date = df[
-                (df['DOCDATE_DT'] >= from_date) & 
-                (df['DOCDATE_DT'] <= to_date)
-            ].copy()
-
-            if not df_filtered_date.empty:
-                df_filtered_date['AMT_NUM'] = df_filtered_date['AMT'].astype(str).str.replace(',', '', regex=False).apply(pd.to_numeric, errors='coerce').fillna(0)
-                df_filtered_date['BAL_NUM'] = df_filtered_date['BAL'].astype(str).str.replace(',', '', regex=False).apply(pd.to_numeric, errors='coerce').fillna(0)
-                all_gl_data.append(df_filtered_date)
-            else:
-                print(f"Server Log (Base GL Data): No data within date range for {filename}.")
-        else:
-            print(f"Server Log (Base GL Data): Could not read file: {filename}")
+    latest_file = find_latest_dated_csv(branch_folder_path, log_label="Accounting Process - GL Name")
+    if not latest_file:
+        print(f"Server Log (Accounting Process - GL Name): No CSV file with MM-DD-YYYY date format found in {branch_folder_path}.")
+        return None
 
-    if not all_gl_data:
-        print("Server Log (Base GL Data): No relevant GL data found across all files for the specified criteria.")
-        return pd.DataFrame()
+    return get_gl_chart(
+        ('tb', sanitized_branch_name), [latest_file],
+        lambda: _read_gl_names_file(latest_file, sanitized_branch_name),
+        code_field='GLACC_RAW', formatted_field='GLACC_FORMATTED', log_label="Accounting Process - GL Name"
+    )
 
-    combined_df = pd.concat(all_gl_data, ignore_index=True)
+def get_gl_names_and_codes_from_file(branch_name):
+    """
+    Returns the GL Name and GL Code entries of the latest dated CSV file within the
+    branch's subfolder in the TRIAL_BALANCE_BASE_DIR.
+    Returns a list of dictionaries, each with 'TITLE' (GL Name),
+    'GLACC_RAW' (unformatted GL Code), and 'GLACC_FORMATTED' (formatted GL Code).
+    The formatting of 'GLACC_FORMATTED' depends on the branch_name.
+    """
+    chart = get_gl_chart_from_tb(branch_name)
+    return chart['entries'] if chart else []
 
-    if 'TRN' in combined_df.columns:
-        combined_df['TRN_NUM_SORT'] = pd.to_numeric(combined_df['TRN'], errors='coerce').fillna(0)
-        combined_df.sort_values(by=['DOCDATE_DT', 'TRN_NUM_SORT'], ascending=[True, True], inplace=True)
-    else:
-        combined_df.sort_values(by=['DOCDATE_DT'], ascending=[True], inplace=True)
-
-    # Calculate DR and CR based on BALANCE change
-    combined_df['BALANCE_CHANGE'] = combined_df['BAL_NUM'].diff()
-
-    combined_df['DR_VAL'] = 0.0
-    combined_df['CR_VAL'] = 0.0
-
-    combined_df.loc[combined_df['BALANCE_CHANGE'] > 0, 'DR_VAL'] = combined_df['AMT_NUM'].abs()
-    combined_df.loc[combined_df['BALANCE_CHANGE'] < 0, 'CR_VAL'] = combined_df['AMT_NUM'].abs()
-
-    # Handle the very first row
-    if not combined_df.empty:
-        first_row_index = combined_df.index[0]
-        if pd.isna(combined_df.loc[first_row_index, 'BALANCE_CHANGE']):
-            initial_bal = combined_df.loc[first_row_index, 'BAL_NUM']
-            initial_amt = combined_df.loc[first_row_index, 'AMT_NUM']
-            if initial_bal > 0:
-                combined_df.loc[first_row_index, 'DR_VAL'] = initial_amt
-            elif initial_bal < 0:
-                combined_df.loc[first_row_index, 'CR_VAL'] = initial_amt
-    
-    return combined_df.copy() # Return a copy to avoid SettingWithCopyWarning
+def search_gl_names_and_codes(branch_name, prefix, limit=50):
+    """Returns up to `limit` GL name entries whose code or name starts with prefix (case-insensitive)."""
+    chart = get_gl_chart_from_tb(branch_name)
+    return search_gl_chart(chart, prefix, limit) if chart else []
 
 
-def process_gl_report(branch, from_date_str, to_date_str, gl_code_lookup):
+def _select_gl_report_rows(branch, from_date_str, to_date_str, gl_code_lookup):
     """
-    Processes GL data for a specific branch, date range, and GL Code.
-    Leverages _load_and_process_base_gl_data and then filters by GLACC.
+    Returns the base GL rows (see load_base_gl_data) of one GL Code, in report order
+    (DOCDATE, then numeric TRN); empty if there are none.
     """
-    df = _load_and_process_base_gl_data(branch, from_date_str, to_date_str)
+    df = load_base_gl_data(branch, from_date_str, to_date_str, log_label="Base GL Data")
     if df.empty:
         print("Server Log (GL Report): No base GL data to process.")
-        return []
+        return df
 
     # Filter by GLACC (raw, no hyphens)
     # Ensure GLACC is treated as string for comparison
@@ -341,14 +186,16 @@ def process_gl_report(branch, from_date_str, to_date_str, gl_code_lookup):
     
     if df_filtered_glacc.empty:
         print(f"Server Log (GL Report): No data for GLACC '{gl_code_lookup}' after filtering.")
-        return []
+    return df_filtered_glacc
+
+def _format_gl_report_rows(df_filtered_glacc, branch):
+    """Turns selected GL rows into the GL report's table records."""
+    df_filtered_glacc = df_filtered_glacc.copy()
 
     # Add GL Code and GL Name for GL report specifically
-    # Now, get_gl_names_and_codes_from_file returns a list of dicts with 'TITLE', 'GLACC_RAW', and 'GLACC_FORMATTED'
-    gl_names_and_codes_list = get_gl_names_and_codes_from_file(branch)
-    
-    # Create a map from formatted GLACC to TITLE for easy lookup
-    gl_code_to_name_map = {item['GLACC_FORMATTED']: item['TITLE'] for item in gl_names_and_codes_list}
+    # The cached chart maps formatted GLACC to TITLE
+    gl_chart = get_gl_chart_from_tb(branch)
+    gl_code_to_name_map = gl_chart['names_by_formatted'] if gl_chart else {}
     
     # Apply the formatted GL Code and GL Name to the report DataFrame
     # Use the _format_gl_code to ensure consistency if the raw GLACC is directly used
@@ -372,6 +219,41 @@ def process_gl_report(branch, from_date_str, to_date_str, gl_code_lookup):
     # Select and reorder final columns for GL report
     final_columns = ['DATE', 'GL CODE', 'GL NAME', 'TRN', 'DESCRIPTION', 'REF', 'DR', 'CR', 'BALANCE']
     report_df = df_filtered_glacc[final_columns]
-
-    print(f"Server Log (GL Report): Processed {len(report_df)} rows for GL report.")
     return report_df.to_dict(orient='records')
+
+def process_gl_report(branch, from_date_str, to_date_str, gl_code_lookup):
+    """
+    Processes GL data for a specific branch, date range, and GL Code.
+    Leverages load_base_gl_data and then filters by GLACC.
+    """
+    df_filtered_glacc = _select_gl_report_rows(branch, from_date_str, to_date_str, gl_code_lookup)
+    if df_filtered_glacc.empty:
+        return []
+
+    report_data = _format_gl_report_rows(df_filtered_glacc, branch)
+    print(f"Server Log (GL Report): Processed {len(report_data)} rows for GL report.")
+    return report_data
+
+def process_gl_report_page(branch, from_date_str, to_date_str, gl_code_lookup, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    One page of the GL report, keyset-paginated on (DATE, TRN); only the page's rows are formatted.
+
+    Returns:
+        dict: 'rows' (report records) and 'next_cursor' (pass back for the next page; None on the last page).
+    """
+    df_filtered_glacc = _select_gl_report_rows(branch, from_date_str, to_date_str, gl_code_lookup)
+    if df_filtered_glacc.empty:
+        return {'rows': [], 'next_cursor': None}
+    start, stop, next_cursor = frame_page_bounds(df_filtered_glacc['DOCDATE_DT'], df_filtered_glacc['TRN_NUM_SORT'], cursor, page_size)
+    print(f"Server Log (GL Report): Returning rows {start} to {stop} of {len(df_filtered_glacc)} for GL report page.")
+    return {'rows': _format_gl_report_rows(df_filtered_glacc.iloc[start:stop], branch), 'next_cursor': next_cursor}
+
+def iter_gl_report_pages(branch, from_date_str, to_date_str, gl_code_lookup, page_size=DEFAULT_PAGE_SIZE):
+    """Yields the whole GL report as lists of at most page_size records, formatting one page at a time."""
+    df_filtered_glacc = _select_gl_report_rows(branch, from_date_str, to_date_str, gl_code_lookup)
+    for start in range(0, len(df_filtered_glacc), page_size):
+        yield _format_gl_report_rows(df_filtered_glacc.iloc[start:start + page_size], branch)
+
+def get_gl_report_totals(branch, from_date_str, to_date_str, gl_code_lookup):
+    """Row count, DR/CR totals and ending balance of the GL report, without formatting its rows."""
+    return summarize_gl_rows(_select_gl_report_rows(branch, from_date_str, to_date_str, gl_code_lookup), format_currency)
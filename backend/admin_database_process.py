@@ -278,7 +278,7 @@ def get_gl_date_range(branch_name):
 
     # Regex to capture MM-DD-YYYY dates for GL filename format
     # The regex pattern should match the flexible branch name at the start
-    date_pattern = re.compile(rf'^{flexible_branch_pattern_part} - (\d{{2}}-\d{{2}}-\d{{4}}) to (\d{{2}}-\d{{2}}-\d{{4}})\.csv$', re.IGNORECASE)
+    date_pattern = re.compile(rf'^{flexible_branch_pattern_part}(?: \(\d+\))? - (\d{{2}}-\d{{2}}-\d{{4}}) to (\d{{2}}-\d{{2}}-\d{{4}})\.csv$', re.IGNORECASE)
 
     for root, _, files in os.walk(branch_path): # Keep os.walk for GL as it might have subfolders
         for file in files:
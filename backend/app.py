@@ -85,7 +85,7 @@ try:
     from backend.reference_process import process_ref_report
     from backend.description_process import process_desc_report
     from backend.trend_process import process_trend_report
-    from backend.financial_statement_process import process_financial_statement
+    from backend.financial_statement_process import process_financial_statement, start_financial_statement_matrix_refresh
     from backend.operations_process import get_aging_names_and_cids, get_aging_summary_data, get_aging_history_per_member_loan, get_accounts_contribute_to_provisions_report, get_top_borrowers_report, get_new_loans_with_past_due_history_report, get_new_loans_details
     from backend.operations_soa import process_statement_of_account_report
     from backend.journal_voucher_process import process_journal_voucher_data
@@ -483,6 +483,9 @@ if __name__ == '__main__':
         print(f"Server Log: Error during default Former Employee data seeding: {e}")
         # Continue even if seeding fails
 
+    # Compile (or pick up) the FS.xlsx matrix in the background so the first FS request does not wait for it
+    start_financial_statement_matrix_refresh()
+
     # Removed SSL context configuration
     # CERT_PATH = r"C:\xampp\apache\conf\ssl.crt\server.crt"
     # KEY_PATH = r"C:\xampp\apache\conf\ssl.key\server.key"
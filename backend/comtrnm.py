@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 import re # Import regex module
 import io # For in-memory file size estimation
 import csv # For quoting in CSV writes
+from backend.utils.parallel_ingest import INGEST_MAX_WORKERS, INGEST_CHUNK_ROWS, log_once, read_csv_normalized, run_ordered_jobs
 
 print("Server Log (TRNM): comtrnm.py module is being loaded...")
 
@@ -55,8 +56,102 @@ def convert_trndate_serial(serial):
     except (ValueError, TypeError):
         return pd.NaT
 
+# Columns converted to numbers on ingest; the amounts are stored in cents and divided by 100
+NUMERIC_COLUMNS = ['TRNAMT', 'TRNNONC', 'TRNINT', 'TRNTAXPEN', 'BAL', 'SEQ', 'APPTYPE']
+COLUMNS_DIVIDED_BY_100 = ['TRNAMT', 'TRNNONC', 'TRNINT', 'TRNTAXPEN', 'BAL']
+
+# Format ACC: xx-xxxxx-y (ACC -X and CHD -Y)
+def format_acc(acc, chd):
+    # Ensure ACC and CHD are treated as strings for zfill and slicing
+    acc_part = str(acc).split('.')[0] if pd.notna(acc) else ''
+    chd_part = str(chd).split('.')[0] if pd.notna(chd) else ''
+
+    # Pad ACC part to 7 digits, then combine with CHD part
+    combined_acc_chd = acc_part.zfill(7) + chd_part.zfill(1) # Ensure CHD is also padded if needed, assuming 1 digit
+
+    # Apply xx-xxxxx-y format if combined string is long enough
+    if len(combined_acc_chd) >= 8:
+        return f"{combined_acc_chd[:2]}-{combined_acc_chd[2:7]}-{combined_acc_chd[7:]}"
+    else:
+        return acc_part # Fallback if not enough digits for full format
+
+def normalize_trnm_chunk(df, branch_name, warned):
+    """
+    Normalizes one chunk of a TRNM CSV: keeps the branch's rows, converts the numeric columns
+    (amounts divided by 100), adds TRNDATE_DT from the Excel serial TRNDATE, recomputes TRNNONC
+    and formats ACC with CHD. Rows without a valid TRNDATE are kept (TRNDATE_DT is NaT) and
+    dropped once all files are combined.
+
+    Args:
+        warned (set): Warnings already printed for this file, so each is printed once per file.
+    """
+    # Filter by branch first
+    if 'BRANCH' in df.columns:
+        df = df[df['BRANCH'].astype(str).str.strip().str.upper() == branch_name].copy()
+        df['BRANCH'] = df['BRANCH'].astype(str).str.strip().str.upper()
+    else:
+        log_once(warned, "Server Log (TRNM): Warning: 'BRANCH' column not found in combined data. Cannot filter by branch.")
+
+    # Convert columns to numeric, handling potential non-numeric values
+    # Apply division by 100 here for relevant numeric columns
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            try:
+                if col == 'APPTYPE':
+                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int) # Convert to int
+                else:
+                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+                    # Apply division by 100 for specified columns
+                    if col in COLUMNS_DIVIDED_BY_100:
+                        df[col] = df[col] / 100
+            except Exception as e:
+                print(f"Server Log (TRNM): Error converting column '{col}' to numeric: {e}. Values might be NaN.")
+                df[col] = pd.NaT
+        else:
+            log_once(warned, f"Server Log (TRNM): Warning: Column '{col}' not found in combined data. Skipping numeric conversion for this column.")
+
+    # Ensure TRNDATE_DT column exists and is datetime dtype
+    if 'TRNDATE' in df.columns:
+        df['TRNDATE_DT'] = df['TRNDATE'].apply(convert_trndate_serial)
+    else:
+        df['TRNDATE_DT'] = pd.Series([pd.NaT] * len(df), index=df.index)
+        log_once(warned, "Server Log (TRNM): Warning: 'TRNDATE' column not found in new data. 'TRNDATE_DT' initialized to NaT.")
+
+    # Compute TRNNONC (only if necessary columns exist)
+    if all(col in df.columns for col in ['TRNAMT', 'TRNINT', 'TRNTAXPEN']):
+        df['TRNNONC'] = df['TRNAMT'] - df['TRNINT'] - df['TRNTAXPEN']
+    else:
+        log_once(warned, "Server Log (TRNM): Warning: Missing columns for 'TRNNONC' calculation (TRNAMT, TRNINT, TRNTAXPEN). Skipping calculation.")
+        if 'TRNNONC' not in df.columns:
+            df['TRNNONC'] = pd.NA
+
+    if 'ACC' in df.columns:
+        # Check for 'CHD' column presence for ACC formatting
+        if 'CHD' in df.columns:
+            df['ACC'] = [format_acc(acc, chd) for acc, chd in zip(df['ACC'], df['CHD'])]
+        else:
+            log_once(warned, "Server Log (TRNM): Warning: 'CHD' column not found for ACC formatting. Using raw ACC.")
+            df['ACC'] = df['ACC'].astype(str) # Ensure it's string
+    else:
+        log_once(warned, "Server Log (TRNM): Warning: 'ACC' column not found. Account formatting skipped.")
+    return df
+
+def _ingest_trnm_file(job):
+    """
+    Worker-process entry point: reads one TRNM CSV in chunks (UTF-8, falling back to latin1) and
+    normalizes them. Returns (frame, error message); frame is None when the file failed.
+    """
+    path, branch_name, chunk_size = job
+    warned = set()
+    try:
+        frame = read_csv_normalized(path, lambda chunk: normalize_trnm_chunk(chunk, branch_name, warned),
+                                    ['utf-8', 'latin1'], chunk_size, low_memory=False)
+        return frame, None
+    except Exception as e:
+        return None, str(e)
+
 # MODIFIED: Adjusted function signature to accept output_folder and file_prefix
-def process_transactions_web(input_dir, output_folder, file_prefix):
+def process_transactions_web(input_dir, output_folder, file_prefix, max_workers=INGEST_MAX_WORKERS, chunk_size=INGEST_CHUNK_ROWS):
     """
     Processes TRNM CSV files from input_dir, combines data,
     filters by branch, processes all app types and categories,
@@ -70,6 +165,10 @@ def process_transactions_web(input_dir, output_folder, file_prefix):
         input_dir (str): The directory containing the TRNM CSV files.
         output_folder (str): The specific output directory (branch-specific) where files should be saved.
         file_prefix (str): The 3-character prefix for the output filenames (e.g., "ELS").
+        max_workers (int): Worker processes used to read the files (see normalize_trnm_chunk).
+        chunk_size (int): Rows read and normalized at a time per file.
+
+    The files are combined in file name order, so the output does not depend on the worker count.
     """
     # The branch name for filtering is derived from the output_folder now
     sanitized_branch_for_folder = os.path.basename(output_folder)
@@ -92,77 +191,36 @@ def process_transactions_web(input_dir, output_folder, file_prefix):
         'TRNAMT', 'TRNNONC', 'TRNINT', 'TRNTAXPEN', 'BAL', 'SEQ', 'TRNDESC', 'APPTYPE'
     ]
 
-    # Read and combine CSV files from selected input folder
-    combined_data = []
+    # Read and normalize TRNM CSV files from selected input folder, several at a time
     print(f"Server Log (TRNM): Scanning for CSV files in: {input_dir}")
-    files_processed = 0
-    trnm_files_found = False # Track if any TRNM files were found
+    trnm_filenames = sorted(filename for filename in os.listdir(input_dir)
+                            if filename.lower().endswith('.csv') and filename.upper().startswith('TRNM'))
 
-    for filename in os.listdir(input_dir):
-        if not filename.lower().endswith('.csv') or not filename.upper().startswith('TRNM'):
-            continue
-        
-        trnm_files_found = True # Found at least one TRNM CSV
+    if not trnm_filenames:
+        raise Exception("No TRNM CSV files found in the specified input directory.")
 
-        path = os.path.join(input_dir, filename)
-        print(f"Server Log (TRNM): Processing file: {path}")
-        try:
-            # Try reading with utf-8 first, then fall back to latin1 for robustness
-            try:
-                df = pd.read_csv(path, encoding='utf-8', low_memory=False)
-            except UnicodeDecodeError:
-                df = pd.read_csv(path, encoding='latin1', low_memory=False)
-            combined_data.append(df)
-            files_processed += 1
-        except Exception as e: # Catch all other exceptions during read
-            print(f"Server Log (TRNM): Error reading file {path}: {e}. Skipping.")
+    for filename in trnm_filenames:
+        print(f"Server Log (TRNM): Processing file: {os.path.join(input_dir, filename)}")
+    results = run_ordered_jobs(_ingest_trnm_file, [(os.path.join(input_dir, filename), sanitized_branch_for_folder, chunk_size) for filename in trnm_filenames], max_workers)
+
+    combined_data = []
+    for filename, (df, error) in zip(trnm_filenames, results):
+        if df is None:
+            print(f"Server Log (TRNM): Error reading file {os.path.join(input_dir, filename)}: {error}. Skipping.")
             continue
+        combined_data.append(df)
+    files_processed = len(combined_data)
 
-    if not trnm_files_found:
-        raise Exception("No TRNM CSV files found in the specified input directory.")
-    
     if not combined_data:
         raise Exception("No valid TRNM CSV files found in the input folder.")
 
-    final_df = pd.concat(combined_data, ignore_index=True)
+    non_empty_data = [df for df in combined_data if not df.empty]
+    if not non_empty_data:
+        print(f"Server Log (TRNM): No data found for branch '{sanitized_branch_for_folder}'.")
+        return {"message": f"No data found for branch '{sanitized_branch_for_folder}'.", "output_path": branch_output_dir}
+    final_df = pd.concat(non_empty_data, ignore_index=True)
     print(f"Server Log (TRNM): Combined data from {files_processed} files.")
 
-    # Filter by branch first
-    if 'BRANCH' in final_df.columns:
-        final_df['BRANCH'] = final_df['BRANCH'].astype(str).str.strip().str.upper()
-        # Filter using the sanitized branch name derived from the output_dir
-        final_df = final_df[final_df['BRANCH'] == sanitized_branch_for_folder]
-        if final_df.empty:
-            print(f"Server Log (TRNM): No data found for branch '{sanitized_branch_for_folder}'.")
-            return {"message": f"No data found for branch '{sanitized_branch_for_folder}'.", "output_path": branch_output_dir}
-    else:
-        print("Server Log (TRNM): Warning: 'BRANCH' column not found in combined data. Cannot filter by branch.")
-
-    # Convert columns to numeric, handling potential non-numeric values
-    # Apply division by 100 here for relevant numeric columns
-    for col in ['TRNAMT', 'TRNNONC', 'TRNINT', 'TRNTAXPEN', 'BAL', 'SEQ', 'APPTYPE']:
-        if col in final_df.columns:
-            try:
-                if col == 'APPTYPE':
-                    final_df[col] = pd.to_numeric(final_df[col], errors='coerce').fillna(0).astype(int) # Convert to int
-                else:
-                    final_df[col] = pd.to_numeric(final_df[col], errors='coerce').fillna(0)
-                    # Apply division by 100 for specified columns
-                    if col in ['TRNAMT', 'TRNNONC', 'TRNINT', 'TRNTAXPEN', 'BAL']:
-                        final_df[col] = final_df[col] / 100
-            except Exception as e:
-                print(f"Server Log (TRNM): Error converting column '{col}' to numeric: {e}. Values might be NaN.")
-                final_df[col] = pd.NaT
-        else:
-            print(f"Server Log (TRNM): Warning: Column '{col}' not found in combined data. Skipping numeric conversion for this column.")
-
-    # Ensure TRNDATE_DT column exists and is datetime dtype
-    if 'TRNDATE' in final_df.columns:
-        final_df['TRNDATE_DT'] = final_df['TRNDATE'].apply(convert_trndate_serial)
-    else:
-        final_df['TRNDATE_DT'] = pd.Series([pd.NaT] * len(final_df), index=final_df.index)
-        print("Server Log (TRNM): Warning: 'TRNDATE' column not found in new data. 'TRNDATE_DT' initialized to NaT.")
-
     # Remove rows where TRNDATE_DT is blank/NaT
     initial_rows = len(final_df)
     final_df.dropna(subset=['TRNDATE_DT'], inplace=True)
@@ -170,40 +228,6 @@ def process_transactions_web(input_dir, output_folder, file_prefix):
     if rows_removed > 0:
         print(f"Server Log (TRNM): Removed {rows_removed} rows with blank or invalid TRNDATE.")
 
-    # Compute TRNNONC (only if necessary columns exist)
-    if all(col in final_df.columns for col in ['TRNAMT', 'TRNINT', 'TRNTAXPEN']):
-        final_df['TRNNONC'] = final_df['TRNAMT'] - final_df['TRNINT'] - final_df['TRNTAXPEN']
-    else:
-        print("Server Log (TRNM): Warning: Missing columns for 'TRNNONC' calculation (TRNAMT, TRNINT, TRNTAXPEN). Skipping calculation.")
-        if 'TRNNONC' not in final_df.columns:
-            final_df['TRNNONC'] = pd.NA
-
-
-    # Format ACC: xx-xxxxx-y (ACC -X and CHD -Y)
-    def format_acc(row):
-        # Ensure ACC and CHD are treated as strings for zfill and slicing
-        acc_part = str(row['ACC']).split('.')[0] if pd.notna(row['ACC']) else ''
-        chd_part = str(row.get('CHD', '')).split('.')[0] if pd.notna(row.get('CHD')) else '' # Use .get for safety
-        
-        # Pad ACC part to 7 digits, then combine with CHD part
-        combined_acc_chd = acc_part.zfill(7) + chd_part.zfill(1) # Ensure CHD is also padded if needed, assuming 1 digit
-        
-        # Apply xx-xxxxx-y format if combined string is long enough
-        if len(combined_acc_chd) >= 8:
-            return f"{combined_acc_chd[:2]}-{combined_acc_chd[2:7]}-{combined_acc_chd[7:]}"
-        else:
-            return acc_part # Fallback if not enough digits for full format
-
-    if 'ACC' in final_df.columns:
-        # Check for 'CHD' column presence for ACC formatting
-        if 'CHD' in final_df.columns:
-            final_df['ACC'] = final_df.apply(format_acc, axis=1)
-        else:
-            print("Server Log (TRNM): Warning: 'CHD' column not found for ACC formatting. Using raw ACC.")
-            final_df['ACC'] = final_df['ACC'].astype(str) # Ensure it's string
-    else:
-        print("Server Log (TRNM): Warning: 'ACC' column not found. Account formatting skipped.")
-
     # Define numeric columns for final formatting (comma and 2 decimal points)
     numeric_cols_for_final_format = ['TRNAMT', 'TRNNONC', 'TRNINT', 'TRNTAXPEN', 'BAL']
 
@@ -262,7 +286,7 @@ def process_transactions_web(input_dir, output_folder, file_prefix):
 
         # Sort by TRNDATE_DT before saving/splitting to ensure proper appending order
         # This sort is applied to the *original* DataFrame for saving, ensuring consistent internal ordering
-        df_to_save_original.sort_values(by='TRNDATE_DT', inplace=True)
+        df_to_save_original.sort_values(by='TRNDATE_DT', kind='stable', inplace=True)
         df_to_save_original.reset_index(drop=True, inplace=True)
 
         # Apply final formatting for numeric and date columns before saving
@@ -381,8 +405,9 @@ def process_transactions_web(input_dir, output_folder, file_prefix):
         # --- Remove all previous files for this base_filename_prefix ---
         # This ensures that old date range files are removed before new ones are written
         # Regex to match files starting with the base_filename_prefix and having a date range suffix
-        # The regex should only match the base prefix and the date format, not the part_X suffix
-        existing_file_regex = re.compile(rf'^{re.escape(base_filename_prefix)} - \d{{2}}-\d{{2}}-\d{{4}} TO \d{{2}}-\d{{2}}-\d{{4}}\.csv$', re.IGNORECASE)
+        # The regex should only match the base prefix (plus the writer's optional " (n)" copy number)
+        # and the date format, not the part_X suffix
+        existing_file_regex = re.compile(rf'^{re.escape(base_filename_prefix)}(?: \(\d+\))? - \d{{2}}-\d{{2}}-\d{{4}} TO \d{{2}}-\d{{2}}-\d{{4}}\.csv$', re.IGNORECASE)
         
         files_removed = 0
         for existing_file_name in os.listdir(branch_output_dir):
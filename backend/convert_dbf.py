@@ -1,16 +1,18 @@
 # convert_dbf.py
 import os
-import csv
-from dbfread import DBF # Make sure you have dbfread installed: pip install dbfread
+# Streaming DBF reads/writes (dbfread, pip install dbfread) live in the shared DBF layer
+from backend.utils.dbf_stream import convert_dbf_files
 
-def process_dbf_to_csv_web(input_dir, output_dir):
+def process_dbf_to_csv_web(input_dir, output_dir, output_format='csv'):
     """
     Converts all DBF files in the input_dir to CSV files in the output_dir.
-    Attempts multiple encodings for DBF reading.
+    Attempts multiple encodings for DBF reading. Records are streamed to the output
+    file as they are read, and several DBF files are converted in parallel processes.
 
     Args:
         input_dir (str): The directory containing the DBF files.
         output_dir (str): The directory where the CSV files will be saved.
+        output_format (str): 'csv' (default) or 'parquet' (typed columns; needs pyarrow).
     
     Returns:
         str: The path to the output_dir, regardless of whether single or multiple files were converted.
@@ -20,58 +22,30 @@ def process_dbf_to_csv_web(input_dir, output_dir):
     print(f"Server Log (Convert DBF): Starting DBF to CSV conversion from {input_dir} to {output_dir}")
 
     encodings_to_try = ['latin1', 'cp1252', 'utf-8', 'iso-8859-2']
-    dbf_files_found = False
-    converted_count = 0
-    
-    # List to store paths of successfully converted CSVs within output_dir
-    converted_csv_paths = [] 
 
-    for file_name in os.listdir(input_dir):
-        if file_name.lower().endswith('.dbf') and not file_name.startswith('~'):
-            dbf_files_found = True
-            dbf_path = os.path.join(input_dir, file_name)
-            csv_file_name = os.path.splitext(file_name)[0] + '.csv'
-            csv_path = os.path.join(output_dir, csv_file_name)
+    dbf_paths = [
+        os.path.join(input_dir, file_name) for file_name in os.listdir(input_dir)
+        if file_name.lower().endswith('.dbf') and not file_name.startswith('~')
+    ]
+    if not dbf_paths:
+        raise Exception("No DBF files found in the specified input directory.")
 
-            print(f'Server Log (Convert DBF): 🔄 Converting {file_name}...')
+    for dbf_path in dbf_paths:
+        print(f'Server Log (Convert DBF): 🔄 Converting {os.path.basename(dbf_path)}...')
 
-            try:
-                success = False
-                for encoding in encodings_to_try:
-                    try:
-                        table = DBF(dbf_path, load=True, encoding=encoding, ignore_missing_memofile=True)
-                        
-                        with open(csv_path, 'w', newline='', encoding='utf-8') as csv_file:
-                            writer = csv.writer(csv_file)
-                            writer.writerow(table.field_names) # Write header row
-                            for record in table:
-                                try:
-                                    writer.writerow(list(record.values()))
-                                except Exception as e:
-                                    print(f'Server Log (Convert DBF): ⚠️ Skipping corrupted record in {file_name}: {e}')
-                        
-                        print(f'Server Log (Convert DBF): ✅ Converted {file_name} using encoding: {encoding}')
-                        success = True
-                        converted_count += 1
-                        converted_csv_paths.append(csv_path) # Add to list of converted paths
-                        break # Break from encoding loop if successful
-                    except UnicodeDecodeError as e:
-                        print(f'Server Log (Convert DBF): ⚠️ Encoding {encoding} failed for {file_name}: {e}')
-                    except Exception as e:
-                        print(f'Server Log (Convert DBF): ⚠️ Failed on encoding {encoding} for {file_name}: {e}')
-                
-                if not success:
-                    raise Exception(f'Could not decode {file_name} with known encodings.')
+    # Each file is streamed record by record (never loaded whole), several files at once
+    results = convert_dbf_files(dbf_paths, output_dir, output_format, encodings_to_try, log_label="Convert DBF")
 
-            except Exception as e:
-                print(f'Server Log (Convert DBF): ❌ Failed to convert {file_name}: {e}')
-                raise Exception(f"Failed to convert {file_name}: {e}")
+    for result in results:
+        file_name = os.path.basename(result['dbf_path'])
+        if result['error'] is None:
+            print(f'Server Log (Convert DBF): ✅ Converted {file_name} using encoding: {result["encoding"]}')
 
-    if not dbf_files_found:
-        raise Exception("No DBF files found in the specified input directory.")
-    
-    if converted_count == 0 and dbf_files_found:
-        raise Exception("No DBF files were successfully converted.")
+    failed = [result for result in results if result['error'] is not None]
+    for result in failed:
+        print(f'Server Log (Convert DBF): ❌ Failed to convert {os.path.basename(result["dbf_path"])}: {result["error"]}')
+    if failed:
+        raise Exception(f"Failed to convert {os.path.basename(failed[0]['dbf_path'])}: {failed[0]['error']}")
 
     print("Server Log (Convert DBF): 🎉 All conversions attempted. Check 'CSV_Output' folder for results.")
     
@@ -1,11 +1,15 @@
 # audit_tool/backend/db_common.py (Revised for SQLAlchemy integration and get_unique_aging_dates)
 import pandas as pd
+import numpy as np
 import os
 import pymysql
 from datetime import datetime, timedelta
 import re # Import regex for advanced cleaning
-from sqlalchemy import create_engine, text # Import create_engine and text for parameterized queries
+from sqlalchemy import create_engine, text, event # Import create_engine and text for parameterized queries
 import traceback # Import traceback for detailed error logging
+import threading
+import time
+from contextlib import contextmanager
 
 
 # --- Base Directories and Database Configuration ---
@@ -71,47 +75,333 @@ DB_CONFIG = {
     'charset': 'utf8mb4' # Recommended for broader character support
 }
 
-# Removed the module-level 'engine' creation.
-# It will now be created and returned by get_db_connection_sqlalchemy() function.
+# Connection pool settings for the shared SQLAlchemy engine.
+# pool_size/max_overflow bound how many concurrent report queries can hold a connection,
+# pool_recycle drops connections before MySQL's wait_timeout closes them server-side,
+# and pool_pre_ping checks a connection is alive before handing it out.
+DB_POOL_CONFIG = {
+    'pool_size': 10,
+    'max_overflow': 20,
+    'pool_timeout': 30, # Seconds to wait for a free connection before giving up
+    'pool_recycle': 3600,
+    'pool_pre_ping': True
+}
+
+# The engine is created lazily on first use and shared by every module in the process.
+_engine = None
+_engine_lock = threading.Lock()
+_pool_stats_lock = threading.Lock()
+_pool_stats = {
+    'connects': 0,       # New DBAPI connections opened by the pool
+    'checkouts': 0,      # Connections handed out of the pool
+    'checkins': 0,       # Connections returned to the pool
+    'invalidations': 0,  # Connections discarded (e.g. failed pre-ping)
+    'wait_count': 0,     # Timed checkouts made through this module
+    'total_wait_seconds': 0.0,
+    'max_wait_seconds': 0.0
+}
+
+
+def _increment_pool_stat(key, amount=1):
+    with _pool_stats_lock:
+        _pool_stats[key] += amount
+
+
+def _record_pool_wait(elapsed):
+    with _pool_stats_lock:
+        _pool_stats['wait_count'] += 1
+        _pool_stats['total_wait_seconds'] += elapsed
+        if elapsed > _pool_stats['max_wait_seconds']:
+            _pool_stats['max_wait_seconds'] = elapsed
+
+
+def _register_pool_listeners(engine):
+    """Hooks pool events so checkout/checkin activity shows up in get_db_pool_stats()."""
+    event.listen(engine, 'connect', lambda dbapi_conn, conn_record: _increment_pool_stat('connects'))
+    event.listen(engine, 'checkout', lambda dbapi_conn, conn_record, conn_proxy: _increment_pool_stat('checkouts'))
+    event.listen(engine, 'checkin', lambda dbapi_conn, conn_record: _increment_pool_stat('checkins'))
+    event.listen(engine, 'invalidate', lambda dbapi_conn, conn_record, exception: _increment_pool_stat('invalidations'))
 
-def get_db_connection():
-    """Establishes and returns a new raw pymysql database connection (for non-pandas ops)."""
-    return pymysql.connect(
-        host=DB_CONFIG['host'],
-        user=DB_CONFIG['user'],
-        password=DB_CONFIG['password'],
-        database=DB_CONFIG['database'],
-        cursorclass=pymysql.cursors.DictCursor,
-        charset=DB_CONFIG['charset']
-    )
 
 def get_db_connection_sqlalchemy():
     """
-    Establishes and returns a SQLAlchemy engine for database operations.
-    Requires pymysql to be installed (pip install pymysql).
+    Returns the process-wide SQLAlchemy engine, creating it on first call.
+    The engine owns a connection pool configured by DB_POOL_CONFIG, so callers
+    should not dispose of it. Requires pymysql to be installed (pip install pymysql).
     """
+    global _engine
+    if _engine is not None:
+        return _engine
+
+    with _engine_lock:
+        if _engine is not None: # Another thread created it while we waited for the lock
+            return _engine
+        try:
+            engine_url = (
+                f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@"
+                f"{DB_CONFIG['host']}/{DB_CONFIG['database']}?charset={DB_CONFIG['charset']}"
+            )
+            engine = create_engine(engine_url, **DB_POOL_CONFIG)
+            _register_pool_listeners(engine)
+            # Test connection once; this connection goes back into the pool for reuse
+            with engine.connect() as connection:
+                print(f"Server Log (db_common): SQLAlchemy engine connected successfully (pool settings: {DB_POOL_CONFIG}).")
+            _engine = engine
+            return _engine
+        except Exception as e:
+            print(f"Server Log (db_common): Error creating SQLAlchemy engine: {e}")
+            traceback.print_exc()
+            return None
+
+
+def dispose_db_engine():
+    """
+    Closes all pooled connections and forgets the shared engine.
+    The next get_db_connection_sqlalchemy() call builds a fresh one.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+            print("Server Log (db_common): SQLAlchemy engine disposed.")
+
+
+@contextmanager
+def pooled_connection(engine=None):
+    """
+    Context manager that checks a SQLAlchemy Connection out of the shared pool,
+    recording how long the checkout waited, and returns it to the pool on exit.
+    """
+    engine = engine or get_db_connection_sqlalchemy()
+    if engine is None:
+        raise RuntimeError("SQLAlchemy engine not available.")
+    start = time.perf_counter()
+    connection = engine.connect()
+    _record_pool_wait(time.perf_counter() - start)
     try:
-        engine_url = (
-            f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@"
-            f"{DB_CONFIG['host']}/{DB_CONFIG['database']}?charset={DB_CONFIG['charset']}"
+        yield connection
+    finally:
+        connection.close()
+
+
+class _PooledPyMySQLConnection:
+    """
+    Wraps a raw pymysql connection borrowed from the shared pool so it behaves like the
+    DictCursor connections returned by pymysql.connect(). close() returns it to the pool.
+    """
+
+    def __init__(self, pool_proxy):
+        self._pool_proxy = pool_proxy
+        self._closed = False
+
+    def cursor(self, cursor=None):
+        return self._pool_proxy.cursor(cursor or pymysql.cursors.DictCursor)
+
+    @property
+    def open(self):
+        return not self._closed and self._pool_proxy.dbapi_connection is not None and self._pool_proxy.dbapi_connection.open
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._pool_proxy.close()
+
+    def __getattr__(self, name):
+        # Delegate commit(), rollback(), etc. to the pooled DBAPI connection
+        return getattr(self._pool_proxy, name)
+
+
+def get_db_connection():
+    """
+    Returns a raw pymysql connection (DictCursor by default, for non-pandas ops)
+    borrowed from the shared SQLAlchemy pool. Calling close() returns it to the pool.
+    Falls back to a direct pymysql.connect() if the engine is unavailable.
+    """
+    engine = get_db_connection_sqlalchemy()
+    if engine is None:
+        print("Server Log (db_common): SQLAlchemy engine unavailable, opening a direct pymysql connection.")
+        return pymysql.connect(
+            host=DB_CONFIG['host'],
+            user=DB_CONFIG['user'],
+            password=DB_CONFIG['password'],
+            database=DB_CONFIG['database'],
+            cursorclass=pymysql.cursors.DictCursor,
+            charset=DB_CONFIG['charset']
         )
-        engine = create_engine(engine_url)
-        # Test connection (optional, but good for debugging)
-        with engine.connect() as connection:
-            print("Server Log (db_common): SQLAlchemy engine connected successfully.")
-        return engine
-    except Exception as e:
-        print(f"Server Log (db_common): Error creating SQLAlchemy engine: {e}")
-        traceback.print_exc()
-        return None
+    start = time.perf_counter()
+    pool_proxy = engine.raw_connection()
+    _record_pool_wait(time.perf_counter() - start)
+    return _PooledPyMySQLConnection(pool_proxy)
+
+
+def get_db_pool_stats():
+    """
+    Returns a snapshot of the shared pool's configuration, current occupancy and
+    cumulative checkout/wait counters, for sizing DB_POOL_CONFIG under report load.
+    """
+    with _pool_stats_lock:
+        stats = dict(_pool_stats)
+    stats['avg_wait_seconds'] = (stats['total_wait_seconds'] / stats['wait_count']) if stats['wait_count'] else 0.0
+    stats['config'] = dict(DB_POOL_CONFIG)
+
+    engine = _engine
+    if engine is None:
+        stats['engine_initialized'] = False
+        return stats
+
+    pool = engine.pool
+    stats['engine_initialized'] = True
+    stats['pool_size'] = pool.size()
+    stats['checked_in'] = pool.checkedin()
+    stats['checked_out'] = pool.checkedout()
+    stats['overflow'] = pool.overflow()
+    stats['status'] = pool.status()
+    return stats
+
+# --- Report Frame Schemas ---
+# Compact dtypes applied to report frames at load time (get_data_from_mysql, iter_data_from_mysql)
+# when a caller passes schema=<family>. Low-cardinality text becomes 'category', DECIMAL money
+# becomes float64 and DATE columns become datetime64. Column names match the MySQL tables.
+FRAME_SCHEMAS = {
+    'aging': {
+        'Branch': 'category',
+        'Aging': 'category',
+        'Product': 'category',
+        'Group': 'category',
+        'Principal': 'float64',
+        'Balance': 'float64',
+        'Date': 'datetime64[ns]',
+        'Disbursement_Date': 'datetime64[ns]',
+        'Due_Date': 'datetime64[ns]',
+    },
+    'trnm': {
+        'TRNTYPE': 'category',
+        'TLR': 'category',
+        'LEVEL': 'category',
+        'APPTYPE': 'category',
+        'TRNAMT': 'float64',
+        'TRNNONC': 'float64',
+        'TRNINT': 'float64',
+        'TRNTAXPEN': 'float64',
+        'BAL': 'float64',
+        'TRNDATE': 'datetime64[ns]',
+    },
+    'svacc': {
+        'TYPE': 'category',
+        'GLCODE': 'category',
+        'ACCNAME': 'category',
+        'BAL': 'float64',
+        'INTRATE': 'float64',
+        'CUMINTPD': 'float64',
+        'CUMTAXW': 'float64',
+        'DOPEN': 'datetime64[ns]',
+        'DOLASTTRN': 'datetime64[ns]',
+        'MATDATE': 'datetime64[ns]',
+    },
+    'lnacc': {
+        'GLCODE': 'category',
+        'LOANID': 'category',
+        'BAL': 'float64',
+        'INTRATE': 'float64',
+        'CUMINTPD': 'float64',
+        'PRINCIPAL': 'float64',
+        'CUMPENPD': 'float64',
+        'INTBAL': 'float64',
+        'PENBAL': 'float64',
+        'DOPEN': 'datetime64[ns]',
+        'DOFIRSTI': 'datetime64[ns]',
+        'DOLASTTRN': 'datetime64[ns]',
+        'MATDATE': 'datetime64[ns]',
+        'DISBDATE': 'datetime64[ns]',
+    },
+    'gl': {
+        'GLACC': 'category',
+        'ACCOUNT': 'category',
+        'AMT': 'float64',
+        'BAL': 'float64',
+        'DOCDATE': 'datetime64[ns]',
+    },
+}
+
+
+def _resolve_frame_schema(schema):
+    """Returns the column -> dtype mapping for a registered schema name or an explicit dict."""
+    if schema is None:
+        return {}
+    if isinstance(schema, dict):
+        return schema
+    if schema not in FRAME_SCHEMAS:
+        raise KeyError(f"Unknown frame schema '{schema}'. Known schemas: {', '.join(sorted(FRAME_SCHEMAS))}")
+    return FRAME_SCHEMAS[schema]
+
+
+def _coerce_column(series, col_type):
+    """Casts one column to col_type. Unparseable numbers and dates become NaN/NaT."""
+    if col_type == 'category':
+        return series.astype('category')
+    if col_type.startswith('datetime64'):
+        converted = pd.to_datetime(series, errors='coerce')
+    elif col_type.startswith(('float', 'int')):
+        converted = pd.to_numeric(series, errors='coerce')
+        if not pd.api.types.is_numeric_dtype(series) and converted.isna().sum() > series.isna().sum():
+            # Text money columns may carry thousands separators
+            converted = pd.to_numeric(series.astype(str).str.replace(',', '', regex=False), errors='coerce')
+            converted[series.isna()] = np.nan
+        if col_type.startswith('int') and converted.isna().any():
+            col_type = 'float64' # int64 cannot hold NULLs
+    else:
+        return series.astype(col_type)
+    return converted.astype(col_type)
+
+
+def apply_frame_schema(df, schema, label=None, report=True):
+    """
+    Casts the columns of df listed in the schema (a FRAME_SCHEMAS name or a column -> dtype
+    dict) in place and returns (df, bytes_saved). Columns missing from df are ignored.
+    When report is True the before/after memory footprint is logged.
+    """
+    column_types = _resolve_frame_schema(schema)
+    present = {col: col_type for col, col_type in column_types.items() if col in df.columns}
+    if df.empty or not present:
+        return df, 0
+
+    before = df.memory_usage(deep=True).sum()
+    for col, col_type in present.items():
+        try:
+            df[col] = _coerce_column(df[col], col_type)
+        except (TypeError, ValueError) as e:
+            print(f"Server Log (db_common): Could not cast column '{col}' to {col_type}: {e}")
+    after = df.memory_usage(deep=True).sum()
+
+    saved = int(before - after)
+    if report:
+        print(f"Server Log (db_common): Applied '{label or schema}' schema to {len(df)} rows: "
+              f"{before / 1048576:.2f} MB -> {after / 1048576:.2f} MB (saved {saved / 1048576:.2f} MB)")
+    return df, saved
+
+
+def normalize_text_series(series):
+    """
+    Returns series.astype(str).str.strip().str.upper() as an object Series. For categorical
+    columns the string work runs once per category rather than once per row.
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(str).str.strip().str.upper()
+    labels = series.cat.categories.astype(str).str.strip().str.upper().to_numpy(dtype=object)
+    labels = np.append(labels, 'NAN') # Slot for missing values (code -1)
+    codes = series.cat.codes.to_numpy()
+    return pd.Series(labels[np.where(codes < 0, len(labels) - 1, codes)], index=series.index, name=series.name)
+
 
 # NEW: Helper function to fetch data from MySQL using pandas and SQLAlchemy engine
-# This function now calls get_db_connection_sqlalchemy internally to get the engine
-def get_data_from_mysql(query, params=None):
+# This function borrows a connection from the shared pool for the duration of the query
+def get_data_from_mysql(query, params=None, schema=None):
     """
     Fetches data from MySQL using a given query and returns it as a pandas DataFrame.
     Uses SQLAlchemy engine for better compatibility with pandas.read_sql.
     Handles database connection and error logging.
+    If schema is given (a FRAME_SCHEMAS name or column -> dtype dict), the frame is cast to it.
     """
     engine = get_db_connection_sqlalchemy() # Get the engine here
     if engine is None:
@@ -124,13 +414,16 @@ def get_data_from_mysql(query, params=None):
         print(f"DEBUG DB_COMMON (get_data_from_mysql): With parameters: {params}")
         # --- END DEBUGGING ---
 
-        # Use the engine directly with pandas.read_sql
+        # Borrow a pooled connection for pandas.read_sql
         # For parameterized queries, use sqlalchemy.text() to mark the query as literal SQL
         # and pass parameters separately.
-        if params is not None:
-            df = pd.read_sql(text(query), engine, params=params)
-        else:
-            df = pd.read_sql(query, engine)
+        with pooled_connection(engine) as connection:
+            if params is not None:
+                df = pd.read_sql(text(query), connection, params=params)
+            else:
+                df = pd.read_sql(query, connection)
+        if schema is not None:
+            df, _ = apply_frame_schema(df, schema)
         return df
     except Exception as e:
         print(f"Database Error (get_data_from_mysql): {e}")
@@ -138,6 +431,57 @@ def get_data_from_mysql(query, params=None):
         return pd.DataFrame() # Return empty DataFrame on error
 
 
+# Default number of rows per DataFrame chunk yielded by iter_data_from_mysql.
+DEFAULT_STREAM_CHUNKSIZE = 50000
+
+
+def iter_data_from_mysql(query, params=None, chunksize=DEFAULT_STREAM_CHUNKSIZE, dtype=None, schema=None):
+    """
+    Streams the result of a query as pandas DataFrame chunks of at most `chunksize` rows.
+
+    Unlike get_data_from_mysql, rows are read through a server-side (unbuffered) cursor,
+    so only one chunk is held in memory at a time. Each chunk is cast to `schema` (a
+    FRAME_SCHEMAS name) and then to `dtype`, which maps column names to types and takes
+    precedence (e.g. 'float64' for DECIMAL columns, 'datetime64[ns]' for dates).
+
+    The pooled connection stays checked out until the generator is exhausted or closed.
+    Errors are logged and re-raised, because a silently truncated stream would produce
+    wrong aggregates.
+    """
+    engine = get_db_connection_sqlalchemy()
+    if engine is None:
+        raise RuntimeError("SQLAlchemy engine not available.")
+
+    print(f"DEBUG DB_COMMON (iter_data_from_mysql): Streaming query in chunks of {chunksize}: {query}")
+    print(f"DEBUG DB_COMMON (iter_data_from_mysql): With parameters: {params}")
+
+    column_types = dict(_resolve_frame_schema(schema))
+    column_types.update(dtype or {})
+    total_saved = 0
+
+    try:
+        with pooled_connection(engine) as connection:
+            # stream_results makes the pymysql dialect use an SSCursor instead of
+            # buffering the full result set client-side.
+            stream_connection = connection.execution_options(stream_results=True)
+            if params is not None:
+                chunks = pd.read_sql(text(query), stream_connection, params=params, chunksize=chunksize)
+            else:
+                chunks = pd.read_sql(query, stream_connection, chunksize=chunksize)
+            for chunk in chunks:
+                chunk, saved = apply_frame_schema(chunk, column_types, report=False)
+                total_saved += saved
+                yield chunk
+        if column_types:
+            print(f"Server Log (db_common): Typed streamed chunks saved {total_saved / 1048576:.2f} MB in total.")
+    except GeneratorExit:
+        raise
+    except Exception as e:
+        print(f"Database Error (iter_data_from_mysql): {e}")
+        traceback.print_exc()
+        raise
+
+
 # NEW: Function to get all unique dates from aging_report_data table
 def get_unique_aging_dates(selected_branches=None):
     """
@@ -146,7 +490,9 @@ def get_unique_aging_dates(selected_branches=None):
     Returns dates as a sorted list of strings in MM/DD/YYYY format.
     """
     print(f"Server Log (db_common): Fetching unique aging dates for branches: {selected_branches}")
-    query = "SELECT DISTINCT Date FROM aging_report_data"
+    # (Branch, Date) is the leftmost part of idx_aging_branch_date, so MySQL answers this with a
+    # loose index scan (one index probe per branch and date) and always sees the current raw data
+    query = "SELECT DISTINCT Branch, Date FROM aging_report_data"
     params = None
     
     # MODIFIED: Refined logic to correctly handle single branch, area, or consolidated selections.
@@ -205,6 +551,162 @@ def get_unique_aging_dates(selected_branches=None):
     return unique_dates
 
 
+# --- Aging rollup: pre-aggregated aging_report_data for dashboard summaries ---
+AGING_ROLLUP_TABLE = 'aging_rollup'
+
+# One row per (Branch, Date, Aging bucket, Product). Aging_Bucket is the trimmed, upper-cased
+# Aging value ('' for NULL) so summaries can compare buckets without re-normalizing.
+# Key columns are kept short so the composite primary key fits InnoDB's index size limit.
+AGING_ROLLUP_DDL = f"""
+    CREATE TABLE IF NOT EXISTS `{AGING_ROLLUP_TABLE}` (
+        `Branch` VARCHAR(64) NOT NULL,
+        `Date` DATE NOT NULL,
+        `Aging_Bucket` VARCHAR(64) NOT NULL,
+        `Product` VARCHAR(128) NOT NULL,
+        `Balance_Sum` DECIMAL(20,2) NOT NULL DEFAULT 0,
+        `Principal_Sum` DECIMAL(20,2) NOT NULL DEFAULT 0,
+        `Account_Count` INT NOT NULL DEFAULT 0,
+        `Refreshed_At` DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (`Branch`, `Date`, `Aging_Bucket`, `Product`),
+        KEY `idx_aging_rollup_date_branch` (`Date`, `Branch`)
+    );
+"""
+
+# Account_Count is COUNT(DISTINCT Loan_Account) within one rollup key only. aging_report_data has
+# no unique key (an account can repeat within a branch and date), so these counts must not be
+# added across keys; summaries take their account counts from aging_rollup_accounts.
+_AGING_ROLLUP_INSERT_SQL = f"""
+    INSERT INTO `{AGING_ROLLUP_TABLE}`
+        (`Branch`, `Date`, `Aging_Bucket`, `Product`, `Balance_Sum`, `Principal_Sum`, `Account_Count`)
+    SELECT
+        COALESCE(Branch, '') AS Branch,
+        Date,
+        UPPER(TRIM(COALESCE(Aging, ''))) AS Aging_Bucket,
+        COALESCE(Product, '') AS Product,
+        COALESCE(SUM(Balance), 0) AS Balance_Sum,
+        COALESCE(SUM(Principal), 0) AS Principal_Sum,
+        COUNT(DISTINCT Loan_Account) AS Account_Count
+    FROM aging_report_data
+    WHERE Date IS NOT NULL {{date_filter}}
+    GROUP BY COALESCE(Branch, ''), Date, UPPER(TRIM(COALESCE(Aging, ''))), COALESCE(Product, '')
+"""
+
+AGING_ROLLUP_ACCOUNTS_TABLE = 'aging_rollup_accounts'
+
+# One row per (Branch, Date): the distinct loan accounts of each dashboard bucket group, so summaries
+# add up per-branch counts instead of running COUNT(DISTINCT) over aging_report_data. The bucket
+# groups match _build_aging_summary_query in operations_process.py.
+AGING_ROLLUP_ACCOUNTS_DDL = f"""
+    CREATE TABLE IF NOT EXISTS `{AGING_ROLLUP_ACCOUNTS_TABLE}` (
+        `Branch` VARCHAR(64) NOT NULL,
+        `Date` DATE NOT NULL,
+        `Current_Accounts` INT NOT NULL DEFAULT 0,
+        `Past_Due_Accounts` INT NOT NULL DEFAULT 0,
+        `Total_Accounts` INT NOT NULL DEFAULT 0,
+        `Provision_1_365_Accounts` INT NOT NULL DEFAULT 0,
+        `Provision_Over_365_Accounts` INT NOT NULL DEFAULT 0,
+        `Refreshed_At` DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (`Branch`, `Date`),
+        KEY `idx_aging_rollup_accounts_date` (`Date`)
+    );
+"""
+
+_AGING_ROLLUP_ACCOUNTS_INSERT_SQL = f"""
+    INSERT INTO `{AGING_ROLLUP_ACCOUNTS_TABLE}`
+        (`Branch`, `Date`, `Current_Accounts`, `Past_Due_Accounts`, `Total_Accounts`, `Provision_1_365_Accounts`, `Provision_Over_365_Accounts`)
+    SELECT
+        COALESCE(Branch, '') AS Branch,
+        Date,
+        COUNT(DISTINCT CASE WHEN UPPER(TRIM(COALESCE(Aging, ''))) = 'NOT YET DUE' THEN Loan_Account END) AS Current_Accounts,
+        COUNT(DISTINCT CASE WHEN UPPER(TRIM(COALESCE(Aging, ''))) <> 'NOT YET DUE' THEN Loan_Account END) AS Past_Due_Accounts,
+        COUNT(DISTINCT Loan_Account) AS Total_Accounts,
+        COUNT(DISTINCT CASE WHEN UPPER(TRIM(COALESCE(Aging, ''))) IN ('1-30 DAYS', '31-60', '61-90', '91-120', '121-180', '181-365') THEN Loan_Account END) AS Provision_1_365_Accounts,
+        COUNT(DISTINCT CASE WHEN UPPER(TRIM(COALESCE(Aging, ''))) = 'OVER 365' THEN Loan_Account END) AS Provision_Over_365_Accounts
+    FROM aging_report_data
+    WHERE Date IS NOT NULL {{date_filter}}
+    GROUP BY COALESCE(Branch, ''), Date
+"""
+
+
+def _ensure_aging_rollup_table(connection):
+    """Creates aging_rollup and aging_rollup_accounts if they don't exist."""
+    connection.execute(text(AGING_ROLLUP_DDL))
+    connection.execute(text(AGING_ROLLUP_ACCOUNTS_DDL))
+
+
+def refresh_aging_rollup(dates=None):
+    """
+    Rebuilds aging_rollup and aging_rollup_accounts rows from aging_report_data for the given report dates.
+    Only the listed dates are deleted and re-aggregated, so loading a new month
+    costs one pass over that month's rows. Pass dates=None to rebuild everything.
+
+    Args:
+        dates (list, optional): Dates (datetime/date objects or 'YYYY-MM-DD' strings).
+
+    Returns:
+        bool: True if the rollup was refreshed, False otherwise.
+    """
+    engine = get_db_connection_sqlalchemy()
+    if engine is None:
+        print("Error: Cannot refresh aging rollup, SQLAlchemy engine not available.")
+        return False
+
+    params = {}
+    if dates is not None:
+        date_strings = sorted({pd.to_datetime(d).strftime('%Y-%m-%d') for d in dates if pd.notna(pd.to_datetime(d, errors='coerce'))})
+        if not date_strings:
+            print("Server Log (db_common): No valid dates given for aging rollup refresh. Nothing to do.")
+            return True
+        params['dates'] = date_strings
+
+    with pooled_connection(engine) as connection:
+        try:
+            _ensure_aging_rollup_table(connection)
+            date_filter = "" if dates is None else "AND Date IN :dates"
+            for table_name in (AGING_ROLLUP_TABLE, AGING_ROLLUP_ACCOUNTS_TABLE):
+                connection.execute(text(f"DELETE FROM `{table_name}`" + ("" if dates is None else " WHERE Date IN :dates")), params)
+            result = connection.execute(text(_AGING_ROLLUP_INSERT_SQL.format(date_filter=date_filter)), params)
+            connection.execute(text(_AGING_ROLLUP_ACCOUNTS_INSERT_SQL.format(date_filter=date_filter)), params)
+            connection.commit()
+            print(f"Server Log (db_common): Aging rollup refreshed for {'all dates' if dates is None else params['dates']} ({result.rowcount} rollup rows).")
+            return True
+        except Exception as e:
+            print(f"Error refreshing aging rollup: {e}")
+            traceback.print_exc()
+            connection.rollback()
+            return False
+
+
+def prune_aging_rollup():
+    """
+    Removes aging_rollup and aging_rollup_accounts rows for dates that no longer exist in aging_report_data
+    (e.g. after the raw table was reloaded without some months).
+    """
+    engine = get_db_connection_sqlalchemy()
+    if engine is None:
+        print("Error: Cannot prune aging rollup, SQLAlchemy engine not available.")
+        return False
+
+    with pooled_connection(engine) as connection:
+        try:
+            _ensure_aging_rollup_table(connection)
+            pruned_rows = 0
+            for table_name in (AGING_ROLLUP_TABLE, AGING_ROLLUP_ACCOUNTS_TABLE):
+                result = connection.execute(text(f"""
+                    DELETE FROM `{table_name}`
+                    WHERE Date NOT IN (SELECT DISTINCT Date FROM aging_report_data WHERE Date IS NOT NULL)
+                """))
+                pruned_rows += result.rowcount
+            connection.commit()
+            print(f"Server Log (db_common): Pruned {pruned_rows} stale aging rollup rows.")
+            return True
+        except Exception as e:
+            print(f"Error pruning aging rollup: {e}")
+            traceback.print_exc()
+            connection.rollback()
+            return False
+
+
 # --- NEW: Function to create all necessary tables if they don't exist ---
 def create_tables():
     """
@@ -238,6 +740,10 @@ def create_tables():
             """))
             print("Table 'aging_report_data' ensured to exist.")
 
+            # Pre-aggregated aging summary tables, refreshed by refresh_aging_rollup()
+            _ensure_aging_rollup_table(connection)
+            print(f"Tables '{AGING_ROLLUP_TABLE}' and '{AGING_ROLLUP_ACCOUNTS_TABLE}' ensured to exist.")
+
             # NEW: Table for svacc_data (for SVACC data)
             # This table is now created per branch, so this generic one is not needed
             # but leaving it here if some other part of the system still relies on a consolidated svacc_data table.
@@ -406,6 +912,9 @@ def create_tables():
             print("Table 'finding_report' ensured to exist.")
 
             connection.commit() # Commit all DDL operations
+
+            # Secondary indexes for the report queries (versioned and idempotent)
+            apply_index_migrations(connection)
             return True
         except Exception as e:
             print(f"Error during table creation in create_tables(): {e}")
@@ -413,6 +922,372 @@ def create_tables():
             connection.rollback() # Rollback in case of error
             return False
 
+
+# --- Index migrations for hot report predicates ---
+SCHEMA_MIGRATIONS_TABLE = 'schema_migrations'
+
+# Each entry targets either fixed 'tables' or every table matching 'table_like'
+# (the per-branch trnm_/svacc_/lnacc_/gl_ tables). Index definitions are
+# {index_name: [columns]}; columns are ordered to match the WHERE / ORDER BY of the report queries.
+# An entry with 'fulltext_parser' creates FULLTEXT indexes with that parser instead of B-tree ones.
+# A version is recorded in schema_migrations once applied. Pattern-based entries are still
+# re-checked on every run because the populate/import scripts drop and recreate branch tables.
+INDEX_MIGRATIONS = [
+    {
+        'version': 1,
+        'description': "aging_report_data: Branch IN (...) AND Date = ..., and CID lookups",
+        'tables': ['aging_report_data'],
+        'indexes': {
+            'idx_aging_branch_date': ['Branch', 'Date'],
+            'idx_aging_branch_cid_date': ['Branch', 'CID', 'Date'],
+            'idx_aging_cid_date': ['CID', 'Date'],
+            'idx_aging_branch_name_date': ['Branch', 'Name_of_Member', 'Date']
+        }
+    },
+    {
+        'version': 2,
+        'description': "trnm_<branch>: statement of account by ACC ordered by TRNDATE, SEQ, and TRNDATE ranges",
+        'table_like': 'trnm\\_%',
+        'indexes': {
+            'idx_trnm_acc_date_seq': ['ACC', 'TRNDATE', 'SEQ'],
+            'idx_trnm_date_trn': ['TRNDATE', 'TRN']
+        }
+    },
+    {
+        'version': 3,
+        'description': "svacc_<branch>: deposit lookups by ACC and CID",
+        'table_like': 'svacc\\_%',
+        'indexes': {
+            'idx_svacc_acc': ['ACC'],
+            'idx_svacc_cid': ['CID']
+        }
+    },
+    {
+        'version': 4,
+        'description': "lnacc_<branch>: loan lookups by ACC and CID",
+        'table_like': 'lnacc\\_%',
+        'indexes': {
+            'idx_lnacc_acc': ['ACC'],
+            'idx_lnacc_cid': ['CID']
+        }
+    },
+    {
+        'version': 5,
+        'description': "gl_<branch>: GL account history by GLACC and DOCDATE, REF lookups",
+        'table_like': 'gl\\_%',
+        'indexes': {
+            'idx_gl_glacc_docdate': ['GLACC', 'DOCDATE'],
+            'idx_gl_docdate': ['DOCDATE'],
+            'idx_gl_ref': ['REF']
+        }
+    },
+    {
+        'version': 6,
+        'description': "finding tables: regular audit report by Area/Branch and status lookups",
+        'tables': ['finding_report', 'finding_detail', 'finding_audit'],
+        'indexes': {
+            'idx_finding_area_branch': ['Area', 'Branch'],
+            'idx_finding_status_lookup': ['Branch', 'Year_Audited', 'Finding_ID', 'Risk_ID']
+        }
+    },
+    {
+        'version': 7,
+        'description': "trnm_<branch>: SOA approximate description search on TRNDESC (ngram full-text)",
+        'table_like': 'trnm\\_%',
+        'fulltext_parser': 'ngram',
+        'indexes': {
+            'ftx_trnm_trndesc': ['TRNDESC']
+        }
+    }
+]
+
+# TEXT/BLOB columns can only be indexed by prefix; VARCHAR columns are indexed in full
+_INDEX_PREFIX_LENGTH = 64
+
+# has_fulltext_index answers: {(table_name, column_name): (has_index, checked_at monotonic)}
+_fulltext_index_cache = {}
+_fulltext_index_cache_lock = threading.Lock()
+FULLTEXT_INDEX_RECHECK_SECONDS = 300
+
+
+def _get_table_columns(connection, table_name):
+    """Returns {column_name: data_type} for a table in the current database."""
+    rows = connection.execute(text("""
+        SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name
+    """), {'table_name': table_name}).fetchall()
+    return {row[0]: row[1].lower() for row in rows}
+
+
+def _get_table_indexes(connection, table_name):
+    """Returns the set of index names defined on a table in the current database."""
+    rows = connection.execute(text("""
+        SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name
+    """), {'table_name': table_name}).fetchall()
+    return {row[0] for row in rows}
+
+
+def _resolve_migration_tables(connection, migration):
+    """Returns the existing tables a migration applies to."""
+    if 'table_like' in migration:
+        rows = connection.execute(text("""
+            SELECT TABLE_NAME FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME LIKE :pattern
+        """), {'pattern': migration['table_like']}).fetchall()
+        return sorted(row[0] for row in rows)
+    return [table for table in migration['tables'] if _get_table_columns(connection, table)]
+
+
+def _ensure_indexes_on_table(connection, table_name, indexes, fulltext_parser=None):
+    """
+    Creates any index in `indexes` that the table doesn't have yet.
+    Indexes referencing columns the table doesn't have are skipped, so one
+    definition can serve tables whose schemas drifted (e.g. finding_* tables).
+    With fulltext_parser, the indexes are FULLTEXT indexes using that parser.
+    Returns the list of index names created.
+    """
+    _forget_fulltext_indexes(table_name)
+    columns = _get_table_columns(connection, table_name)
+    existing = _get_table_indexes(connection, table_name)
+    created = []
+    for index_name, index_columns in indexes.items():
+        if index_name in existing:
+            continue
+        missing = [col for col in index_columns if col not in columns]
+        if missing:
+            print(f"Server Log (db_common): Skipping index '{index_name}' on '{table_name}', missing columns: {missing}")
+            continue
+        if fulltext_parser:
+            # The stopword list is fixed into a FULLTEXT index when it is built; with the ngram
+            # parser every ngram containing a stopword such as 'a' would be dropped, so build without one.
+            # The setting is restored afterwards because the connection goes back to the pool.
+            previous_stopword = connection.execute(text("SELECT @@SESSION.innodb_ft_enable_stopword")).scalar()
+            connection.execute(text("SET SESSION innodb_ft_enable_stopword = OFF"))
+            column_sql = ", ".join(f"`{col}`" for col in index_columns)
+            try:
+                connection.execute(text(f"ALTER TABLE `{table_name}` ADD FULLTEXT INDEX `{index_name}` ({column_sql}) WITH PARSER {fulltext_parser}"))
+            finally:
+                connection.execute(text("SET SESSION innodb_ft_enable_stopword = :previous"), {'previous': previous_stopword})
+            created.append(index_name)
+            print(f"Server Log (db_common): Created {fulltext_parser} full-text index '{index_name}' on '{table_name}' ({', '.join(index_columns)}).")
+            continue
+        column_sql = ", ".join(
+            f"`{col}`({_INDEX_PREFIX_LENGTH})" if columns[col] in ('text', 'tinytext', 'mediumtext', 'longtext', 'blob') else f"`{col}`"
+            for col in index_columns
+        )
+        connection.execute(text(f"ALTER TABLE `{table_name}` ADD INDEX `{index_name}` ({column_sql})"))
+        created.append(index_name)
+        print(f"Server Log (db_common): Created index '{index_name}' on '{table_name}' ({', '.join(index_columns)}).")
+    return created
+
+
+def apply_index_migrations(connection=None):
+    """
+    Applies INDEX_MIGRATIONS. Safe to run repeatedly: existing indexes are left alone,
+    and versions already recorded in schema_migrations are skipped unless they target
+    per-branch tables (which may have been recreated since).
+
+    Returns:
+        dict: {table_name: [created index names]} for this run.
+    """
+    if connection is None:
+        engine = get_db_connection_sqlalchemy()
+        if engine is None:
+            print("Error: Cannot apply index migrations, SQLAlchemy engine not available.")
+            return {}
+        with pooled_connection(engine) as pooled:
+            return apply_index_migrations(pooled)
+
+    created_by_table = {}
+    try:
+        connection.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS `{SCHEMA_MIGRATIONS_TABLE}` (
+                `version` INT PRIMARY KEY,
+                `description` VARCHAR(255),
+                `applied_at` DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+        """))
+        applied_versions = {row[0] for row in connection.execute(text(f"SELECT version FROM `{SCHEMA_MIGRATIONS_TABLE}`")).fetchall()}
+
+        for migration in INDEX_MIGRATIONS:
+            if migration['version'] in applied_versions and 'table_like' not in migration:
+                continue
+            target_tables = _resolve_migration_tables(connection, migration)
+            for table_name in target_tables:
+                created = _ensure_indexes_on_table(connection, table_name, migration['indexes'], migration.get('fulltext_parser'))
+                if created:
+                    created_by_table.setdefault(table_name, []).extend(created)
+            # A fixed-table migration only counts as applied once all of its tables exist
+            all_tables_present = 'table_like' in migration or len(target_tables) == len(migration['tables'])
+            if migration['version'] not in applied_versions and all_tables_present:
+                connection.execute(text(f"""
+                    INSERT INTO `{SCHEMA_MIGRATIONS_TABLE}` (`version`, `description`) VALUES (:version, :description)
+                """), {'version': migration['version'], 'description': migration['description']})
+                print(f"Server Log (db_common): Index migration {migration['version']} applied: {migration['description']}")
+        connection.commit()
+    except Exception as e:
+        print(f"Error applying index migrations: {e}")
+        traceback.print_exc()
+        connection.rollback()
+    return created_by_table
+
+
+def ensure_table_indexes(table_name):
+    """
+    Creates the migration-defined indexes for one table. Called by the populate/import
+    scripts after they (re)create a table, so reloaded branch tables get their indexes back.
+    """
+    engine = get_db_connection_sqlalchemy()
+    if engine is None:
+        print(f"Error: Cannot index '{table_name}', SQLAlchemy engine not available.")
+        return []
+
+    created = []
+    with pooled_connection(engine) as connection:
+        try:
+            for migration in INDEX_MIGRATIONS:
+                if table_name in _resolve_migration_tables(connection, migration):
+                    created.extend(_ensure_indexes_on_table(connection, table_name, migration['indexes'], migration.get('fulltext_parser')))
+            connection.commit()
+        except Exception as e:
+            print(f"Error creating indexes on '{table_name}': {e}")
+            traceback.print_exc()
+            connection.rollback()
+    return created
+
+
+def get_missing_migration_indexes(table_names=None):
+    """
+    Lists the migration-defined indexes that existing tables don't have yet, without creating
+    them (apply_index_migrations / ensure_table_indexes do that). With table_names, only those
+    tables are checked.
+
+    Returns:
+        dict: {table_name: [missing index names]}; tables missing an index's columns are skipped,
+              as _ensure_indexes_on_table would skip them.
+    """
+    engine = get_db_connection_sqlalchemy()
+    if engine is None:
+        print("Error: Cannot check index migrations, SQLAlchemy engine not available.")
+        return {}
+
+    missing_by_table = {}
+    with pooled_connection(engine) as connection:
+        for migration in INDEX_MIGRATIONS:
+            for table_name in _resolve_migration_tables(connection, migration):
+                if table_names is not None and table_name not in table_names:
+                    continue
+                columns = _get_table_columns(connection, table_name)
+                existing = _get_table_indexes(connection, table_name)
+                missing = [index_name for index_name, index_columns in migration['indexes'].items()
+                           if index_name not in existing and all(col in columns for col in index_columns)]
+                if missing:
+                    missing_by_table.setdefault(table_name, []).extend(missing)
+    return missing_by_table
+
+
+def _forget_fulltext_indexes(table_name):
+    """Drops the cached has_fulltext_index answers for a table whose indexes are being (re)built."""
+    with _fulltext_index_cache_lock:
+        for key in [key for key in _fulltext_index_cache if key[0] == table_name]:
+            del _fulltext_index_cache[key]
+
+
+def has_fulltext_index(table_name, column_name):
+    """
+    Returns True if the table has a FULLTEXT index on exactly this column, so callers can fall
+    back to LIKE on tables that were (re)loaded without it instead of failing in MATCH().
+    Answers are cached for FULLTEXT_INDEX_RECHECK_SECONDS (tables reloaded by the import scripts
+    run in other processes) and dropped as soon as this process rebuilds the table's indexes.
+    """
+    key = (table_name, column_name)
+    with _fulltext_index_cache_lock:
+        cached = _fulltext_index_cache.get(key)
+    if cached is not None and time.monotonic() - cached[1] < FULLTEXT_INDEX_RECHECK_SECONDS:
+        return cached[0]
+
+    engine = get_db_connection_sqlalchemy()
+    if engine is None:
+        return False
+    try:
+        with pooled_connection(engine) as connection:
+            rows = connection.execute(text("""
+                SELECT INDEX_NAME FROM information_schema.STATISTICS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name AND INDEX_TYPE = 'FULLTEXT'
+                GROUP BY INDEX_NAME
+                HAVING COUNT(*) = 1 AND MAX(COLUMN_NAME) = :column_name
+            """), {'table_name': table_name, 'column_name': column_name}).fetchall()
+        with _fulltext_index_cache_lock:
+            _fulltext_index_cache[key] = (bool(rows), time.monotonic())
+        return bool(rows)
+    except Exception as e:
+        print(f"Server Log (db_common): Could not check full-text indexes of '{table_name}': {e}")
+        return False
+
+
+def verify_report_query_indexes(branch_name):
+    """
+    Runs EXPLAIN on representative report queries for one branch and reports whether
+    MySQL picks an index for each. Parameter values are placeholders: EXPLAIN only
+    needs the query shape, not matching rows.
+
+    Returns:
+        list: One dict per query with 'name', 'table', 'key', 'possible_keys', 'access_type',
+              'rows' and 'uses_index'. Queries against missing tables are reported with an 'error'.
+    """
+    engine = get_db_connection_sqlalchemy()
+    if engine is None:
+        print("Error: Cannot verify report indexes, SQLAlchemy engine not available.")
+        return []
+
+    branch_table_suffix = branch_name.strip().lower()
+    params = {
+        'branch': branch_name.strip().upper(), 'branches': [branch_name.strip().upper()],
+        'report_date': '2000-01-31', 'cid': '0', 'acc': '0', 'glacc': '0', 'ref': '0',
+        'from_date': '2000-01-01', 'to_date': '2000-12-31', 'area': 1, 'year': 2000, 'finding_id': 0, 'risk_id': 0,
+        'description': '"00"'
+    }
+    report_queries = [
+        ('aging summary by branch/date', "SELECT Balance, Aging, Loan_Account FROM aging_report_data WHERE Branch IN :branches AND Date = :report_date"),
+        ('aging latest date', "SELECT MAX(Date) FROM aging_report_data WHERE Branch IN :branches"),
+        ('aging history by CID', "SELECT * FROM aging_report_data WHERE Branch = :branch AND CID = :cid ORDER BY Date"),
+        ('SOA by account', f"SELECT * FROM `trnm_{branch_table_suffix}` WHERE TRNDATE BETWEEN :from_date AND :to_date AND ACC = :acc ORDER BY ACC, TRNDATE, SEQ"),
+        ('SOA by date range', f"SELECT * FROM `trnm_{branch_table_suffix}` WHERE TRNDATE BETWEEN :from_date AND :to_date"),
+        ('SOA by description', f"SELECT * FROM `trnm_{branch_table_suffix}` WHERE TRNDATE BETWEEN :from_date AND :to_date AND MATCH(TRNDESC) AGAINST(:description IN BOOLEAN MODE)"),
+        ('SVACC by CID', f"SELECT * FROM `svacc_{branch_table_suffix}` WHERE CID = :cid"),
+        ('LNACC by CID', f"SELECT * FROM `lnacc_{branch_table_suffix}` WHERE CID = :cid"),
+        ('GL by account and date', f"SELECT * FROM `gl_{branch_table_suffix}` WHERE GLACC = :glacc AND DOCDATE BETWEEN :from_date AND :to_date"),
+        ('GL by REF', f"SELECT * FROM `gl_{branch_table_suffix}` WHERE REF = :ref"),
+        ('finding report by area/branch', "SELECT * FROM finding_report WHERE `Area` = :area AND `Branch` = :branch"),
+        ('finding audit status lookup', "SELECT `Status` FROM finding_audit WHERE `Branch` = :branch AND `Year_Audited` = :year AND `Finding_ID` = :finding_id AND `Risk_ID` = :risk_id")
+    ]
+
+    results = []
+    with pooled_connection(engine) as connection:
+        for name, query in report_queries:
+            try:
+                plan = connection.execute(text(f"EXPLAIN {query}"), params).mappings().fetchall()
+                for step in plan:
+                    result = {
+                        'name': name,
+                        'table': step.get('table'),
+                        'key': step.get('key'),
+                        'possible_keys': step.get('possible_keys'),
+                        'access_type': step.get('type'),
+                        'rows': step.get('rows'),
+                        'uses_index': step.get('key') is not None
+                    }
+                    results.append(result)
+                    if not result['uses_index']:
+                        print(f"Server Log (db_common): Report query '{name}' does not use an index (access type: {result['access_type']}).")
+            except Exception as e:
+                connection.rollback()
+                results.append({'name': name, 'table': None, 'key': None, 'possible_keys': None,
+                                'access_type': None, 'rows': None, 'uses_index': False, 'error': str(e)})
+    print(f"Server Log (db_common): Index check for '{branch_name}': {sum(r['uses_index'] for r in results)}/{len(results)} query steps use an index.")
+    return results
+
 # --- NEW: CSV Helper Functions (retained for other parts of the system) ---
 # (These functions are for CSV interaction, not direct DB table creation/interaction)
 
@@ -1,5 +1,8 @@
 # audit_tool/backend/financial_statement_process.py
 import os
+import json
+import time
+import threading
 import pandas as pd
 from datetime import datetime
 from dateutil.relativedelta import relativedelta # Import for date calculations
@@ -11,89 +14,288 @@ FS_BASE_DIR = r"C:\xampp\htdocs\audit_tool\db"
 FS_FILENAME = "FS.xlsx"
 FS_FILE_PATH = os.path.join(FS_BASE_DIR, FS_FILENAME)
 
-# --- Global Cache for Financial Statement Data ---
-# These variables will hold the loaded DataFrames and the last modification time
-_cached_df_bs = None
-_cached_df_is = None
-_last_fs_file_modified_time = None
-
-# Helper function to safely convert value to float, handling NaN and empty strings
-def safe_float_conversion(value):
-    if pd.isna(value): # Check for pandas NaN
-        return 0.0
-    s_value = str(value).strip()
-    if not s_value: # Handle empty strings
-        return 0.0
+# --- Compiled Financial Statement Matrix ---
+# Each sheet is compiled once per FS.xlsx version into a float matrix (.npy, memory-mapped by every
+# worker) plus a JSON index of its (branch, date) columns and row labels, stored next to FS.xlsx.
+FS_MATRIX_META_PATH = os.path.join(FS_BASE_DIR, "FS.matrix.json")
+# Bump when the compiled layout or the cell conversion changes so existing sidecars are rebuilt
+FS_MATRIX_VERSION = 1
+FS_SHEET_NAMES = ['BS', 'IS']
+# (branch row, date row) of each sheet's column headers, 0-indexed
+FS_SHEET_HEADER_ROWS = {'BS': (3, 5), 'IS': (4, 5)}
+# Held (created exclusively) by the one server process compiling FS.xlsx; other processes wait or keep serving
+FS_MATRIX_LOCK_PATH = os.path.join(FS_BASE_DIR, "FS.matrix.lock")
+# A lock file older than this was left by a process that died while compiling
+FS_COMPILE_LOCK_STALE_SECONDS = 600
+# How long a request with no compiled version at all waits for another process's compile
+FS_COMPILE_LOCK_WAIT_SECONDS = 120
+# A FS.xlsx version that failed to compile is retried after this many seconds, doubling per failure up to the max
+FS_COMPILE_RETRY_SECONDS = 30
+FS_COMPILE_RETRY_MAX_SECONDS = 900
+
+_fs_matrix = None # {'source': [mtime, size], 'sheets': {'BS': compiled sheet or None, 'IS': ...}}
+_fs_matrix_lock = threading.Lock()
+_fs_compile_lock = threading.Lock()
+_fs_compile_failures = {} # (mtime, size) -> (failed attempts, time.time() before which it is not retried)
+
+def _convert_sheet_values(df):
+    """
+    Converts a whole string sheet to floats: commas are dropped, parentheses mean negative,
+    and empty or non-numeric cells become 0.0. Returns (float matrix, count of non-numeric text cells).
+    """
+    cells = pd.Series(df.to_numpy(dtype=object).ravel())
+    missing = cells.isna()
+    text = cells.astype(str).str.strip()
+    empty = missing | (text == '')
+    cleaned = text.str.replace(',', '', regex=False).str.replace('(', '-', regex=False).str.replace(')', '', regex=False)
+    unconvertible = pd.to_numeric(cleaned, errors='coerce').isna() & ~empty
+    # numpy parses the remaining strings exactly as float() did, so totals match to the last digit
+    values = cleaned.where(~(empty | unconvertible), '0').to_numpy(dtype=str).astype(np.float64).reshape(df.shape)
+    return values, int(unconvertible.sum())
+
+def _compile_sheet(df, sheet_name):
+    """
+    Compiles one sheet: its values as floats, the first column of every (BRANCH, date) header
+    pair (as get_column_index_map matches them) and the first row of every column A label.
+    """
+    values, text_cells = _convert_sheet_values(df)
+    branch_row_idx, date_row_idx = FS_SHEET_HEADER_ROWS[sheet_name]
+    column_keys = []
+    seen_keys = set()
+    if branch_row_idx < len(df) and date_row_idx < len(df):
+        for col_idx in range(len(df.columns)):
+            key = (str(df.iloc[branch_row_idx, col_idx]).strip().upper(), str(df.iloc[date_row_idx, col_idx]).strip())
+            if key not in seen_keys: # Store the first matching column if duplicates exist
+                seen_keys.add(key)
+                column_keys.append([key[0], key[1], col_idx])
+    row_labels = []
+    seen_labels = set()
+    if len(df.columns):
+        for row_idx, label in enumerate(df.iloc[:, 0]):
+            label = str(label).strip() if pd.notna(label) else ''
+            if label and label not in seen_labels:
+                seen_labels.add(label)
+                row_labels.append([label, row_idx])
+    print(f"Server Log (FS Matrix): Compiled '{sheet_name}' sheet: {values.shape[0]} rows x {values.shape[1]} columns ({text_cells} text cells read as 0.0).")
+    return values, {'shape': list(values.shape), 'column_keys': column_keys, 'row_labels': row_labels}
+
+def _matrix_sheet_path(sheet_name, source):
+    # The source version is part of the name: a file mapped by another worker cannot be replaced on Windows
+    return os.path.join(FS_BASE_DIR, f"FS.{sheet_name}.{int(source[0])}_{source[1]}.npy")
+
+def _open_compiled_sheet(sheet_meta, sheet_path):
+    values = np.load(sheet_path, mmap_mode='r')
+    if list(values.shape) != sheet_meta['shape']:
+        raise ValueError(f"{sheet_path} has shape {values.shape}, expected {sheet_meta['shape']}")
+    return {
+        'values': values,
+        'column_keys': {(branch, date): col_idx for branch, date, col_idx in sheet_meta['column_keys']},
+        'label_rows': {label: row_idx for label, row_idx in sheet_meta['row_labels']},
+        'n_rows': values.shape[0],
+        'n_cols': values.shape[1],
+    }
+
+def _load_matrix_sidecar():
+    """Opens the compiled sidecar of whichever FS.xlsx version it was built from, or returns None if unusable."""
+    if not os.path.exists(FS_MATRIX_META_PATH):
+        return None
+    try:
+        with open(FS_MATRIX_META_PATH, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != FS_MATRIX_VERSION:
+            return None
+        sheets = {}
+        for sheet_name in FS_SHEET_NAMES:
+            sheet_meta = meta['sheets'].get(sheet_name)
+            sheets[sheet_name] = _open_compiled_sheet(sheet_meta, _matrix_sheet_path(sheet_name, meta['source'])) if sheet_meta else None
+        return {'source': meta['source'], 'sheets': sheets}
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Server Log (FS Matrix): Ignoring unreadable compiled sidecar: {e}")
+        return None
+
+def _remove_old_sheet_files(source):
+    current = {os.path.basename(_matrix_sheet_path(sheet_name, source)) for sheet_name in FS_SHEET_NAMES}
+    for filename in os.listdir(FS_BASE_DIR):
+        if filename.startswith('FS.') and filename.endswith('.npy') and filename not in current:
+            try:
+                os.remove(os.path.join(FS_BASE_DIR, filename))
+            except OSError:
+                pass # Still mapped by a worker serving the previous version; removed on a later compile
+
+def _compile_financial_statement_matrix(source):
+    """
+    Parses FS.xlsx (BS and IS sheets) and writes the compiled sidecar for the given source
+    version ([mtime, size]). The JSON index is written last, so other workers only switch
+    once every matrix file is complete. Returns the opened matrix, or None on error.
+    """
+    print(f"Server Log (FS Matrix): Compiling FS.xlsx due to modification or first load.")
+    try:
+        xl = pd.ExcelFile(FS_FILE_PATH)
+        sheet_names_raw = xl.sheet_names
+        meta = {'version': FS_MATRIX_VERSION, 'source': source, 'sheets': {}}
+        for sheet_name in FS_SHEET_NAMES:
+            actual_sheet_name = next((s for s in sheet_names_raw if s.strip() == sheet_name), None)
+            if not actual_sheet_name:
+                print(f"Server Log (FS Matrix Error): Worksheet named '{sheet_name}' (stripped) not found in '{FS_FILENAME}'.")
+                continue
+            df = xl.parse(sheet_name=actual_sheet_name, header=None, dtype=str)
+            values, sheet_meta = _compile_sheet(df, sheet_name)
+            sheet_path = _matrix_sheet_path(sheet_name, source)
+            temp_path = f"{sheet_path}.{os.getpid()}.tmp.npy"
+            np.save(temp_path, values)
+            os.replace(temp_path, sheet_path)
+            meta['sheets'][sheet_name] = sheet_meta
+
+        temp_meta_path = f"{FS_MATRIX_META_PATH}.{os.getpid()}.tmp"
+        with open(temp_meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(temp_meta_path, FS_MATRIX_META_PATH)
+        _remove_old_sheet_files(source)
+    except Exception as e:
+        print(f"Server Log (FS Matrix Error): Error compiling FS.xlsx: {e}")
+        return None
+    return _load_matrix_sidecar()
+
+def _compile_retry_wait(source):
+    """Seconds until a FS.xlsx version that failed to compile may be tried again (0 if it has not failed)."""
+    with _fs_matrix_lock:
+        failure = _fs_compile_failures.get(tuple(source))
+    return max(0.0, failure[1] - time.time()) if failure else 0.0
+
+def _record_compile_failure(source):
+    with _fs_matrix_lock:
+        attempts = _fs_compile_failures.get(tuple(source), (0, 0))[0] + 1
+        delay = min(FS_COMPILE_RETRY_SECONDS * 2 ** (attempts - 1), FS_COMPILE_RETRY_MAX_SECONDS)
+        _fs_compile_failures.clear() # Only the current version matters
+        _fs_compile_failures[tuple(source)] = (attempts, time.time() + delay)
+    print(f"Server Log (FS Matrix Error): Compile of this FS.xlsx version failed {attempts} time(s); not retrying for {delay}s.")
+
+def _acquire_compile_file_lock(wait_seconds=0):
+    """
+    Takes the cross-process compile lock (FS_MATRIX_LOCK_PATH, created exclusively), waiting up
+    to wait_seconds for another process to release it. A stale lock is removed. Returns True if taken.
+    """
+    deadline = time.time() + wait_seconds
+    while True:
+        try:
+            fd = os.open(FS_MATRIX_LOCK_PATH, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            with os.fdopen(fd, 'w') as f:
+                f.write(str(os.getpid()))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(FS_MATRIX_LOCK_PATH) > FS_COMPILE_LOCK_STALE_SECONDS:
+                    print(f"Server Log (FS Matrix): Removing stale compile lock {FS_MATRIX_LOCK_PATH}.")
+                    os.remove(FS_MATRIX_LOCK_PATH)
+                    continue
+            except OSError:
+                continue # Released (or removed) in the meantime; try again
+        if time.time() >= deadline:
+            return False
+        time.sleep(0.5)
+
+def _release_compile_file_lock():
     try:
-        # Handle parentheses for negative numbers and remove commas
-        return float(s_value.replace(',', '').replace('(', '-').replace(')', ''))
-    except ValueError:
-        print(f"Server Log (FS Process Warning): Could not convert '{s_value}' to numeric. Setting to 0.0.")
-        return 0.0
-
-# --- Function to load and cache the Excel file ---
-def _load_financial_statement_excel():
+        os.remove(FS_MATRIX_LOCK_PATH)
+    except OSError:
+        pass
+
+def _refresh_financial_statement_matrix(source, wait=False):
+    """
+    Makes the matrix for `source` current: reuses a sidecar another process already compiled,
+    else compiles it under the cross-process lock. A version that failed is not retried before
+    its backoff ends. With wait, waits for another process's compile instead of giving up.
+    """
+    global _fs_matrix
+    with _fs_compile_lock:
+        with _fs_matrix_lock:
+            if _fs_matrix is not None and _fs_matrix['source'] == source:
+                return _fs_matrix
+        matrix = _load_matrix_sidecar()
+        if matrix is None or matrix['source'] != source:
+            retry_wait = _compile_retry_wait(source)
+            if retry_wait > 0:
+                print(f"Server Log (FS Matrix): This FS.xlsx version failed to compile; next attempt in {retry_wait:.0f}s.")
+                return None
+            if not _acquire_compile_file_lock(FS_COMPILE_LOCK_WAIT_SECONDS if wait else 0):
+                print(f"Server Log (FS Matrix): Another server process is compiling FS.xlsx; using its result when it is done.")
+                return None
+            try:
+                # Another process may have compiled this version while the lock was held
+                matrix = _load_matrix_sidecar()
+                if matrix is None or matrix['source'] != source:
+                    matrix = _compile_financial_statement_matrix(source)
+            finally:
+                _release_compile_file_lock()
+            if matrix is None:
+                _record_compile_failure(source)
+                return None
+        with _fs_matrix_lock:
+            _fs_matrix = matrix
+            _fs_compile_failures.clear()
+        print(f"Server Log (FS Matrix): FS.xlsx matrix loaded and cache updated.")
+        return matrix
+
+def start_financial_statement_matrix_refresh():
+    """Brings the compiled matrix up to date in a background thread (e.g. at startup or after FS.xlsx changed)."""
+    if not os.path.exists(FS_FILE_PATH):
+        return
+    stat_result = os.stat(FS_FILE_PATH)
+    source = [stat_result.st_mtime, stat_result.st_size]
+    if _compile_retry_wait(source) > 0:
+        return
+    threading.Thread(target=_refresh_financial_statement_matrix, args=(source,), daemon=True, name="fs-matrix-refresh").start()
+
+# --- Function to load the compiled Financial Statement matrix ---
+def _load_financial_statement_matrix():
     """
-    Loads the FS.xlsx file into global pandas DataFrames (BS and IS sheets)
-    and caches them. It only reloads if the file has been modified on disk.
+    Returns the compiled BS and IS sheets (see _open_compiled_sheet), each None if missing.
+    When FS.xlsx changed, the previously compiled version keeps being served while the new
+    one compiles in the background; only when no compiled version exists at all does the
+    request wait for the compile.
     """
-    global _cached_df_bs, _cached_df_is, _last_fs_file_modified_time
+    global _fs_matrix
 
     if not os.path.exists(FS_FILE_PATH):
         print(f"Server Log (FS Cache Error): FS.xlsx file not found at: {FS_FILE_PATH}")
-        _cached_df_bs = None
-        _cached_df_is = None
-        _last_fs_file_modified_time = None
+        with _fs_matrix_lock:
+            _fs_matrix = None
         return None, None
 
-    current_modified_time = os.path.getmtime(FS_FILE_PATH)
-
-    # Check if the file has been modified or if it's the first load
-    if _cached_df_bs is None or _cached_df_is is None or current_modified_time != _last_fs_file_modified_time:
-        print(f"Server Log (FS Cache): Reloading FS.xlsx due to modification or first load.")
-        try:
-            xl = pd.ExcelFile(FS_FILE_PATH)
-            sheet_names_raw = xl.sheet_names
-            
-            actual_bs_sheet_name = next((s for s in sheet_names_raw if s.strip() == 'BS'), None)
-            if actual_bs_sheet_name:
-                _cached_df_bs = xl.parse(sheet_name=actual_bs_sheet_name, header=None, dtype=str)
-                print(f"Server Log (FS Cache): Successfully loaded '{actual_bs_sheet_name}' sheet.")
-            else:
-                _cached_df_bs = None
-                print(f"Server Log (FS Cache Error): Worksheet named 'BS' (stripped) not found in '{FS_FILENAME}'.")
-
-            actual_is_sheet_name = next((s for s in sheet_names_raw if s.strip() == 'IS'), None)
-            if actual_is_sheet_name:
-                _cached_df_is = xl.parse(sheet_name=actual_is_sheet_name, header=None, dtype=str)
-                print(f"Server Log (FS Cache): Successfully loaded '{actual_is_sheet_name}' sheet.")
-            else:
-                _cached_df_is = None
-                print(f"Server Log (FS Cache Error): Worksheet named 'IS' (stripped) not found in '{FS_FILENAME}'.")
-
-            _last_fs_file_modified_time = current_modified_time
-            print(f"Server Log (FS Cache): FS.xlsx loaded and cache updated.")
-
-        except Exception as e:
-            print(f"Server Log (FS Cache Error): Error reading FS.xlsx during cache load: {e}")
-            _cached_df_bs = None
-            _cached_df_is = None
-            _last_fs_file_modified_time = None # Reset on error to force reload next time
-            return None, None
+    stat_result = os.stat(FS_FILE_PATH)
+    source = [stat_result.st_mtime, stat_result.st_size]
+
+    with _fs_matrix_lock:
+        matrix = _fs_matrix
+    if matrix is None:
+        matrix = _load_matrix_sidecar()
+        if matrix is not None:
+            with _fs_matrix_lock:
+                _fs_matrix = matrix
+
+    if matrix is not None and matrix['source'] == source:
+        print(f"Server Log (FS Cache): Using compiled FS.xlsx matrix.")
+    elif matrix is not None:
+        # A version that failed to compile is left alone until its backoff ends
+        if not _fs_compile_lock.locked() and _compile_retry_wait(source) == 0:
+            print(f"Server Log (FS Cache): FS.xlsx changed; serving the previous compiled version while it reloads.")
+            start_financial_statement_matrix_refresh()
     else:
-        print(f"Server Log (FS Cache): Using cached FS.xlsx data.")
+        matrix = _refresh_financial_statement_matrix(source, wait=True)
+        if matrix is None:
+            return None, None
 
-    return _cached_df_bs, _cached_df_is
+    return matrix['sheets']['BS'], matrix['sheets']['IS']
 
 
 # --- Optimized Column Index Finder ---
-def get_column_index_map(df, branch_lookup_row_idx, date_lookup_row_idx, target_area_name, current_branch_selection, lookup_date_str, last_december_lookup_str_fp, previous_period_lookup_str_is, bs_trend_dates_lookup_str, is_trend_dates_lookup_str):
+def get_column_index_map(sheet, target_area_name, current_branch_selection, lookup_date_str, last_december_lookup_str_fp, previous_period_lookup_str_is, bs_trend_dates_lookup_str, is_trend_dates_lookup_str):
     """
-    Builds a map of (branch_name, date_str) to column index for efficient lookups.
-    Handles 'ALL' and 'CONSOLIDATED' branches.
+    Builds a map of (branch_name, date_str) to column index for efficient lookups,
+    from the sheet's compiled header index. Handles 'ALL' and 'CONSOLIDATED' branches.
     """
     col_index_map = {}
-    if df is None:
+    if sheet is None:
         return col_index_map
 
     branches_to_scan = []
@@ -124,31 +326,22 @@ def get_column_index_map(df, branch_lookup_row_idx, date_lookup_row_idx, target_
     print(f"Server Log (get_column_index_map): Branches to scan for: {branches_to_scan}")
     print(f"Server Log (get_column_index_map): All target dates: {all_target_dates}")
 
-    # Ensure row indices are within DataFrame bounds
-    if branch_lookup_row_idx >= len(df) or date_lookup_row_idx >= len(df):
-        print(f"Server Log (get_column_index_map Error): Lookup row index out of bounds. Branch row: {branch_lookup_row_idx}, Date row: {date_lookup_row_idx}, DataFrame rows: {len(df)}")
-        return col_index_map
-
-    for col_idx in range(len(df.columns)):
-        if col_idx >= len(df.columns): # Ensure column index is within bounds
-            continue
-        current_branch_cell_value = str(df.iloc[branch_lookup_row_idx, col_idx]).strip().upper()
-        current_date_cell_value = str(df.iloc[date_lookup_row_idx, col_idx]).strip()
-
-        if current_branch_cell_value in branches_to_scan and current_date_cell_value in all_target_dates:
-            key = (current_branch_cell_value, current_date_cell_value)
-            if key not in col_index_map: # Store the first matching column if duplicates exist
-                col_index_map[key] = col_idx
+    for branch in branches_to_scan:
+        for date_str in all_target_dates:
+            col_idx = sheet['column_keys'].get((branch, date_str))
+            if col_idx is not None:
+                col_index_map[(branch, date_str)] = col_idx
     
     print(f"Server Log (get_column_index_map): Final column index map: {col_index_map}")
     return col_index_map
 
 # --- Helper to get values for an account across multiple dates ---
-def get_values_for_account_across_dates(df, account_row_idx, col_index_map, target_branches_list, target_dates):
+def get_values_for_account_across_dates(sheet, account_row_idx, col_index_map, target_branches_list, target_dates):
     """
     Retrieves and sums values for a given account across multiple branches and dates.
     `target_branches_list` can be a single branch name in a list, or multiple branch names.
     """
+    values = sheet['values']
     all_date_values = []
     for date_str in target_dates:
         total_value_for_date = 0.0
@@ -156,10 +349,8 @@ def get_values_for_account_across_dates(df, account_row_idx, col_index_map, targ
             key = (branch_to_sum.upper(), date_str)
             col_idx = col_index_map.get(key)
             if col_idx is not None:
-                if account_row_idx < len(df) and col_idx < len(df.columns):
-                    raw_value = df.iloc[account_row_idx, col_idx]
-                    value = safe_float_conversion(raw_value)
-                    total_value_for_date += value
+                if account_row_idx < sheet['n_rows'] and col_idx < sheet['n_cols']:
+                    total_value_for_date += float(values[account_row_idx, col_idx])
         all_date_values.append(total_value_for_date)
     return all_date_values
 
@@ -205,13 +396,273 @@ def calculate_percentages_fp_is(current_val, previous_val, structure_base):
     return changes_pct, structure_pct
 
 
+# Define the main accounts and their row numbers (0-indexed for pandas) for BS
+FS_BS_ACCOUNTS_MAP = {
+    # ASSETS - CURRENT ASSETS
+    'cashAndCashEquivalents': {'label': 'Cash and Cash Equivalents:', 'row': 19 - 1, 'type': 'asset', 'category': 'current'},
+    'loansAndReceivables': {'label': 'Loans and Receivables:', 'row': 42 - 1, 'type': 'asset', 'category': 'current'},
+    'financialAssetsCurrent': {'label': 'Financial Assets:', 'row': 48 - 1, 'type': 'asset', 'category': 'current'},
+    'otherCurrentAssets': {'label': 'Other Current Assets:', 'row': 57 - 1, 'type': 'asset', 'category': 'current'},
+    
+    # ASSETS - NON-CURRENT ASSETS
+    'financialAssetsNonCurrent': {'label': 'Financial Assets - Non-Current:', 'row': 67 - 1, 'type': 'asset', 'category': 'non-current'},
+    'investmentInSubsidiaries': {'label': 'Investment in Subsidiaries:', 'row': 68 - 1, 'type': 'asset', 'category': 'non-current'},
+    'investmentInAssociates': {'label': 'Investment in Associates:', 'row': 69 - 1, 'type': 'asset', 'category': 'non-current'},
+    'investmentInJointVentures': {'label': 'Investment in Joint Ventures:', 'row': 70 - 1, 'type': 'asset', 'category': 'non-current'},
+    'investmentProperty': {'label': 'Investment Property:', 'row': 83 - 1, 'type': 'asset', 'category': 'non-current'},
+    'propertyPlantAndEquipment': {'label': 'Property, Plant, and Equipment:', 'row': 102 - 1, 'type': 'asset', 'category': 'non-current'},
+    'otherNonCurrentAssets': {'label': 'Other Non-Current Assets:', 'row': 108 - 1, 'type': 'asset', 'category': 'non-current'},
+
+    # LIABILITIES - CURRENT LIABILITIES
+    'depositLiabilities': {'label': 'Deposit Liabilities:', 'row': 119 - 1, 'type': 'liability', 'category': 'current'},
+    'accountsAndOtherPayables': {'label': 'Accounts and Other Payables:', 'row': 127 - 1, 'type': 'liability', 'category': 'current'},
+    'accruedExpenses': {'label': 'Accrued Expenses:', 'row': 135 - 1, 'type': 'liability', 'category': 'current'},
+    'otherCurrentLiabilities': {'label': 'Other Current Liabilities:', 'row': 141 - 1, 'type': 'liability', 'category': 'current'},
+
+    # LIABILITIES - NON-CURRENT LIABILITIES
+    'loansPayableNet': {'label': 'Loans Payable, Net:', 'row': 147 - 1, 'type': 'liability', 'category': 'non-current'},
+    'revolvingCapitalPayable': {'label': 'Revolving Capital Payable:', 'row': 148 - 1, 'type': 'liability', 'category': 'non-current'},
+    'retirementFundPayable': {'label': 'Retirement Fund Payable:', 'row': 149 - 1, 'type': 'liability', 'category': 'non-current'},
+    'projectSubsidyFundPayable': {'label': 'Project Subsidy Fund Payable:', 'row': 156 - 1, 'type': 'liability', 'category': 'non-current'},
+    'membersBenefitsAndOtherFundsPayable': {'label': 'Members\' Benefits and Other Funds Payable:', 'row': 154 - 1, 'type': 'liability', 'category': 'non-current'},
+    'dueToHeadOfficeBranchSubsidiary': {'label': 'Due to Head Office/Branch/Subsidiary:', 'row': 155 - 1, 'type': 'liability', 'category': 'non-current'},
+    'otherNonCurrentLiabilities': {'label': 'Other Non-Current Liabilities:', 'row': 156 - 1, 'type': 'liability', 'category': 'non-current'},
+    'commonShares': {'label': 'Common Shares:', 'row': 171 - 1, 'type': 'equity', 'category': 'equity'},
+    'preferredShares': {'label': 'Preferred Shares:', 'row': 178 - 1, 'type': 'equity', 'category': 'equity'},
+    'depositsForShareCapitalSubscription': {'label': 'Deposits for Share Capital Subscription:', 'row': 179 - 1, 'type': 'equity', 'category': 'equity'},
+    'undividedNetSurplusNetLoss': {'label': 'Undivided Net Surplus (Net Loss):', 'row': 182 - 1, 'type': 'equity', 'category': 'equity'},
+    'statutoryFunds': {'label': 'STATUTORY FUNDS:', 'row': 191 - 1, 'type': 'equity', 'category': 'equity'},
+}
+
+# Define sub-accounts and their row numbers (0-indexed) for BS
+FS_BS_SUB_ACCOUNTS_MAP = {
+    'Cash and Cash Equivalents:': [
+        {'label': 'Cash on Hand', 'row': 11 - 1},
+        {'label': 'Checks and Other Cash Items (COCI)', 'row': 12 - 1},
+        {'label': 'Cash in Bank', 'row': 13 - 1},
+        {'label': 'Cash in Cooperative Federation', 'row': 14 - 1},
+        {'label': 'Petty Cash Fund', 'row': 15 - 1},
+        {'label': 'Revolving Fund', 'row': 16 - 1},
+        {'label': 'Change Fund', 'row': 17 - 1},
+        {'label': 'ATM Fund', 'row': 18 - 1},
+    ],
+    'Loans and Receivables:': [
+        {'label': 'Loans Receivable (based on PAR)', 'row': 21 - 1},
+        {'label': 'Loans Receivable - Current', 'row': 22 - 1},
+        {'label': 'Loans Receivable - Past Due', 'row': 23 - 1},
+        {'label': 'Loans Receivable - Restructured (Past Due)', 'row': 24 - 1},
+        {'label': 'Loans Receivable - Loans in Litigation (Past Due)', 'row': 25 - 1},
+        {'label': 'Total Loans Receivables (Gross)', 'row': 26 - 1},
+        {'label': 'Less: Unearned Interests and Discounts', 'row': 27 - 1},
+        {'label': 'Allowance for Probable Losses on Loans', 'row': 28 - 1},
+        {'label': 'Net, Loans Receivable', 'row': 29 - 1},
+        {'label': 'Sales Contract Receivable', 'row': 30 - 1},
+        {'label': 'Less: Allowance for Probable Losses - SCR', 'row': 31 - 1},
+        {'label': 'Net, Sales Contract Receivable', 'row': 32 - 1},
+        {'label': 'Accounts Receivables - Non Trade', 'row': 33 - 1},
+        {'label': 'Less: Allowance for Probable Losses - AR-NT', 'row': 34 - 1},
+        {'label': 'Net, Accounts Receivables - Non Trade', 'row': 35 - 1},
+        {'label': 'Advances to Officers, Employees and Members', 'row': 36 - 1},
+        {'label': 'Due from Accountable Officers and Employees', 'row': 37 - 1},
+        {'label': 'Finance Lease Receivable', 'row': 38 - 1},
+        {'label': 'Allowance for Impairment-Finance Lease Receivable', 'row': 39 - 1},
+        {'label': 'Net, Finance Lease Receivable', 'row': 40 - 1},
+        {'label': 'Other Current Receivables', 'row': 41 - 1},
+    ],
+    'Financial Assets:': [ # This is Financial Assets (Current)
+        {'label': 'Financial Assets', 'row': 43 - 1},
+        {'label': 'Financial Assets at Fair Value through Profit and Loss', 'row': 44 - 1},
+        {'label': 'Financial Assets at Cost', 'row': 45 - 1},
+        {'label': 'Less: Allowance for Impairment', 'row': 62 - 1}, # Corrected row number for consistency
+        {'label': 'Net', 'row': 63 - 1}, # Corrected row number for consistency
+        {'label': 'Financial Assets at Amortized Cost', 'row': 64 - 1}, # Corrected row number for consistency
+        {'label': 'Less: Allowance for Impairment', 'row': 65 - 1}, # Corrected row number for consistency
+        {'label': 'Net', 'row': 66 - 1}, # Corrected row number for consistency
+    ],
+    'Other Current Assets:': [
+        {'label': 'Deposit to Suppliers', 'row': 50 - 1},
+        {'label': 'Unused Supplies', 'row': 51 - 1},
+        {'label': 'Prepaid Expenses', 'row': 52 - 1},
+        {'label': 'Assets Acquired in Settlement of Loans/Accounts', 'row': 53 - 1},
+        {'label': 'Less: Accumulated Depreciation - A/ASL/A', 'row': 54 - 1},
+        {'label': 'Net, Assets Acquired in Settlement of Loans/Accounts', 'row': 55 - 1},
+        {'label': 'Other Current Assets', 'row': 56 - 1},
+    ],
+    'Financial Assets - Non-Current:': [
+        {'label': 'Financial Assets - Non-Current', 'row': 60 - 1},
+        {'label': 'Financial Assets at Cost', 'row': 61 - 1},
+        {'label': 'Less: Allowance for Impairment', 'row': 62 - 1},
+        {'label': 'Net', 'row': 63 - 1},
+        {'label': 'Financial Assets at Amortized Cost', 'row': 64 - 1},
+        {'label': 'Less: Allowance for Impairment', 'row': 65 - 1},
+        {'label': 'Net', 'row': 66 - 1},
+    ],
+    'Investment Property:': [
+        {'label': 'Investment Property - Land', 'row': 72 - 1},
+        {'label': 'Investment Property - Land Improvements', 'row': 73 - 1},
+        {'label': 'Less: Accumulated Depreciation - Land Improvements', 'row': 74 - 1},
+        {'label': 'Investment Property - Furniture, Fixtures and Equipment', 'row': 75 - 1},
+        {'label': 'Less: Accumulated Depreciation - Furniture, Fixtures and Equipment', 'row': 76 - 1},
+        {'label': 'Investment Property - Machineries, Tools and Equipment', 'row': 77 - 1},
+        {'label': 'Less: Accumulated Depreciation - Machineries, Tools and Equipment', 'row': 78 - 1},
+        {'label': 'Investment Property - Building', 'row': 79 - 1},
+        {'label': 'Less: Accumulated Depreciation - IP - Building', 'row': 80 - 1},
+        {'label': 'Real Properties Acquired (RPA)', 'row': 81 - 1},
+        {'label': 'Less: Accumulated Depreciation - RPA', 'row': 82 - 1},
+    ],
+    'Property, Plant, and Equipment:': [
+        {'label': 'Land', 'row': 85 - 1},
+        {'label': 'Land Improvements', 'row': 86 - 1},
+        {'label': 'Less: Accumulated Depreciation - Land Improvements', 'row': 87 - 1},
+        {'label': 'Building and Improvements', 'row': 88 - 1},
+        {'label': 'Less: Accumulated Depreciation - Bldg and Improv', 'row': 89 - 1},
+        {'label': 'Building on Leased/Usufruct Land', 'row': 90 - 1},
+        {'label': 'Less: Accumulated Depreciation - Bldg on Leased/Usufruct Land', 'row': 91 - 1},
+        {'label': 'Property, Plant and Equipment - Under Finance Lease', 'row': 92 - 1},
+        {'label': 'Less: Accumulated Depreciation - PPE Under Finance Lease', 'row': 93 - 1},
+        {'label': 'Construction in Progress', 'row': 94 - 1},
+        {'label': 'Furniture, Fixtures and Equipment', 'row': 95 - 1},
+        {'label': 'Less: Accumulated Depreciation - FF and E', 'row': 96 - 1},
+        {'label': 'Machineries, Tools and Equipment', 'row': 97 - 1},
+        {'label': 'Less: Accumulated Depreciation - Machineries and Equiptment', 'row': 98 - 1},
+        {'label': 'Transportation Equipment', 'row': 99 - 1},
+        {'label': 'Less: Accumulated Depreciation - Transpo Equiptment', 'row': 100 - 1},
+        {'label': 'Leasehold Rights and Improvements (net of Amortization)', 'row': 101 - 1},
+    ],
+    'Other Non-Current Assets:': [
+        {'label': 'Computerization Cost, net', 'row': 104 - 1},
+        {'label': 'Other Funds and Deposits', 'row': 105 - 1},
+        {'label': 'Due from Head Office/Branch/Subsidy', 'row': 106 - 1},
+        {'label': 'Miscellaneous Assets', 'row': 107 - 1},
+    ],
+    'Deposit Liabilities:': [
+        {'label': 'Savings Deposits', 'row': 117 - 1},
+        {'label': 'Time Deposits', 'row': 118 - 1},
+    ],
+    'Accounts and Other Payables:': [
+        {'label': 'Accounts Payable - Non-Trade', 'row': 121 - 1},
+        {'label': 'Loans Payable - Current', 'row': 122 - 1},
+        {'label': 'Less: Discounts on Loans Payable', 'row': 123 - 1},
+        {'label': 'Loans Payable, Net', 'row': 124 - 1},
+        {'label': 'Cash Bond Payable', 'row': 125 - 1},
+        {'label': 'Other Payables', 'row': 126 - 1},
+    ],
+    'Accrued Expenses:': [
+        {'label': 'Due to Regulatory Agencies', 'row': 129 - 1},
+        {'label': 'SSS/ECC/PhilHealth and Pag-ibig Premium Contributions Payable', 'row': 130 - 1},
+        {'label': 'SSS / Pag-ibig Loans Payable', 'row': 131 - 1},
+        {'label': 'Withholding Tax Payable', 'row': 132 - 1},
+        {'label': 'Income Tax Payable', 'row': 133 - 1},
+        {'label': 'Other Accrued Expenses', 'row': 134 - 1},
+    ],
+    'Other Current Liabilities:': [
+        {'label': 'Other Current Liabilities', 'row': 136 - 1},
+        {'label': 'Deposit from Customers', 'row': 137 - 1},
+        {'label': 'Interest on Share Capital Payable', 'row': 138 - 1},
+        {'label': 'Patronage Refund Payable', 'row': 139 - 1},
+        {'label': 'Due to Union/Federation (CETF)', 'row': 140 - 1},
+    ],
+    'STATUTORY FUNDS:': [
+        {'label': 'Reserve Fund', 'row': 187 - 1},
+        {'label': 'Coop Education and Training Fund', 'row': 188 - 1},
+        {'label': 'Community Development Fund', 'row': 189 - 1},
+        {'label': 'Optional Fund', 'row': 190 - 1},
+    ],
+}
+
+# Define the main accounts and their row numbers (0-indexed) for IS
+# Removed direct row numbers for Administrative Costs and Operating Costs as they will be summed from sub-accounts
+FS_IS_ACCOUNTS_MAP = {
+    'incomeFromCreditOperations': {'label': 'Income from Credit Operations', 'row': 13 - 1, 'type': 'revenue'},
+    'otherIncome': {'label': 'Other Income', 'row': 19 - 1, 'type': 'revenue'},
+    'financingCost': {'label': 'FINANCING COST', 'row': 28 - 1, 'type': 'expense'},
+    'administrativeCosts': {'label': 'Administrative Costs', 'type': 'expense'}, # No direct row, calculated from sub-accounts
+    'operatingCosts': {'label': 'Operating Costs', 'type': 'expense'}, # No direct row, calculated from sub-accounts
+    'otherItemsSubsidyGainLosses': {'label': 'Other Items - Subsidy/Gain (Losses)', 'row': 81 - 1, 'type': 'other_item'},
+}
+
+# Define sub-accounts and their row numbers (0-indexed) for IS
+FS_IS_SUB_ACCOUNTS_MAP = {
+    'Income from Credit Operations': [
+        {'label': 'Interest Income from Loans', 'row': 9 - 1},
+        {'label': 'Service Fees', 'row': 10 - 1},
+        {'label': 'Filing Fees', 'row': 11 - 1},
+        {'label': 'Fines, Penalties, and Surcharges', 'row': 12 - 1},
+    ],
+    'Other Income': [
+        {'label': 'Income/ Interest from Investments/ Deposits', 'row': 15 - 1},
+        {'label': 'Membership Fees', 'row': 16 - 1},
+        {'label': 'Commissions', 'row': 17 - 1},
+        {'label': 'Miscellaneous Income', 'row': 18 - 1},
+    ],
+    'FINANCING COST': [
+        {'label': 'Interest Expense on Deposits', 'row': 25 - 1},
+        {'label': 'Interest Expense on Borrowings', 'row': 26 - 1},
+        {'label': 'Other Charges on Borrowings', 'row': 27 - 1},
+    ],
+    'Administrative Costs': [
+        {'label': 'Salaries and Wages', 'row': 30 - 1},
+        {'label': 'Employees\' Benefits', 'row': 31 - 1},
+        {'label': 'SSS,PhilHealth,ECC, Pag-ibig Premium', 'row': 32 - 1},
+        {'label': 'Retirement Benefit Expense', 'row': 33 - 1},
+        {'label': 'Officers\' Honorarium and Allowances', 'row': 34 - 1},
+        {'label': 'Trainings/Seminars', 'row': 35 - 1},
+    ],
+    'Operating Costs': [
+        {'label': 'Office Supplies', 'row': 36 - 1},
+        {'label': 'Power, Light and Water', 'row': 37 - 1},
+        {'label': 'Travel and Transportation', 'row': 38 - 1},
+        {'label': 'Insurance', 'row': 39 - 1},
+        {'label': 'Repairs and Maintenance', 'row': 40 - 1},
+        {'label': 'Rentals', 'row': 41 - 1},
+        {'label': 'Taxes, Fees and Charges', 'row': 42 - 1},
+        {'label': 'Professional Fees', 'row': 43 - 1},
+        {'label': 'Communication', 'row': 44 - 1},
+        {'label': 'Representation', 'row': 45 - 1},
+        {'label': 'Meetings and Conferences', 'row': 46 - 1},
+        {'label': 'Periodicals, Magazines & Subscriptions', 'row': 47 - 1},
+        {'label': 'General Support Services', 'row': 48 - 1},
+        {'label': 'Litigation Expenses', 'row': 49 - 1},
+        {'label': 'Gas, Oil & Lubricants', 'row': 50 - 1},
+        {'label': 'Miscellaneous Expense', 'row': 51 - 1},
+        {'label': 'Bank Charges', 'row': 52 - 1},
+        {'label': 'Depreciation', 'row': 53 - 1},
+        {'label': 'Amortization', 'row': 54 - 1},
+        {'label': 'Amortization of Leasehold Rights and Improvement', 'row': 55 - 1},
+        {'label': 'Provision for Probable Losses on Loans/Accounts/Installment Receivables', 'row': 56 - 1},
+        {'label': 'Impairment Losses', 'row': 57 - 1},
+        {'label': 'Collection Expense', 'row': 58 - 1},
+        {'label': 'Commision Expense', 'row': 59 - 1},
+        {'label': 'Advertising and Promotion', 'row': 60 - 1},
+        {'label': 'General Assembly Expenses', 'row': 61 - 1},
+        {'label': 'Members\' Benefit Expense', 'row': 62 - 1},
+        {'label': 'Provision for Members\' Future Benefits', 'row': 63 - 1},
+        {'label': 'Affiliation Fee', 'row': 64 - 1},
+        {'label': 'Social & Community Service Expense', 'row': 65 - 1},
+        {'label': 'Provision for CGF (KBGF)', 'row': 66 - 1},
+    ],
+    'Other Items - Subsidy/Gain (Losses)': [
+        {'label': 'Project Subsidy', 'row': 71 - 1},
+        {'label': 'Donation and Grant Subsidy', 'row': 72 - 1},
+        {'label': 'Optional Fund Subsidy', 'row': 73 - 1},
+        {'label': 'Gains (Losses) on Sale of Property & Eqpt', 'row': 74 - 1},
+        {'label': 'Gains (Losses) in Investment', 'row': 75 - 1},
+        {'label': 'Gains (Losses) on Sale of Repossessed Item', 'row': 76 - 1},
+        {'label': 'Gains (Losses) from Foreign Exchange Valuation', 'row': 77 - 1},
+        {'label': 'Subsidized Project Expenses', 'row': 78 - 1},
+        {'label': 'Special Project Expenses', 'row': 79 - 1},
+        {'label': 'Prior Years\' Adjustment', 'row': 80 - 1},
+    ],
+}
+
+
 def process_financial_statement(branch_name, report_date_str, area_name): # Added area_name parameter
     print(f"Server Log (FS Process): Attempting to process FS for Area: '{area_name}', Branch: '{branch_name}', Date: '{report_date_str}'")
     
-    # Load or reload the Excel data from cache
-    df_bs, df_is = _load_financial_statement_excel()
+    # Load the compiled BS/IS matrices (recompiled in the background when FS.xlsx changes)
+    bs_sheet, is_sheet = _load_financial_statement_matrix()
 
-    if df_bs is None and df_is is None:
+    if bs_sheet is None and is_sheet is None:
         print(f"Server Log (FS Process Error): Neither 'BS' nor 'IS' sheets were found or loaded from cache. Returning empty data.")
         return {}
 
@@ -235,12 +686,6 @@ def process_financial_statement(branch_name, report_date_str, area_name): # Adde
         print(f"Server Log (FS Process Error): Invalid date format for report_date_str: {e}")
         return {}
 
-    # --- Column Row Indices ---
-    bs_branch_row_index = 3 # Excel row 4
-    bs_date_row_index = 5 # Excel row 6
-    is_branch_row_index = 4 # Excel row 5 (for branch name)
-    is_date_row_index = 5 # Excel row 6 (for date)
-
     # Generate the 5-year trend dates for BS
     bs_trend_dates_lookup_str = []
     for i in range(4, 0, -1):
@@ -270,185 +715,13 @@ def process_financial_statement(branch_name, report_date_str, area_name): # Adde
         bs_branches_to_process = [branch_name.upper()]
 
     # Pre-build column index map for BS (Called only once now)
-    bs_col_index_map = get_column_index_map(df_bs, bs_branch_row_index, bs_date_row_index, area_name, branch_name, lookup_date_str, last_december_lookup_str_fp, previous_period_lookup_str_is, bs_trend_dates_lookup_str, is_trend_dates_lookup_str)
-    if not bs_col_index_map and df_bs is not None: # If df_bs exists but no columns found for any date/branch
+    bs_col_index_map = get_column_index_map(bs_sheet, area_name, branch_name, lookup_date_str, last_december_lookup_str_fp, previous_period_lookup_str_is, bs_trend_dates_lookup_str, is_trend_dates_lookup_str)
+    if not bs_col_index_map and bs_sheet is not None: # If bs_sheet exists but no columns found for any date/branch
         print(f"Server Log (FS Process Error): No relevant columns found in BS sheet for branch '{branch_name}' and any target date. Returning empty data.")
         return {}
 
 
-    # Define the main accounts and their row numbers (0-indexed for pandas) for BS
-    bs_accounts_map = {
-        # ASSETS - CURRENT ASSETS
-        'cashAndCashEquivalents': {'label': 'Cash and Cash Equivalents:', 'row': 19 - 1, 'type': 'asset', 'category': 'current'},
-        'loansAndReceivables': {'label': 'Loans and Receivables:', 'row': 42 - 1, 'type': 'asset', 'category': 'current'},
-        'financialAssetsCurrent': {'label': 'Financial Assets:', 'row': 48 - 1, 'type': 'asset', 'category': 'current'},
-        'otherCurrentAssets': {'label': 'Other Current Assets:', 'row': 57 - 1, 'type': 'asset', 'category': 'current'},
-        
-        # ASSETS - NON-CURRENT ASSETS
-        'financialAssetsNonCurrent': {'label': 'Financial Assets - Non-Current:', 'row': 67 - 1, 'type': 'asset', 'category': 'non-current'},
-        'investmentInSubsidiaries': {'label': 'Investment in Subsidiaries:', 'row': 68 - 1, 'type': 'asset', 'category': 'non-current'},
-        'investmentInAssociates': {'label': 'Investment in Associates:', 'row': 69 - 1, 'type': 'asset', 'category': 'non-current'},
-        'investmentInJointVentures': {'label': 'Investment in Joint Ventures:', 'row': 70 - 1, 'type': 'asset', 'category': 'non-current'},
-        'investmentProperty': {'label': 'Investment Property:', 'row': 83 - 1, 'type': 'asset', 'category': 'non-current'},
-        'propertyPlantAndEquipment': {'label': 'Property, Plant, and Equipment:', 'row': 102 - 1, 'type': 'asset', 'category': 'non-current'},
-        'otherNonCurrentAssets': {'label': 'Other Non-Current Assets:', 'row': 108 - 1, 'type': 'asset', 'category': 'non-current'},
-
-        # LIABILITIES - CURRENT LIABILITIES
-        'depositLiabilities': {'label': 'Deposit Liabilities:', 'row': 119 - 1, 'type': 'liability', 'category': 'current'},
-        'accountsAndOtherPayables': {'label': 'Accounts and Other Payables:', 'row': 127 - 1, 'type': 'liability', 'category': 'current'},
-        'accruedExpenses': {'label': 'Accrued Expenses:', 'row': 135 - 1, 'type': 'liability', 'category': 'current'},
-        'otherCurrentLiabilities': {'label': 'Other Current Liabilities:', 'row': 141 - 1, 'type': 'liability', 'category': 'current'},
-
-        # LIABILITIES - NON-CURRENT LIABILITIES
-        'loansPayableNet': {'label': 'Loans Payable, Net:', 'row': 147 - 1, 'type': 'liability', 'category': 'non-current'},
-        'revolvingCapitalPayable': {'label': 'Revolving Capital Payable:', 'row': 148 - 1, 'type': 'liability', 'category': 'non-current'},
-        'retirementFundPayable': {'label': 'Retirement Fund Payable:', 'row': 149 - 1, 'type': 'liability', 'category': 'non-current'},
-        'projectSubsidyFundPayable': {'label': 'Project Subsidy Fund Payable:', 'row': 156 - 1, 'type': 'liability', 'category': 'non-current'},
-        'membersBenefitsAndOtherFundsPayable': {'label': 'Members\' Benefits and Other Funds Payable:', 'row': 154 - 1, 'type': 'liability', 'category': 'non-current'},
-        'dueToHeadOfficeBranchSubsidiary': {'label': 'Due to Head Office/Branch/Subsidiary:', 'row': 155 - 1, 'type': 'liability', 'category': 'non-current'},
-        'otherNonCurrentLiabilities': {'label': 'Other Non-Current Liabilities:', 'row': 156 - 1, 'type': 'liability', 'category': 'non-current'},
-        'commonShares': {'label': 'Common Shares:', 'row': 171 - 1, 'type': 'equity', 'category': 'equity'},
-        'preferredShares': {'label': 'Preferred Shares:', 'row': 178 - 1, 'type': 'equity', 'category': 'equity'},
-        'depositsForShareCapitalSubscription': {'label': 'Deposits for Share Capital Subscription:', 'row': 179 - 1, 'type': 'equity', 'category': 'equity'},
-        'undividedNetSurplusNetLoss': {'label': 'Undivided Net Surplus (Net Loss):', 'row': 182 - 1, 'type': 'equity', 'category': 'equity'},
-        'statutoryFunds': {'label': 'STATUTORY FUNDS:', 'row': 191 - 1, 'type': 'equity', 'category': 'equity'},
-    }
 
-    # Define sub-accounts and their row numbers (0-indexed) for BS
-    bs_sub_accounts_map = {
-        'Cash and Cash Equivalents:': [
-            {'label': 'Cash on Hand', 'row': 11 - 1},
-            {'label': 'Checks and Other Cash Items (COCI)', 'row': 12 - 1},
-            {'label': 'Cash in Bank', 'row': 13 - 1},
-            {'label': 'Cash in Cooperative Federation', 'row': 14 - 1},
-            {'label': 'Petty Cash Fund', 'row': 15 - 1},
-            {'label': 'Revolving Fund', 'row': 16 - 1},
-            {'label': 'Change Fund', 'row': 17 - 1},
-            {'label': 'ATM Fund', 'row': 18 - 1},
-        ],
-        'Loans and Receivables:': [
-            {'label': 'Loans Receivable (based on PAR)', 'row': 21 - 1},
-            {'label': 'Loans Receivable - Current', 'row': 22 - 1},
-            {'label': 'Loans Receivable - Past Due', 'row': 23 - 1},
-            {'label': 'Loans Receivable - Restructured (Past Due)', 'row': 24 - 1},
-            {'label': 'Loans Receivable - Loans in Litigation (Past Due)', 'row': 25 - 1},
-            {'label': 'Total Loans Receivables (Gross)', 'row': 26 - 1},
-            {'label': 'Less: Unearned Interests and Discounts', 'row': 27 - 1},
-            {'label': 'Allowance for Probable Losses on Loans', 'row': 28 - 1},
-            {'label': 'Net, Loans Receivable', 'row': 29 - 1},
-            {'label': 'Sales Contract Receivable', 'row': 30 - 1},
-            {'label': 'Less: Allowance for Probable Losses - SCR', 'row': 31 - 1},
-            {'label': 'Net, Sales Contract Receivable', 'row': 32 - 1},
-            {'label': 'Accounts Receivables - Non Trade', 'row': 33 - 1},
-            {'label': 'Less: Allowance for Probable Losses - AR-NT', 'row': 34 - 1},
-            {'label': 'Net, Accounts Receivables - Non Trade', 'row': 35 - 1},
-            {'label': 'Advances to Officers, Employees and Members', 'row': 36 - 1},
-            {'label': 'Due from Accountable Officers and Employees', 'row': 37 - 1},
-            {'label': 'Finance Lease Receivable', 'row': 38 - 1},
-            {'label': 'Allowance for Impairment-Finance Lease Receivable', 'row': 39 - 1},
-            {'label': 'Net, Finance Lease Receivable', 'row': 40 - 1},
-            {'label': 'Other Current Receivables', 'row': 41 - 1},
-        ],
-        'Financial Assets:': [ # This is Financial Assets (Current)
-            {'label': 'Financial Assets', 'row': 43 - 1},
-            {'label': 'Financial Assets at Fair Value through Profit and Loss', 'row': 44 - 1},
-            {'label': 'Financial Assets at Cost', 'row': 45 - 1},
-            {'label': 'Less: Allowance for Impairment', 'row': 62 - 1}, # Corrected row number for consistency
-            {'label': 'Net', 'row': 63 - 1}, # Corrected row number for consistency
-            {'label': 'Financial Assets at Amortized Cost', 'row': 64 - 1}, # Corrected row number for consistency
-            {'label': 'Less: Allowance for Impairment', 'row': 65 - 1}, # Corrected row number for consistency
-            {'label': 'Net', 'row': 66 - 1}, # Corrected row number for consistency
-        ],
-        'Other Current Assets:': [
-            {'label': 'Deposit to Suppliers', 'row': 50 - 1},
-            {'label': 'Unused Supplies', 'row': 51 - 1},
-            {'label': 'Prepaid Expenses', 'row': 52 - 1},
-            {'label': 'Assets Acquired in Settlement of Loans/Accounts', 'row': 53 - 1},
-            {'label': 'Less: Accumulated Depreciation - A/ASL/A', 'row': 54 - 1},
-            {'label': 'Net, Assets Acquired in Settlement of Loans/Accounts', 'row': 55 - 1},
-            {'label': 'Other Current Assets', 'row': 56 - 1},
-        ],
-        'Financial Assets - Non-Current:': [
-            {'label': 'Financial Assets - Non-Current', 'row': 60 - 1},
-            {'label': 'Financial Assets at Cost', 'row': 61 - 1},
-            {'label': 'Less: Allowance for Impairment', 'row': 62 - 1},
-            {'label': 'Net', 'row': 63 - 1},
-            {'label': 'Financial Assets at Amortized Cost', 'row': 64 - 1},
-            {'label': 'Less: Allowance for Impairment', 'row': 65 - 1},
-            {'label': 'Net', 'row': 66 - 1},
-        ],
-        'Investment Property:': [
-            {'label': 'Investment Property - Land', 'row': 72 - 1},
-            {'label': 'Investment Property - Land Improvements', 'row': 73 - 1},
-            {'label': 'Less: Accumulated Depreciation - Land Improvements', 'row': 74 - 1},
-            {'label': 'Investment Property - Furniture, Fixtures and Equipment', 'row': 75 - 1},
-            {'label': 'Less: Accumulated Depreciation - Furniture, Fixtures and Equipment', 'row': 76 - 1},
-            {'label': 'Investment Property - Machineries, Tools and Equipment', 'row': 77 - 1},
-            {'label': 'Less: Accumulated Depreciation - Machineries, Tools and Equipment', 'row': 78 - 1},
-            {'label': 'Investment Property - Building', 'row': 79 - 1},
-            {'label': 'Less: Accumulated Depreciation - IP - Building', 'row': 80 - 1},
-            {'label': 'Real Properties Acquired (RPA)', 'row': 81 - 1},
-            {'label': 'Less: Accumulated Depreciation - RPA', 'row': 82 - 1},
-        ],
-        'Property, Plant, and Equipment:': [
-            {'label': 'Land', 'row': 85 - 1},
-            {'label': 'Land Improvements', 'row': 86 - 1},
-            {'label': 'Less: Accumulated Depreciation - Land Improvements', 'row': 87 - 1},
-            {'label': 'Building and Improvements', 'row': 88 - 1},
-            {'label': 'Less: Accumulated Depreciation - Bldg and Improv', 'row': 89 - 1},
-            {'label': 'Building on Leased/Usufruct Land', 'row': 90 - 1},
-            {'label': 'Less: Accumulated Depreciation - Bldg on Leased/Usufruct Land', 'row': 91 - 1},
-            {'label': 'Property, Plant and Equipment - Under Finance Lease', 'row': 92 - 1},
-            {'label': 'Less: Accumulated Depreciation - PPE Under Finance Lease', 'row': 93 - 1},
-            {'label': 'Construction in Progress', 'row': 94 - 1},
-            {'label': 'Furniture, Fixtures and Equipment', 'row': 95 - 1},
-            {'label': 'Less: Accumulated Depreciation - FF and E', 'row': 96 - 1},
-            {'label': 'Machineries, Tools and Equipment', 'row': 97 - 1},
-            {'label': 'Less: Accumulated Depreciation - Machineries and Equiptment', 'row': 98 - 1},
-            {'label': 'Transportation Equipment', 'row': 99 - 1},
-            {'label': 'Less: Accumulated Depreciation - Transpo Equiptment', 'row': 100 - 1},
-            {'label': 'Leasehold Rights and Improvements (net of Amortization)', 'row': 101 - 1},
-        ],
-        'Other Non-Current Assets:': [
-            {'label': 'Computerization Cost, net', 'row': 104 - 1},
-            {'label': 'Other Funds and Deposits', 'row': 105 - 1},
-            {'label': 'Due from Head Office/Branch/Subsidy', 'row': 106 - 1},
-            {'label': 'Miscellaneous Assets', 'row': 107 - 1},
-        ],
-        'Deposit Liabilities:': [
-            {'label': 'Savings Deposits', 'row': 117 - 1},
-            {'label': 'Time Deposits', 'row': 118 - 1},
-        ],
-        'Accounts and Other Payables:': [
-            {'label': 'Accounts Payable - Non-Trade', 'row': 121 - 1},
-            {'label': 'Loans Payable - Current', 'row': 122 - 1},
-            {'label': 'Less: Discounts on Loans Payable', 'row': 123 - 1},
-            {'label': 'Loans Payable, Net', 'row': 124 - 1},
-            {'label': 'Cash Bond Payable', 'row': 125 - 1},
-            {'label': 'Other Payables', 'row': 126 - 1},
-        ],
-        'Accrued Expenses:': [
-            {'label': 'Due to Regulatory Agencies', 'row': 129 - 1},
-            {'label': 'SSS/ECC/PhilHealth and Pag-ibig Premium Contributions Payable', 'row': 130 - 1},
-            {'label': 'SSS / Pag-ibig Loans Payable', 'row': 131 - 1},
-            {'label': 'Withholding Tax Payable', 'row': 132 - 1},
-            {'label': 'Income Tax Payable', 'row': 133 - 1},
-            {'label': 'Other Accrued Expenses', 'row': 134 - 1},
-        ],
-        'Other Current Liabilities:': [
-            {'label': 'Other Current Liabilities', 'row': 136 - 1},
-            {'label': 'Deposit from Customers', 'row': 137 - 1},
-            {'label': 'Interest on Share Capital Payable', 'row': 138 - 1},
-            {'label': 'Patronage Refund Payable', 'row': 139 - 1},
-            {'label': 'Due to Union/Federation (CETF)', 'row': 140 - 1},
-        ],
-        'STATUTORY FUNDS:': [
-            {'label': 'Reserve Fund', 'row': 187 - 1},
-            {'label': 'Coop Education and Training Fund', 'row': 188 - 1},
-            {'label': 'Community Development Fund', 'row': 189 - 1},
-            {'label': 'Optional Fund', 'row': 190 - 1},
-        ],
-    }
 
     # Initialize structured data for BS
     bs_structured_data = {
@@ -473,17 +746,17 @@ def process_financial_statement(branch_name, report_date_str, area_name): # Adde
         'totalLiabilitiesAndMembersEquity': {'label': 'TOTAL LIABILITIES AND MEMBERS\' EQUITY:', 'current_balance': 0.0, 'last_december_balance': 0.0, 'changes_percentage': 0.0, 'structure_percentage': 0.0, 'trend_data': [0.0]*5}
     }
 
-    # Process BS data only if df_bs was loaded successfully
-    if df_bs is not None:
+    # Process BS data only if bs_sheet was loaded successfully
+    if bs_sheet is not None:
         # The bs_col_index_map is already built above, no need to rebuild it here.
 
         # Populate bs_structured_data with main account details and their sub-accounts
-        for key, item_info in bs_accounts_map.items():
+        for key, item_info in FS_BS_ACCOUNTS_MAP.items():
             main_account_label = item_info['label']
             
             # Get all required values for main account in one go
             main_account_all_values = get_values_for_account_across_dates(
-                df_bs, item_info['row'], bs_col_index_map, bs_branches_to_process, # Pass the list of branches
+                bs_sheet, item_info['row'], bs_col_index_map, bs_branches_to_process, # Pass the list of branches
                 [lookup_date_str, last_december_lookup_str_fp] + bs_trend_dates_lookup_str
             )
             current_main_account_value = main_account_all_values[0]
@@ -491,13 +764,13 @@ def process_financial_statement(branch_name, report_date_str, area_name): # Adde
             main_account_trend_data = main_account_all_values[2:] # Remaining are trend data
 
             components = []
-            if main_account_label in bs_sub_accounts_map:
-                for sub_item_info in bs_sub_accounts_map[main_account_label]:
+            if main_account_label in FS_BS_SUB_ACCOUNTS_MAP:
+                for sub_item_info in FS_BS_SUB_ACCOUNTS_MAP[main_account_label]:
                     sub_row_idx = sub_item_info['row']
                     
                     # Get all required values for sub-account in one go
                     sub_account_all_values = get_values_for_account_across_dates(
-                        df_bs, sub_row_idx, bs_col_index_map, bs_branches_to_process, # Pass the list of branches
+                        bs_sheet, sub_row_idx, bs_col_index_map, bs_branches_to_process, # Pass the list of branches
                         [lookup_date_str, last_december_lookup_str_fp] + bs_trend_dates_lookup_str
                     )
                     current_sub_value = sub_account_all_values[0]
@@ -595,7 +868,7 @@ def process_financial_statement(branch_name, report_date_str, area_name): # Adde
 
         print(f"Server Log (FS Process): Successfully processed BS data for branch '{branch_name}' on '{report_date_str}'.")
     else:
-        print(f"Server Log (FS Process): Skipping BS data processing as df_bs was not loaded.")
+        print(f"Server Log (FS Process): Skipping BS data processing as bs_sheet was not loaded.")
 
     # --- Income Statement (IS) Processing ---
     # Determine the actual list of branches to process for IS
@@ -610,96 +883,13 @@ def process_financial_statement(branch_name, report_date_str, area_name): # Adde
         is_branches_to_process = [branch_name.upper()]
 
     # Pre-build column index map for IS (Called only once now)
-    is_col_index_map = get_column_index_map(df_is, is_branch_row_index, is_date_row_index, area_name, branch_name, lookup_date_str, last_december_lookup_str_fp, previous_period_lookup_str_is, bs_trend_dates_lookup_str, is_trend_dates_lookup_str)
-    if not is_col_index_map and df_is is not None:
+    is_col_index_map = get_column_index_map(is_sheet, area_name, branch_name, lookup_date_str, last_december_lookup_str_fp, previous_period_lookup_str_is, bs_trend_dates_lookup_str, is_trend_dates_lookup_str)
+    if not is_col_index_map and is_sheet is not None:
         print(f"Server Log (FS Process Error): No relevant columns found in IS sheet for branch '{branch_name}' and any target date. Returning empty data.")
         return {}
 
 
-    # Define the main accounts and their row numbers (0-indexed) for IS
-    # Removed direct row numbers for Administrative Costs and Operating Costs as they will be summed from sub-accounts
-    is_accounts_map = { 
-        'incomeFromCreditOperations': {'label': 'Income from Credit Operations', 'row': 13 - 1, 'type': 'revenue'},
-        'otherIncome': {'label': 'Other Income', 'row': 19 - 1, 'type': 'revenue'},
-        'financingCost': {'label': 'FINANCING COST', 'row': 28 - 1, 'type': 'expense'},
-        'administrativeCosts': {'label': 'Administrative Costs', 'type': 'expense'}, # No direct row, calculated from sub-accounts
-        'operatingCosts': {'label': 'Operating Costs', 'type': 'expense'}, # No direct row, calculated from sub-accounts
-        'otherItemsSubsidyGainLosses': {'label': 'Other Items - Subsidy/Gain (Losses)', 'row': 81 - 1, 'type': 'other_item'},
-    }
 
-    # Define sub-accounts and their row numbers (0-indexed) for IS
-    is_sub_accounts_map = {
-        'Income from Credit Operations': [
-            {'label': 'Interest Income from Loans', 'row': 9 - 1},
-            {'label': 'Service Fees', 'row': 10 - 1},
-            {'label': 'Filing Fees', 'row': 11 - 1},
-            {'label': 'Fines, Penalties, and Surcharges', 'row': 12 - 1},
-        ],
-        'Other Income': [
-            {'label': 'Income/ Interest from Investments/ Deposits', 'row': 15 - 1},
-            {'label': 'Membership Fees', 'row': 16 - 1},
-            {'label': 'Commissions', 'row': 17 - 1},
-            {'label': 'Miscellaneous Income', 'row': 18 - 1},
-        ],
-        'FINANCING COST': [
-            {'label': 'Interest Expense on Deposits', 'row': 25 - 1},
-            {'label': 'Interest Expense on Borrowings', 'row': 26 - 1},
-            {'label': 'Other Charges on Borrowings', 'row': 27 - 1},
-        ],
-        'Administrative Costs': [
-            {'label': 'Salaries and Wages', 'row': 30 - 1},
-            {'label': 'Employees\' Benefits', 'row': 31 - 1},
-            {'label': 'SSS,PhilHealth,ECC, Pag-ibig Premium', 'row': 32 - 1},
-            {'label': 'Retirement Benefit Expense', 'row': 33 - 1},
-            {'label': 'Officers\' Honorarium and Allowances', 'row': 34 - 1},
-            {'label': 'Trainings/Seminars', 'row': 35 - 1},
-        ],
-        'Operating Costs': [
-            {'label': 'Office Supplies', 'row': 36 - 1},
-            {'label': 'Power, Light and Water', 'row': 37 - 1},
-            {'label': 'Travel and Transportation', 'row': 38 - 1},
-            {'label': 'Insurance', 'row': 39 - 1},
-            {'label': 'Repairs and Maintenance', 'row': 40 - 1},
-            {'label': 'Rentals', 'row': 41 - 1},
-            {'label': 'Taxes, Fees and Charges', 'row': 42 - 1},
-            {'label': 'Professional Fees', 'row': 43 - 1},
-            {'label': 'Communication', 'row': 44 - 1},
-            {'label': 'Representation', 'row': 45 - 1},
-            {'label': 'Meetings and Conferences', 'row': 46 - 1},
-            {'label': 'Periodicals, Magazines & Subscriptions', 'row': 47 - 1},
-            {'label': 'General Support Services', 'row': 48 - 1},
-            {'label': 'Litigation Expenses', 'row': 49 - 1},
-            {'label': 'Gas, Oil & Lubricants', 'row': 50 - 1},
-            {'label': 'Miscellaneous Expense', 'row': 51 - 1},
-            {'label': 'Bank Charges', 'row': 52 - 1},
-            {'label': 'Depreciation', 'row': 53 - 1},
-            {'label': 'Amortization', 'row': 54 - 1},
-            {'label': 'Amortization of Leasehold Rights and Improvement', 'row': 55 - 1},
-            {'label': 'Provision for Probable Losses on Loans/Accounts/Installment Receivables', 'row': 56 - 1},
-            {'label': 'Impairment Losses', 'row': 57 - 1},
-            {'label': 'Collection Expense', 'row': 58 - 1},
-            {'label': 'Commision Expense', 'row': 59 - 1},
-            {'label': 'Advertising and Promotion', 'row': 60 - 1},
-            {'label': 'General Assembly Expenses', 'row': 61 - 1},
-            {'label': 'Members\' Benefit Expense', 'row': 62 - 1},
-            {'label': 'Provision for Members\' Future Benefits', 'row': 63 - 1},
-            {'label': 'Affiliation Fee', 'row': 64 - 1},
-            {'label': 'Social & Community Service Expense', 'row': 65 - 1},
-            {'label': 'Provision for CGF (KBGF)', 'row': 66 - 1},
-        ],
-        'Other Items - Subsidy/Gain (Losses)': [
-            {'label': 'Project Subsidy', 'row': 71 - 1},
-            {'label': 'Donation and Grant Subsidy', 'row': 72 - 1},
-            {'label': 'Optional Fund Subsidy', 'row': 73 - 1},
-            {'label': 'Gains (Losses) on Sale of Property & Eqpt', 'row': 74 - 1},
-            {'label': 'Gains (Losses) in Investment', 'row': 75 - 1},
-            {'label': 'Gains (Losses) on Sale of Repossessed Item', 'row': 76 - 1},
-            {'label': 'Gains (Losses) from Foreign Exchange Valuation', 'row': 77 - 1},
-            {'label': 'Subsidized Project Expenses', 'row': 78 - 1},
-            {'label': 'Special Project Expenses', 'row': 79 - 1},
-            {'label': 'Prior Years\' Adjustment', 'row': 80 - 1},
-        ],
-    }
 
     # Initialize structured data for IS
     is_structured_data = {
@@ -722,12 +912,12 @@ def process_financial_statement(branch_name, report_date_str, area_name): # Adde
         'netSurplusForAllocation': {'label': 'NET SURPLUS (FOR ALLOCATION)', 'current_balance': 0.0, 'last_december_balance': 0.0, 'changes_percentage': 0.0, 'structure_percentage': 0.0, 'trend_data': [0.0]*5}
     }
 
-    # Process IS data only if df_is was loaded successfully
-    if df_is is not None:
+    # Process IS data only if is_sheet was loaded successfully
+    if is_sheet is not None:
         # The is_col_index_map is already built above, no need to rebuild it here.
 
         # Populate IS structured data with main account details and their sub-accounts
-        for main_account_key, main_account_info in is_accounts_map.items():
+        for main_account_key, main_account_info in FS_IS_ACCOUNTS_MAP.items():
             main_account_label = main_account_info['label']
             
             components = []
@@ -735,13 +925,13 @@ def process_financial_statement(branch_name, report_date_str, area_name): # Adde
             previous_total_main_account_value = 0.0
             main_account_trend_data = [0.0] * 5 # Initialize trend data for main account
 
-            if main_account_label in is_sub_accounts_map:
-                for sub_item_info in is_sub_accounts_map[main_account_label]:
+            if main_account_label in FS_IS_SUB_ACCOUNTS_MAP:
+                for sub_item_info in FS_IS_SUB_ACCOUNTS_MAP[main_account_label]:
                     sub_row_idx = sub_item_info['row']
                     
                     # Get all required values for sub-account in one go
                     sub_account_all_values = get_values_for_account_across_dates(
-                        df_is, sub_row_idx, is_col_index_map, is_branches_to_process, # Pass the list of branches
+                        is_sheet, sub_row_idx, is_col_index_map, is_branches_to_process, # Pass the list of branches
                         [lookup_date_str, previous_period_lookup_str_is] + is_trend_dates_lookup_str
                     )
                     current_sub_value = sub_account_all_values[0]
@@ -764,7 +954,7 @@ def process_financial_statement(branch_name, report_date_str, area_name): # Adde
             else: # For accounts that still rely on a single row (not summed from sub-accounts)
                 if 'row' in main_account_info:
                     main_account_all_values = get_values_for_account_across_dates(
-                        df_is, main_account_info['row'], is_col_index_map, is_branches_to_process,
+                        is_sheet, main_account_info['row'], is_col_index_map, is_branches_to_process,
                         [lookup_date_str, previous_period_lookup_str_is] + is_trend_dates_lookup_str
                     )
                     current_total_main_account_value = main_account_all_values[0]
@@ -1046,3 +1236,182 @@ def get_financial_statement_trend_data(branch_name, report_date_str, area_name,
         'dates': trend_dates,
         'values': trend_data_points
     }
+
+
+# --- Batch trend series for whole statements ---
+FS_TREND_REPORT_TYPES = ['financial_position', 'financial_performance']
+
+def _resolve_fs_branches(branch_name, area_name):
+    """Branch columns summed for a selection, as in process_financial_statement ('ALL' expands to the area's branches)."""
+    if branch_name.upper() == 'CONSOLIDATED':
+        return ['CONSOLIDATED']
+    if branch_name.upper() == 'ALL':
+        if area_name.upper() == 'CONSOLIDATED':
+            return ['CONSOLIDATED']
+        return [b.upper() for b in AREA_BRANCH_MAP.get(area_name, []) if b.upper() not in ['ALL', 'CONSOLIDATED']]
+    return [branch_name.upper()]
+
+def _fs_trend_dates(report_date_dt, report_type):
+    """The 5 trend points: the last four Decembers (financial position) or the same day in the last four years (financial performance), then the report date."""
+    if report_type == 'financial_position':
+        trend_dates = [datetime(report_date_dt.year - i, 12, 31) for i in range(4, 0, -1)]
+    else:
+        trend_dates = [report_date_dt - relativedelta(years=i) for i in range(4, 0, -1)]
+    trend_dates.append(report_date_dt)
+    return [d.strftime('%#m/%d/%Y') for d in trend_dates]
+
+def _sum_rows_across_branches(sheet, rows, branches, dates):
+    """
+    Returns a (len(rows), len(dates)) array: for each row and date, the sum of that row over the
+    branches' columns, taken as one slice of the compiled matrix. Missing columns count as 0.
+    """
+    col_idx = np.array([[sheet['column_keys'].get((branch, date_str), -1) for branch in branches] for date_str in dates], dtype=np.int64).reshape(len(dates), len(branches))
+    present = (col_idx >= 0) & (col_idx < sheet['n_cols'])
+    rows = np.asarray(rows, dtype=np.int64)
+    in_range = rows < sheet['n_rows']
+    block = sheet['values'][np.ix_(np.where(in_range, rows, 0), np.where(present, col_idx, 0).ravel())]
+    block = block.reshape(len(rows), len(dates), len(branches))
+    return np.where(present[np.newaxis] & in_range[:, np.newaxis, np.newaxis], block, 0.0).sum(axis=2)
+
+def _trend_entry(label, parent, kind, values):
+    return {'label': label, 'parent': parent, 'kind': kind, 'values': [float(v) for v in values]}
+
+def _financial_position_trends(sheet, branches, dates):
+    """Trend series of every BS account, sub-account and total, in statement order."""
+    mains = list(FS_BS_ACCOUNTS_MAP.values())
+    rows = []
+    for item_info in mains:
+        rows.append(item_info['row'])
+        rows.extend(sub_item_info['row'] for sub_item_info in FS_BS_SUB_ACCOUNTS_MAP.get(item_info['label'], []))
+    trends = _sum_rows_across_branches(sheet, rows, branches, dates)
+
+    entries = []
+    group_totals = {}
+    position = 0
+    for item_info in mains:
+        main_trend = trends[position]
+        entries.append(_trend_entry(item_info['label'], None, 'account', main_trend))
+        position += 1
+        for sub_item_info in FS_BS_SUB_ACCOUNTS_MAP.get(item_info['label'], []):
+            entries.append(_trend_entry(sub_item_info['label'], item_info['label'], 'component', trends[position]))
+            position += 1
+        group_key = (item_info['type'], item_info['category'])
+        group_totals[group_key] = group_totals.get(group_key, np.zeros(len(dates))) + main_trend
+
+    def group_total(account_type, category):
+        return group_totals.get((account_type, category), np.zeros(len(dates)))
+
+    total_assets = group_total('asset', 'current') + group_total('asset', 'non-current')
+    total_liabilities = group_total('liability', 'current') + group_total('liability', 'non-current')
+    total_equity = group_total('equity', 'equity')
+    for label, values in [
+        ('TOTAL CURRENT ASSETS:', group_total('asset', 'current')),
+        ('TOTAL NON-CURRENT ASSETS:', group_total('asset', 'non-current')),
+        ('TOTAL ASSETS:', total_assets),
+        ('TOTAL CURRENT LIABILITIES:', group_total('liability', 'current')),
+        ('TOTAL NON-CURRENT LIABILITIES:', group_total('liability', 'non-current')),
+        ('TOTAL LIABILITIES:', total_liabilities),
+        ('TOTAL MEMBERS\' EQUITY:', total_equity),
+        ('TOTAL LIABILITIES AND MEMBERS\' EQUITY:', total_liabilities + total_equity),
+    ]:
+        entries.append(_trend_entry(label, None, 'total', values))
+    return entries
+
+def _financial_performance_trends(sheet, branches, dates):
+    """Trend series of every IS account, sub-account and total, in statement order."""
+    rows = []
+    for main_account_info in FS_IS_ACCOUNTS_MAP.values():
+        sub_items = FS_IS_SUB_ACCOUNTS_MAP.get(main_account_info['label'])
+        if sub_items is not None:
+            rows.extend(sub_item_info['row'] for sub_item_info in sub_items)
+        elif 'row' in main_account_info:
+            rows.append(main_account_info['row'])
+    trends = _sum_rows_across_branches(sheet, rows, branches, dates) if rows else np.zeros((0, len(dates)))
+
+    entries = []
+    main_trends = {}
+    position = 0
+    for main_account_key, main_account_info in FS_IS_ACCOUNTS_MAP.items():
+        sub_items = FS_IS_SUB_ACCOUNTS_MAP.get(main_account_info['label'])
+        component_entries = []
+        if sub_items is not None:
+            # Main accounts with sub-accounts are the sum of their sub-accounts, not their own row
+            main_trend = trends[position:position + len(sub_items)].sum(axis=0)
+            for sub_item_info in sub_items:
+                component_entries.append(_trend_entry(sub_item_info['label'], main_account_info['label'], 'component', trends[position]))
+                position += 1
+        elif 'row' in main_account_info:
+            main_trend = trends[position]
+            position += 1
+        else:
+            main_trend = np.zeros(len(dates))
+        main_trends[main_account_key] = main_trend
+        entries.append(_trend_entry(main_account_info['label'], None, 'account', main_trend))
+        entries.extend(component_entries)
+
+    def main_trend(key):
+        return main_trends.get(key, np.zeros(len(dates)))
+
+    total_revenues = main_trend('incomeFromCreditOperations') + main_trend('otherIncome')
+    total_expenses = main_trend('financingCost') + main_trend('administrativeCosts') + main_trend('operatingCosts')
+    net_surplus_before_other_items = total_revenues - total_expenses
+    total_other_items = main_trend('otherItemsSubsidyGainLosses')
+    for label, values in [
+        ('TOTAL REVENUES', total_revenues),
+        ('TOTAL EXPENSES', total_expenses),
+        ('Net Surplus Before Other Items', net_surplus_before_other_items),
+        ('TOTAL OTHER ITEMS', total_other_items),
+        ('NET SURPLUS (FOR ALLOCATION)', net_surplus_before_other_items + total_other_items),
+    ]:
+        entries.append(_trend_entry(label, None, 'total', values))
+    return entries
+
+def get_financial_statement_trends(branch_name, report_date_str, area_name, report_types=None, account_labels=None):
+    """
+    Returns the 5-point trend series of every account, sub-account and total of the Financial
+    Statement in one call, instead of one get_financial_statement_trend_data call per account.
+    Each statement is one slice of the compiled matrix (all its rows x trend dates x branches),
+    with 'ALL'/area selections summed across the branch columns.
+
+    Args:
+        branch_name (str): Branch, 'ALL' (every branch of the area) or 'CONSOLIDATED'.
+        report_date_str (str): Report date, YYYY-MM-DD.
+        area_name (str): Area used to expand 'ALL'.
+        report_types (list): Subset of FS_TREND_REPORT_TYPES; all when empty.
+        account_labels (list): Only return entries with these labels; all when empty.
+
+    Returns:
+        dict: report type -> {'dates': [...], 'accounts': [{'label', 'parent', 'kind', 'values'}]},
+              with None for a statement whose sheet or columns were not found; None on invalid input.
+    """
+    print(f"Server Log (FS Trends): Fetching trend series for Area: '{area_name}', Branch: '{branch_name}', Date: '{report_date_str}', Report Types: {report_types or 'all'}, Accounts: {len(account_labels) if account_labels else 'all'}")
+
+    try:
+        report_date_dt = datetime.strptime(report_date_str, '%Y-%m-%d')
+    except ValueError as e:
+        print(f"Server Log (FS Trends Error): Invalid date format for report_date_str: {e}")
+        return None
+
+    report_types = report_types or FS_TREND_REPORT_TYPES
+    invalid_types = [report_type for report_type in report_types if report_type not in FS_TREND_REPORT_TYPES]
+    if invalid_types:
+        print(f"Server Log (FS Trends Error): Invalid report_type(s): {invalid_types}")
+        return None
+
+    bs_sheet, is_sheet = _load_financial_statement_matrix()
+    branches = _resolve_fs_branches(branch_name, area_name)
+    wanted_labels = set(account_labels) if account_labels else None
+
+    result = {}
+    for report_type in report_types:
+        sheet, build_entries = (bs_sheet, _financial_position_trends) if report_type == 'financial_position' else (is_sheet, _financial_performance_trends)
+        dates = _fs_trend_dates(report_date_dt, report_type)
+        if sheet is None or not any((branch, date_str) in sheet['column_keys'] for branch in branches for date_str in dates):
+            print(f"Server Log (FS Trends Error): No relevant columns found for '{report_type}' for branch '{branch_name}' and any trend date.")
+            result[report_type] = None
+            continue
+        entries = build_entries(sheet, branches, dates)
+        if wanted_labels is not None:
+            entries = [entry for entry in entries if entry['label'] in wanted_labels]
+        result[report_type] = {'dates': dates, 'accounts': entries}
+    return result
@@ -0,0 +1,206 @@
+# audit_tool/backend/gl_balance_snapshots.py
+# Closing GL balance per (GLACC, day) with monthly and yearly roll-ups, derived from the GL store,
+# so trend reports look balances up per period instead of reloading every GL file.
+import os
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+
+from backend.gl_catalog import GL_CACHE_DIR, get_gl_files_for_range
+from backend.gl_parquet_store import load_gl_source
+
+GL_SNAPSHOT_DIR = os.path.join(GL_CACHE_DIR, "balance_snapshots")
+# Bump when the snapshot layout changes so existing files are rebuilt
+GL_SNAPSHOT_VERSION = 1
+SNAPSHOT_SOURCE_COLUMNS = ['DOCDATE_DT', 'TRN', 'GLACC_CLEAN', 'BAL_NUM', 'SOURCE_ROW']
+
+_source_snapshots = {} # (branch folder, filename) -> per-file daily snapshot dict
+_branch_snapshots = {} # branch folder -> (file set fingerprint, combined snapshots)
+_snapshot_lock = threading.Lock()
+
+
+def _snapshot_file_path(branch_folder, filename):
+    return os.path.join(GL_SNAPSHOT_DIR, branch_folder, hashlib.md5(filename.encode('utf-8')).hexdigest()[:16] + ".npz")
+
+
+def _build_source_snapshot(rows):
+    """
+    Reduces one source file to its last transaction per (GLACC, day), ordered the way the
+    trend report orders rows: by DOCDATE, then numeric TRN, then file position.
+    """
+    rows = rows.assign(
+        TRN_NUM_SORT=pd.to_numeric(rows['TRN'], errors='coerce').fillna(0),
+        DAY=rows['DOCDATE_DT'].dt.normalize(),
+    )
+    rows = rows.sort_values(['GLACC_CLEAN', 'DOCDATE_DT', 'TRN_NUM_SORT', 'SOURCE_ROW'], kind='mergesort')
+    last_rows = rows.drop_duplicates(subset=['GLACC_CLEAN', 'DAY'], keep='last')
+    return {
+        'glacc': last_rows['GLACC_CLEAN'].astype(str).to_numpy(dtype=str),
+        'day': last_rows['DAY'].to_numpy(dtype='datetime64[D]'),
+        'timestamp': last_rows['DOCDATE_DT'].to_numpy(dtype='datetime64[ns]'),
+        'trn': last_rows['TRN_NUM_SORT'].to_numpy(dtype=np.float64),
+        'balance': last_rows['BAL_NUM'].to_numpy(dtype=np.float64),
+    }
+
+
+def _load_snapshot_file(snapshot_path, gl_file):
+    try:
+        with np.load(snapshot_path) as data:
+            if (int(data['version'][0]) != GL_SNAPSHOT_VERSION or int(data['size'][0]) != gl_file['size']
+                    or float(data['mtime'][0]) != gl_file['mtime']):
+                return None
+            return {key: data[key] for key in ('glacc', 'day', 'timestamp', 'trn', 'balance')}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _save_snapshot_file(snapshot_path, gl_file, snapshot):
+    try:
+        os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+        temp_path = f"{snapshot_path}.tmp.npz"
+        np.savez(
+            temp_path,
+            version=np.array([GL_SNAPSHOT_VERSION]),
+            size=np.array([gl_file['size']], dtype=np.int64),
+            mtime=np.array([gl_file['mtime']], dtype=np.float64),
+            **snapshot
+        )
+        os.replace(temp_path, snapshot_path)
+    except OSError as e:
+        print(f"Server Log (GL Snapshots): Could not save snapshot {snapshot_path}: {e}")
+
+
+def _get_source_snapshot(branch_folder, gl_file):
+    """Returns one file's daily snapshot, building it from the GL store only when the file is new or changed."""
+    key = (branch_folder, gl_file['filename'])
+    version = (gl_file['size'], gl_file['mtime'])
+    with _snapshot_lock:
+        cached = _source_snapshots.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    snapshot_path = _snapshot_file_path(branch_folder, gl_file['filename'])
+    snapshot = _load_snapshot_file(snapshot_path, gl_file) if os.path.exists(snapshot_path) else None
+    if snapshot is None:
+        rows = load_gl_source(branch_folder, gl_file, SNAPSHOT_SOURCE_COLUMNS, log_label="GL Snapshots")
+        if rows is None:
+            return None
+        snapshot = _build_source_snapshot(rows)
+        _save_snapshot_file(snapshot_path, gl_file, snapshot)
+        print(f"Server Log (GL Snapshots): Built daily balance snapshot for {gl_file['filename']} ({len(snapshot['day'])} GLACC-days from {len(rows)} rows).")
+
+    with _snapshot_lock:
+        _source_snapshots[key] = (version, snapshot)
+    return snapshot
+
+
+def _combine_snapshots(source_snapshots):
+    """
+    Merges per-file snapshots (in file order) into the branch snapshot: the latest transaction
+    per (GLACC, day) across files, plus month and year roll-ups taken from the last day.
+    """
+    frames = [pd.DataFrame(snapshot).assign(FILE_ORDER=order) for order, snapshot in enumerate(source_snapshots)]
+    daily = pd.concat(frames, ignore_index=True)
+    daily = daily.sort_values(['glacc', 'day', 'timestamp', 'trn', 'FILE_ORDER'], kind='mergesort')
+    daily = daily.drop_duplicates(subset=['glacc', 'day'], keep='last').reset_index(drop=True)
+
+    day_index = pd.DatetimeIndex(daily['day'])
+    daily['year'] = day_index.year
+    daily['month'] = day_index.month
+    monthly = daily.drop_duplicates(subset=['glacc', 'year', 'month'], keep='last')
+    yearly = daily.drop_duplicates(subset=['glacc', 'year'], keep='last')
+
+    days_by_glacc = {}
+    for glacc, (start, stop) in _group_bounds(daily['glacc'].to_numpy()).items():
+        days_by_glacc[glacc] = (daily['day'].to_numpy(dtype='datetime64[D]')[start:stop], daily['balance'].to_numpy()[start:stop])
+
+    return {
+        'daily': days_by_glacc,
+        'monthly': dict(zip(zip(monthly['glacc'], monthly['year'], monthly['month']), monthly['balance'])),
+        'yearly': dict(zip(zip(yearly['glacc'], yearly['year']), yearly['balance'])),
+    }
+
+
+def _group_bounds(sorted_keys):
+    """Maps each key of a sorted array to its [start, stop) slice."""
+    if len(sorted_keys) == 0:
+        return {}
+    change_points = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+    starts = np.concatenate(([0], change_points))
+    stops = np.concatenate((change_points, [len(sorted_keys)]))
+    return {sorted_keys[start]: (start, stop) for start, stop in zip(starts, stops)}
+
+
+def load_balance_snapshots(branch_folder, from_date, to_date):
+    """
+    Returns the balance snapshots built from the branch's GL files overlapping
+    [from_date, to_date] (the same files the trend report used to load), or None if the
+    branch folder does not exist.
+
+    Per-file daily snapshots are built once per file version and persisted; the combined
+    branch snapshot is cached until the selected file set changes.
+
+    Returns:
+        dict: 'daily' (GLACC -> (sorted day array, closing balance array)),
+              'monthly' ((GLACC, year, month) -> closing balance),
+              'yearly' ((GLACC, year) -> closing balance).
+    """
+    gl_files = get_gl_files_for_range(branch_folder, from_date, to_date)
+    if gl_files is None:
+        return None
+
+    fingerprint = tuple((gl_file['filename'], gl_file['size'], gl_file['mtime']) for gl_file in gl_files)
+    with _snapshot_lock:
+        cached = _branch_snapshots.get(branch_folder)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    source_snapshots = []
+    for gl_file in gl_files:
+        snapshot = _get_source_snapshot(branch_folder, gl_file)
+        if snapshot is not None and len(snapshot['day']):
+            source_snapshots.append(snapshot)
+
+    if source_snapshots:
+        snapshots = _combine_snapshots(source_snapshots)
+    else:
+        snapshots = {'daily': {}, 'monthly': {}, 'yearly': {}}
+    with _snapshot_lock:
+        _branch_snapshots[branch_folder] = (fingerprint, snapshots)
+    return snapshots
+
+
+def closing_balance(snapshots, glacc, start_date, end_date):
+    """
+    Returns the balance after the last transaction of `glacc` dated within
+    [start_date, end_date], or None if it had no transaction in that window. Whole calendar
+    months and years are answered from the roll-ups; any other window is a binary search
+    over the daily snapshot.
+    """
+    start_day = np.datetime64(start_date.date() if hasattr(start_date, 'date') else start_date, 'D')
+    end_day = np.datetime64(end_date.date() if hasattr(end_date, 'date') else end_date, 'D')
+    start_ts, end_ts = pd.Timestamp(start_day), pd.Timestamp(end_day)
+
+    if start_ts.day == 1 and end_ts == start_ts + pd.offsets.MonthEnd(0):
+        return snapshots['monthly'].get((glacc, start_ts.year, start_ts.month))
+    if start_ts.month == 1 and start_ts.day == 1 and end_ts.month == 12 and end_ts.day == 31 and end_ts.year == start_ts.year:
+        return snapshots['yearly'].get((glacc, start_ts.year))
+
+    days, balances = snapshots['daily'].get(glacc, (None, None))
+    if days is None:
+        return None
+    position = np.searchsorted(days, end_day, side='right') - 1
+    if position < 0 or days[position] < start_day:
+        return None
+    return float(balances[position])
+
+
+def daily_balances(snapshots, glacc, start_date, end_date):
+    """Returns [(day, closing balance)] for each day `glacc` moved within [start_date, end_date]."""
+    days, balances = snapshots['daily'].get(glacc, (None, None))
+    if days is None:
+        return []
+    start = np.searchsorted(days, np.datetime64(start_date.date(), 'D'), side='left')
+    stop = np.searchsorted(days, np.datetime64(end_date.date(), 'D'), side='right')
+    return [(pd.Timestamp(day).to_pydatetime(), float(balance)) for day, balance in zip(days[start:stop], balances[start:stop])]
@@ -0,0 +1,275 @@
+# audit_tool/backend/gl_catalog.py
+# Persistent per-branch catalog of the General Ledger export files used by the GL, Reference,
+# Description and Trend reports.
+import os
+import re
+import json
+import codecs
+import threading
+from datetime import datetime
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+# Define the base directory where accounting data is stored (for GL report processing)
+ACCOUNTING_BASE_DIR = r"C:\xampp\htdocs\audit_tool\ACCOUTNING\GENERAL LEDGER"
+# Derived GL data (catalogs, caches) lives outside the GL folders so writing it never changes their mtimes
+GL_CACHE_DIR = r"C:\xampp\htdocs\audit_tool\db\gl_cache"
+GL_CATALOG_DIR = os.path.join(GL_CACHE_DIR, "catalog")
+
+# Bump when the entry layout changes so old catalog files are rebuilt instead of misread
+GL_CATALOG_VERSION = 1
+
+# Same order the reports used to try; latin1 decodes any byte, so later entries are only reached if it is removed
+GL_ENCODINGS = ['utf-8', 'latin1', 'cp1252', 'iso-8859-1', 'utf-8-sig']
+ENCODING_PROBE_CHUNK_BYTES = 1024 * 1024
+
+_catalogs = {} # branch folder name -> catalog dict
+_catalog_lock = threading.Lock()
+
+
+def sanitize_gl_branch_folder(branch):
+    """Returns the GL folder name for a branch (alphanumerics/spaces/underscores, spaces to underscores, upper case)."""
+    sanitized_branch_name = "".join([c for c in branch if c.isalnum() or c in (' ', '_')]).strip().replace(' ', '_')
+    return sanitized_branch_name.upper()
+
+
+def parse_gl_filename_dates(filename):
+    """
+    Parses the covered date range from a GL export filename.
+    Supports "... - MMM YYYY to MMM YYYY.csv" and "... - MM-DD-YYYY to MM-DD-YYYY.csv".
+    Returns (start_date, end_date) as datetimes, or (None, None) if the name does not match.
+    """
+    match_month_year = re.match(r'.* - (\w{3} \d{4}) to (\w{3} \d{4})\.csv$', filename, re.IGNORECASE)
+    if match_month_year:
+        try:
+            file_start_date = datetime.strptime(match_month_year.group(1), '%b %Y').replace(day=1)
+            temp_end_date = datetime.strptime(match_month_year.group(2), '%b %Y').replace(day=1)
+            file_end_date = temp_end_date + relativedelta(months=1, days=-1)
+            return file_start_date, file_end_date
+        except ValueError:
+            return None, None
+
+    match_full_date = re.match(r'.* - (\d{2}-\d{2}-\d{4}) to (\d{2}-\d{2}-\d{4})\.csv$', filename, re.IGNORECASE)
+    if match_full_date:
+        try:
+            file_start_date = datetime.strptime(match_full_date.group(1), '%m-%d-%Y')
+            file_end_date = datetime.strptime(match_full_date.group(2), '%m-%d-%Y')
+            return file_start_date, file_end_date
+        except ValueError:
+            return None, None
+
+    return None, None
+
+
+def _probe_csv_file(file_path):
+    """
+    Streams the raw bytes once per candidate encoding (normally just once) and returns
+    (encoding, row_count). The encoding is the first of GL_ENCODINGS that decodes the whole
+    file; row_count is the number of lines after the header. Returns (None, None) if
+    no encoding works or the file cannot be read.
+    """
+    for encoding in GL_ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        line_count = 0
+        last_byte = b''
+        try:
+            with open(file_path, 'rb') as f:
+                while True:
+                    chunk = f.read(ENCODING_PROBE_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    decoder.decode(chunk)
+                    line_count += chunk.count(b'\n')
+                    last_byte = chunk[-1:]
+                decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            continue
+        except OSError as e:
+            print(f"Server Log (GL Catalog): Could not read {file_path}: {e}")
+            return None, None
+        if last_byte and last_byte != b'\n':
+            line_count += 1 # Last line without a trailing newline
+        return encoding, max(line_count - 1, 0)
+    return None, None
+
+
+def _build_file_entry(branch_folder_path, filename, stat_result):
+    """Creates the catalog entry for one GL file (date range, encoding, row count, size, mtime)."""
+    file_path = os.path.join(branch_folder_path, filename)
+    file_start_date, file_end_date = parse_gl_filename_dates(filename)
+    entry = {
+        'filename': filename,
+        'path': file_path,
+        'start_date': file_start_date.strftime('%Y-%m-%d') if file_start_date else None,
+        'end_date': file_end_date.strftime('%Y-%m-%d') if file_end_date else None,
+        'encoding': None,
+        'row_count': None,
+        'size': stat_result.st_size,
+        'mtime': stat_result.st_mtime,
+    }
+    if file_start_date is None or file_end_date is None:
+        # Logged once per file version instead of on every report request
+        print(f"Server Log (GL Catalog): {filename} will be skipped by GL reports: Could not parse date range from filename.")
+        return entry
+
+    entry['encoding'], entry['row_count'] = _probe_csv_file(file_path)
+    if entry['encoding'] is None:
+        print(f"Server Log (GL Catalog): {filename} could not be decoded with any of {', '.join(GL_ENCODINGS)}.")
+    return entry
+
+
+def _catalog_file_path(branch_folder):
+    return os.path.join(GL_CATALOG_DIR, f"{branch_folder}.json")
+
+
+def _load_persisted_catalog(branch_folder):
+    """Reads the branch catalog saved by a previous process, or None if absent/outdated/corrupt."""
+    catalog_path = _catalog_file_path(branch_folder)
+    if not os.path.exists(catalog_path):
+        return None
+    try:
+        with open(catalog_path, 'r', encoding='utf-8') as f:
+            catalog = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Server Log (GL Catalog): Ignoring unreadable catalog {catalog_path}: {e}")
+        return None
+    if catalog.get('version') != GL_CATALOG_VERSION:
+        return None
+    return catalog
+
+
+def _save_catalog(branch_folder, catalog):
+    """Writes the catalog atomically so a concurrent reader never sees a half-written file."""
+    catalog_path = _catalog_file_path(branch_folder)
+    temp_path = f"{catalog_path}.tmp"
+    try:
+        os.makedirs(GL_CATALOG_DIR, exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(catalog, f, indent=1)
+        os.replace(temp_path, catalog_path)
+    except OSError as e:
+        # The in-memory catalog still works; it just has to be rebuilt after a restart
+        print(f"Server Log (GL Catalog): Could not save catalog {catalog_path}: {e}")
+
+
+def _refresh_catalog(branch_folder, branch_folder_path, dir_mtime, previous):
+    """
+    Rescans the branch folder. Files whose size and mtime match the previous catalog keep
+    their entry; only new or changed files are probed again.
+    """
+    previous_files = previous['files'] if previous else {}
+    files = {}
+    probed = 0
+    for filename in os.listdir(branch_folder_path):
+        if not filename.lower().endswith('.csv'):
+            continue
+        file_path = os.path.join(branch_folder_path, filename)
+        try:
+            stat_result = os.stat(file_path)
+        except OSError:
+            continue
+        old_entry = previous_files.get(filename)
+        if old_entry and old_entry['size'] == stat_result.st_size and old_entry['mtime'] == stat_result.st_mtime:
+            files[filename] = old_entry
+        else:
+            files[filename] = _build_file_entry(branch_folder_path, filename, stat_result)
+            probed += 1
+
+    removed = len(set(previous_files) - set(files))
+    print(f"Server Log (GL Catalog): Refreshed catalog for {branch_folder}: {len(files)} files, {probed} probed, {removed} removed.")
+    return {'version': GL_CATALOG_VERSION, 'branch': branch_folder, 'dir_mtime': dir_mtime, 'files': files}
+
+
+def get_gl_catalog(branch_folder):
+    """
+    Returns the catalog for a branch GL folder, refreshing it only when the folder's mtime
+    changed (files added, removed or renamed). Returns None if the folder does not exist.
+
+    The catalog is a dict with 'dir_mtime' and 'files' (filename -> entry). Each entry holds
+    'path', 'start_date'/'end_date' (YYYY-MM-DD, None if the filename has no range),
+    'encoding', 'row_count', 'size' and 'mtime'.
+    """
+    branch_folder_path = os.path.join(ACCOUNTING_BASE_DIR, branch_folder)
+    try:
+        dir_mtime = os.stat(branch_folder_path).st_mtime
+    except OSError:
+        return None
+
+    with _catalog_lock:
+        catalog = _catalogs.get(branch_folder)
+        if catalog is None:
+            catalog = _load_persisted_catalog(branch_folder)
+        if catalog is None or catalog['dir_mtime'] != dir_mtime:
+            catalog = _refresh_catalog(branch_folder, branch_folder_path, dir_mtime, catalog)
+            _save_catalog(branch_folder, catalog)
+        _catalogs[branch_folder] = catalog
+        return catalog
+
+
+def get_gl_files_for_range(branch_folder, from_date, to_date):
+    """
+    Returns the catalog entries whose filename date range overlaps [from_date, to_date],
+    ordered by start date. Selected files are re-checked against their size/mtime, since a
+    file overwritten in place does not change the folder mtime.
+    Returns None if the branch folder does not exist.
+    """
+    catalog = get_gl_catalog(branch_folder)
+    if catalog is None:
+        return None
+
+    from_key = from_date.strftime('%Y-%m-%d')
+    to_key = to_date.strftime('%Y-%m-%d')
+    branch_folder_path = os.path.join(ACCOUNTING_BASE_DIR, branch_folder)
+    selected = []
+    changed = False
+    with _catalog_lock:
+        for filename, entry in catalog['files'].items():
+            if entry['start_date'] is None or not (entry['start_date'] <= to_key and entry['end_date'] >= from_key):
+                continue
+            try:
+                stat_result = os.stat(entry['path'])
+            except OSError:
+                continue # Deleted since the last scan; the next folder mtime change drops the entry
+            if entry['size'] != stat_result.st_size or entry['mtime'] != stat_result.st_mtime:
+                entry = _build_file_entry(branch_folder_path, filename, stat_result)
+                catalog['files'][filename] = entry
+                changed = True
+            if entry['encoding'] is not None:
+                selected.append(entry)
+        if changed:
+            _save_catalog(branch_folder, catalog)
+
+    selected.sort(key=lambda entry: (entry['start_date'], entry['filename']))
+    return selected
+
+
+def read_gl_csv(entry, log_label="GL Catalog", **read_csv_kwargs):
+    """
+    Reads a cataloged GL CSV with its detected encoding. Only if that fails with a decode
+    error are the remaining encodings tried, and the catalog is corrected to the one that worked.
+    Returns the DataFrame, or None if the file could not be read.
+    """
+    encodings = [entry['encoding']] + [enc for enc in GL_ENCODINGS if enc != entry['encoding']]
+    for encoding in encodings:
+        try:
+            df = pd.read_csv(entry['path'], encoding=encoding, **read_csv_kwargs)
+        except UnicodeDecodeError:
+            continue
+        except Exception as e:
+            print(f"Server Log ({log_label}): Error reading CSV file {entry['filename']} with {encoding}: {e}")
+            return None
+        if encoding != entry['encoding']:
+            print(f"Server Log ({log_label}): {entry['filename']} needed encoding {encoding} instead of cataloged {entry['encoding']}.")
+            with _catalog_lock:
+                entry['encoding'] = encoding
+        return df
+    return None
+
+
+def clear_gl_catalog_cache(branch_folder=None):
+    """Drops in-memory catalogs (all, or one branch) so the next lookup reloads them from disk."""
+    with _catalog_lock:
+        if branch_folder is None:
+            _catalogs.clear()
+        else:
+            _catalogs.pop(branch_folder, None)
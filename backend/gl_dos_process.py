@@ -1,15 +1,11 @@
 import os
-import csv
-from dbfread import DBF
+from backend.utils.dbf_stream import read_dbf_frames
+from backend.utils.number_formatting import format_amount_series
+from backend.utils.rolling_csv import RollingCsvWriter, MAX_FILE_SIZE_BYTES, WRITE_BATCH_ROWS
 from datetime import datetime, timedelta
 import pandas as pd
-import math
-from io import StringIO
 import re
 
-# Define the maximum file size in bytes (49.9 MB)
-MAX_FILE_SIZE_BYTES = 49.9 * 1024 * 1024
-
 # Define the fixed base output directory for General Ledger
 FIXED_BASE_OUTPUT_DIR = r"C:\xampp\htdocs\audit_tool\ACCOUTNING\GENERAL LEDGER"
 
@@ -55,28 +51,27 @@ def process_gl_dos_data_web(input_dir, branch):
         return formatted_accounts.apply(lambda x: f'="{x}"') # Always quote to force text
 
     all_dbf_dataframes = []
-    dbf_files_found = False
+    required = {'TRN', 'GLACC', 'DOCDATE', 'REF', 'AMT', 'DESC', 'BAL'}
 
     print(f"Server Log (GL DOS): Starting DBF file processing in: {input_dir} for branch '{branch}'")
 
-    for filename in os.listdir(input_dir):
-        if filename.lower().endswith('.dbf'):
-            dbf_files_found = True
-            dbf_path = os.path.join(input_dir, filename)
-            print(f"Server Log (GL DOS): Reading: {filename}")
-            try:
-                df_current_dbf = pd.DataFrame(list(DBF(dbf_path, encoding='latin-1', ignore_missing_memofile=True)))
-                df_current_dbf.columns = [col.upper() for col in df_current_dbf.columns]
-
-                required = {'TRN', 'GLACC', 'DOCDATE', 'REF', 'AMT', 'DESC', 'BAL'}
-                if not required.issubset(set(df_current_dbf.columns)):
-                    missing_headers = required.difference(set(df_current_dbf.columns))
-                    print(f"Server Log (GL DOS): Skipping {filename} (missing required headers: {missing_headers})")
-                    continue
-                
-                all_dbf_dataframes.append(df_current_dbf)
-            except Exception as e:
-                print(f"Server Log (GL DOS): Failed to read or process {filename}: {e}")
+    dbf_filenames = [filename for filename in os.listdir(input_dir) if filename.lower().endswith('.dbf')]
+    dbf_files_found = bool(dbf_filenames)
+    for filename in dbf_filenames:
+        print(f"Server Log (GL DOS): Reading: {filename}")
+
+    # The DBFs are streamed in parallel processes, keeping only the required columns of each record
+    dbf_results = read_dbf_frames([os.path.join(input_dir, filename) for filename in dbf_filenames],
+                                  encoding='latin-1', columns=required, log_label="GL DOS")
+    for filename, (df_current_dbf, error) in zip(dbf_filenames, dbf_results):
+        if df_current_dbf is None:
+            print(f"Server Log (GL DOS): Failed to read or process {filename}: {error}")
+            continue
+        if not required.issubset(set(df_current_dbf.columns)):
+            missing_headers = required.difference(set(df_current_dbf.columns))
+            print(f"Server Log (GL DOS): Skipping {filename} (missing required headers: {missing_headers})")
+            continue
+        all_dbf_dataframes.append(df_current_dbf)
 
     if not dbf_files_found:
         raise Exception("No DBF files found in the specified input directory for GL DOS processing.")
@@ -100,7 +95,6 @@ def process_gl_dos_data_web(input_dir, branch):
     df_combined = df_combined[target_headers]
 
     # --- File Saving and Appending Logic ---
-    current_data_start_row = 0
     
     print("Server Log (GL DOS): Starting CSV file saving and appending...")
 
@@ -127,160 +121,22 @@ def process_gl_dos_data_web(input_dir, branch):
                         latest_file_path = os.path.join(output_dir, fname)
         return latest_file_path, latest_date_to
 
-    # --- Main Loop for Splitting and Saving ---
-    while current_data_start_row < len(df_combined):
-        latest_file_path, latest_date_to = get_latest_existing_file_info(branch_output_dir, sanitized_branch)
-        
-        file_written_or_appended = False
-
-        # MODIFIED: Initialize estimated_bytes_per_row and header_size_bytes at the start of the loop
-        estimated_bytes_per_row = 100 # Default value
-        header_size_bytes = 0 # Default value
-
-        # Calculate header size once per function call, not per loop iteration
-        # MODIFIED: Ensure header_size_bytes is calculated only once
-        if header_size_bytes == 0:
-            temp_s_buf = StringIO()
-            pd.DataFrame(columns=target_headers).to_csv(temp_s_buf, index=False, quoting=csv.QUOTE_NONNUMERIC, encoding='utf-8-sig')
-            header_size_bytes = len(temp_s_buf.getvalue().encode('utf-8-sig'))
-
-
-        # Estimate average row size from a sample if data is not empty
-        if not df_combined.empty:
-            sample_df_for_size = df_combined.head(min(100, len(df_combined)))
-            s_buf_sample = StringIO()
-            sample_df_for_size.to_csv(s_buf_sample, index=False, quoting=csv.QUOTE_NONNUMERIC, encoding='utf-8-sig', header=False) # No header
-            if len(sample_df_for_size) > 0:
-                estimated_bytes_per_row = len(s_buf_sample.getvalue().encode('utf-8-sig')) / len(sample_df_for_size)
-            else:
-                estimated_bytes_per_row = 100 # Fallback if sample is empty
-        else:
-            estimated_bytes_per_row = 100 # Default if overall data is empty
-
-
-        if latest_file_path and os.path.exists(latest_file_path):
-            existing_file_size = os.path.getsize(latest_file_path)
-            
-            # Try to append as many rows as possible without exceeding MAX_FILE_SIZE_BYTES
-            rows_to_append = 0
-            
-            # Calculate how many rows can fit into the remaining space
-            remaining_space = MAX_FILE_SIZE_BYTES - existing_file_size
-            if remaining_space > 0 and estimated_bytes_per_row > 0:
-                max_rows_to_append = math.floor(remaining_space / estimated_bytes_per_row)
-                rows_to_append = min(max_rows_to_append, len(df_combined) - current_data_start_row)
-            
-            if rows_to_append > 0:
-                chunk_for_append = df_combined.iloc[current_data_start_row : current_data_start_row + rows_to_append]
-                
-                # Format the chunk for CSV output (without header)
-                chunk_for_csv_output = chunk_for_append.copy()
-                chunk_for_csv_output['AMT'] = chunk_for_csv_output['AMT'].apply(lambda x: f"{x:,.2f}")
-                chunk_for_csv_output['BAL'] = chunk_for_csv_output['BAL'].apply(lambda x: f"{x:,.2f}")
-                chunk_for_csv_output['DOCDATE'] = chunk_for_csv_output['DOCDATE'].dt.strftime('%m/%d/%Y').fillna('')
-
-                s_buf_append = StringIO()
-                chunk_for_csv_output.to_csv(s_buf_append, index=False, quoting=csv.QUOTE_NONNUMERIC, encoding='utf-8-sig', header=False) # No header
-                content_to_append = s_buf_append.getvalue()
-
-                # Double check size before writing
-                if existing_file_size + len(content_to_append.encode('utf-8-sig')) <= MAX_FILE_SIZE_BYTES:
-                    with open(latest_file_path, mode='a', newline='', encoding='utf-8-sig') as f:
-                        f.write(content_to_append)
-                    print(f"Server Log (GL DOS): Appended {rows_to_append} rows to: {latest_file_path} (New Size: {os.path.getsize(latest_file_path)/ (1024 * 1024):.2f} MB)")
-                    
-                    # After appending, re-read, deduplicate, and overwrite to update date range
-                    temp_df_for_dedup = pd.read_csv(latest_file_path, dtype=str, keep_default_na=False)
-                    deduplicated_df = temp_df_for_dedup.drop_duplicates(keep='first').reset_index(drop=True)
-
-                    deduplicated_df['DOCDATE'] = pd.to_datetime(deduplicated_df['DOCDATE'], errors='coerce', format='%m/%d/%Y')
-                    actual_min_date = deduplicated_df['DOCDATE'].min() if not deduplicated_df['DOCDATE'].dropna().empty else pd.NaT
-                    actual_max_date = deduplicated_df['DOCDATE'].max() if not deduplicated_df['DOCDATE'].dropna().empty else pd.NaT
-
-                    min_date_str = actual_min_date.strftime('%m-%d-%Y') if pd.notna(actual_min_date) else "UNKNOWN_START"
-                    max_date_str = actual_max_date.strftime('%m-%d-%Y') if pd.notna(actual_max_date) else "UNKNOWN_END"
-
-                    new_filename_for_updated_file = f"{sanitized_branch} - {min_date_str} TO {max_date_str}.csv"
-                    new_file_path_for_updated_file = os.path.join(branch_output_dir, new_filename_for_updated_file)
-
-                    s_buf_dedup = StringIO()
-                    deduplicated_df['DOCDATE'] = deduplicated_df['DOCDATE'].dt.strftime('%m/%d/%Y').fillna('')
-                    deduplicated_df.to_csv(s_buf_dedup, index=False, quoting=csv.QUOTE_NONNUMERIC, encoding='utf-8-sig')
-                    deduplicated_content = s_buf_dedup.getvalue()
-
-                    if latest_file_path != new_file_path_for_updated_file:
-                        os.remove(latest_file_path)
-                        print(f"Server Log (GL DOS): Renamed/Moved old file: {latest_file_path} to {new_file_path_for_updated_file}")
-                    
-                    with open(new_file_path_for_updated_file, mode='w', newline='', encoding='utf-8-sig') as f:
-                        f.write(deduplicated_content)
-                    print(f"Server Log (GL DOS): Overwrote/Updated file after deduplication: {new_file_path_for_updated_file} (Size: {os.path.getsize(new_file_path_for_updated_file)/ (1024 * 1024):.2f} MB)")
-                    
-                    current_data_start_row += rows_to_append
-                    file_written_or_appended = True
-                else:
-                    print(f"Server Log (GL DOS): Appending {rows_to_append} rows would exceed limit. Creating new file.")
-            else:
-                print(f"Server Log (GL DOS): No space to append to {latest_file_path}. Creating new file.")
-        
-        if not file_written_or_appended:
-            # If no appendable file was found, or the latest was full, create a new file.
-            # Calculate how many rows from the current data can fit into a new file (including header)
-            
-            # Estimate rows per chunk for a new file
-            if estimated_bytes_per_row > 0:
-                max_rows_for_new_file = math.floor((MAX_FILE_SIZE_BYTES - header_size_bytes) / estimated_bytes_per_row)
-                rows_for_new_file = min(max_rows_for_new_file, len(df_combined) - current_data_start_row)
-            else:
-                rows_for_new_file = len(df_combined) - current_data_start_row # If no estimate, take all remaining
-
-            if rows_for_new_file <= 0: # Ensure at least 1 row if there's data left
-                if len(df_combined) - current_data_start_row > 0:
-                    rows_for_new_file = 1
-                else:
-                    break # No more data to process
-
-            current_chunk_df = df_combined.iloc[current_data_start_row : current_data_start_row + rows_for_new_file].copy()
-
-            if current_chunk_df.empty:
-                break # No more data to process
-
-            # Ensure TRNDATE_DT column is datetime objects for min/max operations
-            if not pd.api.types.is_datetime64_any_dtype(current_chunk_df['DOCDATE']):
-                current_chunk_df['DOCDATE'] = pd.to_datetime(current_chunk_df['DOCDATE'], errors='coerce')
-
-
-            # Determine date range for the current chunk
-            valid_dates_in_chunk = current_chunk_df['DOCDATE'].dropna()
-
-            chunk_min_date_val = None
-            chunk_max_date_val = None
-
-            if not valid_dates_in_chunk.empty:
-                chunk_min_date_val = valid_dates_in_chunk.min()
-                chunk_max_date_val = valid_dates_in_chunk.max()
-            
-            min_date_str = chunk_min_date_val.strftime('%m-%d-%Y') if pd.notna(chunk_min_date_val) else "UNKNOWN_START"
-            max_date_str = chunk_max_date_val.strftime('%m-%d-%Y') if pd.notna(chunk_max_date_val) else "UNKNOWN_END"
-
-            new_output_filename = f"{sanitized_branch} - {min_date_str} TO {max_date_str}.csv"
-            new_output_file_path = os.path.join(branch_output_dir, new_output_filename)
-
-            # Format the current chunk for CSV output (with header)
-            chunk_for_csv_output = current_chunk_df.copy()
-            chunk_for_csv_output['AMT'] = chunk_for_csv_output['AMT'].apply(lambda x: f"{x:,.2f}")
-            chunk_for_csv_output['BAL'] = chunk_for_csv_output['BAL'].apply(lambda x: f"{x:,.2f}")
-            chunk_for_csv_output['DOCDATE'] = chunk_for_csv_output['DOCDATE'].dt.strftime('%m/%d/%Y').fillna('')
-
-            s_buf_new_file = StringIO()
-            chunk_for_csv_output.to_csv(s_buf_new_file, index=False, quoting=csv.QUOTE_NONNUMERIC, encoding='utf-8-sig')
-            content_for_new_file = s_buf_new_file.getvalue()
-
-            with open(new_output_file_path, mode='w', newline='', encoding='utf-8-sig') as f:
-                f.write(content_for_new_file)
-            print(f"Server Log (GL DOS): ✅ Saved new file: {new_output_file_path} (Size: {os.path.getsize(new_output_file_path)/ (1024 * 1024):.2f} MB)")
-            
-            current_data_start_row += rows_for_new_file
+    # --- Stream the rows into files of at most MAX_FILE_SIZE_BYTES, named by their DOCDATE range ---
+    # New data continues the file with the latest 'date to' while it has room (rows it already
+    # holds are not written again), then rolls over to new files exactly at the size limit.
+    latest_file_path, latest_date_to = get_latest_existing_file_info(branch_output_dir, sanitized_branch)
+    with RollingCsvWriter(branch_output_dir, sanitized_branch, target_headers, MAX_FILE_SIZE_BYTES, log_label="GL DOS") as writer:
+        if latest_file_path and os.path.getsize(latest_file_path) < MAX_FILE_SIZE_BYTES:
+            writer.resume(latest_file_path, 'DOCDATE')
+        elif latest_file_path:
+            print(f"Server Log (GL DOS): No space to append to {latest_file_path}. Creating new file.")
+        for start in range(0, len(df_combined), WRITE_BATCH_ROWS):
+            batch = df_combined.iloc[start:start + WRITE_BATCH_ROWS]
+            formatted = batch.copy()
+            formatted['AMT'] = format_amount_series(batch['AMT'])
+            formatted['BAL'] = format_amount_series(batch['BAL'])
+            formatted['DOCDATE'] = batch['DOCDATE'].dt.strftime('%m/%d/%Y').fillna('')
+            writer.write(formatted, batch['DOCDATE'])
 
     print(f"\nServer Log (GL DOS): Processing complete! Output saved to {branch_output_dir}")
     return {"message": f"GL DOS processing completed. Output saved to {branch_output_dir}", "output_path": branch_output_dir}
@@ -0,0 +1,294 @@
+# audit_tool/backend/gl_engine.py
+# Shared GL loader for the GL, Reference and Description reports: typed rows of a branch's file set,
+# sorted once and kept in a memory-bounded LRU, sliced per request with DR/CR derived on the slice.
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+from backend.gl_catalog import ACCOUNTING_BASE_DIR, sanitize_gl_branch_folder, get_gl_files_for_range
+from backend.gl_parquet_store import load_gl_files, load_gl_range, load_gl_rows_by_id, SOURCE_FILE_COLUMN
+from backend.gl_text_index import find_gl_text_matches, select_matched_rows
+
+# Upper bound on the typed frames kept in memory across all branches
+GL_ENGINE_MAX_BYTES = 512 * 1024 * 1024
+
+_frame_cache = OrderedDict() # (branch folder, file set fingerprint) -> (sorted frame, resident bytes)
+_engine_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'resident_bytes': 0}
+_engine_lock = threading.Lock()
+
+
+def _file_set_fingerprint(gl_files):
+    return tuple((gl_file['filename'], gl_file['size'], gl_file['mtime']) for gl_file in gl_files)
+
+
+def _build_sorted_frame(branch_folder, gl_files, log_label):
+    """Loads every row of the file set and orders it the way the reports do: DOCDATE, then numeric TRN."""
+    frame = load_gl_files(branch_folder, gl_files, log_label=log_label)
+    frame['TRN_NUM_SORT'] = pd.to_numeric(frame['TRN'], errors='coerce').fillna(0)
+    # Stable, so rows sharing a date and TRN keep their file order and any date slice matches a fresh sort
+    frame.sort_values(by=['DOCDATE_DT', 'TRN_NUM_SORT'], kind='mergesort', inplace=True)
+    return frame.reset_index(drop=True)
+
+
+def _store_frame(key, frame):
+    """Adds a frame to the LRU, dropping outdated versions of its files and evicting the least recently used entries."""
+    resident_bytes = int(frame.memory_usage(deep=True).sum())
+    if resident_bytes > GL_ENGINE_MAX_BYTES:
+        print(f"Server Log (GL Engine): {key[0]} file set needs {resident_bytes} bytes, above the {GL_ENGINE_MAX_BYTES} byte budget; not cached.")
+        return
+
+    branch_folder, fingerprint = key
+    current_versions = {filename: (size, mtime) for filename, size, mtime in fingerprint}
+    with _engine_lock:
+        for cached_key in list(_frame_cache):
+            if cached_key == key:
+                continue
+            if cached_key[0] == branch_folder and any(
+                    filename in current_versions and current_versions[filename] != (size, mtime)
+                    for filename, size, mtime in cached_key[1]):
+                _engine_stats['resident_bytes'] -= _frame_cache.pop(cached_key)[1]
+
+        if key in _frame_cache:
+            _engine_stats['resident_bytes'] -= _frame_cache.pop(key)[1]
+        _frame_cache[key] = (frame, resident_bytes)
+        _engine_stats['resident_bytes'] += resident_bytes
+
+        while _engine_stats['resident_bytes'] > GL_ENGINE_MAX_BYTES and len(_frame_cache) > 1:
+            evicted_key, (_, evicted_bytes) = _frame_cache.popitem(last=False)
+            _engine_stats['resident_bytes'] -= evicted_bytes
+            _engine_stats['evictions'] += 1
+            print(f"Server Log (GL Engine): Evicted {evicted_key[0]} file set ({len(evicted_key[1])} files, {evicted_bytes} bytes).")
+
+
+def _get_cached_frame(branch_folder, gl_files):
+    """Returns the cached sorted frame of a file set (counted as a hit), or None without loading it."""
+    key = (branch_folder, _file_set_fingerprint(gl_files))
+    with _engine_lock:
+        cached = _frame_cache.get(key)
+        if cached is None:
+            return None
+        _frame_cache.move_to_end(key)
+        _engine_stats['hits'] += 1
+        return cached[0]
+
+
+def _get_sorted_frame(branch_folder, gl_files, log_label):
+    cached = _get_cached_frame(branch_folder, gl_files)
+    if cached is not None:
+        return cached
+    key = (branch_folder, _file_set_fingerprint(gl_files))
+    with _engine_lock:
+        _engine_stats['misses'] += 1
+
+    frame = _build_sorted_frame(branch_folder, gl_files, log_label)
+    print(f"Server Log (GL Engine): Loaded {len(frame)} rows from {len(gl_files)} files for {branch_folder}.")
+    _store_frame(key, frame)
+    return frame
+
+
+def _derive_dr_cr(df, previous_balance=None):
+    """
+    DR/CR from the change in running balance; the first row falls back to the sign of its balance.
+    previous_balance (aligned with df, NaN for none) is the balance of the row before each row in
+    the full report order, for selections that are not consecutive rows.
+    """
+    if previous_balance is None:
+        df['BALANCE_CHANGE'] = df['BAL_NUM'].diff()
+    else:
+        df['BALANCE_CHANGE'] = df['BAL_NUM'].to_numpy() - np.asarray(previous_balance, dtype=np.float64)
+
+    df['DR_VAL'] = 0.0
+    df['CR_VAL'] = 0.0
+
+    df.loc[df['BALANCE_CHANGE'] > 0, 'DR_VAL'] = df['AMT_NUM'].abs()
+    df.loc[df['BALANCE_CHANGE'] < 0, 'CR_VAL'] = df['AMT_NUM'].abs()
+
+    # Handle the very first row
+    if not df.empty:
+        first_row_index = df.index[0]
+        if pd.isna(df.loc[first_row_index, 'BALANCE_CHANGE']):
+            initial_bal = df.loc[first_row_index, 'BAL_NUM']
+            initial_amt = df.loc[first_row_index, 'AMT_NUM']
+            if initial_bal > 0:
+                df.loc[first_row_index, 'DR_VAL'] = initial_amt
+            elif initial_bal < 0:
+                df.loc[first_row_index, 'CR_VAL'] = initial_amt
+    return df
+
+
+def _resolve_gl_request(branch, from_date_str, to_date_str, log_label):
+    """Returns (branch folder, from date, to date, GL files overlapping the range), or None if the input is invalid."""
+    branch_folder = sanitize_gl_branch_folder(branch)
+    if not branch_folder:
+        print(f"Server Log ({log_label}): Invalid branch name provided.")
+        return None
+
+    branch_folder_path = os.path.join(ACCOUNTING_BASE_DIR, branch_folder)
+    print(f"Server Log ({log_label}): Loading GL data for branch: {branch_folder_path}")
+    print(f"Server Log ({log_label}): Date Range: {from_date_str} to {to_date_str}")
+
+    try:
+        from_date = datetime.strptime(from_date_str, '%m/%d/%Y')
+        to_date = datetime.strptime(to_date_str, '%m/%d/%Y')
+    except ValueError as e:
+        print(f"Server Log ({log_label}): Invalid date format received from frontend: {e}")
+        return None
+
+    gl_files = get_gl_files_for_range(branch_folder, from_date, to_date)
+    if gl_files is None:
+        print(f"Server Log ({log_label}): Branch folder not found: {branch_folder_path}")
+        return None
+    return branch_folder, from_date, to_date, gl_files
+
+
+def _date_slice_bounds(frame, from_date, to_date):
+    dates = frame['DOCDATE_DT'].to_numpy()
+    return np.searchsorted(dates, np.datetime64(from_date), side='left'), np.searchsorted(dates, np.datetime64(to_date), side='right')
+
+
+def load_base_gl_data(branch, from_date_str, to_date_str, log_label="Base GL Data"):
+    """
+    Loads base GL data for a branch and date range: typed rows (see GL_TYPED_COLUMNS) of
+    every GL file overlapping the range, sorted by DOCDATE then numeric TRN, limited to the
+    range, with BALANCE_CHANGE and DR_VAL/CR_VAL derived from the running balance.
+
+    The sorted rows of each branch file set are cached (LRU, bounded by GL_ENGINE_MAX_BYTES),
+    so repeated and overlapping report windows over the same files only slice and derive DR/CR.
+
+    Args:
+        branch (str): Branch name as sent by the frontend.
+        from_date_str (str): Inclusive start date, MM/DD/YYYY.
+        to_date_str (str): Inclusive end date, MM/DD/YYYY.
+        log_label (str): Prefix used in server log lines.
+
+    Returns:
+        pd.DataFrame: A copy the caller may modify; empty if the input was invalid or nothing matched.
+    """
+    resolved = _resolve_gl_request(branch, from_date_str, to_date_str, log_label)
+    if resolved is None:
+        return pd.DataFrame()
+    branch_folder, from_date, to_date, gl_files = resolved
+
+    frame = _get_sorted_frame(branch_folder, gl_files, log_label) if gl_files else pd.DataFrame()
+    if frame.empty:
+        print(f"Server Log ({log_label}): No relevant GL data found across all files for the specified criteria.")
+        return pd.DataFrame()
+
+    start, stop = _date_slice_bounds(frame, from_date, to_date)
+    if start >= stop:
+        print(f"Server Log ({log_label}): No relevant GL data found across all files for the specified criteria.")
+        return pd.DataFrame()
+
+    return _derive_dr_cr(frame.iloc[start:stop].copy())
+
+
+def load_gl_text_matches(branch, from_date_str, to_date_str, field, lookup, match_type, log_label="Base GL Data"):
+    """
+    The rows of load_base_gl_data whose REF or DESC matches the lookup (see find_gl_text_matches),
+    with the same columns, order and DR/CR, loaded without reading the other rows' data.
+
+    The text index gives the matching row ids first. If the file set is cached, the matches are
+    picked from it. Otherwise only the ordering keys (DOCDATE, TRN, row id) of the range are read
+    to place the matches in report order, then only the matched rows and the row before each one
+    (whose balance DR/CR is derived from) are loaded.
+
+    Returns:
+        pd.DataFrame or None: The matching rows (empty if none or the input was invalid); None if
+        the index could not be used, in which case the caller filters load_base_gl_data itself.
+    """
+    resolved = _resolve_gl_request(branch, from_date_str, to_date_str, log_label)
+    if resolved is None:
+        return pd.DataFrame()
+    branch_folder, from_date, to_date, gl_files = resolved
+
+    matches = find_gl_text_matches(branch_folder, from_date, to_date, field, lookup, match_type)
+    if matches is None:
+        return None
+    if not matches or not gl_files:
+        return pd.DataFrame()
+
+    frame = _get_cached_frame(branch_folder, gl_files)
+    if frame is not None:
+        start, stop = _date_slice_bounds(frame, from_date, to_date)
+        range_frame = frame.iloc[start:stop]
+        positions = np.flatnonzero(select_matched_rows(range_frame, matches))
+        if len(positions) == 0:
+            return pd.DataFrame()
+        previous_balance = np.where(positions > 0, range_frame['BAL_NUM'].to_numpy()[positions - 1], np.nan)
+        return _derive_dr_cr(range_frame.iloc[positions].copy(), previous_balance)
+
+    # Report order of the range from its ordering keys alone: DOCDATE, numeric TRN, then file and
+    # row order, which is the order the stable sort of _build_sorted_frame leaves ties in
+    keys = load_gl_range(branch_folder, from_date, to_date, columns=['DOCDATE_DT', 'TRN', 'SOURCE_ROW', SOURCE_FILE_COLUMN], log_label=log_label)
+    if keys is None or keys.empty:
+        return pd.DataFrame()
+    file_order = {gl_file['filename']: position for position, gl_file in enumerate(gl_files)}
+    keys['TRN_NUM_SORT'] = pd.to_numeric(keys['TRN'], errors='coerce').fillna(0)
+    keys['FILE_ORDER'] = keys[SOURCE_FILE_COLUMN].astype(str).map(file_order)
+    keys.sort_values(by=['DOCDATE_DT', 'TRN_NUM_SORT', 'FILE_ORDER', 'SOURCE_ROW'], kind='mergesort', inplace=True)
+    keys.reset_index(drop=True, inplace=True)
+
+    positions = np.flatnonzero(select_matched_rows(keys, matches))
+    if len(positions) == 0:
+        return pd.DataFrame()
+    needed_positions = np.union1d(positions, positions[positions > 0] - 1)
+    needed = keys.iloc[needed_positions]
+    source_rows = {filename: rows['SOURCE_ROW'].to_numpy() for filename, rows in needed.groupby(needed[SOURCE_FILE_COLUMN].astype(str), sort=False)}
+
+    rows = load_gl_rows_by_id(branch_folder, gl_files, source_rows, log_label=log_label)
+    rows['POSITION'] = pd.MultiIndex.from_frame(keys[[SOURCE_FILE_COLUMN, 'SOURCE_ROW']].astype({SOURCE_FILE_COLUMN: str})).get_indexer(
+        pd.MultiIndex.from_frame(rows[[SOURCE_FILE_COLUMN, 'SOURCE_ROW']].astype({SOURCE_FILE_COLUMN: str})))
+    rows = rows.set_index('POSITION')
+    previous_balance = rows['BAL_NUM'].reindex(positions - 1).to_numpy(dtype=np.float64)
+
+    matched = rows.loc[positions].reset_index(drop=True)
+    matched['TRN_NUM_SORT'] = keys['TRN_NUM_SORT'].to_numpy()[positions]
+    print(f"Server Log ({log_label}): Loaded {len(matched)} matching rows of {len(keys)} in range through the GL text index.")
+    return _derive_dr_cr(matched, previous_balance)
+
+
+def get_gl_engine_stats():
+    """Returns cache counters (hits, misses, evictions), resident bytes against the budget and the cached file sets."""
+    with _engine_lock:
+        lookups = _engine_stats['hits'] + _engine_stats['misses']
+        return {
+            **_engine_stats,
+            'hit_rate': round(_engine_stats['hits'] / lookups, 4) if lookups else None,
+            'max_bytes': GL_ENGINE_MAX_BYTES,
+            'entries': [
+                {'branch': branch_folder, 'files': len(fingerprint), 'rows': len(frame), 'bytes': resident_bytes}
+                for (branch_folder, fingerprint), (frame, resident_bytes) in _frame_cache.items()
+            ],
+        }
+
+
+def clear_gl_engine_cache(branch_folder=None):
+    """Drops cached frames (all, or one branch); the counters are kept."""
+    with _engine_lock:
+        for key in [key for key in _frame_cache if branch_folder is None or key[0] == branch_folder]:
+            _engine_stats['resident_bytes'] -= _frame_cache.pop(key)[1]
+
+
+def summarize_gl_rows(df, format_amount):
+    """
+    Totals of a selection of base GL rows, for report footers fetched apart from the rows:
+    row count, DR/CR totals and the balance after the last row, each also as formatted text.
+    """
+    if df.empty:
+        return {'row_count': 0, 'total_dr': 0.0, 'total_cr': 0.0, 'ending_balance': None,
+                'total_dr_formatted': '', 'total_cr_formatted': '', 'ending_balance_formatted': ''}
+    total_dr = float(df['DR_VAL'].sum())
+    total_cr = float(df['CR_VAL'].sum())
+    ending_balance = float(df['BAL_NUM'].iloc[-1])
+    return {
+        'row_count': int(len(df)),
+        'total_dr': total_dr,
+        'total_cr': total_cr,
+        'ending_balance': ending_balance,
+        'total_dr_formatted': format_amount(total_dr),
+        'total_cr_formatted': format_amount(total_cr),
+        'ending_balance_formatted': format_amount(ending_balance),
+    }
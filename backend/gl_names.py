@@ -0,0 +1,205 @@
+# audit_tool/backend/gl_names.py
+# Per-branch GL chart of accounts (code -> name) kept in memory until its source file changes,
+# with constant-time name lookup and prefix search for the GL name datalist, plus the reader for
+# the branch GL Name files (ACCOUNTING/GENERAL LEDGER/GL NAME) the Reference and Description reports use.
+import os
+import re
+import threading
+from bisect import bisect_left
+from datetime import datetime
+import pandas as pd
+
+TB_FILE_DATE_PATTERN = re.compile(r'(\d{2}-\d{2}-\d{4})')
+# Sorts after any character, so [prefix, prefix + PREFIX_SEARCH_END) spans every key starting with prefix
+PREFIX_SEARCH_END = '\U0010ffff'
+GL_NAME_FILE_EXTENSIONS = ['.xlsx', '.xls', '.csv'] # Tried in this order
+
+_charts = {} # cache key -> (source fingerprint, chart dict)
+_latest_tb_files = {} # folder path -> (folder mtime, latest dated CSV path or None)
+_names_lock = threading.Lock()
+
+
+def find_latest_dated_csv(folder_path, log_label="GL Names"):
+    """
+    Returns the path of the CSV in folder_path whose MM-DD-YYYY filename date is the latest,
+    or None if there is none. The folder is only listed again when its mtime changes, i.e.
+    when a file was added, removed or renamed.
+    """
+    try:
+        folder_mtime = os.stat(folder_path).st_mtime
+    except OSError:
+        return None
+    with _names_lock:
+        cached = _latest_tb_files.get(folder_path)
+    if cached is not None and cached[0] == folder_mtime:
+        return cached[1]
+
+    latest_file = None
+    latest_date = None
+    for filename in os.listdir(folder_path):
+        if not filename.lower().endswith('.csv'):
+            continue
+        match = TB_FILE_DATE_PATTERN.search(filename)
+        if not match:
+            continue
+        try:
+            file_date = datetime.strptime(match.group(1), '%m-%d-%Y')
+        except ValueError:
+            print(f"Server Log ({log_label}): Could not parse date from filename: {filename}")
+            continue
+        if latest_date is None or file_date > latest_date:
+            latest_date = file_date
+            latest_file = os.path.join(folder_path, filename)
+
+    with _names_lock:
+        _latest_tb_files[folder_path] = (folder_mtime, latest_file)
+    return latest_file
+
+
+def read_gl_name_file_entries(folder_path, branch_name, expected_filename_prefix, log_label="GL Names"):
+    """
+    Reads the first usable GL Name file in folder_path (.xlsx, .xls, then .csv) named
+    expected_filename_prefix and returns its entries as dicts with 'TITLE' and 'GLACC'
+    (cleaned, no hyphens). Shared by the Reference and Description reports.
+    """
+    gl_name_entries = []
+    file_found_and_processed = False
+    
+    encodings_to_try = ['utf-8', 'latin1', 'cp1252', 'iso-8859-1', 'utf-8-sig']
+
+    for ext in GL_NAME_FILE_EXTENSIONS:
+        filename = f"{expected_filename_prefix}{ext}"
+        file_path = os.path.join(folder_path, filename)
+        
+        if os.path.exists(file_path):
+            df = None
+            read_success = False
+
+            if ext in ['.xlsx', '.xls']:
+                try:
+                    df = pd.read_excel(file_path, dtype={'GLACC': str}) # Read GLACC as string
+                    read_success = True
+                except Exception as e:
+                    print(f"Server Log ({log_label}): Error reading Excel GL Name file {filename}: {e}")
+            elif ext == '.csv':
+                for encoding in encodings_to_try:
+                    try:
+                        df = pd.read_csv(file_path, encoding=encoding, dtype={'GLACC': str}) # Read GLACC as string
+                        read_success = True
+                        break
+                    except UnicodeDecodeError:
+                        pass # Try next encoding
+                    except Exception as e:
+                        print(f"Server Log ({log_label}): Error reading CSV GL Name file {filename} with {encoding}: {e}")
+            
+            if read_success and df is not None:
+                file_found_and_processed = True
+
+                df.columns = [col.strip().upper() for col in df.columns]
+
+                required_cols = ['TITLE', 'GLACC']
+                if all(col in df.columns for col in required_cols):
+                    for title, gl_acc in zip(df['TITLE'], df['GLACC']):
+                        title = str(title).strip() if pd.notna(title) else ''
+                        gl_acc = str(gl_acc).strip() if pd.notna(gl_acc) else ''
+                        
+                        # Further cleaning for gl_acc: remove .0 if it's a float representation of an integer
+                        if gl_acc.endswith('.0') and gl_acc[:-2].isdigit():
+                            gl_acc = gl_acc[:-2]
+                        
+                        # Remove hyphens for lookup key
+                        gl_acc_lookup = gl_acc.replace('-', '')
+
+                        if title and gl_acc_lookup:
+                            gl_name_entries.append({'TITLE': title, 'GLACC': gl_acc_lookup})
+                    if gl_name_entries:
+                        break # Stop after finding and processing the first valid file
+                else:
+                    print(f"Server Log ({log_label}): Found {filename}, but missing 'TITLE' or 'GLACC' columns. Available columns: {df.columns.tolist()}")
+            else:
+                print(f"Server Log ({log_label}): Could not read GL Name file: {filename} with any tried encoding or format.")
+    
+    if file_found_and_processed and not gl_name_entries:
+        print(f"Server Log ({log_label}): No GL name data extracted from the found file(s) for branch '{branch_name}'. This might mean the file was empty or rows had no valid TITLE/GLACC.")
+
+    return gl_name_entries
+
+
+def build_gl_chart(entries, code_field, formatted_field=None):
+    """
+    Indexes GL name entries (dicts with 'TITLE' and a code field). Later entries win on
+    duplicate codes, as the dict-building loops they replace did.
+
+    Returns:
+        dict: 'entries' (the list as given), 'names' (hyphen-free code -> TITLE),
+              'names_by_formatted' (formatted code -> TITLE, when formatted_field is given),
+              plus the sorted keys used by search_gl_chart.
+    """
+    names = {}
+    names_by_formatted = {}
+    search_pairs = []
+    for position, entry in enumerate(entries):
+        code = str(entry[code_field]).replace('-', '')
+        names[code] = entry['TITLE']
+        keys = {code.upper(), entry['TITLE'].upper()}
+        if formatted_field:
+            names_by_formatted[entry[formatted_field]] = entry['TITLE']
+            keys.add(str(entry[formatted_field]).upper())
+        search_pairs.extend((key, position) for key in keys)
+    search_pairs.sort()
+    return {
+        'entries': entries,
+        'names': names,
+        'names_by_formatted': names_by_formatted,
+        'search_keys': [key for key, _ in search_pairs],
+        'search_positions': [position for _, position in search_pairs],
+    }
+
+
+def get_gl_chart(cache_key, source_paths, load_entries, code_field, formatted_field=None, log_label="GL Names"):
+    """
+    Returns the cached chart for cache_key, calling load_entries() and rebuilding it only
+    when the existing files among source_paths (or their mtimes) differ from the cached ones.
+    Returns None when none of the source files exist.
+    """
+    fingerprint = []
+    for source_path in source_paths:
+        try:
+            fingerprint.append((source_path, os.stat(source_path).st_mtime))
+        except OSError:
+            continue
+    if not fingerprint:
+        return None
+    fingerprint = tuple(fingerprint)
+
+    with _names_lock:
+        cached = _charts.get(cache_key)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    chart = build_gl_chart(load_entries(), code_field, formatted_field)
+    print(f"Server Log ({log_label}): Cached {len(chart['entries'])} GL names for {cache_key[-1]} from {', '.join(os.path.basename(path) for path, _ in fingerprint)}.")
+    with _names_lock:
+        _charts[cache_key] = (fingerprint, chart)
+    return chart
+
+
+def search_gl_chart(chart, prefix, limit=50):
+    """
+    Returns up to `limit` entries whose code (with or without hyphens) or name starts with
+    prefix, case-insensitively, in chart order. An empty prefix returns the first entries.
+    """
+    prefix = (prefix or '').strip().upper()
+    if not prefix:
+        return chart['entries'][:limit]
+    start = bisect_left(chart['search_keys'], prefix)
+    stop = bisect_left(chart['search_keys'], prefix + PREFIX_SEARCH_END, lo=start)
+    positions = sorted(set(chart['search_positions'][start:stop]))
+    return [chart['entries'][position] for position in positions[:limit]]
+
+
+def clear_gl_names_cache():
+    """Drops every cached chart and TB folder listing."""
+    with _names_lock:
+        _charts.clear()
+        _latest_tb_files.clear()
@@ -0,0 +1,347 @@
+# audit_tool/backend/gl_parquet_store.py
+# Columnar Parquet copy of the General Ledger CSVs, partitioned by year/month, so GL reports
+# stop re-parsing the source exports on every request.
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+
+from backend.gl_catalog import GL_CACHE_DIR, get_gl_catalog, get_gl_files_for_range, read_gl_csv
+from backend.utils.date_parsing import parse_date_series
+
+try:
+    import pyarrow # noqa: F401 - only needed by pandas' Parquet engine
+    PARQUET_AVAILABLE = True
+except ImportError:
+    print("Warning: pyarrow is not installed. GL reports will read the General Ledger CSVs directly.")
+    PARQUET_AVAILABLE = False
+
+GL_PARQUET_DIR = os.path.join(GL_CACHE_DIR, "parquet")
+# Bump when the stored columns or their types change so existing fragments are rebuilt
+GL_PARQUET_VERSION = 2
+MANIFEST_FILENAME = "_manifest.json"
+
+GL_REQUIRED_COLUMNS = ['DOCDATE', 'TRN', 'DESC', 'REF', 'AMT', 'BAL', 'GLACC']
+# Typed columns kept for the reports; the raw DOCDATE/AMT/BAL strings are not stored.
+# SOURCE_ROW is the row's position in its typed source file, the row id used by the GL text index.
+GL_TYPED_COLUMNS = ['DOCDATE_DT', 'TRN', 'DESC', 'REF', 'GLACC', 'GLACC_CLEAN', 'AMT_NUM', 'BAL_NUM', 'SOURCE_ROW']
+# Not stored: load_gl_range fills it with each row's source filename (categorical) when requested
+SOURCE_FILE_COLUMN = 'SOURCE_FILE'
+
+_branch_locks = {}
+_branch_locks_guard = threading.Lock()
+
+
+def _get_branch_lock(branch_folder):
+    with _branch_locks_guard:
+        return _branch_locks.setdefault(branch_folder, threading.Lock())
+
+
+def _to_number(series):
+    """Strips thousands separators and converts to float, with unparseable values as 0."""
+    return pd.to_numeric(series.astype(str).str.replace(',', '', regex=False), errors='coerce').fillna(0)
+
+
+def type_gl_frame(df, filename, log_label="GL Store"):
+    """
+    Normalizes one GL CSV read with dtype={'GLACC': str} into GL_TYPED_COLUMNS: parsed
+    DOCDATE_DT (rows without a date dropped), numeric AMT_NUM/BAL_NUM, a hyphen-free
+    GLACC_CLEAN and SOURCE_ROW. Returns None if required columns are missing.
+    """
+    df.columns = [col.strip().upper() for col in df.columns]
+    if not all(col in df.columns for col in GL_REQUIRED_COLUMNS):
+        print(f"Server Log ({log_label}): Skipping {filename}: Missing one or more required columns ({', '.join(GL_REQUIRED_COLUMNS)}).")
+        return None
+
+    typed = pd.DataFrame({
+        'DOCDATE_DT': parse_date_series(df['DOCDATE'], family='gl_csv.DOCDATE'),
+        'TRN': df['TRN'].astype(str),
+        'DESC': df['DESC'].astype(str),
+        'REF': df['REF'].astype(str),
+        'GLACC': df['GLACC'].astype(str),
+        'AMT_NUM': _to_number(df['AMT']),
+        'BAL_NUM': _to_number(df['BAL']),
+    })
+    typed['GLACC_CLEAN'] = typed['GLACC'].str.replace('-', '', regex=False).str.strip()
+    typed = typed.dropna(subset=['DOCDATE_DT']).reset_index(drop=True)
+    typed['SOURCE_ROW'] = np.arange(len(typed), dtype='int64')
+    return typed[GL_TYPED_COLUMNS]
+
+
+def _month_keys(from_date, to_date):
+    """Lists (year, month) pairs covering [from_date, to_date]."""
+    keys = []
+    year, month = from_date.year, from_date.month
+    while (year, month) <= (to_date.year, to_date.month):
+        keys.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return keys
+
+
+def _partition_dir(branch_dir, year, month):
+    return os.path.join(branch_dir, f"year={year}", f"month={month:02d}")
+
+
+def _fragment_name(filename):
+    """Stable per-source fragment name, so a rebuilt source file replaces its own fragments only."""
+    return hashlib.md5(filename.encode('utf-8')).hexdigest()[:16] + ".parquet"
+
+
+def _load_manifest(branch_dir):
+    manifest_path = os.path.join(branch_dir, MANIFEST_FILENAME)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'version': GL_PARQUET_VERSION, 'sources': {}}
+    if manifest.get('version') != GL_PARQUET_VERSION:
+        return {'version': GL_PARQUET_VERSION, 'sources': {}, 'stale_sources': manifest.get('sources', {})}
+    return manifest
+
+
+def _save_manifest(branch_dir, manifest):
+    manifest_path = os.path.join(branch_dir, MANIFEST_FILENAME)
+    temp_path = f"{manifest_path}.tmp"
+    manifest.pop('stale_sources', None)
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(temp_path, manifest_path)
+
+
+def _remove_source_fragments(branch_dir, filename, partitions):
+    fragment = _fragment_name(filename)
+    for year, month in partitions:
+        fragment_path = os.path.join(_partition_dir(branch_dir, year, month), fragment)
+        if os.path.exists(fragment_path):
+            os.remove(fragment_path)
+
+
+def _build_source_fragments(branch_dir, gl_file):
+    """Converts one source CSV into per-month Parquet fragments. Returns the partitions written, or None on failure."""
+    df = read_gl_csv(gl_file, log_label="GL Store", dtype={'GLACC': str})
+    if df is None:
+        print(f"Server Log (GL Store): Could not read file: {gl_file['filename']}")
+        return None
+    typed = type_gl_frame(df, gl_file['filename'])
+    if typed is None:
+        return None
+
+    partitions = []
+    fragment = _fragment_name(gl_file['filename'])
+    for (year, month), part in typed.groupby([typed['DOCDATE_DT'].dt.year, typed['DOCDATE_DT'].dt.month], sort=True):
+        partition_dir = _partition_dir(branch_dir, int(year), int(month))
+        os.makedirs(partition_dir, exist_ok=True)
+        part.to_parquet(os.path.join(partition_dir, fragment), index=False)
+        partitions.append([int(year), int(month)])
+    print(f"Server Log (GL Store): Converted {gl_file['filename']} ({len(typed)} rows) into {len(partitions)} monthly partitions.")
+    return partitions
+
+
+def _sync_branch_store(branch_folder, gl_files):
+    """
+    Makes sure every requested source file has up-to-date fragments (matching size/mtime),
+    and drops fragments of sources that left the catalog. Returns the manifest.
+    """
+    branch_dir = os.path.join(GL_PARQUET_DIR, branch_folder)
+    os.makedirs(branch_dir, exist_ok=True)
+    manifest = _load_manifest(branch_dir)
+    changed = False
+
+    for filename, source in manifest.pop('stale_sources', {}).items():
+        _remove_source_fragments(branch_dir, filename, source.get('partitions', []))
+        changed = True
+
+    catalog = get_gl_catalog(branch_folder)
+    cataloged_files = catalog['files'] if catalog else {}
+    for filename in list(manifest['sources']):
+        if filename not in cataloged_files:
+            _remove_source_fragments(branch_dir, filename, manifest['sources'].pop(filename)['partitions'])
+            changed = True
+
+    for gl_file in gl_files:
+        source = manifest['sources'].get(gl_file['filename'])
+        if source and source['size'] == gl_file['size'] and source['mtime'] == gl_file['mtime']:
+            continue
+        if source:
+            _remove_source_fragments(branch_dir, gl_file['filename'], source['partitions'])
+            manifest['sources'].pop(gl_file['filename'])
+        partitions = _build_source_fragments(branch_dir, gl_file)
+        if partitions is not None:
+            manifest['sources'][gl_file['filename']] = {
+                'size': gl_file['size'],
+                'mtime': gl_file['mtime'],
+                'partitions': partitions,
+            }
+        changed = True
+
+    if changed:
+        _save_manifest(branch_dir, manifest)
+    return manifest
+
+
+def _read_from_parquet(branch_folder, gl_files, from_date, to_date, columns, glacc, source_rows=None):
+    branch_dir = os.path.join(GL_PARQUET_DIR, branch_folder)
+    with _get_branch_lock(branch_folder):
+        manifest = _sync_branch_store(branch_folder, gl_files)
+
+    # No window means every partition of the given files
+    wanted_months = set(_month_keys(from_date, to_date)) if from_date is not None else None
+    filters = []
+    if from_date is not None:
+        filters += [('DOCDATE_DT', '>=', pd.Timestamp(from_date)), ('DOCDATE_DT', '<=', pd.Timestamp(to_date))]
+    if glacc is not None:
+        filters.append(('GLACC_CLEAN', '==', glacc))
+
+    frames = []
+    for gl_file in gl_files:
+        source = manifest['sources'].get(gl_file['filename'])
+        if not source:
+            continue
+        file_filters = filters
+        if source_rows is not None:
+            if gl_file['filename'] not in source_rows:
+                continue
+            file_filters = filters + [('SOURCE_ROW', 'in', np.asarray(source_rows[gl_file['filename']]).tolist())]
+        fragment = _fragment_name(gl_file['filename'])
+        for year, month in source['partitions']:
+            if wanted_months is not None and (year, month) not in wanted_months:
+                continue
+            fragment_path = os.path.join(_partition_dir(branch_dir, year, month), fragment)
+            frames.append((gl_file['filename'], pd.read_parquet(fragment_path, columns=columns, filters=file_filters or None)))
+    return frames
+
+
+def _read_from_csv(gl_files, from_date, to_date, columns, glacc, log_label, source_rows=None):
+    frames = []
+    for gl_file in gl_files:
+        if source_rows is not None and gl_file['filename'] not in source_rows:
+            continue
+        typed = _read_typed_csv(gl_file, log_label)
+        if typed is None:
+            continue
+        mask = pd.Series(True, index=typed.index)
+        if from_date is not None:
+            mask &= (typed['DOCDATE_DT'] >= from_date) & (typed['DOCDATE_DT'] <= to_date)
+        if glacc is not None:
+            mask &= typed['GLACC_CLEAN'] == glacc
+        if source_rows is not None:
+            mask &= typed['SOURCE_ROW'].isin(source_rows[gl_file['filename']])
+        frames.append((gl_file['filename'], typed.loc[mask, columns].reset_index(drop=True)))
+    return frames
+
+
+def _read_typed_csv(gl_file, log_label):
+    df = read_gl_csv(gl_file, log_label=log_label, dtype={'GLACC': str})
+    if df is None:
+        print(f"Server Log ({log_label}): Could not read file: {gl_file['filename']}")
+        return None
+    return type_gl_frame(df, gl_file['filename'], log_label)
+
+
+def _combine_frames(frames, columns):
+    """Concatenates (filename, frame) pairs, filling SOURCE_FILE when it is one of the requested columns."""
+    frames = [(filename, frame) for filename, frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    if SOURCE_FILE_COLUMN in columns:
+        frames = [(filename, frame.assign(**{SOURCE_FILE_COLUMN: filename})) for filename, frame in frames]
+    combined = pd.concat([frame for _, frame in frames], ignore_index=True)
+    if SOURCE_FILE_COLUMN in columns:
+        combined[SOURCE_FILE_COLUMN] = combined[SOURCE_FILE_COLUMN].astype('category')
+    return combined[columns]
+
+
+def load_gl_range(branch_folder, from_date, to_date, columns=None, glacc=None, log_label="GL Store"):
+    """
+    Returns typed GL rows (see GL_TYPED_COLUMNS) dated within [from_date, to_date] from the
+    branch's source files that overlap that window.
+
+    With pyarrow installed, rows come from the Parquet store: stale or missing fragments are
+    rebuilt from the source CSVs first, then only the requested columns of the month
+    partitions inside the window are read, with the date (and optional GLACC) filter pushed
+    down. Without pyarrow the same frame is built straight from the CSVs.
+
+    Args:
+        branch_folder (str): Sanitized GL branch folder name (see sanitize_gl_branch_folder).
+        from_date (datetime): Inclusive start of the window.
+        to_date (datetime): Inclusive end of the window.
+        columns (list, optional): Subset of GL_TYPED_COLUMNS plus SOURCE_FILE to return.
+            Defaults to all of them.
+        glacc (str, optional): Only rows whose hyphen-free GLACC equals this code.
+        log_label (str): Prefix used in server log lines.
+
+    Returns:
+        pd.DataFrame or None: Rows in source-file order (not sorted by date); empty if nothing
+        matched; None if the branch folder does not exist.
+    """
+    gl_files = get_gl_files_for_range(branch_folder, from_date, to_date)
+    if gl_files is None:
+        return None
+    return _load_gl_rows(branch_folder, gl_files, from_date, to_date, columns, glacc, log_label)
+
+
+def load_gl_files(branch_folder, gl_files, columns=None, log_label="GL Store"):
+    """
+    Returns every typed row (GL_TYPED_COLUMNS plus SOURCE_FILE by default) of the given
+    cataloged files, in source-file order, from the Parquet store when available.
+    """
+    return _load_gl_rows(branch_folder, gl_files, None, None, columns, None, log_label)
+
+
+def load_gl_rows_by_id(branch_folder, gl_files, source_rows, columns=None, log_label="GL Store"):
+    """
+    Returns the typed rows (GL_TYPED_COLUMNS plus SOURCE_FILE by default) listed in source_rows
+    ({source filename: SOURCE_ROW ids}, as the GL text index returns them), in source-file order.
+    With the Parquet store the ids are pushed down as a filter, so only those rows are decoded.
+    """
+    return _load_gl_rows(branch_folder, gl_files, None, None, columns, None, log_label, source_rows=source_rows)
+
+
+def _load_gl_rows(branch_folder, gl_files, from_date, to_date, columns, glacc, log_label, source_rows=None):
+    columns = list(columns or GL_TYPED_COLUMNS + [SOURCE_FILE_COLUMN])
+    stored_columns = [col for col in columns if col != SOURCE_FILE_COLUMN]
+    frames = []
+    if PARQUET_AVAILABLE:
+        try:
+            frames = _read_from_parquet(branch_folder, gl_files, from_date, to_date, stored_columns, glacc, source_rows)
+        except Exception as e:
+            # A damaged cache must never break the report; the CSVs are still the source of truth
+            print(f"Server Log ({log_label}): Parquet store unavailable for {branch_folder}, reading CSVs instead: {e}")
+            frames = _read_from_csv(gl_files, from_date, to_date, stored_columns, glacc, log_label, source_rows)
+    else:
+        frames = _read_from_csv(gl_files, from_date, to_date, stored_columns, glacc, log_label, source_rows)
+
+    return _combine_frames(frames, columns)
+
+
+def load_gl_source(branch_folder, gl_file, columns, log_label="GL Store"):
+    """
+    Returns the given typed columns for every row of one cataloged source file, ordered by
+    SOURCE_ROW, or None if the file could not be read. Used to build derived per-file data
+    such as the GL text index.
+    """
+    columns = list(columns)
+    if PARQUET_AVAILABLE:
+        try:
+            branch_dir = os.path.join(GL_PARQUET_DIR, branch_folder)
+            with _get_branch_lock(branch_folder):
+                manifest = _sync_branch_store(branch_folder, [gl_file])
+            source = manifest['sources'].get(gl_file['filename'])
+            if source is None:
+                return None
+            fragment = _fragment_name(gl_file['filename'])
+            read_columns = columns if 'SOURCE_ROW' in columns else columns + ['SOURCE_ROW']
+            parts = [
+                pd.read_parquet(os.path.join(_partition_dir(branch_dir, year, month), fragment), columns=read_columns)
+                for year, month in source['partitions']
+            ]
+            if not parts:
+                return pd.DataFrame(columns=columns)
+            return pd.concat(parts, ignore_index=True).sort_values('SOURCE_ROW', kind='mergesort')[columns].reset_index(drop=True)
+        except Exception as e:
+            print(f"Server Log ({log_label}): Parquet store unavailable for {gl_file['filename']}, reading CSV instead: {e}")
+
+    typed = _read_typed_csv(gl_file, log_label)
+    return None if typed is None else typed[columns]
@@ -0,0 +1,239 @@
+# audit_tool/backend/gl_text_index.py
+# Per-branch trigram index over GL REF and DESC values, so Reference/Description searches
+# resolve matching rows without scanning every string in the date range.
+import os
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+
+from backend.gl_catalog import GL_CACHE_DIR, get_gl_catalog, get_gl_files_for_range
+from backend.gl_parquet_store import load_gl_source, SOURCE_FILE_COLUMN
+
+GL_TEXT_INDEX_DIR = os.path.join(GL_CACHE_DIR, "text_index")
+# Bump when the index layout or value normalization changes so existing files are rebuilt
+GL_TEXT_INDEX_VERSION = 1
+INDEXED_FIELDS = ('REF', 'DESC')
+NGRAM_SIZE = 3
+# Lookups containing these are regular expressions (str.contains semantics) and cannot use the trigrams
+REGEX_SPECIAL_CHARACTERS = set('.^$*+?{}[]\\|()')
+
+_loaded_indexes = {} # (branch folder, filename) -> index dict
+_index_lock = threading.Lock()
+
+
+def normalize_text_values(series):
+    """The same REF/DESC normalization the reports compare against: string, stripped, upper case."""
+    return series.astype(str).str.strip().str.upper()
+
+
+def _ngrams(value):
+    return {value[i:i + NGRAM_SIZE] for i in range(len(value) - NGRAM_SIZE + 1)}
+
+
+def _build_field_index(values):
+    """
+    Indexes the distinct values of one column. Rows point at a distinct value (row_codes,
+    -1 for missing), distinct values are kept as one UTF-8 blob with offsets, and each
+    trigram maps to the sorted ids of the distinct values containing it (CSR layout).
+    """
+    row_codes, uniques = pd.factorize(normalize_text_values(values))
+    encoded = [value.encode('utf-8') for value in uniques]
+    value_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    value_offsets[1:] = np.cumsum([len(value) for value in encoded])
+
+    postings_by_gram = {}
+    for value_id, value in enumerate(uniques):
+        for gram in _ngrams(value):
+            postings_by_gram.setdefault(gram, []).append(value_id)
+    grams = sorted(postings_by_gram)
+    gram_offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+    gram_offsets[1:] = np.cumsum([len(postings_by_gram[gram]) for gram in grams])
+    postings = np.fromiter((value_id for gram in grams for value_id in postings_by_gram[gram]), dtype=np.int32, count=int(gram_offsets[-1]))
+
+    return {
+        'row_codes': row_codes.astype(np.int32),
+        'values_blob': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+        'value_offsets': value_offsets,
+        'grams': np.array(grams, dtype=f'<U{NGRAM_SIZE}'),
+        'gram_offsets': gram_offsets,
+        'postings': postings,
+    }
+
+
+def _index_file_path(branch_folder, filename):
+    return os.path.join(GL_TEXT_INDEX_DIR, branch_folder, hashlib.md5(filename.encode('utf-8')).hexdigest()[:16] + ".npz")
+
+
+def _is_current(index, gl_file):
+    return index is not None and index['size'] == gl_file['size'] and index['mtime'] == gl_file['mtime']
+
+
+def _load_index_file(index_path):
+    try:
+        with np.load(index_path) as data:
+            if int(data['version'][0]) != GL_TEXT_INDEX_VERSION:
+                return None
+            index = {'size': int(data['size'][0]), 'mtime': float(data['mtime'][0]), 'fields': {}}
+            for field in INDEXED_FIELDS:
+                index['fields'][field] = {key: data[f"{field}__{key}"] for key in
+                                          ('row_codes', 'values_blob', 'value_offsets', 'grams', 'gram_offsets', 'postings')}
+            return index
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _save_index_file(index_path, index):
+    arrays = {
+        'version': np.array([GL_TEXT_INDEX_VERSION]),
+        'size': np.array([index['size']], dtype=np.int64),
+        'mtime': np.array([index['mtime']], dtype=np.float64),
+    }
+    for field, field_index in index['fields'].items():
+        for key, array in field_index.items():
+            arrays[f"{field}__{key}"] = array
+    try:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        temp_path = f"{index_path}.tmp.npz"
+        np.savez(temp_path, **arrays)
+        os.replace(temp_path, index_path)
+    except OSError as e:
+        print(f"Server Log (GL Text Index): Could not save index {index_path}: {e}")
+
+
+def _get_source_index(branch_folder, gl_file):
+    """Returns the index for one source file, loading it from disk or (re)building it when the file changed."""
+    key = (branch_folder, gl_file['filename'])
+    with _index_lock:
+        index = _loaded_indexes.get(key)
+    if _is_current(index, gl_file):
+        return index
+
+    index_path = _index_file_path(branch_folder, gl_file['filename'])
+    index = _load_index_file(index_path) if os.path.exists(index_path) else None
+    if not _is_current(index, gl_file):
+        rows = load_gl_source(branch_folder, gl_file, list(INDEXED_FIELDS), log_label="GL Text Index")
+        if rows is None:
+            return None
+        index = {
+            'size': gl_file['size'],
+            'mtime': gl_file['mtime'],
+            'fields': {field: _build_field_index(rows[field]) for field in INDEXED_FIELDS},
+        }
+        _save_index_file(index_path, index)
+        print(f"Server Log (GL Text Index): Indexed REF/DESC of {gl_file['filename']} ({len(rows)} rows).")
+
+    with _index_lock:
+        _loaded_indexes[key] = index
+    return index
+
+
+def _decode_values(field_index, value_ids):
+    blob = field_index['values_blob'].tobytes()
+    offsets = field_index['value_offsets']
+    return [blob[offsets[value_id]:offsets[value_id + 1]].decode('utf-8') for value_id in value_ids]
+
+
+def _candidate_value_ids(field_index, lookup):
+    """Intersects the posting lists of the lookup's trigrams; None means every value is a candidate."""
+    grams = _ngrams(lookup)
+    if not grams:
+        return None
+    candidates = None
+    for gram in sorted(grams):
+        position = np.searchsorted(field_index['grams'], gram)
+        if position >= len(field_index['grams']) or field_index['grams'][position] != gram:
+            return np.array([], dtype=np.int32)
+        postings = field_index['postings'][field_index['gram_offsets'][position]:field_index['gram_offsets'][position + 1]]
+        candidates = postings if candidates is None else np.intersect1d(candidates, postings, assume_unique=True)
+        if len(candidates) == 0:
+            break
+    return candidates
+
+
+def _match_value_ids(field_index, lookup, match_type):
+    """Returns ids of the distinct values matching the lookup with the reports' exact/approximate semantics."""
+    is_regex = match_type != 'exact' and any(char in REGEX_SPECIAL_CHARACTERS for char in lookup)
+    candidates = None if is_regex else _candidate_value_ids(field_index, lookup)
+    if candidates is None:
+        candidates = np.arange(len(field_index['value_offsets']) - 1, dtype=np.int32)
+    if len(candidates) == 0:
+        return candidates
+
+    values = pd.Series(_decode_values(field_index, candidates), dtype=object)
+    if match_type == 'exact':
+        matched = values == lookup
+    elif is_regex:
+        matched = values.str.contains(lookup, na=False)
+    else:
+        matched = values.str.contains(lookup, regex=False, na=False)
+    return candidates[matched.to_numpy(dtype=bool)]
+
+
+def find_gl_text_matches(branch_folder, from_date, to_date, field, lookup, match_type):
+    """
+    Resolves the rows whose REF or DESC matches the lookup from the index, without reading
+    row data. The lookup is normalized like the reports (stripped, upper case); 'exact'
+    compares whole values and 'approximate' keeps str.contains semantics (literal lookups
+    use the trigrams, regular expressions are checked against the distinct values only).
+
+    Returns:
+        dict or None: Source filename -> np.ndarray of matching SOURCE_ROW ids, for the files
+        overlapping [from_date, to_date]; None if the branch folder is missing or the index
+        could not be used (callers then scan the rows themselves).
+    """
+    if field not in INDEXED_FIELDS:
+        raise ValueError(f"Field {field} is not indexed; expected one of {', '.join(INDEXED_FIELDS)}.")
+    gl_files = get_gl_files_for_range(branch_folder, from_date, to_date)
+    if gl_files is None:
+        return None
+
+    lookup = lookup.upper().strip()
+    matches = {}
+    try:
+        for gl_file in gl_files:
+            index = _get_source_index(branch_folder, gl_file)
+            if index is None:
+                return None
+            field_index = index['fields'][field]
+            value_ids = _match_value_ids(field_index, lookup, match_type)
+            if len(value_ids):
+                rows = np.flatnonzero(np.isin(field_index['row_codes'], value_ids))
+                if len(rows):
+                    matches[gl_file['filename']] = rows
+    except Exception as e:
+        print(f"Server Log (GL Text Index): Index lookup failed for {branch_folder}, falling back to a row scan: {e}")
+        return None
+
+    _prune_removed_sources(branch_folder)
+    return matches
+
+
+def select_matched_rows(df, matches):
+    """Boolean mask of the rows of a load_gl_range frame (with SOURCE_FILE/SOURCE_ROW) listed in matches."""
+    mask = np.zeros(len(df), dtype=bool)
+    for filename, rows in matches.items():
+        in_file = (df[SOURCE_FILE_COLUMN] == filename).to_numpy(dtype=bool)
+        mask |= in_file & df['SOURCE_ROW'].isin(rows).to_numpy(dtype=bool)
+    return mask
+
+
+def _prune_removed_sources(branch_folder):
+    """Drops indexes (in memory and on disk) of files that left the branch catalog."""
+    catalog = get_gl_catalog(branch_folder)
+    cataloged_files = catalog['files'] if catalog else {}
+    with _index_lock:
+        for key in [key for key in _loaded_indexes if key[0] == branch_folder and key[1] not in cataloged_files]:
+            _loaded_indexes.pop(key, None)
+
+    branch_index_dir = os.path.join(GL_TEXT_INDEX_DIR, branch_folder)
+    if not os.path.isdir(branch_index_dir):
+        return
+    current_files = {os.path.basename(_index_file_path(branch_folder, filename)) for filename in cataloged_files}
+    for index_filename in os.listdir(branch_index_dir):
+        if index_filename.endswith('.tmp.npz') or index_filename in current_files:
+            continue
+        try:
+            os.remove(os.path.join(branch_index_dir, index_filename))
+        except OSError:
+            pass
@@ -2,13 +2,9 @@
 import pandas as pd
 import os
 from datetime import datetime, timedelta
-import csv
-from io import StringIO
 import re
-import math # MODIFIED: Import the math module
-
-# Define the maximum file size in bytes (49.9 MB)
-MAX_FILE_SIZE_BYTES = 49.9 * 1024 * 1024
+from backend.utils.number_formatting import format_amount_series
+from backend.utils.rolling_csv import RollingCsvWriter, MAX_FILE_SIZE_BYTES, WRITE_BATCH_ROWS
 
 # Define the fixed base output directory for General Ledger
 FIXED_BASE_OUTPUT_DIR = r"C:\xampp\htdocs\audit_tool\ACCOUTNING\GENERAL LEDGER"
@@ -131,7 +127,6 @@ def process_gl_win_data_web(input_dir, branch):
     combined_df.reset_index(drop=True, inplace=True)
 
     # --- File Saving and Appending Logic ---
-    current_data_start_row = 0
     
     print("Server Log (GL WIN): Starting CSV file saving and appending...")
 
@@ -158,162 +153,23 @@ def process_gl_win_data_web(input_dir, branch):
                         latest_file_path = os.path.join(output_dir, fname)
         return latest_file_path, latest_date_to
 
-    # --- Main Loop for Splitting and Saving ---
-    while current_data_start_row < len(combined_df):
-        latest_file_path, latest_date_to = get_latest_existing_file_info(branch_output_dir, sanitized_branch)
-        
-        file_written_or_appended = False
-
-        # MODIFIED: Initialize estimated_bytes_per_row and header_size_bytes at the start of the loop
-        estimated_bytes_per_row = 100 # Default value
-        header_size_bytes = 0 # Default value
-
-        # Calculate header size once per function call, not per loop iteration
-        # MODIFIED: Ensure header_size_bytes is calculated only once
-        if header_size_bytes == 0:
-            temp_s_buf = StringIO()
-            pd.DataFrame(columns=final_output_columns).to_csv(temp_s_buf, index=False, quoting=csv.QUOTE_NONNUMERIC, encoding='utf-8-sig')
-            header_size_bytes = len(temp_s_buf.getvalue().encode('utf-8-sig'))
-
-
-        # Estimate average row size from a sample if data is not empty
-        if not combined_df.empty:
-            sample_df_for_size = combined_df.head(min(100, len(combined_df)))
-            s_buf_sample = StringIO()
-            sample_df_for_size.to_csv(s_buf_sample, index=False, quoting=csv.QUOTE_NONNUMERIC, encoding='utf-8-sig', header=False) # No header
-            if len(sample_df_for_size) > 0:
-                estimated_bytes_per_row = len(s_buf_sample.getvalue().encode('utf-8-sig')) / len(sample_df_for_size)
-            else:
-                estimated_bytes_per_row = 100 # Fallback if sample is empty
-        else:
-            estimated_bytes_per_row = 100 # Default if overall data is empty
-
-
-        if latest_file_path and os.path.exists(latest_file_path):
-            existing_file_size = os.path.getsize(latest_file_path)
-            
-            # Try to append as many rows as possible without exceeding MAX_FILE_SIZE_BYTES
-            rows_to_append = 0
-            
-            # Calculate how many rows can fit into the remaining space
-            remaining_space = MAX_FILE_SIZE_BYTES - existing_file_size
-            if remaining_space > 0 and estimated_bytes_per_row > 0:
-                max_rows_to_append = math.floor(remaining_space / estimated_bytes_per_row)
-                rows_to_append = min(max_rows_to_append, len(combined_df) - current_data_start_row)
-            
-            if rows_to_append > 0:
-                chunk_for_append = combined_df.iloc[current_data_start_row : current_data_start_row + rows_to_append]
-                
-                # Format the chunk for CSV output (without header)
-                chunk_for_csv_output = chunk_for_append.copy()
-                for col in ['AMT', 'BAL']:
-                    chunk_for_csv_output[col] = pd.to_numeric(chunk_for_csv_output[col], errors='coerce').fillna(0)
-                    chunk_for_csv_output[col] = chunk_for_csv_output[col].apply(lambda x: f"{x:,.2f}")
-                chunk_for_csv_output['DOCDATE'] = pd.to_datetime(chunk_for_csv_output['DOCDATE'], errors='coerce').dt.strftime('%m/%d/%Y').fillna('')
-
-                s_buf_append = StringIO()
-                chunk_for_csv_output.to_csv(s_buf_append, index=False, quoting=csv.QUOTE_NONNUMERIC, encoding='utf-8-sig', header=False) # No header
-                content_to_append = s_buf_append.getvalue()
-
-                # Double check size before writing
-                if existing_file_size + len(content_to_append.encode('utf-8-sig')) <= MAX_FILE_SIZE_BYTES:
-                    with open(latest_file_path, mode='a', newline='', encoding='utf-8-sig') as f:
-                        f.write(content_to_append)
-                    print(f"Server Log (GL WIN): Appended {rows_to_append} rows to: {latest_file_path} (New Size: {os.path.getsize(latest_file_path)/ (1024 * 1024):.2f} MB)")
-                    
-                    # After appending, re-read, deduplicate, and overwrite to update date range
-                    temp_df_for_dedup = pd.read_csv(latest_file_path, dtype=str, keep_default_na=False)
-                    deduplicated_df = temp_df_for_dedup.drop_duplicates(keep='first').reset_index(drop=True)
-
-                    deduplicated_df['DOCDATE'] = pd.to_datetime(deduplicated_df['DOCDATE'], errors='coerce', format='%m/%d/%Y')
-                    actual_min_date = deduplicated_df['DOCDATE'].min() if not deduplicated_df['DOCDATE'].dropna().empty else pd.NaT
-                    actual_max_date = deduplicated_df['DOCDATE'].max() if not deduplicated_df['DOCDATE'].dropna().empty else pd.NaT
-
-                    min_date_str = actual_min_date.strftime('%m-%d-%Y') if pd.notna(actual_min_date) else "UNKNOWN_START"
-                    max_date_str = actual_max_date.strftime('%m-%d-%Y') if pd.notna(actual_max_date) else "UNKNOWN_END"
-
-                    new_filename_for_updated_file = f"{sanitized_branch} - {min_date_str} TO {max_date_str}.csv"
-                    new_file_path_for_updated_file = os.path.join(branch_output_dir, new_filename_for_updated_file)
-
-                    s_buf_dedup = StringIO()
-                    deduplicated_df['DOCDATE'] = deduplicated_df['DOCDATE'].dt.strftime('%m/%d/%Y').fillna('') # Re-format DOCDATE to string for saving
-                    deduplicated_df.to_csv(s_buf_dedup, index=False, quoting=csv.QUOTE_NONNUMERIC, encoding='utf-8-sig')
-                    deduplicated_content = s_buf_dedup.getvalue()
-
-                    if latest_file_path != new_file_path_for_updated_file:
-                        os.remove(latest_file_path)
-                        print(f"Server Log (GL WIN): Renamed/Moved old file: {latest_file_path} to {new_file_path_for_updated_file}")
-                    
-                    with open(new_file_path_for_updated_file, mode='w', newline='', encoding='utf-8-sig') as f:
-                        f.write(deduplicated_content)
-                    print(f"Server Log (GL WIN): Overwrote/Updated file after deduplication: {new_file_path_for_updated_file} (Size: {os.path.getsize(new_file_path_for_updated_file)/ (1024 * 1024):.2f} MB)")
-                    
-                    current_data_start_row += rows_to_append
-                    file_written_or_appended = True
-                else:
-                    print(f"Server Log (GL WIN): Appending {rows_to_append} rows would exceed limit. Creating new file.")
-            else:
-                print(f"Server Log (GL WIN): No space to append to {latest_file_path}. Creating new file.")
-        
-        if not file_written_or_appended:
-            # If no appendable file was found, or the latest was full, create a new file.
-            # Calculate how many rows from the current data can fit into a new file (including header)
-            
-            # Estimate rows per chunk for a new file
-            if estimated_bytes_per_row > 0:
-                max_rows_for_new_file = math.floor((MAX_FILE_SIZE_BYTES - header_size_bytes) / estimated_bytes_per_row)
-                rows_for_new_file = min(max_rows_for_new_file, len(combined_df) - current_data_start_row)
-            else:
-                rows_for_new_file = len(combined_df) - current_data_start_row # If no estimate, take all remaining
-
-            if rows_for_new_file <= 0: # Ensure at least 1 row if there's data left
-                if len(combined_df) - current_data_start_row > 0:
-                    rows_for_new_file = 1
-                else:
-                    break # No more data to process
-
-            current_chunk_df = combined_df.iloc[current_data_start_row : current_data_start_row + rows_for_new_file].copy()
-
-            if current_chunk_df.empty:
-                break # No more data to process
-
-            # Ensure DOCDATE column is datetime objects for min/max operations
-            if not pd.api.types.is_datetime64_any_dtype(current_chunk_df['DOCDATE']):
-                current_chunk_df['DOCDATE'] = pd.to_datetime(current_chunk_df['DOCDATE'], errors='coerce')
-
-
-            # Determine date range for the current chunk
-            valid_dates_in_chunk = current_chunk_df['DOCDATE'].dropna()
-
-            chunk_min_date_val = None
-            chunk_max_date_val = None
-
-            if not valid_dates_in_chunk.empty:
-                chunk_min_date_val = valid_dates_in_chunk.min()
-                chunk_max_date_val = valid_dates_in_chunk.max()
-            
-            min_date_str = chunk_min_date_val.strftime('%m-%d-%Y') if pd.notna(chunk_min_date_val) else "UNKNOWN_START"
-            max_date_str = chunk_max_date_val.strftime('%m-%d-%Y') if pd.notna(chunk_max_date_val) else "UNKNOWN_END"
-
-            new_output_filename = f"{sanitized_branch} - {min_date_str} TO {max_date_str}.csv"
-            new_output_file_path = os.path.join(branch_output_dir, new_output_filename)
-
-            # Format the current chunk for CSV output (with header)
-            chunk_for_csv_output = current_chunk_df.copy()
+    # --- Stream the rows into files of at most MAX_FILE_SIZE_BYTES, named by their DOCDATE range ---
+    # New data continues the file with the latest 'date to' while it has room (rows it already
+    # holds are not written again), then rolls over to new files exactly at the size limit.
+    latest_file_path, latest_date_to = get_latest_existing_file_info(branch_output_dir, sanitized_branch)
+    with RollingCsvWriter(branch_output_dir, sanitized_branch, final_output_columns, MAX_FILE_SIZE_BYTES, log_label="GL WIN") as writer:
+        if latest_file_path and os.path.getsize(latest_file_path) < MAX_FILE_SIZE_BYTES:
+            writer.resume(latest_file_path, 'DOCDATE')
+        elif latest_file_path:
+            print(f"Server Log (GL WIN): No space to append to {latest_file_path}. Creating new file.")
+        for start in range(0, len(combined_df), WRITE_BATCH_ROWS):
+            batch = combined_df.iloc[start:start + WRITE_BATCH_ROWS]
+            formatted = batch.copy()
             for col in ['AMT', 'BAL']:
-                chunk_for_csv_output[col] = pd.to_numeric(chunk_for_csv_output[col], errors='coerce').fillna(0)
-                chunk_for_csv_output[col] = chunk_for_csv_output[col].apply(lambda x: f"{x:,.2f}")
-            chunk_for_csv_output['DOCDATE'] = pd.to_datetime(chunk_for_csv_output['DOCDATE'], errors='coerce').dt.strftime('%m/%d/%Y').fillna('')
-
-            s_buf_new_file = StringIO()
-            chunk_for_csv_output.to_csv(s_buf_new_file, index=False, quoting=csv.QUOTE_NONNUMERIC, encoding='utf-8-sig')
-            content_for_new_file = s_buf_new_file.getvalue()
-
-            with open(new_output_file_path, mode='w', newline='', encoding='utf-8-sig') as f:
-                f.write(content_for_new_file)
-            print(f"Server Log (GL WIN): ✅ Saved new file: {new_output_file_path} (Size: {os.path.getsize(new_output_file_path)/ (1024 * 1024):.2f} MB)")
-            
-            current_data_start_row += rows_for_new_file
+                formatted[col] = format_amount_series(pd.to_numeric(batch[col], errors='coerce').fillna(0))
+            docdates = pd.to_datetime(batch['DOCDATE'], errors='coerce')
+            formatted['DOCDATE'] = docdates.dt.strftime('%m/%d/%Y').fillna('')
+            writer.write(formatted, docdates)
 
     print(f"\nServer Log (GL WIN): Processing complete! Output saved to {branch_output_dir}")
     return {"message": f"GL WIN processing completed. Output saved to {branch_output_dir}", "output_path": branch_output_dir}
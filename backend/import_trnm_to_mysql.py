@@ -24,7 +24,8 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 # FIX: Changed import to get the function, not the engine object directly
-from backend.db_common import get_db_connection_sqlalchemy
+from backend.db_common import get_db_connection_sqlalchemy, ensure_table_indexes
+from backend.utils.date_parsing import parse_date_series
 
 # --- Configuration ---
 TRNM_BASE_DIR = r"C:\xampp\htdocs\audit_tool\OPERATIONS\TRNM" # Adjust if your base directory is different
@@ -49,6 +50,9 @@ CSV_COLUMNS_MAPPING = {
     'Branch': VARCHAR(255)
 }
 
+# Candidate TRNDATE formats; '%b %Y' covers "Jan 2008" style values
+TRNDATE_FORMATS = ['%m/%d/%Y', '%Y-%m-%d', '%m-%d-%Y', '%d-%m-%Y', '%b %Y']
+
 # --- Helper Functions ---
 def parse_filename_dates_trnm(filename):
     """
@@ -157,15 +161,8 @@ def import_trnm_csv_to_mysql():
             # Add 'Branch' column, derived from folder name
             df['Branch'] = branch_folder_name.upper()
 
-            # Process 'TRNDATE' column
-            # Try multiple date formats for parsing
-            date_formats = ['%m/%d/%Y', '%Y-%m-%d', '%m-%d-%Y', '%d-%m-%Y', '%b %Y'] # Added '%b %Y' for "Jan 2008" format
-            df['TRNDATE_PARSED'] = pd.NaT # Initialize with Not a Time
-            
-            for fmt in date_formats:
-                # Only attempt to parse rows where TRNDATE_PARSED is still NaT
-                mask = df['TRNDATE_PARSED'].isna()
-                df.loc[mask, 'TRNDATE_PARSED'] = pd.to_datetime(df.loc[mask, 'TRNDATE'], format=fmt, errors='coerce')
+            # Process 'TRNDATE' column: dominant format first, remaining formats only for leftover rows
+            df['TRNDATE_PARSED'] = parse_date_series(df['TRNDATE'], formats=TRNDATE_FORMATS, family="trnm_csv.TRNDATE", infer_fallback=False)
             
             if df['TRNDATE_PARSED'].isna().any():
                 print(f"    Warning: Some TRNDATE values in {filename} could not be parsed. These rows will be dropped.")
@@ -214,6 +211,8 @@ def import_trnm_csv_to_mysql():
                     dtype=CSV_COLUMNS_MAPPING # Specify SQL types for creation/validation
                 )
                 print(f"  Successfully imported {branch_rows_count} rows to table '{current_db_table_name}'.")
+                # to_sql(if_exists='replace') recreated the table without indexes; add the report indexes back
+                ensure_table_indexes(current_db_table_name)
                 total_rows_imported += branch_rows_count
             except Exception as e:
                 print(f"  Error importing data for branch {branch_folder_name} to MySQL table '{current_db_table_name}': {e}")
@@ -225,7 +224,6 @@ def import_trnm_csv_to_mysql():
     print(f"\nTRNM CSV import complete.")
     print(f"Total files processed: {total_files_processed}")
     print(f"Total rows imported: {total_rows_imported}")
-    print(f"Please ensure the 'trnm_branchname' tables in MySQL have appropriate indexes for performance (e.g., on Branch, TRNDATE, ACC).")
 
 if __name__ == '__main__':
     # This block will only run when the script is executed directly
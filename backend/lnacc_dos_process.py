@@ -1,6 +1,6 @@
 import os
 import csv
-from dbfread import DBF
+from backend.utils.dbf_stream import read_dbf_frame
 from datetime import datetime, timedelta
 import pandas as pd
 import math
@@ -103,7 +103,7 @@ def process_lnacc_dos_data_web(input_dir, branch): # Removed output_dir paramete
             if filename.lower().endswith('.dbf'):
                 files_found = True
                 print(f"Server Log (LNACC DOS): Processing DBF file: {filename}...")
-                df_current = pd.DataFrame(list(DBF(filepath, encoding='latin-1', ignore_missing_memofile=True)))
+                df_current = read_dbf_frame(filepath, encoding='latin-1', log_label="LNACC DOS") # Streamed in batches, not a dict per record
             elif filename.lower().endswith('.csv'):
                 files_found = True
                 print(f"Server Log (LNACC DOS): Processing CSV file: {filename}...")
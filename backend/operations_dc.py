@@ -11,6 +11,7 @@ from db_common import (
     format_currency_py, normalize_cid_py, _clean_numeric_string_for_conversion,
     get_latest_data_for_month, get_data_from_mysql
 )
+from backend.utils.date_parsing import parse_date_series
 
 
 # Mapping from GROUP code (from AGING CSV) to LOAN PRODUCT GROUP
@@ -44,50 +45,8 @@ DEPOSIT_ACCNAME_TO_REPORT_COL = {
     'Time Deposit - Monthly': 'TIME_DEPOSITS_BALANCE',
 }
 
-def parse_dates_robustly(series, filename="unknown_file"):
-    """
-    Attempts to parse a pandas Series into datetime objects using multiple formats.
-    It tries specific formats first, then falls back to general inference.
-    Includes logging for diagnosis.
-    """
-    initial_count = len(series)
-    
-    # Attempt 1: Specific format with time and AM/PM
-    parsed_dates = pd.to_datetime(series, errors='coerce', format='%m/%d/%Y %I:%M:%S %p')
-    parsed_count_1 = parsed_dates.count()
-    print(f"Server Log: ({filename}) Attempt 1 (mm/dd/yyyy hh:mm:ss am/pm): Successfully parsed {parsed_count_1} of {initial_count} dates.")
-    
-    # Attempt 2: Simpler MM/DD/YYYY format for unparsed dates
-    unparsed_mask_1 = parsed_dates.isna()
-    if unparsed_mask_1.any():
-        remaining_to_parse_2 = series[unparsed_mask_1]
-        parsed_dates[unparsed_mask_1] = pd.to_datetime(remaining_to_parse_2, errors='coerce', format='%m/%d/%Y')
-        parsed_count_2 = parsed_dates.count() - parsed_count_1
-        print(f"Server Log: ({filename}) Attempt 2 (mm/dd/yyyy): Successfully parsed {parsed_count_2} of {len(remaining_to_parse_2)} remaining dates.")
-        
-    # Attempt 3: YYYY-MM-DD format for any remaining unparsed dates
-    unparsed_mask_2 = parsed_dates.isna()
-    if unparsed_mask_2.any():
-        remaining_to_parse_3 = series[unparsed_mask_2]
-        parsed_dates[unparsed_mask_2] = pd.to_datetime(remaining_to_parse_3, errors='coerce', format='%Y-%m-%d')
-        parsed_count_3 = parsed_dates.count() - (parsed_count_1 + parsed_count_2)
-        print(f"Server Log: ({filename}) Attempt 3 (yyyy-mm-dd): Successfully parsed {parsed_count_3} of {len(remaining_to_parse_3)} remaining dates.")
-
-    # Attempt 4: General inference for any remaining unparsed dates (without infer_datetime_format=True)
-    unparsed_mask_3 = parsed_dates.isna()
-    if unparsed_mask_3.any():
-        remaining_to_parse_4 = series[unparsed_mask_3]
-        parsed_dates[unparsed_mask_3] = pd.to_datetime(remaining_to_parse_4, errors='coerce', dayfirst=False, yearfirst=False)
-        parsed_count_4 = parsed_dates.count() - (parsed_count_1 + parsed_count_2 + parsed_count_3)
-        print(f"Server Log: ({filename}) Attempt 4 (General Inference): Successfully parsed {parsed_count_4} of {len(remaining_to_parse_4)} remaining dates.")
-        
-    final_unparsed_count = parsed_dates.isna().sum()
-    if final_unparsed_count > 0:
-        # Log a sample of unparsed values if they exist
-        sample_unparsed = series[parsed_dates.isna()].head(5).tolist()
-        print(f"Server Log: ({filename}) Warning: {final_unparsed_count} dates could not be parsed. Sample: {sample_unparsed}")
-        
-    return parsed_dates
+# Formats tried (dominant first) before falling back to general inference
+DC_DATE_FORMATS = ['%m/%d/%Y %I:%M:%S %p', '%m/%d/%Y', '%Y-%m-%d']
 
 def generate_deposit_counterpart_report_logic(branches, report_date_str, deposit_requirements_data, selected_report_entity):
     """
@@ -134,9 +93,9 @@ def generate_deposit_counterpart_report_logic(branches, report_date_str, deposit
                                          'DISBURSEMENT DATE': 'DISBDATE', 'DUE DATE': 'DUE DATE'}, inplace=True)
             for col in ['PRINCIPAL', 'BALANCE']: all_aging_df[col] = pd.to_numeric(all_aging_df[col], errors='coerce').fillna(0)
             # Ensure 'DATE' column is parsed robustly
-            all_aging_df['DATE'] = parse_dates_robustly(all_aging_df['DATE'], filename="aging_report_data")
-            all_aging_df['DISBDATE'] = parse_dates_robustly(all_aging_df['DISBDATE'], filename="aging_report_data_disbdate")
-            all_aging_df['DUE DATE'] = parse_dates_robustly(all_aging_df['DUE DATE'], filename="aging_report_data_duedate")
+            all_aging_df['DATE'] = parse_date_series(all_aging_df['DATE'], formats=DC_DATE_FORMATS, family="aging_report_data.DATE", log_label="aging_report_data")
+            all_aging_df['DISBDATE'] = parse_date_series(all_aging_df['DISBDATE'], formats=DC_DATE_FORMATS, family="aging_report_data.DISBDATE", log_label="aging_report_data_disbdate")
+            all_aging_df['DUE DATE'] = parse_date_series(all_aging_df['DUE DATE'], formats=DC_DATE_FORMATS, family="aging_report_data.DUE DATE", log_label="aging_report_data_duedate")
 
             if 'CID' in all_aging_df.columns: all_aging_df['CID_NORM'] = all_aging_df['CID'].apply(normalize_cid_py)
             else: all_aging_df['CID_NORM'] = ''
@@ -167,9 +126,9 @@ def generate_deposit_counterpart_report_logic(branches, report_date_str, deposit
                 for col in ['BAL', 'INTRATE', 'CUMINTPD', 'CUMTAXW']:
                     df_svacc_branch[col] = pd.to_numeric(df_svacc_branch[col], errors='coerce').fillna(0)
                 # Ensure 'DOPEN' column is parsed robustly
-                df_svacc_branch['DOPEN'] = parse_dates_robustly(df_svacc_branch['DOPEN'], filename=f"svacc_{branch_name}")
-                df_svacc_branch['DOLASTTRN'] = parse_dates_robustly(df_svacc_branch['DOLASTTRN'], filename=f"svacc_{branch_name}_dolasttrn")
-                df_svacc_branch['MATDATE'] = parse_dates_robustly(df_svacc_branch['MATDATE'], filename=f"svacc_{branch_name}_matdate")
+                df_svacc_branch['DOPEN'] = parse_date_series(df_svacc_branch['DOPEN'], formats=DC_DATE_FORMATS, family="svacc.DOPEN", log_label=f"svacc_{branch_name}")
+                df_svacc_branch['DOLASTTRN'] = parse_date_series(df_svacc_branch['DOLASTTRN'], formats=DC_DATE_FORMATS, family="svacc.DOLASTTRN", log_label=f"svacc_{branch_name}_dolasttrn")
+                df_svacc_branch['MATDATE'] = parse_date_series(df_svacc_branch['MATDATE'], formats=DC_DATE_FORMATS, family="svacc.MATDATE", log_label=f"svacc_{branch_name}_matdate")
 
                 if 'CID' in df_svacc_branch.columns: df_svacc_branch['CID_NORM'] = df_svacc_branch['CID'].apply(normalize_cid_py)
                 else: df_svacc_branch['CID_NORM'] = ''
@@ -4,13 +4,15 @@ from flask import request, jsonify, send_file
 from datetime import datetime
 import io
 import re # Import regex module
+from backend.utils.date_parsing import parse_date_series
+from backend.db_common import get_data_from_mysql
 
 # --- Configuration for file paths ---
 # IMPORTANT: Ensure these paths are correct and accessible on your server.
 # It is highly recommended to use environment variables or a separate config file for paths
 # in a production environment, rather than hardcoding them.
 BASE_OPERATIONS_PATH = "C:/xampp/htdocs/audit_tool/OPERATIONS/"
-AGING_PATH = os.path.join(BASE_OPERATIONS_PATH, "AGING") # Used for DOSRI Loans and Former Emp Loans
+AGING_PATH = os.path.join(BASE_OPERATIONS_PATH, "AGING") # Source of aging_report_data; loan reports now query MySQL
 SVACC_PATH = os.path.join(BASE_OPERATIONS_PATH, "SVACC") # Used for DOSRI Deposits and Former Emp Deposits
 
 
@@ -336,20 +338,12 @@ def upload_dosri_csv_to_db(filepath, upload_option='override'):
 
 
 # --- Helper function to parse dates ---
-# Handles both 'MM/DD/YYYY' and 'MM/DD/YYYY HH:MM:SS am/pm' formats.
-def parse_date_robust(date_str):
-    if not isinstance(date_str, str):
-        return pd.NaT # Not a Time (Pandas equivalent of None for datetime)
-    date_str = date_str.strip()
-    try:
-        # Try parsing 'MM/DD/YYYY HH:MM:SS am/pm'
-        return datetime.strptime(date_str, '%m/%d/%Y %I:%M:%S %p')
-    except ValueError:
-        try:
-            # Try parsing 'MM/DD/YYYY'
-            return datetime.strptime(date_str, '%m/%d/%Y')
-        except ValueError:
-            return pd.NaT # Return Not a Time if neither format matches
+# Aging CSV dates come as 'MM/DD/YYYY' or 'MM/DD/YYYY HH:MM:SS am/pm'.
+AGING_CSV_DATE_FORMATS = ['%m/%d/%Y %I:%M:%S %p', '%m/%d/%Y']
+
+def parse_aging_csv_dates(series, column_name):
+    """Vectorized parse of an aging CSV date column; unparseable values become NaT."""
+    return parse_date_series(series, formats=AGING_CSV_DATE_FORMATS, family=f"aging_csv.{column_name}", infer_fallback=False)
 
 # --- Placeholder for fetching DOSRI members from CSV for summary reports ---
 def get_dosri_members_for_summary(type_filter=None): # NEW: Added type_filter parameter
@@ -459,8 +453,8 @@ def get_loan_balance_details_from_df(df_loans_filtered, member_list):
             df_loans_filtered[col] = '' # Add missing columns as empty to prevent KeyError later
 
     # Convert 'DISBDATE' and 'DATE' (for DUE DATE) to datetime using the robust parser
-    df_loans_filtered['DISBDATE_PARSED'] = df_loans_filtered['DISBDATE'].apply(parse_date_robust)
-    df_loans_filtered['DATE_PARSED'] = df_loans_filtered['DATE'].apply(parse_date_robust)
+    df_loans_filtered['DISBDATE_PARSED'] = parse_aging_csv_dates(df_loans_filtered['DISBDATE'], 'DISBDATE')
+    df_loans_filtered['DATE_PARSED'] = parse_aging_csv_dates(df_loans_filtered['DATE'], 'DATE')
     
     # Drop rows where critical dates (DISBDATE or DUE DATE) couldn't be parsed for primary logic
     df_loans_filtered.dropna(subset=['DISBDATE_PARSED', 'DATE_PARSED'], inplace=True)
@@ -527,7 +521,7 @@ def get_loan_balance_details_from_df(df_loans_filtered, member_list):
         member_type = member_info['type'] # Get the type
 
         # Ensure values for 'DISBDATE' and 'DUE DATE' are proper datetime objects before formatting
-        # They should already be datetime or NaT due to earlier .apply(parse_date_robust)
+        # They should already be datetime or NaT due to earlier parse_aging_csv_dates()
         disb_date_val = row.get('DISBDATE_PARSED')
         due_date_val = row.get('DATE_PARSED') # This is now the 'DUE DATE' as per user's clarification
 
@@ -615,308 +609,184 @@ def get_deposit_liabilities_details_from_df(df_deposits_filtered, member_list):
     return deposit_details
 
 
-# --- API Route: Process DOSRI Loan Balances (Reads CSVs) ---
-# This route would typically be part of your main app.py or a blueprint.
-# @app.route('/api/dosri/loan_balances', methods=['POST'])
-def process_dosri_loan_balances(dosri_members, report_date=None): # Added report_date parameter
-    """
-    Processes loan data for DOSRI members from CSV files in the AGING_PATH.
-    Calculates current and past due balances for each DOSRI member, including
-    a breakdown of past due amounts by aging buckets.
-    The latest record for each loan account is determined by the 'DATE' header in CSVs.
-    Filters loan data based on the provided report_date (inclusive).
-    """
-    if not dosri_members:
-        return jsonify({
-            "current_balance": 0.0,
-            "past_due_balance": 0.0,
-            "past_due_breakdown": { # Initialize breakdown
-                "1-30 DAYS": 0.0, "31-60 DAYS": 0.0, "61-90 DAYS": 0.0,
-                "91-120 DAYS": 0.0, "121-180 DAYS": 0.0, "181-365 DAYS": 0.0,
-                "OVER 365 DAYS": 0.0
-            },
-            "loan_balance_details": []
-        })
-
-    total_current_balance = 0.0
-    total_past_due_balance = 0.0
-    past_due_breakdown = {
-        "1-30 DAYS": 0.0,
-        "31-60 DAYS": 0.0,
-        "61-90 DAYS": 0.0,
-        "91-120 DAYS": 0.0,
-        "121-180 DAYS": 0.0,
-        "181-365 DAYS": 0.0,
-        "OVER 365 DAYS": 0.0
-    }
+# --- Loan exposure for DOSRI / Former Employee members (served from aging_report_data) ---
 
-    # Parse report_date if provided
-    parsed_report_date = None
-    if report_date:
-        try:
-            parsed_report_date = datetime.strptime(report_date, '%Y-%m-%d')
-            print(f"DOSRI Loan: Report date received and parsed: {parsed_report_date}") # Debugging print
-        except ValueError:
-            print(f"Warning: Invalid report_date format received: {report_date}. Skipping date filter for DOSRI loans.")
+# Maps the normalized AGING value to its past due bucket (both '31-60' and '31-60 DAYS' forms occur)
+PAST_DUE_BUCKET_MAP = {
+    '1-30 DAYS': '1-30 DAYS',
+    '31-60': '31-60 DAYS', '31-60 DAYS': '31-60 DAYS',
+    '61-90': '61-90 DAYS', '61-90 DAYS': '61-90 DAYS',
+    '91-120': '91-120 DAYS', '91-120 DAYS': '91-120 DAYS',
+    '121-180': '121-180 DAYS', '121-180 DAYS': '121-180 DAYS',
+    '181-365': '181-365 DAYS', '181-365 DAYS': '181-365 DAYS',
+    'OVER 365': 'OVER 365 DAYS', 'OVER 365 DAYS': 'OVER 365 DAYS',
+}
 
-    # --- PERFORMANCE IMPROVEMENT START ---
-    # Step 1: Identify all unique branches that need to be processed from the DOSRI members list
-    unique_branches_to_process = set()
-    for member in dosri_members:
-        if isinstance(member, dict) and member.get('branch'):
-            unique_branches_to_process.add(str(member['branch']).strip().replace(' ', '').upper())
-    
-    if not unique_branches_to_process:
-        return jsonify({
-            "current_balance": 0.0,
-            "past_due_balance": 0.0,
-            "past_due_breakdown": past_due_breakdown,
-            "loan_balance_details": []
-        })
 
-    # Step 2: Pre-process existing branch directories once
-    actual_aging_dirs = {}
-    if os.path.isdir(AGING_PATH):
-        for d_name in os.listdir(AGING_PATH):
-            full_path = os.path.join(AGING_PATH, d_name)
-            if os.path.isdir(full_path):
-                # Ensure the key is normalized (stripped, no spaces, uppercase)
-                actual_aging_dirs[d_name.strip().replace(' ', '').upper()] = d_name
-    else:
-        print(f"ERROR: AGING_PATH '{AGING_PATH}' does not exist or is not a directory.")
-        return jsonify({
-            "current_balance": 0.0,
-            "past_due_balance": 0.0,
-            "past_due_breakdown": past_due_breakdown,
-            "loan_balance_details": []
-        })
+def _empty_loan_exposure():
+    return {
+        "current_balance": 0.0,
+        "past_due_balance": 0.0,
+        "past_due_breakdown": {bucket: 0.0 for bucket in dict.fromkeys(PAST_DUE_BUCKET_MAP.values())},
+        "loan_balance_details": []
+    }
 
-    all_aging_data_frames = []
-    
-    # Step 3: Iterate through unique branches and read all relevant CSV files only once
-    for normalized_branch in unique_branches_to_process:
-        target_branch_dir_name = actual_aging_dirs.get(normalized_branch)
-        
-        if not target_branch_dir_name:
-            print(f"WARNING: No aging directory found for branch '{normalized_branch}'. Skipping.")
-            continue
-            
-        branch_aging_path = os.path.join(AGING_PATH, target_branch_dir_name)
-        csv_files = [f for f in os.listdir(branch_aging_path) if f.lower().endswith('.csv')]
 
-        if not csv_files:
-            print(f"WARNING: No CSV files found in aging directory '{branch_aging_path}'. Skipping.")
+def _member_loan_keys(members):
+    """Returns the normalized (BRANCH without spaces, CID) keys of a DOSRI/Former Employee member list."""
+    member_keys = set()
+    for member in members or []:
+        if not isinstance(member, dict):
             continue
+        branch_raw = member.get('branch') or member.get('BRANCH')
+        cid_raw = member.get('cid') or member.get('CID')
+        branch = str(branch_raw).strip().replace(' ', '').upper() if branch_raw else ''
+        cid = str(cid_raw).strip() if cid_raw else ''
+        if branch and cid:
+            member_keys.add((branch, cid))
+    return member_keys
+
+
+def _normalize_members_for_details(members):
+    """Lower-cases the branch/cid/name keys so get_loan_balance_details_from_df can look members up."""
+    return [
+        {
+            'branch': member.get('branch') or member.get('BRANCH'),
+            'cid': member.get('cid') or member.get('CID'),
+            'name': member.get('name') or member.get('NAME', ''),
+            'type': member.get('type') or member.get('TYPE', '')
+        }
+        for member in members or [] if isinstance(member, dict)
+    ]
 
-        for csv_file in csv_files:
-            file_path = os.path.join(branch_aging_path, csv_file)
-            try:
-                # Explicitly set dtype for 'CID' and 'LOAN ACCT.' columns to string
-                # Also set low_memory=False to handle mixed types more efficiently during loading
-                df = pd.read_csv(file_path, encoding='utf-8', on_bad_lines='skip', low_memory=False, dtype={'CID': str, 'LOAN ACCT.': str})
-                df.columns = [col.upper() for col in df.columns] # Standardize column names
-                
-                # Add the original branch name (from the directory name, not normalized)
-                # This ensures the original casing/spacing is preserved for later output/matching
-                df['BRANCH'] = target_branch_dir_name 
-                
-                # Apply robust date parsing for the 'DATE' column (which is the filter target)
-                df['DATE_PARSED'] = df['DATE'].apply(parse_date_robust)
-                df['DISBDATE_PARSED'] = df['DISBDATE'].apply(parse_date_robust)
-                
-                # Drop rows where essential parsed dates (DISBDATE_PARSED or DATE_PARSED) couldn't be parsed
-                df.dropna(subset=['DISBDATE_PARSED', 'DATE_PARSED'], inplace=True)
-
-                # Apply date filter IMMEDIATELY after reading each DataFrame
-                if parsed_report_date:
-                    original_len = len(df) # Debugging print
-                    df = df[df['DATE_PARSED'] == parsed_report_date].copy() # Filter for exact match
-                    print(f"DOSRI Loan: Filtered {csv_file} by date. Original records: {original_len}, Records remaining: {len(df)}") # Debugging print
-
-                if not df.empty: # Only append if there's data after filtering
-                    all_aging_data_frames.append(df)
-
-            except UnicodeDecodeError:
-                try:
-                    df = pd.read_csv(file_path, encoding='latin-1', on_bad_lines='skip', low_memory=False, dtype={'CID': str, 'LOAN ACCT.': str})
-                    df.columns = [col.upper() for col in df.columns] # Standardize column names
-                    df['BRANCH'] = target_branch_dir_name
-                    
-                    df['DATE_PARSED'] = df['DATE'].apply(parse_date_robust)
-                    df['DISBDATE_PARSED'] = df['DISBDATE'].apply(parse_date_robust)
-                    df.dropna(subset=['DISBDATE_PARSED', 'DATE_PARSED'], inplace=True)
-
-                    if parsed_report_date:
-                        original_len = len(df) # Debugging print
-                        df = df[df['DATE_PARSED'] == parsed_report_date].copy() # Filter for exact match
-                        print(f"DOSRI Loan: Filtered {csv_file} (latin-1) by date. Original records: {original_len}, Records remaining: {len(df)}") # Debugging print
-
-                    if not df.empty:
-                        all_aging_data_frames.append(df)
-
-                except Exception as e:
-                    print(f"Error reading CSV '{csv_file}' with latin-1 encoding: {e}")
-                    pass # Continue to next file
-            except Exception as e:
-                print(f"Error reading CSV '{csv_file}': {e}")
-                pass # Continue to next file
-
-    if not all_aging_data_frames:
-        print("DOSRI Loan: No data frames left after initial file reading and date filtering.") # Debugging print
-        return jsonify({
-            "current_balance": 0.0,
-            "past_due_balance": 0.0,
-            "past_due_breakdown": past_due_breakdown,
-            "loan_balance_details": []
-        })
-
-    all_aging_data_combined = pd.concat(all_aging_data_frames, ignore_index=True)
-    # Clear list of DataFrames to free up memory
-    all_aging_data_frames = [] 
-    print(f"DOSRI Loan: Total records after initial file reading and date filtering: {len(all_aging_data_combined)}") # Debugging print
-
-
-    # Step 4: Centralize column cleaning and type conversions on the combined DataFrame
-    # (Most of this is now done per-file, but ensure consistency)
-    required_cols_aging = ['BRANCH', 'CID', 'BALANCE', 'DATE', 'AGING', 'LOAN ACCT.', 'PRODUCT', 'DISBDATE']
-    for col in required_cols_aging:
-        if col not in all_aging_data_combined.columns:
-            print(f"WARNING: Missing required column '{col}' in combined aging data. Adding as empty.")
-            all_aging_data_combined[col] = '' # Add missing columns as empty
-        if all_aging_data_combined[col].dtype == 'object': # Only apply to string/object columns
-            all_aging_data_combined[col] = all_aging_data_combined[col].astype(str).fillna('').str.strip()
-
-    # Convert BALANCE to numeric, handling potential non-numeric values
-    all_aging_data_combined['BALANCE'] = all_aging_data_combined['BALANCE'].astype(str).str.replace(',', '', regex=False)
-    all_aging_data_combined['BALANCE'] = pd.to_numeric(all_aging_data_combined['BALANCE'], errors='coerce')
-
-    # Re-check for NaT after concatenation if any new NaT values were introduced (unlikely if done per-file)
-    all_aging_data_combined.dropna(subset=['DISBDATE_PARSED', 'DATE_PARSED'], inplace=True)
-
-
-    # Step 5: Prepare DOSRI identifiers for efficient filtering
-    dosri_identifiers = set()
-    for member in dosri_members:
-        if isinstance(member, dict) and member.get('branch') and member.get('cid'): # Ensure both exist
-            # Use the original branch name (as stored in the member list) for comparison
-            branch = str(member['branch']).strip() 
-            cid = str(member['cid']).strip() 
-            # Create the normalized composite key for lookup
-            dosri_identifiers.add((branch.replace(' ', '').upper(), cid))
-
-    if not dosri_identifiers:
-        print("DOSRI Loan: No DOSRI identifiers found.") # Debugging print
-        return jsonify({
-            "current_balance": 0.0,
-            "past_due_balance": 0.0,
-            "past_due_breakdown": past_due_breakdown,
-            "loan_balance_details": []
-        })
-
-    # Create a composite key in the combined DataFrame for efficient filtering
-    # Normalize BRANCH for the composite key to match DOSRI list
-    all_aging_data_combined['NORMALIZED_BRANCH'] = all_aging_data_combined['BRANCH'].astype(str).str.strip().str.replace(' ', '').str.upper()
-    all_aging_data_combined['COMPOSITE_KEY'] = all_aging_data_combined['NORMALIZED_BRANCH'] + '_' + all_aging_data_combined['CID'].astype(str).str.strip()
-    
-    # Filter the combined DataFrame once for all relevant DOSRI members
-    # Reconstruct dosri_composite_keys for efficient lookup using the normalized (branch, cid) from dosri_identifiers
-    dosri_composite_keys = {f"{b}_{c}" for b, c in dosri_identifiers}
-
-    relevant_aging_data = all_aging_data_combined[
-        all_aging_data_combined['COMPOSITE_KEY'].isin(dosri_composite_keys)
-    ].copy()
-
-    # Drop the temporary composite keys
-    relevant_aging_data.drop(columns=['NORMALIZED_BRANCH', 'COMPOSITE_KEY'], errors='ignore', inplace=True)
-    all_aging_data_combined.drop(columns=['NORMALIZED_BRANCH', 'COMPOSITE_KEY'], errors='ignore', inplace=True)
-
-    print(f"DOSRI Loan: Records after DOSRI member filter: {len(relevant_aging_data)}") # Debugging print
-
-    if relevant_aging_data.empty:
-        return jsonify({
-            "current_balance": 0.0,
-            "past_due_balance": 0.0,
-            "past_due_breakdown": past_due_breakdown,
-            "loan_balance_details": []
-        })
 
-    # Find the latest record for each (Branch, CID, LOAN ACCT.) combination to ensure unique loan entry
-    # Sort by 'DATE_PARSED' (which is the 'DATE' header from the CSV) descending to get the latest record for a unique loan.
-    sort_cols = ['BRANCH', 'CID', 'LOAN ACCT.', 'DATE_PARSED']
-    existing_sort_cols = [col for col in relevant_aging_data.columns if col in sort_cols] # Filter for existing columns
-    
-    if len(existing_sort_cols) < 4:
-        print(f"WARNING: Not all sort columns found in relevant_aging_data for final deduplication. Found: {existing_sort_cols}")
-        sort_by_cols = existing_sort_cols
-        ascending_order = [True] * (len(existing_sort_cols)-1) + [False] if existing_sort_cols else []
-    else:
-        sort_by_cols = sort_cols
-        ascending_order = [True] * (len(sort_cols)-1) + [False]
-        
-    if not sort_by_cols: # If no valid sort columns, skip sorting and deduplication
-        latest_records_idx = relevant_aging_data.copy()
-    else:
-        latest_records_idx = relevant_aging_data.sort_values(
-            by=sort_by_cols,
-            ascending=ascending_order
-        ).drop_duplicates(subset=['BRANCH', 'CID', 'LOAN ACCT.'], keep='first')
-
-    # Filter out loans with zero or NaN balance after getting the latest record
-    latest_records_idx['BALANCE_NUM'] = pd.to_numeric(latest_records_idx['BALANCE'], errors='coerce')
-    latest_records_idx = latest_records_idx[latest_records_idx['BALANCE_NUM'] != 0].copy()
-    latest_records_idx.dropna(subset=['BALANCE_NUM'], inplace=True) # Remove rows where balance is NaN
-    
-    # Drop the temporary numeric balance column
-    latest_records_idx.drop(columns=['BALANCE_NUM'], errors='ignore', inplace=True)
+def fetch_member_loan_records(member_keys, report_date=None):
+    """
+    Fetches the latest aging record of every loan held by the given (normalized branch, CID)
+    keys with one query on aging_report_data, served by the (Branch, CID, Date) index.
+    If report_date ('YYYY-MM-DD') is valid only that date is read; otherwise the latest
+    record per loan across all dates is used.
 
-    print(f"DOSRI Loan: Records after deduplication and zero balance filter: {len(latest_records_idx)}") # Debugging print
+    Returns a DataFrame with the aging CSV column names used by the DOSRI reports
+    (BRANCH, CID, LOAN ACCT., BALANCE, AGING, PRODUCT, DATE, DISBDATE) plus MEMBER_KEY.
+    """
+    if not member_keys:
+        return pd.DataFrame()
+
+    # Member lists store branches without spaces; resolve them to the stored Branch values
+    branches_df = get_data_from_mysql("SELECT DISTINCT Branch FROM aging_report_data")
+    if branches_df.empty:
+        print("DOSRI Loan: No branches found in aging_report_data.")
+        return pd.DataFrame()
+    wanted_branches = {branch for branch, _ in member_keys}
+    db_branches = [
+        branch for branch in branches_df['Branch'].dropna().astype(str)
+        if branch.strip().replace(' ', '').upper() in wanted_branches
+    ]
+    if not db_branches:
+        print(f"DOSRI Loan: None of the member branches {sorted(wanted_branches)} exist in aging_report_data.")
+        return pd.DataFrame()
+
+    params = {'branches': db_branches, 'cids': sorted({cid for _, cid in member_keys})}
+    date_condition = ""
+    if report_date:
+        try:
+            params['report_date'] = datetime.strptime(report_date, '%Y-%m-%d').strftime('%Y-%m-%d')
+            date_condition = "AND Date = :report_date"
+        except ValueError:
+            print(f"Warning: Invalid report_date format received: {report_date}. Skipping date filter for member loans.")
 
+    query = f"""
+        SELECT Branch, CID, Loan_Account, Balance, Aging, Product, Date, Disbursement_Date
+        FROM aging_report_data
+        WHERE Branch IN :branches AND CID IN :cids {date_condition}
+    """
+    df = get_data_from_mysql(query, params=params, schema='aging')
+    if df.empty:
+        return df
 
-    # Calculate total current and past due balances from these latest records
-    for _, record in latest_records_idx.iterrows():
-        balance = pd.to_numeric(record['BALANCE'], errors='coerce') # Re-parse to ensure numeric after filtering
-        aging_status = str(record['AGING']).strip().upper()
+    df.rename(columns={
+        'Branch': 'BRANCH', 'Loan_Account': 'LOAN ACCT.', 'Balance': 'BALANCE', 'Aging': 'AGING',
+        'Product': 'PRODUCT', 'Date': 'DATE', 'Disbursement_Date': 'DISBDATE'
+    }, inplace=True)
+    for col in ['BRANCH', 'AGING', 'PRODUCT']:
+        df[col] = df[col].astype(str).str.strip()
+    df['CID'] = df['CID'].astype(str).str.strip()
+    df['LOAN ACCT.'] = df['LOAN ACCT.'].astype(str).str.strip()
+    df.dropna(subset=['DATE', 'DISBDATE'], inplace=True)
+
+    # Branch IN x CID IN is a superset of the member pairs; keep the exact pairs only
+    df['MEMBER_KEY'] = list(zip(df['BRANCH'].str.replace(' ', '', regex=False).str.upper(), df['CID']))
+    df = df[df['MEMBER_KEY'].isin(member_keys)]
+
+    # Latest record for each (Branch, CID, LOAN ACCT.) loan, then drop zero/NaN balances
+    df = df.sort_values(by=['BRANCH', 'CID', 'LOAN ACCT.', 'DATE'], ascending=[True, True, True, False]) \
+           .drop_duplicates(subset=['BRANCH', 'CID', 'LOAN ACCT.'], keep='first')
+    df = df[df['BALANCE'].notna() & (df['BALANCE'] != 0)].copy()
+    return df
+
+
+def summarize_member_loan_exposure(loan_records, members, log_prefix):
+    """Totals current/past due balances (with the past due breakdown) and builds the detail rows."""
+    summary = _empty_loan_exposure()
+    if loan_records.empty:
+        return summary
+
+    aging_status = loan_records['AGING'].str.upper()
+    is_current = aging_status == 'NOT YET DUE'
+    summary['current_balance'] = round(float(loan_records.loc[is_current, 'BALANCE'].sum()), 2)
+    summary['past_due_balance'] = round(float(loan_records.loc[~is_current, 'BALANCE'].sum()), 2)
+
+    buckets = aging_status[~is_current].map(PAST_DUE_BUCKET_MAP)
+    unknown_statuses = aging_status[~is_current][buckets.isna()].unique()
+    for status in unknown_statuses:
+        print(f"WARNING: Unknown aging status encountered ({log_prefix}): '{status}'. Balance not categorized.")
+    bucket_totals = loan_records.loc[~is_current, 'BALANCE'].groupby(buckets).sum()
+    for bucket, total in bucket_totals.items():
+        summary['past_due_breakdown'][bucket] = round(float(total), 2)
+
+    summary['loan_balance_details'] = get_loan_balance_details_from_df(loan_records.copy(), _normalize_members_for_details(members))
+    print(f"{log_prefix}: {len(loan_records)} loans after deduplication and zero balance filter.")
+    return summary
+
+
+def get_member_loan_exposure(dosri_members=None, form_emp_members=None, report_date=None):
+    """
+    Computes the loan exposure of DOSRI and Former Employee members in one pass: the union of
+    both member lists is resolved with a single aging_report_data query, then split per list.
 
-        if pd.isna(balance): # Should not happen after previous dropna, but good safeguard
-            continue
+    Returns:
+        dict: {'dosri': {...}, 'form_emp': {...}}, each with current_balance, past_due_balance,
+              past_due_breakdown and loan_balance_details.
+    """
+    dosri_keys = _member_loan_keys(dosri_members)
+    form_emp_keys = _member_loan_keys(form_emp_members)
 
-        if aging_status == 'NOT YET DUE':
-            total_current_balance += balance
-        else:
-            total_past_due_balance += balance
-            # Categorize into aging buckets based on exact match or 'in' check
-            if aging_status == '1-30 DAYS':
-                past_due_breakdown['1-30 DAYS'] += balance
-            elif aging_status == '31-60 DAYS' or aging_status == '31-60': # Catch both forms
-                past_due_breakdown['31-60 DAYS'] += balance
-            elif aging_status == '61-90 DAYS' or aging_status == '61-90':
-                past_due_breakdown['61-90 DAYS'] += balance
-            elif aging_status == '91-120 DAYS' or aging_status == '91-120':
-                past_due_breakdown['91-120 DAYS'] += balance
-            elif aging_status == '121-180 DAYS' or aging_status == '121-180':
-                past_due_breakdown['121-180 DAYS'] += balance
-            elif aging_status == '181-365 DAYS' or aging_status == '181-365':
-                past_due_breakdown['181-365 DAYS'] += balance
-            elif aging_status == 'OVER 365 DAYS' or aging_status == 'OVER 365':
-                past_due_breakdown['OVER 365 DAYS'] += balance
-            else:
-                print(f"WARNING: Unknown aging status encountered: '{aging_status}'. Balance {balance} not categorized.")
-                pass # Continue processing
+    loan_records = fetch_member_loan_records(dosri_keys | form_emp_keys, report_date)
+    print(f"Member Loan Exposure: {len(loan_records)} loan records fetched for {len(dosri_keys)} DOSRI and {len(form_emp_keys)} Former Employee keys.")
 
-    # Get detailed loan balance information
-    # Pass 'latest_records_idx' which contains the unique and latest loan records for details
-    loan_balance_details = get_loan_balance_details_from_df(latest_records_idx, dosri_members)
+    result = {}
+    for label, keys, members, log_prefix in (
+        ('dosri', dosri_keys, dosri_members, 'DOSRI Loan'),
+        ('form_emp', form_emp_keys, form_emp_members, 'Former Employee Loan')
+    ):
+        records = loan_records[loan_records['MEMBER_KEY'].isin(keys)] if not loan_records.empty else loan_records
+        result[label] = summarize_member_loan_exposure(records, members, log_prefix)
+    return result
 
-    # Round all balances in breakdown
-    for key in past_due_breakdown:
-        past_due_breakdown[key] = round(past_due_breakdown[key], 2)
 
-    return jsonify({
-        "current_balance": round(total_current_balance, 2),
-        "past_due_balance": round(total_past_due_balance, 2),
-        "past_due_breakdown": past_due_breakdown, # Return breakdown
-        "loan_balance_details": loan_balance_details # Return detailed data
-    })
+# --- API Route: Process DOSRI Loan Balances (reads aging_report_data) ---
+# This route would typically be part of your main app.py or a blueprint.
+# @app.route('/api/dosri/loan_balances', methods=['POST'])
+def process_dosri_loan_balances(dosri_members, report_date=None): # Added report_date parameter
+    """
+    Processes loan data for DOSRI members from the aging_report_data table.
+    Calculates current and past due balances for each DOSRI member, including
+    a breakdown of past due amounts by aging buckets.
+    The latest record for each loan account is determined by the aging Date.
+    Filters loan data to the provided report_date (YYYY-MM-DD) when given.
+    """
+    return jsonify(get_member_loan_exposure(dosri_members=dosri_members, report_date=report_date)['dosri'])
 
 # --- API Route: Process DOSRI Deposit Liabilities (Reads CSVs/XLSX) ---
 # This route would typically be part of your main app.py or a blueprint.
@@ -1137,294 +1007,20 @@ def process_dosri_deposit_liabilities(dosri_members, report_date=None): # report
     })
 
 
-# --- API Route: Process Former Employee Loan Balances (Reads CSVs) ---
+# --- API Route: Process Former Employee Loan Balances (reads aging_report_data) ---
 # This route would typically be part of your main app.py or a blueprint.
 # @app.route('/api/form_emp/loan_balances', methods=['POST'])
 def process_form_emp_loan_balances(form_emp_members, report_date=None): # Added report_date
     """
-    Processes loan data for Former Employee members from CSV files in the AGING_PATH.
+    Processes loan data for Former Employee members from the aging_report_data table.
     Calculates current and past due balances for each Former Employee member, including
     a breakdown of past due amounts by aging buckets.
-    The latest record for each loan account is determined by the 'DATE' header in CSVs.
-    Filters loan data based on the provided report_date (inclusive).
+    The latest record for each loan account is determined by the aging Date.
+    Filters loan data to the provided report_date (YYYY-MM-DD) when given.
     """
-    if not form_emp_members:
-        return jsonify({
-            "current_balance": 0.0,
-            "past_due_balance": 0.0,
-            "past_due_breakdown": {
-                "1-30 DAYS": 0.0, "31-60 DAYS": 0.0, "61-90 DAYS": 0.0,
-                "91-120 DAYS": 0.0, "121-180 DAYS": 0.0, "181-365 DAYS": 0.0,
-                "OVER 365 DAYS": 0.0
-            },
-            "loan_balance_details": []
-        })
-
-    total_current_balance = 0.0
-    total_past_due_balance = 0.0
-    past_due_breakdown = {
-        "1-30 DAYS": 0.0,
-        "31-60 DAYS": 0.0,
-        "61-90 DAYS": 0.0,
-        "91-120 DAYS": 0.0,
-        "121-180 DAYS": 0.0,
-        "181-365 DAYS": 0.0,
-        "OVER 365 DAYS": 0.0 # Corrected typo from original
-    }
-
-    # Parse report_date if provided
-    parsed_report_date = None
-    if report_date:
-        try:
-            parsed_report_date = datetime.strptime(report_date, '%Y-%m-%d')
-            print(f"Former Employee Loan: Report date received and parsed: {parsed_report_date}") # Debugging print
-        except ValueError:
-            print(f"Warning: Invalid report_date format received: {report_date}. Skipping date filter for former employee loans.")
-
-
-    actual_loan_dirs = {}
-    if os.path.isdir(AGING_PATH): # Loan data for former employees also uses AGING_PATH
-        for d_name in os.listdir(AGING_PATH):
-            full_path = os.path.join(AGING_PATH, d_name)
-            if os.path.isdir(full_path):
-                actual_loan_dirs[d_name.strip().replace(' ', '').upper()] = d_name
-    else:
-        print(f"ERROR: AGING_PATH '{AGING_PATH}' does not exist or is not a directory for former employee loans.")
-        return jsonify({
-            "current_balance": 0.0,
-            "past_due_balance": 0.0,
-            "past_due_breakdown": past_due_breakdown,
-            "loan_balance_details": []
-        })
-
-    all_loan_data_frames = [] # Changed to list for appending DataFrames
-    
-    processed_branches_for_aging_form_emp = set()
-    for member in form_emp_members:
-        if not isinstance(member, dict):
-            continue
-
-        # Use .get with default and then .strip().replace(' ', '').upper() for robustness
-        branch_raw = member.get('branch') or member.get('BRANCH') # Try both casings
-        branch = str(branch_raw).strip() if branch_raw else ''
-        normalized_branch_from_form_emp_list = branch.replace(' ', '').upper()
-        
-        target_branch_dir_name = actual_loan_dirs.get(normalized_branch_from_form_emp_list)
-        
-        if not target_branch_dir_name:
-            continue
-
-        if normalized_branch_from_form_emp_list in processed_branches_for_aging_form_emp:
-            continue
-        processed_branches_for_aging_form_emp.add(normalized_branch_from_form_emp_list)
-        
-        branch_loan_path = os.path.join(AGING_PATH, target_branch_dir_name)
-
-        csv_files = [f for f in os.listdir(branch_loan_path) if f.lower().endswith('.csv')]
-
-        if not csv_files:
-            continue
-
-        for csv_file in csv_files:
-            file_path = os.path.join(branch_loan_path, csv_file)
-            try:
-                df = pd.read_csv(file_path, encoding='utf-8', on_bad_lines='skip', low_memory=False, dtype={'CID': str, 'LOAN ACCT.': str})
-                df.columns = [col.upper() for col in df.columns]
-                
-                if 'CID' in df.columns:
-                    df['CID'] = df['CID'].astype(str).fillna('').str.strip()
-                if 'BALANCE' in df.columns:
-                    df['BALANCE'] = df['BALANCE'].astype(str).str.replace(',', '', regex=False)
-                    df['BALANCE'] = pd.to_numeric(df['BALANCE'], errors='coerce')
-                df['BRANCH'] = branch # Use the original branch name from Former Emp list
-                
-                # Apply robust date parsing
-                df['DATE_PARSED'] = df['DATE'].apply(parse_date_robust)
-                df['DISBDATE_PARSED'] = df['DISBDATE'].apply(parse_date_robust)
-                df.dropna(subset=['DISBDATE_PARSED', 'DATE_PARSED'], inplace=True)
-
-                # Apply date filter IMMEDIATELY after reading each DataFrame
-                if parsed_report_date:
-                    original_len = len(df) # Debugging print
-                    print(f"Former Employee Loan: Unique dates in {csv_file} before filter: {df['DATE_PARSED'].unique()}") # Debugging print
-                    df = df[df['DATE_PARSED'] == parsed_report_date].copy() # Filter for exact match
-                    print(f"Former Employee Loan: Filtered {csv_file} by date. Original records: {original_len}, Records remaining: {len(df)}") # Debugging print
-
-                if not df.empty: # Only append if there's data after filtering
-                    all_loan_data_frames.append(df)
-
-            except UnicodeDecodeError:
-                print(f"WARNING: UTF-8 decoding failed for '{csv_file}', trying latin-1...")
-                try:
-                    df = pd.read_csv(file_path, encoding='latin-1', on_bad_lines='skip', low_memory=False, dtype={'CID': str, 'LOAN ACCT.': str})
-                    df.columns = [col.upper() for col in df.columns]
-                    if 'CID' in df.columns:
-                        df['CID'] = df['CID'].astype(str).fillna('').str.strip()
-                    if 'BALANCE' in df.columns:
-                        df['BALANCE'] = df['BALANCE'].astype(str).str.replace(',', '', regex=False)
-                        df['BALANCE'] = pd.to_numeric(df['BALANCE'], errors='coerce')
-                    df['BRANCH'] = branch
-                    
-                    df['DATE_PARSED'] = df['DATE'].apply(parse_date_robust)
-                    df['DISBDATE_PARSED'] = df['DISBDATE'].apply(parse_date_robust)
-                    df.dropna(subset=['DISBDATE_PARSED', 'DATE_PARSED'], inplace=True)
-
-                    if parsed_report_date:
-                        original_len = len(df) # Debugging print
-                        print(f"Former Employee Loan: Unique dates in {csv_file} (latin-1) before filter: {df['DATE_PARSED'].unique()}") # Debugging print
-                        df = df[df['DATE_PARSED'] == parsed_report_date].copy() # Filter for exact match
-                        print(f"Former Employee Loan: Filtered {csv_file} (latin-1) by date. Original records: {original_len}, Records remaining: {len(df)}") # Debugging print
-
-                    if not df.empty:
-                        all_loan_data_frames.append(df)
-
-                except Exception as e:
-                    print(f"Error reading CSV '{csv_file}' with latin-1 encoding: {e}")
-                    pass
-            except Exception as e:
-                print(f"Error reading CSV '{csv_file}': {e}")
-                pass
-
-    if not all_loan_data_frames: # Check if list is empty
-        print("Former Employee Loan: No data frames left after initial file reading and date filtering.") # Debugging print
-        return jsonify({
-            "current_balance": 0.0,
-            "past_due_balance": 0.0,
-            "past_due_breakdown": past_due_breakdown,
-            "loan_balance_details": []
-        })
-
-    all_loan_data_combined = pd.concat(all_loan_data_frames, ignore_index=True) # Concatenate after loop
-    all_loan_data_frames = [] # Clear list to free memory
-    print(f"Former Employee Loan: Total records after initial file reading and date filtering: {len(all_loan_data_combined)}") # Debugging print
-
-
-    required_cols_form_emp_loan = ['BRANCH', 'CID', 'BALANCE', 'DATE', 'AGING', 'LOAN ACCT.', 'PRODUCT', 'DISBDATE']
-    for col in required_cols_form_emp_loan:
-        if col not in all_loan_data_combined.columns:
-            print(f"WARNING: Missing required column '{col}' in combined former employee loan data. Adding as empty.")
-            all_loan_data_combined[col] = '' # Add missing columns as empty
-        if all_loan_data_combined[col].dtype == 'object': # Only apply to string/object columns
-            all_loan_data_combined[col] = all_loan_data_combined[col].astype(str).fillna('').str.strip()
-
-    # Re-check for NaT after concatenation if any new NaT values were introduced (unlikely if done per-file)
-    all_loan_data_combined.dropna(subset=['DISBDATE_PARSED', 'DATE_PARSED'], inplace=True)
+    return jsonify(get_member_loan_exposure(form_emp_members=form_emp_members, report_date=report_date)['form_emp'])
 
 
-    form_emp_identifiers = set()
-    for member in form_emp_members:
-        if not isinstance(member, dict):
-            continue
-        branch_raw = member.get('branch') or member.get('BRANCH') # Using get('branch') first, then get('BRANCH')
-        branch = str(branch_raw).strip().replace(' ', '').upper() if branch_raw else ''
-        cid_raw = member.get('cid') or member.get('CID') # Using get('cid') first, then get('CID')
-        cid = str(cid_raw).strip() if cid_raw else ''
-        if branch and cid:
-            form_emp_identifiers.add((branch, cid))
-    
-    if not form_emp_identifiers:
-        print("Former Employee Loan: No Former Employee identifiers found.") # Debugging print
-        return jsonify({
-            "current_balance": 0.0,
-            "past_due_balance": 0.0,
-            "past_due_breakdown": past_due_breakdown,
-            "loan_balance_details": []
-        })
-
-    all_loan_data_combined['NORMALIZED_BRANCH'] = all_loan_data_combined['BRANCH'].astype(str).str.strip().str.replace(' ', '').str.upper()
-    all_loan_data_combined['COMPOSITE_KEY'] = all_loan_data_combined['NORMALIZED_BRANCH'] + '_' + all_loan_data_combined['CID'].astype(str).str.strip()
-    
-    form_emp_composite_keys = {f"{branch}_{cid}" for branch, cid in form_emp_identifiers}
-
-    relevant_loan_data = all_loan_data_combined[
-        all_loan_data_combined['COMPOSITE_KEY'].isin(form_emp_composite_keys)
-    ].copy()
-
-    relevant_loan_data.dropna(subset=['DISBDATE_PARSED', 'DATE_PARSED'], inplace=True)
-
-    print(f"Former Employee Loan: Records after member filter: {len(relevant_loan_data)}") # Debugging print
-
-    if relevant_loan_data.empty:
-        return jsonify({
-            "current_balance": 0.0,
-            "past_due_balance": 0.0,
-            "past_due_breakdown": past_due_breakdown,
-            "loan_balance_details": []
-        })
-
-    # Find the latest record for each (Branch, CID, LOAN ACCT.) combination to ensure unique loan entry
-    # Sort by 'DATE_PARSED' (which is the DUE DATE from the CSV) descending to get the latest record for a unique loan.
-    sort_cols = ['BRANCH', 'CID', 'LOAN ACCT.', 'DATE_PARSED']
-    existing_sort_cols = [col for col in relevant_loan_data.columns if col in sort_cols] # Filter for existing columns
-    
-    if len(existing_sort_cols) < 4:
-        print(f"WARNING: Not all sort columns found in relevant_loan_data for final deduplication. Found: {existing_sort_cols}")
-        sort_by_cols = existing_sort_cols
-        ascending_order = [True] * (len(existing_sort_cols)-1) + [False] if existing_sort_cols else []
-    else:
-        sort_by_cols = sort_cols
-        ascending_order = [True] * (len(sort_cols)-1) + [False]
-        
-    if not sort_by_cols: # If no valid sort columns, skip sorting and deduplication
-        latest_records_idx = relevant_loan_data.copy()
-    else:
-        latest_records_idx = relevant_loan_data.sort_values(
-            by=sort_by_cols,
-            ascending=ascending_order
-        ).drop_duplicates(subset=['BRANCH', 'CID', 'LOAN ACCT.'], keep='first')
-
-    # Filter out loans with zero or NaN balance after getting the latest record
-    latest_records_idx['BALANCE_NUM'] = pd.to_numeric(latest_records_idx['BALANCE'], errors='coerce')
-    latest_records_idx = latest_records_idx[latest_records_idx['BALANCE_NUM'] != 0].copy()
-    latest_records_idx.dropna(subset=['BALANCE_NUM'], inplace=True) # Remove rows where balance is NaN
-    
-    # Drop the temporary numeric balance column
-    latest_records_idx.drop(columns=['BALANCE_NUM'], errors='ignore', inplace=True)
-
-    print(f"Former Employee Loan: Records after deduplication and zero balance filter: {len(latest_records_idx)}") # Debugging print
-
-
-    for _, record in latest_records_idx.iterrows():
-        balance = pd.to_numeric(record['BALANCE'], errors='coerce') # Re-parse to ensure numeric after filtering
-        aging_status = str(record['AGING']).strip().upper()
-
-        if pd.isna(balance): # Should not happen after previous dropna, but good safeguard
-            continue
-
-        if aging_status == 'NOT YET DUE':
-            total_current_balance += balance
-        else:
-            total_past_due_balance += balance
-            if aging_status == '1-30 DAYS':
-                past_due_breakdown['1-30 DAYS'] += balance
-            elif aging_status == '31-60 DAYS' or aging_status == '31-60':
-                past_due_breakdown['31-60 DAYS'] += balance
-            elif aging_status == '61-90 DAYS' or aging_status == '61-90':
-                past_due_breakdown['61-90 DAYS'] += balance
-            elif aging_status == '91-120 DAYS' or aging_status == '91-120':
-                past_due_breakdown['91-120 DAYS'] += balance
-            elif aging_status == '121-180 DAYS' or aging_status == '121-180':
-                past_due_breakdown['121-180 DAYS'] += balance
-            elif aging_status == '181-365 DAYS' or aging_status == '181-365':
-                past_due_breakdown['181-365 DAYS'] += balance
-            elif aging_status == 'OVER 365 DAYS' or aging_status == 'OVER 365':
-                past_due_breakdown['OVER 365 DAYS'] += balance
-            else:
-                print(f"WARNING: Unknown aging status encountered for former employee: '{aging_status}'. Balance {balance} not categorized.")
-                pass
-
-    loan_balance_details = get_loan_balance_details_from_df(latest_records_idx, form_emp_members)
-
-    for key, value in past_due_breakdown.items():
-        past_due_breakdown[key] = round(value, 2)
-
-    return jsonify({
-        "current_balance": round(total_current_balance, 2),
-        "past_due_balance": round(total_past_due_balance, 2),
-        "past_due_breakdown": past_due_breakdown,
-        "loan_balance_details": loan_balance_details
-    })
-
 # --- API Route: Process Former Employee Deposit Liabilities (Reads CSVs/XLSX) ---
 # @app.route('/api/form_emp/deposit_liabilities', methods=['POST'])
 def process_form_emp_deposit_liabilities(form_emp_members, report_date=None): # report_date parameter kept for consistency, but not used for filtering
@@ -6,7 +6,7 @@ import re
 from dateutil.relativedelta import relativedelta # For month arithmetic
 
 # Import database connection helper
-from backend.db_common import get_data_from_mysql, get_db_connection, AREA_BRANCH_MAP
+from backend.db_common import get_data_from_mysql, iter_data_from_mysql, get_db_connection, normalize_text_series, AREA_BRANCH_MAP, AGING_ROLLUP_TABLE, AGING_ROLLUP_ACCOUNTS_TABLE
 import traceback # Import traceback for detailed error logging
 
 
@@ -108,6 +108,123 @@ def get_aging_names_and_cids(selected_branches, selected_date=None): # Added sel
     return result_list
 
 
+def _build_aging_summary_query(use_rollup, has_report_date):
+    """
+    Builds the single-row aggregation used by get_aging_summary_data.
+
+    Every figure is a conditional aggregate over the normalized Aging bucket. Account counts are
+    distinct loan accounts per branch, added up across the selected branches. With use_rollup the
+    balances come from aging_rollup and the counts from aging_rollup_accounts, and no
+    aging_report_data row is aggregated: the query only probes idx_aging_branch_date for which
+    branches have raw rows on the report date (source_branches, against rollup_branches) and, for
+    the latest date, whether any raw date is newer (newer_source_date), so the caller can tell a
+    stale or unbuilt rollup.
+    The report date is either the bound :report_date or the latest date for :branches.
+    """
+    # COALESCE keeps NULL Aging values on the past-due side, as the pandas version did
+    raw_bucket = "UPPER(TRIM(COALESCE(a.Aging, '')))"
+
+    def bucket_conditions(bucket):
+        return {
+            'current': f"{bucket} = 'NOT YET DUE'",
+            'past_due': f"{bucket} <> 'NOT YET DUE'",
+            '1_365': f"{bucket} IN ('1-30 DAYS', '31-60', '61-90', '91-120', '121-180', '181-365')",
+            'over_365': f"{bucket} = 'OVER 365'",
+        }
+
+    def balance_columns(bucket, balance):
+        conditions = bucket_conditions(bucket)
+        return f"""
+            COALESCE(SUM(CASE WHEN {conditions['current']} THEN {balance} END), 0) AS current_balance,
+            COALESCE(SUM(CASE WHEN {conditions['past_due']} THEN {balance} END), 0) AS past_due_balance,
+            COALESCE(SUM({balance}), 0) AS total_balance,
+            COALESCE(SUM(CASE WHEN {conditions['1_365']} THEN {balance} END), 0) AS provision_1_365_raw_balance,
+            COALESCE(SUM(CASE WHEN {conditions['over_365']} THEN {balance} END), 0) AS provision_over_365_balance"""
+
+    summary_columns = ['current_accounts_count', 'past_due_accounts_count', 'total_accounts_count',
+                       'provision_1_365_accounts_count', 'provision_over_365_accounts_count',
+                       'current_balance', 'past_due_balance', 'total_balance',
+                       'provision_1_365_raw_balance', 'provision_over_365_balance']
+
+    if has_report_date:
+        report_date_source = "SELECT CAST(:report_date AS DATE) AS report_date"
+    else:
+        # No date provided (or it was invalid): resolve the latest date in the same round trip
+        date_table = AGING_ROLLUP_ACCOUNTS_TABLE if use_rollup else "aging_report_data"
+        report_date_source = f"SELECT MAX(Date) AS report_date FROM {date_table} WHERE Branch IN :branches"
+
+    if not use_rollup:
+        conditions = bucket_conditions(raw_bucket)
+        # Per-branch aggregates first, so accounts are counted per branch as in aging_rollup_accounts
+        return f"""
+            WITH d AS ({report_date_source})
+            SELECT
+                d.report_date AS report_date,
+                {", ".join(f"COALESCE(SUM(p.{column}), 0) AS {column}" for column in summary_columns)}
+            FROM d
+            LEFT JOIN (
+                SELECT
+                    a.Branch,
+                    COUNT(DISTINCT CASE WHEN {conditions['current']} THEN a.Loan_Account END) AS current_accounts_count,
+                    COUNT(DISTINCT CASE WHEN {conditions['past_due']} THEN a.Loan_Account END) AS past_due_accounts_count,
+                    COUNT(DISTINCT a.Loan_Account) AS total_accounts_count,
+                    COUNT(DISTINCT CASE WHEN {conditions['1_365']} THEN a.Loan_Account END) AS provision_1_365_accounts_count,
+                    COUNT(DISTINCT CASE WHEN {conditions['over_365']} THEN a.Loan_Account END) AS provision_over_365_accounts_count,
+                    {balance_columns(raw_bucket, "a.Balance")}
+                FROM d
+                JOIN aging_report_data a
+                    ON a.Date = d.report_date
+                    AND a.Branch IN :branches
+                GROUP BY a.Branch
+            ) p ON 1 = 1
+            GROUP BY d.report_date
+        """
+
+    if has_report_date:
+        newer_source_date = "0"
+    else:
+        newer_source_date = "EXISTS (SELECT 1 FROM aging_report_data a WHERE a.Branch IN :branches AND a.Date > d.report_date)"
+
+    # Each derived table aggregates without GROUP BY, so each yields exactly one row
+    return f"""
+        WITH d AS ({report_date_source})
+        SELECT
+            d.report_date AS report_date,
+            c.*,
+            b.*,
+            (SELECT COUNT(*) FROM (
+                SELECT a.Branch
+                FROM d
+                JOIN aging_report_data a
+                    ON a.Date = d.report_date
+                    AND a.Branch IN :branches
+                GROUP BY a.Branch
+            ) s) AS source_branches,
+            {newer_source_date} AS newer_source_date
+        FROM d
+        CROSS JOIN (
+            SELECT
+                COUNT(r.Branch) AS rollup_branches,
+                COALESCE(SUM(r.Current_Accounts), 0) AS current_accounts_count,
+                COALESCE(SUM(r.Past_Due_Accounts), 0) AS past_due_accounts_count,
+                COALESCE(SUM(r.Total_Accounts), 0) AS total_accounts_count,
+                COALESCE(SUM(r.Provision_1_365_Accounts), 0) AS provision_1_365_accounts_count,
+                COALESCE(SUM(r.Provision_Over_365_Accounts), 0) AS provision_over_365_accounts_count
+            FROM d
+            JOIN {AGING_ROLLUP_ACCOUNTS_TABLE} r
+                ON r.Date = d.report_date
+                AND r.Branch IN :branches
+        ) c
+        CROSS JOIN (
+            SELECT {balance_columns("a.Aging_Bucket", "a.Balance_Sum")}
+            FROM d
+            JOIN {AGING_ROLLUP_TABLE} a
+                ON a.Date = d.report_date
+                AND a.Branch IN :branches
+        ) b
+    """
+
+
 def get_aging_summary_data(selected_branches, selected_date=None): # Added selected_date
     """
     Fetches Aging Report data from MySQL and calculates
@@ -135,16 +252,16 @@ def get_aging_summary_data(selected_branches, selected_date=None): # Added selec
     else:
         actual_branches_to_process = selected_branches
 
+    empty_summary = {"TOTAL CURRENT BALANCE": 0.0, "TOTAL PAST DUE": 0.0, "TOTAL Both Current and Past Due": 0.0, "AS OF DATE": "",
+                     "CURRENT_ACCOUNTS_COUNT": 0, "PAST_DUE_ACCOUNTS_COUNT": 0, "TOTAL_ACCOUNTS_COUNT": 0,
+                     "DELINQUENCY_RATE": 0.0, "PROVISION_1_365_DAYS_BALANCE": 0.0, "PROVISION_1_365_DAYS_ACCOUNTS_COUNT": 0,
+                     "PROVISION_OVER_365_DAYS_BALANCE": 0.0, "PROVISION_OVER_365_DAYS_ACCOUNTS_COUNT": 0,
+                     "TOTAL_PROVISIONS": 0.0}
+
     if not actual_branches_to_process:
         print("Server Log (Operations Aging Summary): No specific branches resolved for summary data.")
-        return {"TOTAL CURRENT BALANCE": 0.0, "TOTAL PAST DUE": 0.0, "TOTAL Both Current and Past Due": 0.0, "AS OF DATE": "",
-                "CURRENT_ACCOUNTS_COUNT": 0, "PAST_DUE_ACCOUNTS_COUNT": 0, "TOTAL_ACCOUNTS_COUNT": 0,
-                "DELINQUENCY_RATE": 0.0, "PROVISION_1_365_DAYS_BALANCE": 0.0, "PROVISION_1_365_DAYS_ACCOUNTS_COUNT": 0,
-                "PROVISION_OVER_365_DAYS_BALANCE": 0.0, "PROVISION_OVER_365_DAYS_ACCOUNTS_COUNT": 0,
-                "TOTAL_PROVISIONS": 0.0}
+        return dict(empty_summary)
 
-    branch_conditions = ", ".join([f"'{branch}'" for branch in actual_branches_to_process])
-    
     report_date = None
 
     if selected_date:
@@ -155,142 +272,52 @@ def get_aging_summary_data(selected_branches, selected_date=None): # Added selec
             print(f"Server Log (Operations Aging Summary): Invalid selected_date format: {selected_date}. Attempting to find latest date.")
             selected_date = None # Fallback to finding latest if format is bad
 
-    if not selected_date: # If no date was provided or it was invalid, find the latest
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            latest_date_query = f"""
-                SELECT MAX(Date) AS latest_date
-                FROM aging_report_data
-                WHERE Branch IN ({branch_conditions})
-            """
-            cursor.execute(latest_date_query)
-            result = cursor.fetchone() # Fetch a single row (dictionary due to DictCursor)
-
-            if result and result['latest_date'] is not None:
-                raw_latest_date = result['latest_date']
-                # Ensure it's a datetime.date object (PyMySQL usually returns this directly for DATE columns)
-                if isinstance(raw_latest_date, datetime.date):
-                    report_date = raw_latest_date
-                elif isinstance(raw_latest_date, str):
-                    # If for some reason it's a string, try to parse it
-                    report_date = pd.to_datetime(raw_latest_date, errors='coerce').date() # Convert to date object
-                
-                if report_date is None or pd.isna(report_date): # Check for None or NaT after parsing
-                    print(f"Server Log (Operations Aging Summary): Failed to parse latest_date from raw: '{raw_latest_date}'. Returning default summary.")
-                    return {"TOTAL CURRENT BALANCE": 0.0, "TOTAL PAST DUE": 0.0, "TOTAL Both Current and Past Due": 0.0, "AS OF DATE": "",
-                            "CURRENT_ACCOUNTS_COUNT": 0, "PAST_DUE_ACCOUNTS_COUNT": 0, "TOTAL_ACCOUNTS_COUNT": 0,
-                            "DELINQUENCY_RATE": 0.0, "PROVISION_1_365_DAYS_BALANCE": 0.0, "PROVISION_1_365_DAYS_ACCOUNTS_COUNT": 0,
-                            "PROVISION_OVER_365_DAYS_BALANCE": 0.0, "PROVISION_OVER_365_DAYS_ACCOUNTS_COUNT": 0,
-                            "TOTAL_PROVISIONS": 0.0}
-
-                print(f"Server Log (Operations Aging Summary): Identified latest DATE from MySQL: {report_date.strftime('%Y-%m-%d')}")
-            else:
-                print("Server Log (Operations Aging Summary): No valid latest DATE found in MySQL for selected branches or query returned no data.")
-                return {"TOTAL CURRENT BALANCE": 0.0, "TOTAL PAST DUE": 0.0, "TOTAL Both Current and Past Due": 0.0, "AS OF DATE": "",
-                        "CURRENT_ACCOUNTS_COUNT": 0, "PAST_DUE_ACCOUNTS_COUNT": 0, "TOTAL_ACCOUNTS_COUNT": 0,
-                        "DELINQUENCY_RATE": 0.0, "PROVISION_1_365_DAYS_BALANCE": 0.0, "PROVISION_1_365_DAYS_ACCOUNTS_COUNT": 0,
-                        "PROVISION_OVER_365_DAYS_BALANCE": 0.0, "PROVISION_OVER_365_DAYS_ACCOUNTS_COUNT": 0,
-                        "TOTAL_PROVISIONS": 0.0}
-        except Exception as e:
-            print(f"Error fetching latest date directly from MySQL: {e}")
-            traceback.print_exc()
-            return {"TOTAL CURRENT BALANCE": 0.0, "TOTAL PAST DUE": 0.0, "TOTAL Both Current and Past Due": 0.0, "AS OF DATE": "",
-                    "CURRENT_ACCOUNTS_COUNT": 0, "PAST_DUE_ACCOUNTS_COUNT": 0, "TOTAL_ACCOUNTS_COUNT": 0,
-                    "DELINQUENCY_RATE": 0.0, "PROVISION_1_365_DAYS_BALANCE": 0.0, "PROVISION_1_365_DAYS_ACCOUNTS_COUNT": 0,
-                    "PROVISION_OVER_365_DAYS_BALANCE": 0.0, "PROVISION_OVER_365_DAYS_ACCOUNTS_COUNT": 0,
-                    "TOTAL_PROVISIONS": 0.0}
-        finally:
-            if conn and conn.open:
-                cursor.close()
-                conn.close()
-
-    if report_date is None: # Final check if no date could be determined
+    params = {"branches": list(actual_branches_to_process)}
+    if report_date is not None:
+        params["report_date"] = report_date.strftime('%Y-%m-%d')
+
+    # Balances and account counts come from the pre-aggregated aging_rollup tables, which hold a few
+    # rows per branch and date. The rollup is only used when it has every branch with raw rows on the
+    # report date (and, for the latest date, no newer raw date exists); otherwise (never built, or a
+    # load that skipped refresh_aging_rollup) the raw table is aggregated instead.
+    summary_df = get_data_from_mysql(_build_aging_summary_query(True, report_date is not None), params=params)
+    if summary_df.empty or pd.isna(summary_df.iloc[0]['report_date']) \
+            or int(summary_df.iloc[0]['rollup_branches']) != int(summary_df.iloc[0]['source_branches']) \
+            or bool(summary_df.iloc[0]['newer_source_date']):
+        print(f"Server Log (Operations Aging Summary): {AGING_ROLLUP_TABLE} does not cover this selection (stale or not built). Aggregating aging_report_data directly.")
+        summary_df = get_data_from_mysql(_build_aging_summary_query(False, report_date is not None), params=params)
+
+    if summary_df.empty or pd.isna(summary_df.iloc[0]['report_date']):
         print("Server Log (Operations Aging Summary): No valid report date determined. Returning default summary.")
-        return {"TOTAL CURRENT BALANCE": 0.0, "TOTAL PAST DUE": 0.0, "TOTAL Both Current and Past Due": 0.0, "AS OF DATE": "",
-                "CURRENT_ACCOUNTS_COUNT": 0, "PAST_DUE_ACCOUNTS_COUNT": 0, "TOTAL_ACCOUNTS_COUNT": 0,
-                "DELINQUENCY_RATE": 0.0, "PROVISION_1_365_DAYS_BALANCE": 0.0, "PROVISION_1_365_DAYS_ACCOUNTS_COUNT": 0,
-                "PROVISION_OVER_365_DAYS_BALANCE": 0.0, "PROVISION_OVER_365_DAYS_ACCOUNTS_COUNT": 0,
-                "TOTAL_PROVISIONS": 0.0}
-
-
-    # Now fetch all data for the determined report_date for the selected branches
-    query = f"""
-        SELECT Balance, Aging, `Loan_Account`
-        FROM aging_report_data
-        WHERE Branch IN ({branch_conditions})
-        AND Date = '{report_date.strftime('%Y-%m-%d')}'
-    """
-    df_filtered_by_date = get_data_from_mysql(query)
-
-    # Initialize all summary variables to 0 or 0.0 at the start of this block
-    current_balance = 0.0
-    past_due_balance = 0.0
-    total_balance = 0.0
-    current_accounts_count = 0
-    past_due_accounts_count = 0
-    total_accounts_count = 0
-    delinquency_rate = 0.0
-    provision_1_365_balance = 0.0
-    provision_1_365_accounts_count = 0
-    provision_over_365_balance = 0.0
-    provision_over_365_accounts_count = 0
-    total_provisions = 0.0
-
-
-    if not df_filtered_by_date.empty:
-        # Clean 'Aging' column to ensure consistent comparison
-        df_filtered_by_date['Aging_CLEAN'] = df_filtered_by_date['Aging'].astype(str).str.strip().str.upper()
-
-        # Calculate TOTAL CURRENT BALANCE
-        current_balance = df_filtered_by_date[
-            df_filtered_by_date['Aging_CLEAN'] == 'NOT YET DUE'
-        ]['Balance'].sum()
-
-        # Calculate TOTAL PAST DUE
-        past_due_balance = df_filtered_by_date[
-            df_filtered_by_date['Aging_CLEAN'] != 'NOT YET DUE'
-        ]['Balance'].sum()
-        
-        # Calculate TOTAL Both Current and Past Due
-        total_balance = df_filtered_by_date['Balance'].sum()
-
-        # Calculate account counts
-        current_accounts_count = df_filtered_by_date[
-            df_filtered_by_date['Aging_CLEAN'] == 'NOT YET DUE'
-        ]['Loan_Account'].nunique() # Count unique loan accounts
-
-        past_due_accounts_count = df_filtered_by_date[
-            df_filtered_by_date['Aging_CLEAN'] != 'NOT YET DUE'
-        ]['Loan_Account'].nunique() # Count unique loan accounts
-
-        total_accounts_count = df_filtered_by_date['Loan_Account'].nunique() # Total unique loan accounts
-
-        # Calculate DELINQUENCY RATE (%)
-        if total_balance != 0:
-            delinquency_rate = (past_due_balance / total_balance) * 100
-
-        # Calculate PROVISION (1-365 DAYS)
-        provision_1_365_aging_categories = ['1-30 DAYS', '31-60', '61-90', '91-120', '121-180', '181-365']
-        df_1_365_days = df_filtered_by_date[
-            df_filtered_by_date['Aging_CLEAN'].isin(provision_1_365_aging_categories)
-        ]
-        if not df_1_365_days.empty: # Check if DataFrame is not empty before summing
-            provision_1_365_balance = df_1_365_days['Balance'].sum() * 0.35 # Multiply by 35%
-            provision_1_365_accounts_count = df_1_365_days['Loan_Account'].nunique()
-
-        # Calculate PROVISION (OVER 365 DAYS)
-        df_over_365_days = df_filtered_by_date[
-            df_filtered_by_date['Aging_CLEAN'] == 'OVER 365'
-        ]
-        if not df_over_365_days.empty: # Check if DataFrame is not empty before summing
-            provision_over_365_balance = df_over_365_days['Balance'].sum()
-            provision_over_365_accounts_count = df_over_365_days['Loan_Account'].nunique()
-
-        # Calculate TOTAL PROVISIONS
-        total_provisions = provision_1_365_balance + provision_over_365_balance
-
+        return dict(empty_summary)
+
+    row = summary_df.iloc[0]
+    report_date = pd.to_datetime(row['report_date'], errors='coerce')
+    if pd.isna(report_date):
+        print(f"Server Log (Operations Aging Summary): Failed to parse report_date from raw: '{row['report_date']}'. Returning default summary.")
+        return dict(empty_summary)
+    report_date = report_date.date()
+    print(f"Server Log (Operations Aging Summary): Aggregated summary in MySQL for DATE: {report_date.strftime('%Y-%m-%d')}")
+
+    # MySQL returns Decimal for SUM over DECIMAL columns; convert before arithmetic
+    current_balance = float(row['current_balance'])
+    past_due_balance = float(row['past_due_balance'])
+    total_balance = float(row['total_balance'])
+    current_accounts_count = int(row['current_accounts_count'])
+    past_due_accounts_count = int(row['past_due_accounts_count'])
+    total_accounts_count = int(row['total_accounts_count'])
+
+    # Calculate DELINQUENCY RATE (%)
+    delinquency_rate = (past_due_balance / total_balance) * 100 if total_balance != 0 else 0.0
+
+    # PROVISION (1-365 DAYS) is 35% of the bucket balance; PROVISION (OVER 365 DAYS) is 100%
+    provision_1_365_balance = float(row['provision_1_365_raw_balance']) * 0.35
+    provision_1_365_accounts_count = int(row['provision_1_365_accounts_count'])
+    provision_over_365_balance = float(row['provision_over_365_balance'])
+    provision_over_365_accounts_count = int(row['provision_over_365_accounts_count'])
+
+    # Calculate TOTAL PROVISIONS
+    total_provisions = provision_1_365_balance + provision_over_365_balance
 
     # Format output to two decimal places
     def format_balance(value):
@@ -789,13 +816,13 @@ def get_top_borrowers_report(selected_branches, status_filter, selected_date=Non
         WHERE Branch IN ({branch_conditions})
         AND Date = '{report_date.strftime('%Y-%m-%d')}'
     """
-    df_filtered_by_date = get_data_from_mysql(query)
+    df_filtered_by_date = get_data_from_mysql(query, schema='aging')
             
     if df_filtered_by_date.empty:
         print("Server Log (Top Borrowers Report): No data found for the selected date in MySQL.")
         return []
 
-    df_filtered_by_date['Aging_CLEAN'] = df_filtered_by_date['Aging'].astype(str).str.strip().str.upper()
+    df_filtered_by_date['Aging_CLEAN'] = normalize_text_series(df_filtered_by_date['Aging'])
 
     # Create helper columns for conditional aggregation
     df_filtered_by_date['is_current'] = (df_filtered_by_date['Aging_CLEAN'] == 'NOT YET DUE')
@@ -888,25 +915,14 @@ def get_new_loans_with_past_due_history_report(selected_branches, selected_year,
     if end_date_for_query:
         date_range_condition += f" AND Date <= '{end_date_for_query}'"
 
-    # Fetch all relevant data for the selected branches within the optimized date range
+    # Fetch all relevant data for the selected branches within the optimized date range.
+    # The range spans more than a year of daily snapshots, so it is streamed in chunks and
+    # reduced to per-member / per-account state instead of being materialized at once.
     query = f"""
         SELECT Branch, Date, CID, Name_of_Member, Loan_Account, Principal, Balance, Aging, Disbursement_Date, Due_Date, Product
         FROM aging_report_data
         WHERE Branch IN ({branch_conditions}) {date_range_condition}
     """
-    combined_df = get_data_from_mysql(query)
-            
-    if combined_df.empty:
-        print("Server Log (New Loans with Past Due History Report): No data found after initial optimized query from MySQL.")
-        return []
-
-    # Ensure date columns are datetime objects
-    combined_df['Date'] = pd.to_datetime(combined_df['Date'], errors='coerce')
-    combined_df['Disbursement_Date'] = pd.to_datetime(combined_df['Disbursement_Date'], errors='coerce')
-    combined_df['Due_Date'] = pd.to_datetime(combined_df['Due_Date'], errors='coerce')
-    combined_df.dropna(subset=['Date', 'Disbursement_Date'], inplace=True) # Drop rows where date conversion failed
-
-    combined_df['Aging_CLEAN'] = combined_df['Aging'].astype(str).str.strip().str.upper()
 
     # Define aging categories for past due history check
     past_due_history_categories = ['31-60', '61-90', '91-120', '121-180', '181-365', 'OVER 365']
@@ -914,28 +930,71 @@ def get_new_loans_with_past_due_history_report(selected_branches, selected_year,
     # Define aging categories for 30-365 DAYS count (excluding 'OVER 365')
     aging_30_to_365_days_count_categories = ['31-60', '61-90', '91-120', '121-180', '181-365']
 
-    # 1. Identify members with past due credit history BEFORE the selected year
-    history_end_date = datetime(selected_year - 1, 12, 31).date()
-    
-    # Filter for historical past due records
-    historical_past_due_df = combined_df[
-        (combined_df['Date'].dt.date <= history_end_date) &
-        (combined_df['Aging_CLEAN'].isin(past_due_history_categories))
-    ].copy()
-
-    # Get unique names of members who had past due history
-    members_with_past_due_history = historical_past_due_df['Name_of_Member'].dropna().unique()
-    
-    # 2. Identify members with new loans IN the selected year
-    new_loans_in_year_df = combined_df[
-        (combined_df['Disbursement_Date'].dt.year == selected_year)
-    ].copy()
+    history_end_date = pd.Timestamp(datetime(selected_year - 1, 12, 31))
+
+    members_with_past_due_history = set()
+    members_with_new_loans = set()
+    historical_aging_counts = None
+    new_loans_principals_acc = None # Earliest-disbursed row per (member, account)
+    new_loans_balances_acc = None # Latest-dated row per (member, account)
+    new_loan_branches_acc = None # Distinct (member, branch) pairs for new loans
+    total_rows = 0
+
+    try:
+        for chunk in iter_data_from_mysql(query, schema='aging'):
+            chunk.dropna(subset=['Date', 'Disbursement_Date'], inplace=True) # Drop rows where date conversion failed
+            if chunk.empty:
+                continue
+            total_rows += len(chunk)
+
+            chunk['Aging_CLEAN'] = normalize_text_series(chunk['Aging'])
+            is_historical = chunk['Date'] <= history_end_date
+
+            # 1. Members with past due credit history BEFORE the selected year
+            members_with_past_due_history.update(
+                chunk.loc[is_historical & chunk['Aging_CLEAN'].isin(past_due_history_categories), 'Name_of_Member'].dropna().unique()
+            )
+
+            # Count historical aging categories per member
+            chunk['is_historical_30_365'] = is_historical & chunk['Aging_CLEAN'].isin(aging_30_to_365_days_count_categories)
+            chunk['is_historical_over_365'] = is_historical & (chunk['Aging_CLEAN'] == 'OVER 365')
+            chunk_counts = chunk.groupby('Name_of_Member')[['is_historical_30_365', 'is_historical_over_365']].sum()
+            historical_aging_counts = chunk_counts if historical_aging_counts is None else historical_aging_counts.add(chunk_counts, fill_value=0)
+
+            # 2. Members with new loans IN the selected year
+            new_loans_chunk = chunk[chunk['Disbursement_Date'].dt.year == selected_year]
+            if new_loans_chunk.empty:
+                continue
+            members_with_new_loans.update(new_loans_chunk['Name_of_Member'].dropna().unique())
+
+            # Stable sorts keep earlier chunks ahead of later ones on ties, matching a single full sort.
+            principals = new_loans_chunk[['Name_of_Member', 'Loan_Account', 'Disbursement_Date', 'Principal']]
+            if new_loans_principals_acc is not None:
+                principals = pd.concat([new_loans_principals_acc, principals], ignore_index=True)
+            new_loans_principals_acc = principals.sort_values(by=['Name_of_Member', 'Loan_Account', 'Disbursement_Date'], kind='mergesort') \
+                                                 .drop_duplicates(subset=['Name_of_Member', 'Loan_Account'], keep='first')
+
+            balances = new_loans_chunk[['Name_of_Member', 'Loan_Account', 'Date', 'Balance']]
+            if new_loans_balances_acc is not None:
+                balances = pd.concat([new_loans_balances_acc, balances], ignore_index=True)
+            new_loans_balances_acc = balances.sort_values(by=['Name_of_Member', 'Loan_Account', 'Date'], kind='mergesort') \
+                                             .drop_duplicates(subset=['Name_of_Member', 'Loan_Account'], keep='last')
+
+            branches = new_loans_chunk[['Name_of_Member', 'Branch']]
+            if new_loan_branches_acc is not None:
+                branches = pd.concat([new_loan_branches_acc, branches], ignore_index=True)
+            new_loan_branches_acc = branches.drop_duplicates()
+    except Exception as e:
+        print(f"Error streaming data for New Loans with Past Due History Report: {e}")
+        traceback.print_exc()
+        return []
 
-    # Get unique names of members who received new loans in the selected year
-    members_with_new_loans = new_loans_in_year_df['Name_of_Member'].dropna().unique()
+    if total_rows == 0:
+        print("Server Log (New Loans with Past Due History Report): No data found after initial optimized query from MySQL.")
+        return []
 
     # 3. Find the intersection: members who had past due history AND new loans in the selected year
-    qualified_members = pd.Series(list(set(members_with_past_due_history) & set(members_with_new_loans))).dropna().unique()
+    qualified_members = pd.Series(list(members_with_past_due_history & members_with_new_loans)).dropna().unique()
 
     if len(qualified_members) == 0:
         print("Server Log (New Loans with Past Due History Report): No qualified members found after intersection.")
@@ -943,41 +1002,24 @@ def get_new_loans_with_past_due_history_report(selected_branches, selected_year,
 
     print(f"Server Log (New Loans with Past Due History Report): Found {len(qualified_members)} qualified members.")
 
-    # Filter the combined_df to only include data for qualified members
-    final_report_df = combined_df[combined_df['Name_of_Member'].isin(qualified_members)].copy()
-
-    # Create helper columns for aggregation
-    final_report_df['is_new_loan_in_year'] = (final_report_df['Disbursement_Date'].dt.year == selected_year)
-    final_report_df['is_historical_30_365'] = (final_report_df['Date'].dt.date <= history_end_date) & \
-                                              (final_report_df['Aging_CLEAN'].isin(aging_30_to_365_days_count_categories))
-    final_report_df['is_historical_over_365'] = (final_report_df['Date'].dt.date <= history_end_date) & \
-                                                (final_report_df['Aging_CLEAN'] == 'OVER 365')
-
-    # Calculate Principal and Balance for new loans in the selected year for each member
-    # Get unique new loan accounts and their earliest principal per member
-    new_loans_principals = final_report_df[final_report_df['is_new_loan_in_year']].sort_values(by=['Name_of_Member', 'Loan_Account', 'Disbursement_Date']) \
-                                                     .drop_duplicates(subset=['Name_of_Member', 'Loan_Account'], keep='first') \
-                                                     .groupby('Name_of_Member')['Principal'].sum().reset_index()
+    # Sum the earliest principal and latest balance of each new loan account per member
+    new_loans_principals = new_loans_principals_acc.groupby('Name_of_Member')['Principal'].sum().reset_index()
     new_loans_principals.rename(columns={'Principal': 'PRINCIPAL_SUM_AGG'}, inplace=True)
 
-    # Get unique new loan accounts and their latest balance per member (as of max date in the year for that loan)
-    new_loans_balances = final_report_df[final_report_df['is_new_loan_in_year']].sort_values(by=['Name_of_Member', 'Loan_Account', 'Date']) \
-                                                   .drop_duplicates(subset=['Name_of_Member', 'Loan_Account'], keep='last') \
-                                                   .groupby('Name_of_Member')['Balance'].sum().reset_index()
+    new_loans_balances = new_loans_balances_acc.groupby('Name_of_Member')['Balance'].sum().reset_index()
     new_loans_balances.rename(columns={'Balance': 'BALANCE_SUM_AGG'}, inplace=True)
 
-    # Count historical aging categories per member
-    historical_aging_counts = final_report_df.groupby('Name_of_Member').agg(
-        COUNT_30_365=('is_historical_30_365', 'sum'),
-        COUNT_OVER_365=('is_historical_over_365', 'sum')
-    ).reset_index()
-    
+    historical_aging_counts = historical_aging_counts.rename(columns={
+        'is_historical_30_365': 'COUNT_30_365',
+        'is_historical_over_365': 'COUNT_OVER_365'
+    }).reset_index()
+
     # Get unique branches for new loans for each member
-    new_loan_branches_agg = final_report_df[final_report_df['is_new_loan_in_year']].groupby('Name_of_Member')['Branch'].apply(lambda x: ', '.join(sorted(x.unique()))).reset_index()
+    new_loan_branches_agg = new_loan_branches_acc.groupby('Name_of_Member')['Branch'].apply(lambda x: ', '.join(sorted(x.unique()))).reset_index()
     new_loan_branches_agg.rename(columns={'Branch': 'BRANCH_AGG'}, inplace=True)
 
     # Get unique account counts for new loans in the year per member
-    new_loan_account_counts = final_report_df[final_report_df['is_new_loan_in_year']].groupby('Name_of_Member')['Loan_Account'].nunique().reset_index()
+    new_loan_account_counts = new_loans_principals_acc.groupby('Name_of_Member')['Loan_Account'].nunique().reset_index()
     new_loan_account_counts.rename(columns={'Loan_Account': 'ACCOUNTS_COUNT_AGG'}, inplace=True)
 
 
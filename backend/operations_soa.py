@@ -4,9 +4,12 @@ import pandas as pd
 from datetime import datetime, timedelta
 import re
 from dateutil.relativedelta import relativedelta
+from sqlalchemy import text
 
 # Import database connection helper
-from backend.db_common import get_data_from_mysql, get_db_connection
+from backend.db_common import get_data_from_mysql, get_db_connection, iter_data_from_mysql, has_fulltext_index
+from backend.utils.number_formatting import format_amount_series
+from backend.utils.report_pagination import DEFAULT_PAGE_SIZE
 
 # TRNM_BASE_DIR is no longer used for direct file reading in this script,
 # as data will now come from MySQL. Kept for reference if needed.
@@ -73,45 +76,147 @@ def format_gl_code(code):
     return digits # For any other length, just return the raw digits.
 
 
-# Modified function signature: removed type_input and category_input_code
-def process_statement_of_account_report(branch_name, from_date_str, to_date_str, account_lookup, code_lookup, description_lookup, trn_type_lookup, match_type):
-    """
-    Processes Statement of Account data from the MySQL 'trnm_{branch_name}' table.
-    Filters by branch, date range, account number, code, description, and TRN type.
-    Applies match_type ('exact' or 'approximate') to account and description lookups.
+# Numeric TRN for ordering (non-numeric TRN sorts as 0, as pd.to_numeric(...).fillna(0) did)
+SOA_TRN_NUM_SORT_SQL = "CASE WHEN TRN REGEXP '^ *-?[0-9]+(\\\\.[0-9]*)? *$' THEN CAST(TRN AS DECIMAL(30,6)) ELSE 0 END"
+# Report order of the SOA; ACC and SEQ break (TRNDATE, TRN) ties so every row has a unique key
+SOA_ORDER_COLUMNS = ['TRNDATE', 'TRN_NUM_SORT', 'SOA_ACC_KEY', 'SOA_SEQ_KEY']
+SOA_CURSOR_KEYS = ['date', 'trn', 'acc', 'seq']
+# Shortest word the ngram full-text index can find (MySQL ngram_token_size, 2 by default)
+SOA_FULLTEXT_MIN_WORD_LENGTH = 2
 
-    Args:
-        branch_name (str): The selected branch name.
-        from_date_str (str): Start date in MM/DD/YYYY format.
-        to_date_str (str): End date in MM/DD/YYYY format.
-        account_lookup (str): The account number to filter by (ACC column).
-        code_lookup (str): 2-digit code to filter ACC by starting digits.
-        description_lookup (str): Text to search for in TRNDESC (case-insensitive, contains).
-        trn_type_lookup (str): Text to search for in TRNTYPE (case-insensitive, contains).
-        match_type (str): 'exact' or 'approximate' for account and description lookups.
-
-    Returns:
-        list: A list of dictionaries representing the processed table data.
-            Returns an empty list if no data is found or an error occurs.
-    """
-    print(f"Server Log (Statement of Account): Processing report for branch: {branch_name}")
-    print(f"Server Log (Statement of Account): Date Range: {from_date_str} to {to_date_str}")
-    print(f"Server Log (Statement of Account): Lookups - Account: '{account_lookup}', Code: '{code_lookup}', Description: '{description_lookup}', TRN Type: '{trn_type_lookup}', Match Type: '{match_type}'")
 
+def _parse_soa_dates(from_date_str, to_date_str):
+    """Returns the (from, to) dates as YYYY-MM-DD, or None if either is not MM/DD/YYYY."""
     try:
         from_date_sql = datetime.strptime(from_date_str, '%m/%d/%Y').strftime('%Y-%m-%d')
         to_date_sql = datetime.strptime(to_date_str, '%m/%d/%Y').strftime('%Y-%m-%d')
     except ValueError as e:
         print(f"Server Log (Statement of Account): Invalid date format received from frontend: {e}")
-        return []
+        return None
+    return from_date_sql, to_date_sql
+
+
+def _soa_fulltext_phrase(description_lookup_clean):
+    """
+    Returns the description as a BOOLEAN MODE phrase for the TRNDESC full-text index, or None when
+    the index cannot answer it (a word shorter than an ngram would match nothing).
+    """
+    words = description_lookup_clean.replace('"', ' ').split()
+    if not words or any(len(word) < SOA_FULLTEXT_MIN_WORD_LENGTH for word in words):
+        return None
+    return '"' + ' '.join(words) + '"'
 
+
+def _soa_after_cursor_sql(trn_sort_sql, acc_key_sql, seq_key_sql):
+    """
+    The keyset predicate "row comes after the :cursor_* key" in SOA order. The leading
+    TRNDATE >= :cursor_date is what MySQL can range-scan on; the row comparison settles the rest.
+    """
+    return (f"TRNDATE >= :cursor_date AND (TRNDATE, {trn_sort_sql}, {acc_key_sql}, {seq_key_sql})"
+            " > (:cursor_date, CAST(:cursor_trn AS DECIMAL(30,6)), :cursor_acc, :cursor_seq)")
+
+
+def _build_soa_query(branch_name, from_date_sql, to_date_sql, account_lookup, code_lookup, description_lookup, trn_type_lookup, match_type, accounts=None, rank_by_relevance=False, cursor=None, page_size=None):
+    """
+    Returns (sql, params) of the filtered SOA rows with the signed TRNNONC_CALCULATED and the
+    TRN_NUM_SORT/SOA_ACC_KEY/SOA_SEQ_KEY ordering keys, without an ORDER BY.
+    If accounts (a non-empty list of ACC values) is given, only those accounts are kept.
+
+    An approximate description search goes through the table's ngram FULLTEXT index on TRNDESC
+    when it has one (LIKE then only re-checks the index's candidates); otherwise it scans with
+    LIKE. With rank_by_relevance, a TRNDESC_RELEVANCE column (0 without the index) is added.
+
+    With page_size, only the TRNDATE window one keyset page needs is read: from the cursor's date
+    (or from_date) up to the date of the (page_size + 1)th row after the cursor, found on the
+    date index. Each account's first row in that window takes its previous balance from one
+    index lookup of the account's last earlier row, so TRNNONC_CALCULATED matches the full query.
+    The caller still applies the keyset predicate (cursor_* params are set here), ORDER BY and LIMIT.
+    """
     # FIX: Dynamically determine the table name based on branch_name
     # This assumes tables are named trnm_aglayan, trnm_bulua, etc.
     table_name = f"trnm_{branch_name.lower()}"
+    params = {'from_date': from_date_sql, 'to_date': to_date_sql}
+
+    description_phrase = None
+    if description_lookup and match_type == 'approximate':
+        description_phrase = _soa_fulltext_phrase(description_lookup.strip())
+        if description_phrase is not None and not has_fulltext_index(table_name, 'TRNDESC'):
+            print(f"Server Log (Statement of Account): No full-text index on {table_name}.TRNDESC; searching descriptions with LIKE.")
+            description_phrase = None
+
+    relevance_column = ""
+    if rank_by_relevance:
+        if description_phrase is not None:
+            relevance_column = ",\n            MATCH(TRNDESC) AGAINST(:description_terms IN NATURAL LANGUAGE MODE) AS TRNDESC_RELEVANCE"
+            params['description_terms'] = description_phrase.strip('"')
+        else:
+            relevance_column = ",\n            0 AS TRNDESC_RELEVANCE"
+
+    # Filters for lookup fields (values are bound, never pasted into the SQL). Columns are left
+    # unqualified so the same conditions also apply inside the page-window subqueries.
+    filters = ""
+    if account_lookup:
+        account_lookup_clean = account_lookup.strip()
+        if match_type == 'exact':
+            filters += " AND ACC = :account_lookup"
+            params['account_lookup'] = account_lookup_clean
+        elif match_type == 'approximate':
+            filters += " AND ACC LIKE :account_lookup"
+            params['account_lookup'] = f"%{account_lookup_clean}%"
+
+    if accounts is not None:
+        filters += " AND ACC IN :accounts"
+        params['accounts'] = list(accounts)
+
+    if code_lookup: # Removed len(code_lookup) == 2 and code_lookup.isdigit() for more flexibility
+        filters += " AND GLCODE LIKE :code_lookup" # Assuming code_lookup is for GLCODE prefix
+        params['code_lookup'] = f"{code_lookup}%"
+
+    if description_lookup:
+        description_lookup_clean = description_lookup.strip()
+        if match_type == 'exact':
+            filters += " AND TRNDESC = :description_lookup"
+            params['description_lookup'] = description_lookup_clean
+        elif match_type == 'approximate':
+            if description_phrase is not None:
+                # The index finds the candidate rows; LIKE keeps the exact substring semantics
+                filters += " AND MATCH(TRNDESC) AGAINST(:description_fulltext IN BOOLEAN MODE)"
+                params['description_fulltext'] = description_phrase
+            filters += " AND TRNDESC LIKE :description_lookup"
+            params['description_lookup'] = f"%{description_lookup_clean}%"
+    
+    if trn_type_lookup:
+        filters += " AND TRNTYPE LIKE :trn_type_lookup"
+        params['trn_type_lookup'] = f"%{trn_type_lookup}%"
+
+    date_range = "TRNDATE BETWEEN :from_date AND :to_date"
+    previous_balance = "BAL_PREVIOUS"
+    if page_size is not None:
+        params['window_from'] = cursor['date'] if cursor is not None else from_date_sql
+        params['window_offset'] = int(page_size)
+        after_cursor = ""
+        if cursor is not None:
+            after_cursor = " AND " + _soa_after_cursor_sql(SOA_TRN_NUM_SORT_SQL, "COALESCE(ACC, '')", "COALESCE(SEQ, '')")
+            params.update({f"cursor_{key}": cursor[key] for key in SOA_CURSOR_KEYS})
+        # Past the last page the subquery finds no row and the window runs to to_date
+        date_range = f"""TRNDATE BETWEEN :window_from AND COALESCE((
+            SELECT TRNDATE FROM `{table_name}`
+            WHERE TRNDATE BETWEEN :window_from AND :to_date{filters}{after_cursor}
+            ORDER BY TRNDATE LIMIT 1 OFFSET :window_offset
+        ), :to_date)"""
+        if cursor is not None:
+            # Unqualified columns resolve to prev_row; COALESCE only runs the lookup when LAG had no row
+            previous_balance = f"""COALESCE(BAL_PREVIOUS, (
+                SELECT COALESCE(BAL, 0) FROM `{table_name}` AS prev_row
+                WHERE prev_row.ACC = soa.ACC AND TRNDATE >= :from_date AND TRNDATE < :window_from{filters}
+                ORDER BY TRNDATE DESC, SEQ DESC LIMIT 1
+            ))"""
 
     # Base query now uses the branch-specific table directly.
     # MODIFIED: Removed 'Branch' column from SELECT statement as it doesn't exist in trnm_ tables
-    query = f"""
+    # The previous balance of each account (LAG over ACC in ACC, TRNDATE, SEQ order) is taken
+    # over the filtered rows, as the old Pandas groupby-shift did.
+    filtered_query = f"""
         SELECT
             TRN,
             ACC,
@@ -120,112 +225,65 @@ def process_statement_of_account_report(branch_name, from_date_str, to_date_str,
             LEVEL,
             TRNDATE,
             TRNAMT,
-            TRNNONC,
+            COALESCE(TRNNONC, 0) AS TRNNONC,
             TRNINT,
             TRNTAXPEN,
-            BAL,
+            COALESCE(BAL, 0) AS BAL,
             SEQ,
             TRNDESC,
-            APPTYPE
+            APPTYPE,
+            LAG(COALESCE(BAL, 0)) OVER (PARTITION BY ACC ORDER BY TRNDATE, SEQ) AS BAL_PREVIOUS{relevance_column}
         FROM `{table_name}`
-        WHERE TRNDATE BETWEEN '{from_date_sql}' AND '{to_date_sql}'
+        WHERE {date_range}{filters}
     """
-    
-    # Add filters for lookup fields
-    if account_lookup:
-        account_lookup_clean = account_lookup.strip()
-        if match_type == 'exact':
-            query += f" AND ACC = '{account_lookup_clean}'"
-        elif match_type == 'approximate':
-            query += f" AND ACC LIKE '%{account_lookup_clean}%'"
 
-    if code_lookup: # Removed len(code_lookup) == 2 and code_lookup.isdigit() for more flexibility
-        query += f" AND GLCODE LIKE '{code_lookup}%'" # Assuming code_lookup is for GLCODE prefix
-
-    if description_lookup:
-        description_lookup_clean = description_lookup.strip()
-        if match_type == 'exact':
-            query += f" AND TRNDESC = '{description_lookup_clean}'"
-        elif match_type == 'approximate':
-            query += f" AND TRNDESC LIKE '%{description_lookup_clean}%'"
-    
-    if trn_type_lookup:
-        query += f" AND TRNTYPE LIKE '%{trn_type_lookup}%'"
-
-    # Order the results for proper post-processing in Pandas
-    query += " ORDER BY ACC, TRNDATE, SEQ"
+    # TRNNONC is signed by the balance movement: negative when BAL fell, positive when it rose,
+    # unchanged when it did not move. The first row of an account follows the sign of its BAL,
+    # and a zero TRNNONC always stays 0. The previous balance appears once, so a seeding
+    # lookup in it runs at most once per row.
+    query = f"""
+        SELECT
+            soa.*,
+            CASE
+                WHEN TRNNONC = 0 THEN 0
+                ELSE CASE COALESCE(SIGN(BAL - {previous_balance}), CASE WHEN BAL < 0 THEN -1 ELSE 1 END)
+                    WHEN -1 THEN -ABS(TRNNONC)
+                    WHEN 1 THEN ABS(TRNNONC)
+                    ELSE TRNNONC
+                END
+            END AS TRNNONC_CALCULATED,
+            {SOA_TRN_NUM_SORT_SQL} AS TRN_NUM_SORT,
+            COALESCE(ACC, '') AS SOA_ACC_KEY,
+            COALESCE(SEQ, '') AS SOA_SEQ_KEY
+        FROM ({filtered_query}) AS soa
+    """
+    return query, params
 
-    combined_df = get_data_from_mysql(query)
-            
-    if combined_df.empty:
-        print("Server Log (Statement of Account): No data found in MySQL for the specified criteria.")
-        return []
 
-    # --- Post-processing in Pandas (now includes previous balance calculation) ---
+def _format_soa_rows(combined_df, branch_name):
+    """Turns SOA query rows into the Statement of Account table records (rows keep their order)."""
+    combined_df = combined_df.copy()
 
     # Ensure date columns are datetime objects for Pandas operations
     combined_df['TRNDATE_DT'] = pd.to_datetime(combined_df['TRNDATE'], errors='coerce')
     combined_df.dropna(subset=['TRNDATE_DT'], inplace=True)
 
-    # Convert BAL and TRNNONC (original) to numeric, handling potential non-numeric strings
+    # Convert BAL and the signed TRNNONC to numeric, handling potential non-numeric values
     combined_df['BAL'] = pd.to_numeric(combined_df['BAL'], errors='coerce').fillna(0)
-    combined_df['TRNNONC'] = pd.to_numeric(combined_df['TRNNONC'], errors='coerce').fillna(0)
-
-    # Calculate previous balance using Pandas shift (reverted to this for compatibility)
-    # Ensure ACC is string for grouping
-    combined_df['ACC_STR'] = combined_df['ACC'].astype(str)
-    combined_df['BAL_RAW_PREVIOUS'] = combined_df.groupby('ACC_STR')['BAL'].shift(1)
-
-    # Calculate TRNNONC_CALCULATED in Pandas based on Pandas-provided previous balance
-    combined_df['TRNNONC_CALCULATED'] = combined_df['TRNNONC'] # Start with original TRNNONC
-
-    # Apply conditional sign change based on balance movement, for non-first rows
-    combined_df.loc[
-        (combined_df['BAL'] < combined_df['BAL_RAW_PREVIOUS']) & (combined_df['BAL_RAW_PREVIOUS'].notna()),
-        'TRNNONC_CALCULATED'
-    ] = -combined_df['TRNNONC'].abs()
-
-    combined_df.loc[
-        (combined_df['BAL'] > combined_df['BAL_RAW_PREVIOUS']) & (combined_df['BAL_RAW_PREVIOUS'].notna()),
-        'TRNNONC_CALCULATED'
-    ] = combined_df['TRNNONC'].abs()
-
-    # Handle the very first row of each group (BAL_RAW_PREVIOUS is NaN or 0)
-    combined_df.loc[
-        (combined_df['BAL_RAW_PREVIOUS'].isna()) & (combined_df['BAL'] < 0),
-        'TRNNONC_CALCULATED'
-    ] = -combined_df['TRNNONC'].abs()
-    
-    combined_df.loc[
-        (combined_df['BAL_RAW_PREVIOUS'].isna()) & (combined_df['BAL'] >= 0),
-        'TRNNONC_CALCULATED'
-    ] = combined_df['TRNNONC'].abs()
-
-    # Final edge case: If the original TRNNONC from CSV was 0, it should always remain 0.
-    combined_df.loc[combined_df['TRNNONC'] == 0, 'TRNNONC_CALCULATED'] = 0
-
-
-    # Re-sort the DataFrame back to the original desired output order (TRNDATE_DT, SEQ/TRN)
-    # Use TRN_NUM_SORT if available, otherwise SEQ should be sufficient for tie-breaking
-    if 'TRN' in combined_df.columns:
-        combined_df['TRN_NUM_SORT'] = pd.to_numeric(combined_df['TRN'], errors='coerce').fillna(0)
-        combined_df.sort_values(by=['TRNDATE_DT', 'TRN_NUM_SORT'], ascending=[True, True], inplace=True)
-    else:
-        combined_df.sort_values(by=['TRNDATE_DT', 'SEQ'], ascending=[True, True], inplace=True)
-
+    combined_df['TRNNONC_CALCULATED'] = pd.to_numeric(combined_df['TRNNONC_CALCULATED'], errors='coerce').fillna(0)
 
     # Format TRNDATE to mm/dd/yyyy
     combined_df['TRNDATE'] = combined_df['TRNDATE_DT'].dt.strftime('%m/%d/%Y')
 
-    # Apply formatting for TRNAMT, TRNINT, TRNTAXPEN, BAL
+    # Apply formatting for TRNAMT, TRNINT, TRNTAXPEN, BAL (same output as format_decimal_amount)
     for col in ['TRNAMT', 'TRNINT', 'TRNTAXPEN', 'BAL']:
         if col in combined_df.columns:
-            combined_df[col] = combined_df[col].apply(format_decimal_amount)
+            combined_df[col] = format_amount_series(combined_df[col])
         else:
             combined_df[col] = '' # Ensure column exists and is empty string if not found
 
-    # Apply formatting for the newly calculated TRNNONC
-    combined_df['TRNNONC'] = combined_df['TRNNONC_CALCULATED'].apply(format_signed_amount)
+    # Apply formatting for the calculated TRNNONC (same output as format_signed_amount)
+    combined_df['TRNNONC'] = format_amount_series(combined_df['TRNNONC_CALCULATED'], negative_parentheses=True, missing='0.00')
     
     # Handle TLR, SEQ, TRN, TRNTYPE, LEVEL, TRNDESC columns explicitly to ensure they are strings and NaNs are handled
     for col in ['TLR', 'SEQ', 'TRN', 'TRNTYPE', 'LEVEL', 'TRNDESC']:
@@ -244,10 +302,160 @@ def process_statement_of_account_report(branch_name, from_date_str, to_date_str,
     # Ensure all required output columns are present and in order
     final_columns = ['TRN', 'ACC', 'TRNTYPE', 'TLR', 'LEVEL', 'TRNDATE',
                      'TRNAMT', 'TRNNONC', 'TRNINT', 'TRNTAXPEN', 'BAL', 'SEQ', 'TRNDESC', 'Branch'] # Added 'Branch'
+    # Relevance-ranked description searches also report each row's full-text score
+    if 'TRNDESC_RELEVANCE' in combined_df.columns:
+        combined_df['RELEVANCE'] = pd.to_numeric(combined_df['TRNDESC_RELEVANCE'], errors='coerce').fillna(0).round(4)
+        final_columns.append('RELEVANCE')
     
     # Reindex to ensure all columns are present and in the correct order
     report_df = combined_df.reindex(columns=final_columns, fill_value='')
-
-    print(f"Server Log (Statement of Account): Processed {len(report_df)} rows for Statement of Account report.")
     return report_df.to_dict(orient='records')
 
+
+# Modified function signature: removed type_input and category_input_code
+def process_statement_of_account_report(branch_name, from_date_str, to_date_str, account_lookup, code_lookup, description_lookup, trn_type_lookup, match_type, rank_by_relevance=False):
+    """
+    Processes Statement of Account data from the MySQL 'trnm_{branch_name}' table.
+    Filters by branch, date range, account number, code, description, and TRN type.
+    Applies match_type ('exact' or 'approximate') to account and description lookups.
+
+    Args:
+        branch_name (str): The selected branch name.
+        from_date_str (str): Start date in MM/DD/YYYY format.
+        to_date_str (str): End date in MM/DD/YYYY format.
+        account_lookup (str): The account number to filter by (ACC column).
+        code_lookup (str): 2-digit code to filter ACC by starting digits.
+        description_lookup (str): Text to search for in TRNDESC (case-insensitive, contains).
+        trn_type_lookup (str): Text to search for in TRNTYPE (case-insensitive, contains).
+        match_type (str): 'exact' or 'approximate' for account and description lookups.
+        rank_by_relevance (bool): For an approximate description search, order rows by full-text
+            relevance (most relevant first, then the usual order) and add a RELEVANCE column.
+
+    Returns:
+        list: A list of dictionaries representing the processed table data.
+            Returns an empty list if no data is found or an error occurs.
+    """
+    print(f"Server Log (Statement of Account): Processing report for branch: {branch_name}")
+    print(f"Server Log (Statement of Account): Date Range: {from_date_str} to {to_date_str}")
+    print(f"Server Log (Statement of Account): Lookups - Account: '{account_lookup}', Code: '{code_lookup}', Description: '{description_lookup}', TRN Type: '{trn_type_lookup}', Match Type: '{match_type}'")
+
+    sql_dates = _parse_soa_dates(from_date_str, to_date_str)
+    if sql_dates is None:
+        return []
+
+    rank_by_relevance = bool(rank_by_relevance and description_lookup and match_type == 'approximate')
+    query, params = _build_soa_query(branch_name, *sql_dates, account_lookup, code_lookup, description_lookup, trn_type_lookup, match_type,
+                                     rank_by_relevance=rank_by_relevance)
+    order_columns = (['TRNDESC_RELEVANCE DESC'] if rank_by_relevance else []) + SOA_ORDER_COLUMNS
+    combined_df = get_data_from_mysql(f"{query} ORDER BY {', '.join(order_columns)}", params)
+            
+    if combined_df.empty:
+        print("Server Log (Statement of Account): No data found in MySQL for the specified criteria.")
+        return []
+
+    report_data = _format_soa_rows(combined_df, branch_name)
+    print(f"Server Log (Statement of Account): Processed {len(report_data)} rows for Statement of Account report.")
+    return report_data
+
+
+def _soa_cursor_from_row(row):
+    """The keyset cursor (SOA_CURSOR_KEYS) of one query row, in JSON-safe types."""
+    return {
+        'date': pd.Timestamp(row['TRNDATE']).strftime('%Y-%m-%d'),
+        'trn': str(row['TRN_NUM_SORT']),
+        'acc': str(row['SOA_ACC_KEY']),
+        'seq': str(row['SOA_SEQ_KEY']),
+    }
+
+
+def process_statement_of_account_page(branch_name, from_date_str, to_date_str, account_lookup, code_lookup, description_lookup, trn_type_lookup, match_type, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    One page of the Statement of Account, keyset-paginated on (TRNDATE, TRN, ACC, SEQ). MySQL
+    reads only the TRNDATE window the page covers (see _build_soa_query), so a page costs about
+    its own rows plus the rest of the cursor's day, not the rows of the pages before it.
+
+    Returns:
+        dict: 'rows' (report records) and 'next_cursor' (pass back for the next page; None on the
+            last page). Returns None if the dates are invalid.
+    """
+    sql_dates = _parse_soa_dates(from_date_str, to_date_str)
+    if sql_dates is None:
+        return None
+
+    combined_df, next_cursor = _fetch_soa_page(branch_name, sql_dates, account_lookup, code_lookup, description_lookup, trn_type_lookup, match_type, cursor, page_size)
+    if combined_df.empty:
+        return {'rows': [], 'next_cursor': None}
+
+    print(f"Server Log (Statement of Account): Returning {len(combined_df)} rows for Statement of Account page.")
+    return {'rows': _format_soa_rows(combined_df, branch_name), 'next_cursor': next_cursor}
+
+
+def _fetch_soa_page(branch_name, sql_dates, account_lookup, code_lookup, description_lookup, trn_type_lookup, match_type, cursor, page_size, accounts=None, connection=None):
+    """
+    Returns (query rows of one keyset page, next cursor or None on the last page). Runs on the
+    given connection (errors are raised) or through get_data_from_mysql.
+    """
+    query, params = _build_soa_query(branch_name, *sql_dates, account_lookup, code_lookup, description_lookup, trn_type_lookup, match_type,
+                                     accounts=accounts, cursor=cursor, page_size=page_size)
+    page_query = f"SELECT * FROM ({query}) AS soa_page"
+    if cursor is not None:
+        page_query += " WHERE " + _soa_after_cursor_sql(*SOA_ORDER_COLUMNS[1:])
+    # One row past the page tells whether there is a next page
+    page_query += f" ORDER BY {', '.join(SOA_ORDER_COLUMNS)} LIMIT :page_limit"
+    params['page_limit'] = page_size + 1
+
+    if connection is not None:
+        combined_df = pd.read_sql(text(page_query), connection, params=params)
+    else:
+        combined_df = get_data_from_mysql(page_query, params)
+    next_cursor = None
+    if len(combined_df) > page_size:
+        combined_df = combined_df.iloc[:page_size]
+        next_cursor = _soa_cursor_from_row(combined_df.iloc[-1])
+    return combined_df, next_cursor
+
+
+def iter_statement_of_account_pages(branch_name, from_date_str, to_date_str, account_lookup, code_lookup, description_lookup, trn_type_lookup, match_type, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Yields the whole Statement of Account as lists of at most page_size records, read through one
+    server-side cursor, so the first rows go out before MySQL has returned the last ones.
+    """
+    sql_dates = _parse_soa_dates(from_date_str, to_date_str)
+    if sql_dates is None:
+        return
+
+    query, params = _build_soa_query(branch_name, *sql_dates, account_lookup, code_lookup, description_lookup, trn_type_lookup, match_type)
+    for chunk in iter_data_from_mysql(f"{query} ORDER BY {', '.join(SOA_ORDER_COLUMNS)}", params, chunksize=page_size):
+        if not chunk.empty:
+            yield _format_soa_rows(chunk, branch_name)
+
+
+def get_statement_of_account_totals(branch_name, from_date_str, to_date_str, account_lookup, code_lookup, description_lookup, trn_type_lookup, match_type):
+    """
+    Row count and amount totals of the Statement of Account, aggregated by MySQL without
+    fetching the rows. Returns None if the dates are invalid.
+    """
+    sql_dates = _parse_soa_dates(from_date_str, to_date_str)
+    if sql_dates is None:
+        return None
+
+    query, params = _build_soa_query(branch_name, *sql_dates, account_lookup, code_lookup, description_lookup, trn_type_lookup, match_type)
+    totals_df = get_data_from_mysql(f"""
+        SELECT
+            COUNT(*) AS row_count,
+            SUM(TRNAMT) AS total_trnamt,
+            SUM(TRNNONC_CALCULATED) AS total_trnnonc,
+            SUM(TRNINT) AS total_trnint,
+            SUM(TRNTAXPEN) AS total_trntaxpen
+        FROM ({query}) AS soa_totals
+    """, params)
+
+    totals = {'row_count': int(totals_df['row_count'].iloc[0]) if not totals_df.empty else 0}
+    for key in ['total_trnamt', 'total_trnnonc', 'total_trnint', 'total_trntaxpen']:
+        value = pd.to_numeric(totals_df[key], errors='coerce').fillna(0).iloc[0] if not totals_df.empty else 0.0
+        totals[key] = float(value)
+    totals['total_trnamt_formatted'] = format_decimal_amount(totals['total_trnamt'])
+    totals['total_trnnonc_formatted'] = format_signed_amount(totals['total_trnnonc'])
+    totals['total_trnint_formatted'] = format_decimal_amount(totals['total_trnint'])
+    totals['total_trntaxpen_formatted'] = format_decimal_amount(totals['total_trntaxpen'])
+    return totals
@@ -0,0 +1,223 @@
+# audit_tool/backend/operations_trnm_search.py
+# Cross-branch transaction search: every trnm_<branch> table is read as SOA keyset pages, fetched
+# concurrently on a bounded worker pool as the merge consumes them, and merged into a single
+# date-ordered stream.
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from sqlalchemy import text
+
+from backend.db_common import get_data_from_mysql, get_db_connection_sqlalchemy, pooled_connection, normalize_cid_py
+from backend.operations_soa import _parse_soa_dates, _fetch_soa_page, _format_soa_rows
+from backend.utils.report_pagination import DEFAULT_PAGE_SIZE
+
+# Page queries running at once; kept well below DB_POOL_CONFIG so other reports still get connections
+TRNM_SEARCH_MAX_WORKERS = 4
+# The unsplit source table shares the trnm_ prefix but is not a branch
+TRNM_NON_BRANCH_TABLES = {'trnm_data'}
+
+
+def list_trnm_branch_tables(branches=None):
+    """
+    Returns {table name: branch name} of the existing trnm_<branch> tables, limited to the given
+    branches if any (branch names are matched case-insensitively, as the SOA report names tables).
+    """
+    tables_df = get_data_from_mysql("""
+        SELECT TABLE_NAME FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME LIKE :pattern
+    """, {'pattern': 'trnm\\_%'})
+    if tables_df.empty:
+        return {}
+    existing = {name.lower(): name for name in tables_df.iloc[:, 0].astype(str) if name.lower() not in TRNM_NON_BRANCH_TABLES}
+
+    if branches:
+        wanted = [f"trnm_{branch.lower()}" for branch in branches]
+        return {existing[table]: table[len('trnm_'):].upper() for table in wanted if table in existing}
+    return {table: table_lower[len('trnm_'):].upper() for table_lower, table in sorted(existing.items())}
+
+
+def _list_cid_source_tables():
+    """Returns the svacc_/lnacc_ tables that have a CID column, for resolving a CID to its accounts."""
+    tables_df = get_data_from_mysql("""
+        SELECT DISTINCT TABLE_NAME FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND COLUMN_NAME = 'CID'
+          AND (TABLE_NAME LIKE :svacc_pattern OR TABLE_NAME LIKE :lnacc_pattern)
+    """, {'svacc_pattern': 'svacc\\_%', 'lnacc_pattern': 'lnacc\\_%'})
+    return set() if tables_df.empty else {name.lower() for name in tables_df.iloc[:, 0].astype(str)}
+
+
+def _resolve_cid_accounts(connection, branch_name, cid, cid_tables):
+    """Returns the ACC values of a member (CID compared as normalize_cid_py does) in one branch's svacc/lnacc tables."""
+    normalized = normalize_cid_py(cid)
+    if normalized.isdigit():
+        condition, cid_value = "TRIM(LEADING '0' FROM TRIM(CID)) = :cid", normalized.lstrip('0')
+    else:
+        condition, cid_value = "TRIM(CID) = :cid", normalized
+
+    accounts = set()
+    for prefix in ('svacc_', 'lnacc_'):
+        table_name = f"{prefix}{branch_name.lower()}"
+        if table_name not in cid_tables:
+            continue
+        rows = connection.execute(text(f"SELECT DISTINCT ACC FROM `{table_name}` WHERE {condition}"), {'cid': cid_value}).fetchall()
+        accounts.update(str(row[0]) for row in rows if row[0] is not None)
+    return sorted(accounts)
+
+
+def _fetch_branch_page(table_name, branch_name, search, cursor, accounts, cancel_event, active_queries, active_lock):
+    """
+    Worker: fetches one keyset page (SOA order) of a branch's matches on a pooled connection and
+    returns (page rows, next cursor, accounts). The first page of a CID search also resolves the
+    member's accounts in the branch; later pages reuse them. The connection id is registered in
+    active_queries while the query runs so a cancelled search can kill it.
+
+    A page is one short query, so no worker ever waits on the merge: every branch keeps getting
+    pool time however many branches there are.
+    """
+    if cancel_event.is_set():
+        return None, None, accounts
+    engine = get_db_connection_sqlalchemy()
+    if engine is None:
+        raise RuntimeError("SQLAlchemy engine not available.")
+
+    with pooled_connection(engine) as connection:
+        if search['cid_lookup'] and accounts is None:
+            accounts = _resolve_cid_accounts(connection, branch_name, search['cid_lookup'], search['cid_tables'])
+        if search['cid_lookup'] and not accounts:
+            return None, None, accounts
+
+        connection_id = connection.execute(text("SELECT CONNECTION_ID()")).scalar()
+        with active_lock:
+            # Checked under the lock: once _kill_active_queries has run, no new query starts
+            if cancel_event.is_set():
+                return None, None, accounts
+            active_queries[table_name] = connection_id
+        try:
+            page_df, next_cursor = _fetch_soa_page(branch_name, search['sql_dates'], search['account_lookup'], '', '', '', search['match_type'],
+                                                   cursor, search['page_size'], accounts=accounts, connection=connection)
+        finally:
+            with active_lock:
+                active_queries.pop(table_name, None)
+    return page_df, next_cursor, accounts
+
+
+def _iter_branch_records(executor, first_page, table_name, branch_name, search, cancel_event, active_queries, active_lock):
+    """
+    Yields ((TRNDATE, numeric TRN), record) for one branch's rows in SOA order. The next page is
+    requested as soon as a page arrives, so at most two pages of a branch are held at a time.
+    """
+    pending = first_page
+    while pending is not None:
+        try:
+            page_df, next_cursor, accounts = pending.result()
+        except Exception as e:
+            if not cancel_event.is_set():
+                print(f"Server Log (Cross-Branch Search): Query on {table_name} failed: {e}")
+            raise
+        pending = None
+        if next_cursor is not None and not cancel_event.is_set():
+            pending = executor.submit(_fetch_branch_page, table_name, branch_name, search, next_cursor, accounts, cancel_event, active_queries, active_lock)
+        if page_df is None or page_df.empty:
+            continue
+        dates = pd.to_datetime(page_df['TRNDATE'], errors='coerce')
+        chunk = page_df[dates.notna()]
+        keys = zip(dates[dates.notna()], pd.to_numeric(chunk['TRN_NUM_SORT'], errors='coerce').fillna(0).astype(float))
+        yield from zip(keys, _format_soa_rows(chunk, branch_name))
+
+
+def _kill_active_queries(active_queries, active_lock):
+    """
+    Stops the branch queries still running on the server (a closed cursor alone would drain them).
+    The lock is held until the KILLs are done: a worker unregisters its connection under the same
+    lock before returning it to the pool, so every id killed still runs this search's query, never
+    another request's. The connection used for the KILLs is taken before the lock, so waiting
+    workers cannot starve it of a pool slot.
+    """
+    with active_lock:
+        if not active_queries:
+            return
+    engine = get_db_connection_sqlalchemy()
+    if engine is None:
+        return
+    connection_ids = []
+    try:
+        with pooled_connection(engine) as connection:
+            with active_lock:
+                connection_ids = list(active_queries.values())
+                for connection_id in connection_ids:
+                    connection.execute(text(f"KILL QUERY {int(connection_id)}"))
+        if connection_ids:
+            print(f"Server Log (Cross-Branch Search): Cancelled {len(connection_ids)} running branch queries.")
+    except Exception as e:
+        print(f"Server Log (Cross-Branch Search): Could not cancel branch queries {connection_ids}: {e}")
+
+
+def iter_cross_branch_transactions(from_date_str, to_date_str, account_lookup='', cid_lookup='', match_type='exact', branches=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Searches the trnm tables of all branches (or the given ones) for an account and/or a member
+    CID within a date range, and yields the matches as lists of at most page_size SOA records
+    (with their Branch), merged across branches in (TRNDATE, TRN) order.
+
+    Each branch is read as keyset pages of page_size rows (see _fetch_soa_page), at most
+    TRNM_SEARCH_MAX_WORKERS page queries at a time. The first pages of all branches are queued at
+    once, so the first rows are sent once every branch has returned its first page, and a branch's
+    next page is fetched while its current one is merged. Closing the generator (e.g. the client
+    disconnected) cancels the outstanding page queries. Yields nothing if the dates are invalid or
+    no branch table matches.
+
+    Args:
+        from_date_str (str): Start date in MM/DD/YYYY format.
+        to_date_str (str): End date in MM/DD/YYYY format.
+        account_lookup (str): ACC to search for ('exact' or 'approximate' per match_type).
+        cid_lookup (str): Member CID; searched through the accounts it owns in each branch's svacc/lnacc tables.
+        match_type (str): 'exact' or 'approximate' for account_lookup.
+        branches (list, optional): Branch names to search; all branches with a trnm table if not given.
+        page_size (int): Records per yielded list.
+    """
+    sql_dates = _parse_soa_dates(from_date_str, to_date_str)
+    if sql_dates is None:
+        return
+    branch_tables = list_trnm_branch_tables(branches)
+    if not branch_tables:
+        print("Server Log (Cross-Branch Search): No trnm branch tables to search.")
+        return
+
+    search = {
+        'sql_dates': sql_dates,
+        'account_lookup': (account_lookup or '').strip(),
+        'cid_lookup': (cid_lookup or '').strip(),
+        'match_type': match_type,
+        'cid_tables': _list_cid_source_tables() if cid_lookup else set(),
+        'page_size': page_size,
+    }
+    print(f"Server Log (Cross-Branch Search): Searching {len(branch_tables)} branches for ACC '{search['account_lookup']}', CID '{search['cid_lookup']}' from {from_date_str} to {to_date_str}.")
+
+    cancel_event = threading.Event()
+    active_queries = {}
+    active_lock = threading.Lock()
+    executor = ThreadPoolExecutor(max_workers=min(TRNM_SEARCH_MAX_WORKERS, len(branch_tables)), thread_name_prefix="trnm-search")
+    branch_streams = []
+    try:
+        # Queue every branch's first page before the merge starts waiting on any of them
+        for table_name, branch_name in branch_tables.items():
+            first_page = executor.submit(_fetch_branch_page, table_name, branch_name, search, None, None, cancel_event, active_queries, active_lock)
+            branch_streams.append(_iter_branch_records(executor, first_page, table_name, branch_name, search, cancel_event, active_queries, active_lock))
+
+        batch = []
+        row_count = 0
+        for _, record in heapq.merge(*branch_streams, key=lambda item: item[0]):
+            batch.append(record)
+            if len(batch) >= page_size:
+                row_count += len(batch)
+                yield batch
+                batch = []
+        if batch:
+            row_count += len(batch)
+            yield batch
+        print(f"Server Log (Cross-Branch Search): Streamed {row_count} rows from {len(branch_tables)} branches.")
+    finally:
+        # Normal completion leaves nothing to cancel; an early close drops the queued pages and kills running ones
+        cancel_event.set()
+        _kill_active_queries(active_queries, active_lock)
+        executor.shutdown(wait=False, cancel_futures=True)
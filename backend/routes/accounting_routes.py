@@ -3,13 +3,14 @@ from flask import Blueprint, request, jsonify
 import traceback
 
 # Import processing functions
-from backend.accounting_process import get_gl_names_and_codes_from_file, process_gl_report
-from backend.trial_balance_process import get_tb_as_of_dates, process_trial_balance_data
-from backend.reference_process import process_ref_report
-from backend.description_process import process_desc_report
-from backend.trend_process import process_trend_report # Keep this import if it's used elsewhere for other trend reports
-from backend.financial_statement_process import process_financial_statement, get_financial_statement_trend_data # Import the new function
+from backend.accounting_process import get_gl_names_and_codes_from_file, search_gl_names_and_codes, process_gl_report, process_gl_report_page, iter_gl_report_pages, get_gl_report_totals
+from backend.trial_balance_process import get_tb_as_of_dates, process_trial_balance_data, process_trial_balance_variance
+from backend.reference_process import process_ref_report, process_ref_report_page, iter_ref_report_pages, get_ref_report_totals
+from backend.description_process import process_desc_report, process_desc_report_page, iter_desc_report_pages, get_desc_report_totals
+from backend.trend_process import process_trend_report, process_trend_report_batch
+from backend.financial_statement_process import process_financial_statement, get_financial_statement_trend_data, get_financial_statement_trends # Import the new function
 from backend.db_common import AREA_BRANCH_MAP # Import AREA_BRANCH_MAP from db_common
+from backend.routes.report_paging import paged_report_response
 
 accounting_bp = Blueprint('accounting', __name__)
 
@@ -26,6 +27,25 @@ def get_gl_names_and_codes():
         print(f"Error fetching GL names and codes for branch {branch}: {e}")
         return jsonify({"message": f"Failed to fetch GL names and codes: {str(e)}"}), 500
 
+@accounting_bp.route('/search_gl_names_and_codes', methods=['GET'])
+def search_gl_names_and_codes_route():
+    branch = request.args.get('branch')
+    prefix = request.args.get('q', '')
+    if not branch:
+        return jsonify({"message": "Branch parameter is required."}), 400
+
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({"message": "Limit must be a whole number."}), 400
+
+    try:
+        gl_data = search_gl_names_and_codes(branch, prefix, max(limit, 1))
+        return jsonify({"data": gl_data}), 200
+    except Exception as e:
+        print(f"Error searching GL names and codes for branch {branch}: {e}")
+        return jsonify({"message": f"Failed to search GL names and codes: {str(e)}"}), 500
+
 @accounting_bp.route('/process_accounting_gl', methods=['POST'])
 def process_accounting_gl():
     branch = request.form.get('branch')
@@ -39,6 +59,9 @@ def process_accounting_gl():
     gl_code_raw = gl_code.replace('-', '')
 
     try:
+        paged_response = paged_report_response("GL Report", process_gl_report_page, iter_gl_report_pages, (branch, from_date, to_date, gl_code_raw))
+        if paged_response is not None:
+            return paged_response
         report_data = process_gl_report(branch, from_date, to_date, gl_code_raw)
         if report_data:
             return jsonify({"message": "GL Report generated successfully!", "data": report_data}), 200
@@ -60,6 +83,9 @@ def process_accounting_ref():
         return jsonify({"message": "All parameters (branch, from_date, to_date, reference_lookup, match_type) are required."}), 400
 
     try:
+        paged_response = paged_report_response("Reference Report", process_ref_report_page, iter_ref_report_pages, (branch, from_date, to_date, reference_lookup, match_type))
+        if paged_response is not None:
+            return paged_response
         report_data = process_ref_report(branch, from_date, to_date, reference_lookup, match_type)
         if report_data:
             return jsonify({"message": "Reference Report generated successfully!", "data": report_data}), 200
@@ -81,6 +107,9 @@ def process_accounting_desc():
         return jsonify({"message": "All parameters (branch, from_date, to_date, description_lookup, match_type) are required."}), 400
 
     try:
+        paged_response = paged_report_response("Description Report", process_desc_report_page, iter_desc_report_pages, (branch, from_date, to_date, description_lookup, match_type))
+        if paged_response is not None:
+            return paged_response
         report_data = process_desc_report(branch, from_date, to_date, description_lookup, match_type)
         if report_data:
             return jsonify({"message": "Description Report generated successfully!", "data": report_data}), 200
@@ -90,6 +119,34 @@ def process_accounting_desc():
         print(f"Error processing Description report: {e}")
         return jsonify({"message": f"An error occurred during Description report processing: {str(e)}"}), 500
 
+@accounting_bp.route('/process_accounting_totals', methods=['POST'])
+def process_accounting_totals():
+    """Footer totals of a GL, Reference or Description report (report=gl|ref|desc), fetched apart from its rows."""
+    report = request.form.get('report')
+    branch = request.form.get('branch')
+    from_date = request.form.get('from_date')
+    to_date = request.form.get('to_date')
+    lookup = request.form.get('lookup')
+    match_type = request.form.get('match_type')
+
+    if report not in ('gl', 'ref', 'desc'):
+        return jsonify({"message": "Report must be one of gl, ref or desc."}), 400
+    if not all([branch, from_date, to_date, lookup]) or (report != 'gl' and not match_type):
+        return jsonify({"message": "All parameters (branch, from_date, to_date, lookup, and match_type for ref/desc) are required."}), 400
+
+    try:
+        if report == 'gl':
+            totals = get_gl_report_totals(branch, from_date, to_date, lookup.replace('-', ''))
+        elif report == 'ref':
+            totals = get_ref_report_totals(branch, from_date, to_date, lookup, match_type)
+        else:
+            totals = get_desc_report_totals(branch, from_date, to_date, lookup, match_type)
+        return jsonify({"message": "Report totals computed successfully!", "data": totals}), 200
+    except Exception as e:
+        print(f"Error computing {report} report totals: {e}")
+        traceback.print_exc()
+        return jsonify({"message": f"An error occurred while computing report totals: {str(e)}"}), 500
+
 @accounting_bp.route('/process_accounting_trend', methods=['POST'])
 def process_accounting_trend():
     branch = request.form.get('branch')
@@ -113,6 +170,28 @@ def process_accounting_trend():
         print(f"Error processing Trend report: {e}")
         return jsonify({"message": f"An error occurred during Trend report processing: {str(e)}"}), 500
 
+@accounting_bp.route('/process_accounting_trend_batch', methods=['POST'])
+def process_accounting_trend_batch():
+    branch = request.form.get('branch')
+    from_date = request.form.get('from_date')
+    to_date = request.form.get('to_date')
+    frequency = request.form.get('frequency')
+    # gl_codes may be repeated form fields and/or a comma-separated list
+    gl_codes = [code.strip() for value in request.form.getlist('gl_codes') for code in value.split(',') if code.strip()]
+
+    if not all([branch, from_date, to_date, gl_codes, frequency]):
+        return jsonify({"message": "All parameters (branch, from_date, to_date, gl_codes, frequency) are required."}), 400
+
+    try:
+        report_data = process_trend_report_batch(branch, from_date, to_date, gl_codes, frequency)
+        if report_data:
+            return jsonify({"message": "Trend Report generated successfully!", "data": report_data}), 200
+        else:
+            return jsonify({"message": "No data found for the specified criteria."}), 200
+    except Exception as e:
+        print(f"Error processing batch Trend report: {e}")
+        return jsonify({"message": f"An error occurred during batch Trend report processing: {str(e)}"}), 500
+
 @accounting_bp.route('/get_tb_as_of_dates', methods=['GET'])
 def get_tb_as_of_dates_endpoint():
     branch = request.args.get('branch')
@@ -143,6 +222,25 @@ def process_trial_balance_endpoint():
         print(f"Error processing Trial Balance report: {e}")
         return jsonify({"message": f"An error occurred during Trial Balance report processing: {str(e)}"}), 500
 
+@accounting_bp.route('/process_trial_balance_variance', methods=['POST'])
+def process_trial_balance_variance_endpoint():
+    branch = request.form.get('branch')
+    # as_of_dates may be repeated form fields and/or a comma-separated list
+    as_of_dates = [name.strip() for value in request.form.getlist('as_of_dates') for name in value.split(',') if name.strip()]
+
+    if not all([branch, as_of_dates]):
+        return jsonify({"message": "Branch and at least one As Of Date are required."}), 400
+
+    try:
+        report_data = process_trial_balance_variance(branch, as_of_dates)
+        if report_data:
+            return jsonify({"message": "Trial Balance Variance generated successfully!", "data": report_data}), 200
+        else:
+            return jsonify({"message": "No data found for the specified criteria."}), 200
+    except Exception as e:
+        print(f"Error processing Trial Balance variance: {e}")
+        return jsonify({"message": f"An error occurred during Trial Balance variance processing: {str(e)}"}), 500
+
 @accounting_bp.route('/financial_statement', methods=['POST', 'OPTIONS'])
 def financial_statement_endpoint():
     if request.method == 'OPTIONS':
@@ -190,3 +288,31 @@ def financial_statement_trend_endpoint():
     except Exception as e:
         print(f"Error fetching financial statement trend data: {traceback.format_exc()}")
         return jsonify({"status": "error", "message": f"An error occurred while fetching trend data: {str(e)}"}), 500
+
+@accounting_bp.route('/financial_statement/trends', methods=['GET'])
+def financial_statement_trends_endpoint():
+    """
+    API endpoint to get the trend series of every Financial Statement account in one call.
+    Optional: report_type (repeatable or comma-separated) and account_label (repeatable;
+    labels may contain commas) limit the statements and accounts returned.
+    """
+    area = request.args.get('area')
+    branch = request.args.get('branch')
+    date = request.args.get('date')
+    report_types = [t.strip() for value in request.args.getlist('report_type') for t in value.split(',') if t.strip()]
+    account_labels = [label for label in request.args.getlist('account_label') if label]
+
+    if not all([area, branch, date]):
+        return jsonify({"status": "error", "message": "Area, Branch, and Date are required."}), 400
+
+    try:
+        trends = get_financial_statement_trends(branch, date, area, report_types, account_labels)
+        if trends is None:
+            return jsonify({"status": "error", "message": "Invalid date or report type."}), 400
+        if any(trends.values()):
+            return jsonify({"status": "success", "message": "Trend data fetched successfully!", "data": trends}), 200
+        else:
+            return jsonify({"status": "error", "message": "No trend data found for the specified criteria."}), 200
+    except Exception as e:
+        print(f"Error fetching financial statement trends: {traceback.format_exc()}")
+        return jsonify({"status": "error", "message": f"An error occurred while fetching trend data: {str(e)}"}), 500
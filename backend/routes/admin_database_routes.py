@@ -19,6 +19,8 @@ import os
 # Import the processing function
 # This import should now work correctly because 'audit_tool' is in sys.path (due to app.py's setup)
 from backend.admin_database_process import get_database_summary_data
+from backend.db_common import get_db_pool_stats, apply_index_migrations, get_missing_migration_indexes, verify_report_query_indexes
+from backend.gl_engine import get_gl_engine_stats
 
 admin_database_bp = Blueprint('admin_database_bp', __name__)
 
@@ -47,3 +49,67 @@ def get_database_summary_route():
         print(f"Error in /get_database_summary route: {e}")
         traceback.print_exc()
         return jsonify({"success": False, "message": "An internal server error occurred while fetching database summary."}), 500
+
+
+@admin_database_bp.route('/get_db_pool_stats', methods=['GET'])
+@cross_origin(supports_credentials=True)
+def get_db_pool_stats_route():
+    """Returns the shared MySQL connection pool's occupancy and checkout/wait counters."""
+    try:
+        return jsonify({"success": True, "data": get_db_pool_stats()}), 200
+    except Exception as e:
+        print(f"Error in /get_db_pool_stats route: {e}")
+        traceback.print_exc()
+        return jsonify({"success": False, "message": "An internal server error occurred while fetching pool statistics."}), 500
+
+
+@admin_database_bp.route('/get_gl_engine_stats', methods=['GET'])
+@cross_origin(supports_credentials=True)
+def get_gl_engine_stats_route():
+    """Returns the GL engine frame cache's hit/miss/eviction counters and resident bytes."""
+    try:
+        return jsonify({"success": True, "data": get_gl_engine_stats()}), 200
+    except Exception as e:
+        print(f"Error in /get_gl_engine_stats route: {e}")
+        traceback.print_exc()
+        return jsonify({"success": False, "message": "An internal server error occurred while fetching GL engine statistics."}), 500
+
+
+@admin_database_bp.route('/verify_report_indexes', methods=['GET'])
+@cross_origin(supports_credentials=True)
+def verify_report_indexes_route():
+    """
+    EXPLAINs the report queries for one branch and lists the migration indexes its tables are
+    missing. Read-only: indexes are created at startup or through POST /apply_index_migrations.
+    """
+    try:
+        branch = request.args.get('branch', '').strip()
+        if not branch:
+            return jsonify({"success": False, "message": "Branch is required."}), 400
+
+        plan = verify_report_query_indexes(branch)
+        branch_table_suffix = branch.lower()
+        report_tables = {'aging_report_data', 'finding_report', 'finding_detail', 'finding_audit'}
+        report_tables.update(f"{prefix}_{branch_table_suffix}" for prefix in ('trnm', 'svacc', 'lnacc', 'gl'))
+        missing = get_missing_migration_indexes(report_tables)
+        return jsonify({"success": True, "data": {"missing_indexes": missing, "query_plans": plan}}), 200
+    except Exception as e:
+        print(f"Error in /verify_report_indexes route: {e}")
+        traceback.print_exc()
+        return jsonify({"success": False, "message": "An internal server error occurred while verifying report indexes."}), 500
+
+
+@admin_database_bp.route('/apply_index_migrations', methods=['POST'])
+@cross_origin(supports_credentials=True)
+def apply_index_migrations_route():
+    """
+    Applies pending index migrations. This runs ALTER TABLE on the report tables (a FULLTEXT
+    index rebuilds its table), so it is an explicit admin action, not part of the verify check.
+    """
+    try:
+        created = apply_index_migrations()
+        return jsonify({"success": True, "data": {"created_indexes": created}}), 200
+    except Exception as e:
+        print(f"Error in /apply_index_migrations route: {e}")
+        traceback.print_exc()
+        return jsonify({"success": False, "message": "An internal server error occurred while applying index migrations."}), 500
@@ -24,6 +24,7 @@ from backend.lnacc_win_process import process_lnacc_win_data_web
 from backend.svacc_dos_process import process_svacc_dos_data_web
 from backend.svacc_win_process import process_svacc_win_data_web
 from backend.journal_voucher_process import process_journal_voucher_data
+from backend.utils.parallel_ingest import parse_ingest_settings
 # Removed WP LR imports:
 # from wp_lr_reference_process import process_wp_lr_reference_data
 from backend.audit_tool_tb_process import process_audit_tool_tb_files as process_audit_tool_tb_logic # Added/Corrected import
@@ -79,6 +80,11 @@ def process_transactions():
 
     if not files or not branch:
         return jsonify({"message": "Please upload DBF files and select a branch."}), 400
+    try:
+        # Optional: worker processes reading the files and rows normalized at a time per file
+        max_workers, chunk_size = parse_ingest_settings(request.form.get('max_workers'), request.form.get('chunk_size'))
+    except ValueError:
+        return jsonify({"message": "max_workers and chunk_size must be numbers."}), 400
 
     print(f"Server Log: Received request for Transactions. Files Count={len(files)}, Branch='{branch}'")
 
@@ -97,7 +103,7 @@ def process_transactions():
     try:
         response_data, status_code = helpers.handle_file_upload_and_process(
             # Pass the file_prefix to process_transactions_web
-            lambda input_temp_dir, output_folder, *args: process_transactions_web(input_temp_dir, output_folder, file_prefix),
+            lambda input_temp_dir, output_folder, *args: process_transactions_web(input_temp_dir, output_folder, file_prefix, max_workers, chunk_size),
             trnm_output_dir, # Pass the specific TRNM output directory here
             files,
             additional_params={'branch_val': branch} # Keep branch_val in additional_params if needed by helper
@@ -120,9 +126,13 @@ def process_transactions():
 @file_processing_bp.route('/process_convert_dbf', methods=['POST'])
 def convert_dbf_to_csv():
     files = request.files.getlist('files')
+    # Optional: 'parquet' writes typed Parquet files instead of CSV
+    output_format = request.form.get('output_format', 'csv')
 
     if not files:
         return jsonify({"message": "Please upload DBF files."}), 400
+    if output_format not in ('csv', 'parquet'):
+        return jsonify({"message": "Output format must be csv or parquet."}), 400
 
     print(f"Server Log: Received request for DBF to CSV conversion. Files Count={len(files)}")
 
@@ -134,7 +144,7 @@ def convert_dbf_to_csv():
     try:
         response_data, status_code = helpers.handle_file_upload_and_process(
             # The processing function process_dbf_to_csv_web expects input_dir and output_dir
-            lambda input_temp_dir, output_folder, dummy_files_arg: process_dbf_to_csv_web(input_temp_dir, output_folder),
+            lambda input_temp_dir, output_folder, dummy_files_arg: process_dbf_to_csv_web(input_temp_dir, output_folder, output_format),
             temp_output_dir, # Pass the generated temporary output directory here
             files
         )
@@ -161,11 +171,17 @@ def process_win_data():
 
     if not files or not output_dir or not branch:
         return jsonify({"message": "Please upload DBF files, select a branch, and provide an output directory."}), 400
+    try:
+        # Optional: worker processes reading the files and rows normalized at a time per file
+        max_workers, chunk_size = parse_ingest_settings(request.form.get('max_workers'), request.form.get('chunk_size'))
+    except ValueError:
+        return jsonify({"message": "max_workers and chunk_size must be numbers."}), 400
 
     print(f"Server Log: Received request for WIN Data processing. Output='{output_dir}', Files Count={len(files)}, Branch='{branch}'")
 
     response_data, status_code = helpers.handle_file_upload_and_process(
-        lambda input_temp_dir, output_folder, branch_val: process_win_data_web(input_temp_dir, output_folder, branch_val),
+        # process_win_data_web writes to its own branch folder; the helper's third argument is the uploaded paths
+        lambda input_temp_dir, output_folder, uploaded_paths: process_win_data_web(input_temp_dir, branch, max_workers, chunk_size),
         output_dir,
         files,
         additional_params={'branch_val': branch}
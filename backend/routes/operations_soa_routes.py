@@ -1,9 +1,15 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 import traceback
 
 # Import processing functions
 # FIX: Changed import to absolute path to match package structure
-from backend.operations_soa import process_statement_of_account_report
+from backend.operations_soa import (
+    process_statement_of_account_report, process_statement_of_account_page,
+    iter_statement_of_account_pages, get_statement_of_account_totals, SOA_CURSOR_KEYS
+)
+from backend.operations_trnm_search import iter_cross_branch_transactions
+from backend.routes.report_paging import paged_report_response
+from backend.utils.report_pagination import parse_page_size, iter_ndjson
 
 operations_soa_bp = Blueprint('operations_soa', __name__)
 
@@ -26,11 +32,25 @@ def process_statement_of_account_endpoint():
        not any([account_lookup, code_lookup, description_lookup, trn_type_lookup]):
         return jsonify({"message": "All parameters (Branch, From Date, To Date) are required, and at least one of Account Number, Code, Description, or TRN Type must be provided."}), 400
 
+    report_args = (branch, from_date_str, to_date_str, account_lookup,
+                   code_lookup, description_lookup, trn_type_lookup, match_type)
+
+    try:
+        # Optional paging (stream=ndjson, page_size/cursor), served like the other paged reports
+        paged_response = paged_report_response("Statement of Account", process_statement_of_account_page, iter_statement_of_account_pages, report_args, cursor_keys=SOA_CURSOR_KEYS)
+        if paged_response is not None:
+            return paged_response
+    except Exception as e:
+        print(f"Error processing Statement of Account page: {e}")
+        traceback.print_exc()
+        return jsonify({"message": f"An error occurred during Statement of Account report processing: {str(e)}"}), 500
+
     try:
         # FIX: Updated the function call to match the new signature of process_statement_of_account_report
         report_data = process_statement_of_account_report(
             branch, from_date_str, to_date_str, account_lookup,
-            code_lookup, description_lookup, trn_type_lookup, match_type
+            code_lookup, description_lookup, trn_type_lookup, match_type,
+            rank_by_relevance=request.form.get('rank_by') == 'relevance'
         )
         if report_data:
             return jsonify({"message": "Statement of Account generated successfully!", "data": report_data}), 200
@@ -40,3 +60,62 @@ def process_statement_of_account_endpoint():
         print(f"Error processing Statement of Account report: {e}")
         traceback.print_exc() # Print full traceback for debugging
         return jsonify({"message": f"An error occurred during Statement of Account report processing: {str(e)}"}), 500
+
+@operations_soa_bp.route('/process_statement_of_account_totals', methods=['POST'])
+def process_statement_of_account_totals_endpoint():
+    """Footer totals of the Statement of Account (same form fields as the report), computed apart from its rows."""
+    branch = request.form.get('branch')
+    from_date_str = request.form.get('from_date')
+    to_date_str = request.form.get('to_date')
+    account_lookup = request.form.get('account_lookup')
+    code_lookup = request.form.get('code_lookup')
+    description_lookup = request.form.get('description')
+    trn_type_lookup = request.form.get('trn_type_lookup')
+    match_type = request.form.get('match_type')
+
+    if not all([branch, from_date_str, to_date_str]) or \
+       not any([account_lookup, code_lookup, description_lookup, trn_type_lookup]):
+        return jsonify({"message": "All parameters (Branch, From Date, To Date) are required, and at least one of Account Number, Code, Description, or TRN Type must be provided."}), 400
+
+    try:
+        totals = get_statement_of_account_totals(
+            branch, from_date_str, to_date_str, account_lookup,
+            code_lookup, description_lookup, trn_type_lookup, match_type
+        )
+        if totals is None:
+            return jsonify({"message": "Invalid date format. Please use MM/DD/YYYY."}), 400
+        return jsonify({"message": "Statement of Account totals computed successfully!", "data": totals}), 200
+    except Exception as e:
+        print(f"Error computing Statement of Account totals: {e}")
+        traceback.print_exc()
+        return jsonify({"message": f"An error occurred while computing Statement of Account totals: {str(e)}"}), 500
+
+@operations_soa_bp.route('/search_cross_branch_transactions', methods=['POST'])
+def search_cross_branch_transactions_endpoint():
+    """
+    Streams (application/x-ndjson) the transactions of an account and/or member CID across the
+    trnm tables of all branches, or of the branches given, merged in date order.
+    """
+    from_date_str = request.form.get('from_date')
+    to_date_str = request.form.get('to_date')
+    account_lookup = request.form.get('account_lookup', '').strip()
+    cid_lookup = request.form.get('cid', '').strip()
+    match_type = request.form.get('match_type') or 'exact'
+    branches = [name.strip() for value in request.form.getlist('branches') for name in value.split(',') if name.strip()]
+
+    if not all([from_date_str, to_date_str]) or not any([account_lookup, cid_lookup]):
+        return jsonify({"message": "From Date and To Date are required, and at least one of Account Number or CID must be provided."}), 400
+
+    try:
+        page_size = parse_page_size(request.form.get('page_size'))
+    except ValueError as e:
+        return jsonify({"message": f"Invalid paging parameters: {str(e)}"}), 400
+
+    try:
+        # Closing the response (client disconnected) closes the generator, which cancels the branch queries
+        pages = iter_cross_branch_transactions(from_date_str, to_date_str, account_lookup, cid_lookup, match_type, branches or None, page_size)
+        return Response(stream_with_context(iter_ndjson(pages)), mimetype='application/x-ndjson')
+    except Exception as e:
+        print(f"Error searching transactions across branches: {e}")
+        traceback.print_exc()
+        return jsonify({"message": f"An error occurred during the cross-branch search: {str(e)}"}), 500
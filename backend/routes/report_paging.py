@@ -0,0 +1,38 @@
+# audit_tool/backend/routes/report_paging.py
+# Paging form fields shared by the paged report endpoints (GL/REF/DESC and the Statement of Account),
+# so their paging errors and response keys match.
+from flask import request, jsonify, Response, stream_with_context
+
+from backend.utils.report_pagination import FRAME_CURSOR_KEYS, parse_page_size, encode_cursor, decode_cursor, iter_ndjson
+
+
+def paged_report_response(report_label, page_function, pages_function, report_args, cursor_keys=FRAME_CURSOR_KEYS):
+    """
+    Serves the optional paging form fields of a report endpoint: stream=ndjson streams every row as
+    one JSON line, and page_size/cursor return one page with its next_cursor. Returns None when
+    none of them were sent, so the endpoint answers with the full report as before.
+    """
+    stream_mode = request.form.get('stream')
+    page_size_value = request.form.get('page_size')
+    cursor_token = request.form.get('cursor')
+    if stream_mode != 'ndjson' and page_size_value is None and cursor_token is None:
+        return None
+
+    try:
+        page_size = parse_page_size(page_size_value)
+        cursor = decode_cursor(cursor_token, cursor_keys)
+    except ValueError as e:
+        return jsonify({"message": f"Invalid paging parameters: {str(e)}"}), 400
+
+    if stream_mode == 'ndjson':
+        pages = pages_function(*report_args, page_size=page_size)
+        return Response(stream_with_context(iter_ndjson(pages)), mimetype='application/x-ndjson')
+
+    page = page_function(*report_args, cursor=cursor, page_size=page_size)
+    if page is None:
+        return jsonify({"message": "Invalid date format."}), 400
+    return jsonify({
+        "message": f"{report_label} page generated successfully!" if page['rows'] else "No data found for the specified criteria.",
+        "data": page['rows'],
+        "next_cursor": encode_cursor(page['next_cursor'])
+    }), 200
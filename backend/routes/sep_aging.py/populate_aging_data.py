@@ -1,17 +1,21 @@
 import pandas as pd
 import os
 from datetime import datetime
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+import sys
 import traceback
 
-# --- Database Configuration (ensure this matches your db_common.py) ---
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '', # Your MySQL password
-    'database': 'dc_req_db',
-    'charset': 'utf8mb4'
-}
+# Add the project root to sys.path so the shared 'backend' package can be imported
+# when this script is run directly (this file lives in backend/routes/sep_aging.py/).
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_script_dir, '..', '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backend.db_common import get_db_connection_sqlalchemy, refresh_aging_rollup, prune_aging_rollup, ensure_table_indexes
+
+# --- Database Configuration ---
+# Connection settings and pooling come from backend.db_common (DB_CONFIG / DB_POOL_CONFIG).
 
 # Define the base directory where your aging CSV files are located, including subfolders
 AGING_SOURCE_BASE_DIR = r"C:\ACC CLEANING\OPERATIONS\AGING"
@@ -38,21 +42,12 @@ CSV_HEADERS_TO_DB_COLUMNS = {
 }
 
 def get_db_engine():
-    """Establishes and returns a SQLAlchemy engine."""
-    try:
-        engine_url = (
-            f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@"
-            f"{DB_CONFIG['host']}/{DB_CONFIG['database']}?charset={DB_CONFIG['charset']}"
-        )
-        engine = create_engine(engine_url)
-        # Test connection
-        with engine.connect() as connection:
-            print("Database: SQLAlchemy engine connected successfully.")
-        return engine
-    except Exception as e:
-        print(f"Database: Error creating SQLAlchemy engine: {e}")
-        traceback.print_exc()
+    """Returns the shared, pooled SQLAlchemy engine from backend.db_common."""
+    engine = get_db_connection_sqlalchemy()
+    if engine is None:
+        print("Database: Error obtaining the shared SQLAlchemy engine.")
         return None
+    return engine
 
 # MODIFIED: Function to drop and then create the aging_report_data table with GL_Code
 def create_aging_table(engine):
@@ -196,9 +191,21 @@ def process_and_insert_aging_data():
         # Using index=False to prevent pandas from writing the DataFrame index as a column
         final_combined_df.to_sql(name=TARGET_TABLE_NAME, con=engine, if_exists='append', index=False, chunksize=1000)
         print(f"Successfully inserted data into '{TARGET_TABLE_NAME}' table.")
+        # The table was dropped and recreated above; rebuild its report indexes after the bulk load
+        ensure_table_indexes(TARGET_TABLE_NAME)
     except Exception as e:
         print(f"Error inserting data into '{TARGET_TABLE_NAME}' table: {e}")
         traceback.print_exc()
+        return
+
+    # Re-aggregate the aging_rollup table for every date that was just loaded,
+    # then drop rollup rows for dates that are no longer in the raw table.
+    loaded_dates = sorted(final_combined_df['Date'].dropna().unique().tolist())
+    print(f"Refreshing aging rollup for {len(loaded_dates)} loaded date(s)...")
+    if refresh_aging_rollup(loaded_dates):
+        prune_aging_rollup()
+    else:
+        print("Warning: Aging rollup refresh failed. Summaries will fall back to aging_report_data.")
 
 if __name__ == "__main__":
     print("Starting aging report data processing and insertion...")
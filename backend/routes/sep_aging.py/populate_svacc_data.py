@@ -1,18 +1,23 @@
 import pandas as pd
 import os
 from datetime import datetime
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+import sys
 import traceback
 import re
 
-# --- Database Configuration (ensure this matches your db_common.py) ---
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '', # Your MySQL password
-    'database': 'dc_req_db',
-    'charset': 'utf8mb4'
-}
+# Add the project root to sys.path so the shared 'backend' package can be imported
+# when this script is run directly (this file lives in backend/routes/sep_aging.py/).
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_script_dir, '..', '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backend.db_common import get_db_connection_sqlalchemy, ensure_table_indexes
+from backend.utils.date_parsing import parse_date_series
+
+# --- Database Configuration ---
+# Connection settings and pooling come from backend.db_common (DB_CONFIG / DB_POOL_CONFIG).
 
 # Define the base directory where your SVACC CSV files are located (no subfolders)
 SVACC_SOURCE_BASE_DIR = r"C:\ACC CLEANING\OPERATIONS\SVACC"
@@ -34,21 +39,12 @@ CSV_HEADERS_TO_DB_COLUMNS = {
 }
 
 def get_db_engine():
-    """Establishes and returns a SQLAlchemy engine."""
-    try:
-        engine_url = (
-            f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@"
-            f"{DB_CONFIG['host']}/{DB_CONFIG['database']}?charset={DB_CONFIG['charset']}"
-        )
-        engine = create_engine(engine_url)
-        # Test connection
-        with engine.connect() as connection:
-            print("Database: SQLAlchemy engine connected successfully.")
-        return engine
-    except Exception as e:
-        print(f"Database: Error creating SQLAlchemy engine: {e}")
-        traceback.print_exc()
+    """Returns the shared, pooled SQLAlchemy engine from backend.db_common."""
+    engine = get_db_connection_sqlalchemy()
+    if engine is None:
+        print("Database: Error obtaining the shared SQLAlchemy engine.")
         return None
+    return engine
 
 def create_svacc_table(engine, table_name):
     """
@@ -87,33 +83,8 @@ def create_svacc_table(engine, table_name):
         traceback.print_exc()
         return False
 
-# Custom date parsing function (reused from LNACC script)
-def parse_date_robust(date_string):
-    """
-    Attempts to parse a date string using multiple common formats.
-    Returns datetime.date object or pd.NaT if parsing fails.
-    """
-    if pd.isna(date_string) or not str(date_string).strip():
-        return pd.NaT
-    
-    s = str(date_string).strip()
-    # MODIFIED: Aggressively clean date string before parsing
-    # Remove any characters that are not digits, slashes, or hyphens
-    s = re.sub(r'[^\d/\-]', '', s) 
-
-    formats_to_try = [
-        '%m/%d/%Y',  # 01/08/1992
-        '%m-%d-%Y',  # 01-08-1992
-        '%Y-%m-%d',  # 1992-01-08
-        '%m/%d/%y',  # 01/08/92
-        '%m-%d-%y'   # 01-08-92
-    ]
-    for fmt in formats_to_try:
-        try:
-            return datetime.strptime(s, fmt).date()
-        except ValueError:
-            continue
-    return pd.NaT # Return NaT if all formats fail
+# Candidate formats for the date columns (e.g. 01/08/1992, 01-08-1992, 1992-01-08, 01/08/92, 01-08-92)
+DATE_FORMATS = ['%m/%d/%Y', '%m-%d-%Y', '%Y-%m-%d', '%m/%d/%y', '%m-%d-%y']
 
 def process_and_insert_svacc_data():
     """
@@ -176,7 +147,7 @@ def process_and_insert_svacc_data():
             date_cols = ['DOPEN', 'DOLASTTRN', 'MATDATE']
             for col in date_cols:
                 if col in df.columns:
-                    df[col] = df[col].apply(parse_date_robust)
+                    df[col] = parse_date_series(df[col], formats=DATE_FORMATS, family=f"svacc_csv.{col}", strip_pattern=r'[^\d/\-]', infer_fallback=False)
                 else:
                     df[col] = pd.NaT # Assign NaT if column is missing
 
@@ -253,6 +224,8 @@ def process_and_insert_svacc_data():
         try:
             final_combined_df.to_sql(name=table_name, con=engine, if_exists='append', index=False, chunksize=1000)
             print(f"Successfully inserted data into '{table_name}' table.")
+            # The table was dropped and recreated above; rebuild its report indexes after the bulk load
+            ensure_table_indexes(table_name)
         except Exception as e:
             print(f"Error inserting data into '{table_name}' table: {e}")
             traceback.print_exc()
@@ -1,18 +1,23 @@
 import pandas as pd
 import os
 from datetime import datetime
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+import sys
 import traceback
 import re
 
+# Add the project root to sys.path so the shared 'backend' package can be imported
+# when this script is run directly (this file lives in backend/routes/sep_aging.py/).
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_script_dir, '..', '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backend.db_common import get_db_connection_sqlalchemy, ensure_table_indexes
+from backend.utils.date_parsing import parse_date_series
+
 # --- Database Configuration ---
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '', # Your MySQL password
-    'database': 'dc_req_db',
-    'charset': 'utf8mb4'
-}
+# Connection settings and pooling come from backend.db_common (DB_CONFIG / DB_POOL_CONFIG).
 
 # Define the base directory where your TRNM CSV files are located
 # Each subfolder within this directory should be a branch name
@@ -40,21 +45,12 @@ CSV_HEADERS_TO_DB_COLUMNS = {
 CHUNK_SIZE = 100000 # Process 100,000 rows at a time
 
 def get_db_engine():
-    """Establishes and returns a SQLAlchemy engine."""
-    try:
-        engine_url = (
-            f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@"
-            f"{DB_CONFIG['host']}/{DB_CONFIG['database']}?charset={DB_CONFIG['charset']}"
-        )
-        engine = create_engine(engine_url)
-        # Test connection
-        with engine.connect() as connection:
-            print("Database: SQLAlchemy engine connected successfully.")
-        return engine
-    except Exception as e:
-        print(f"Database: Error creating SQLAlchemy engine: {e}")
-        traceback.print_exc()
+    """Returns the shared, pooled SQLAlchemy engine from backend.db_common."""
+    engine = get_db_connection_sqlalchemy()
+    if engine is None:
+        print("Database: Error obtaining the shared SQLAlchemy engine.")
         return None
+    return engine
 
 def create_trnm_table(engine, table_name):
     """
@@ -96,34 +92,8 @@ def create_trnm_table(engine, table_name):
         traceback.print_exc()
         return False
 
-# Custom date parsing function (reused from previous scripts)
-def parse_date_robust(date_string):
-    """
-    Attempts to parse a date string using multiple common formats.
-    Returns datetime.date object or pd.NaT if parsing fails.
-    """
-    if pd.isna(date_string) or not str(date_string).strip():
-        return pd.NaT
-    
-    s = str(date_string).strip()
-    s = s.replace('-', '/') # Standardize delimiters
-
-    formats_to_try = [
-        '%m/%d/%Y',  # MM/DD/YYYY
-        '%Y/%m/%d',  # YYYY/MM/DD
-        '%m/%d/%y',  # MM/DD/YY
-    ]
-    for fmt in formats_to_try:
-        try:
-            return datetime.strptime(s, fmt).date()
-        except ValueError:
-            continue
-    
-    # Final fallback: try pandas' general to_datetime with coerce
-    try:
-        return pd.to_datetime(s, errors='coerce').date()
-    except Exception:
-        return pd.NaT # Return NaT if all formats fail
+# Candidate formats after '-' is normalized to '/'; residual rows fall back to general inference
+DATE_FORMATS = ['%m/%d/%Y', '%Y/%m/%d', '%m/%d/%y']
 
 def process_and_insert_trnm_data():
     """
@@ -211,7 +181,7 @@ def process_and_insert_trnm_data():
                             date_cols = ['TRNDATE']
                             for col in date_cols:
                                 if col in chunk_df.columns:
-                                    chunk_df[col] = chunk_df[col].apply(parse_date_robust)
+                                    chunk_df[col] = parse_date_series(chunk_df[col], formats=DATE_FORMATS, family=f"trnm_csv.{col}", normalize_delimiters=True)
                                 else:
                                     chunk_df[col] = pd.NaT
 
@@ -266,6 +236,9 @@ def process_and_insert_trnm_data():
                 connection.commit()
                 print(f"Finished processing branch {branch_folder_name}. Total rows inserted: {total_rows_inserted_for_branch}")
 
+            # The table was dropped and recreated above; rebuild its report indexes after the bulk load
+            ensure_table_indexes(target_table_name)
+
     print("\nStarting TRNM data processing and insertion finished.")
 
 if __name__ == "__main__":
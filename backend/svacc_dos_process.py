@@ -146,7 +146,8 @@ def process_svacc_dos_data_web(input_dir, selected_branch): # Removed output_dir
             print(f"Server Log (SVACC DOS): Processing file: {file_name}...")
 
             try:
-                table = DBF(dbf_path, load=True, encoding='latin-1', ignore_missing_memofile=True)
+                # Records are parsed from disk as they are iterated instead of loading the whole table
+                table = DBF(dbf_path, encoding='latin-1', ignore_missing_memofile=True)
                 
                 rows_in_current_dbf = []
                 for record in table: 
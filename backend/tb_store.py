@@ -0,0 +1,226 @@
+# audit_tool/backend/tb_store.py
+# Long-format store of the Trial Balance exports (as-of file, GLACC, TITLE, DR, CR) per branch.
+# Each TB file is parsed once per version, so single and multi-date TB reports read typed rows.
+import os
+import threading
+from datetime import datetime
+import pandas as pd
+
+# Define the base directory where Trial Balance data is stored
+TB_BASE_DIR = r"C:\xampp\htdocs\audit_tool\ACCOUTNING\TRIAL BALANCE"
+# Derived TB data lives outside the TB folders so writing it never changes their mtimes
+TB_CACHE_DIR = r"C:\xampp\htdocs\audit_tool\db\tb_cache"
+# Bump when the stored columns change so existing stores are rebuilt
+TB_STORE_VERSION = 1
+
+# When an as-of date exists in several formats, the first extension wins (as in the TB report)
+TB_FILE_EXTENSIONS = ['.csv', '.xlsx', '.xls']
+TB_ENCODINGS = ['utf-8', 'latin1', 'cp1252', 'iso-8859-1', 'utf-8-sig']
+TB_STORE_COLUMNS = ['AS_OF_FILE', 'AS_OF_DATE', 'GLACC', 'TITLE', 'DR_VAL', 'CR_VAL']
+
+_tb_listings = {} # branch folder -> (folder mtime, {as-of name: source path})
+_tb_stores = {} # branch folder -> {'sources': {as-of name: {'path', 'size', 'mtime'}}, 'frame': DataFrame}
+_tb_lock = threading.Lock()
+_branch_locks = {}
+
+
+def _get_branch_lock(branch_folder):
+    with _tb_lock:
+        return _branch_locks.setdefault(branch_folder, threading.Lock())
+
+
+def sanitize_tb_branch_folder(branch_name):
+    """Returns the TB folder name for a branch (alphanumerics/spaces/underscores, spaces to underscores, upper case)."""
+    sanitized_branch = "".join([c for c in str(branch_name) if c.isalnum() or c in (' ', '_')]).strip().replace(' ', '_')
+    return sanitized_branch.upper()
+
+
+def parse_as_of_date(as_of_name):
+    """Returns the datetime of an MM-DD-YYYY as-of filename, or None for other names."""
+    try:
+        return datetime.strptime(as_of_name, '%m-%d-%Y')
+    except ValueError:
+        return None
+
+
+def list_tb_sources(branch_folder):
+    """
+    Returns {as-of name (filename without extension): path} for the branch's TB files,
+    or None if the folder does not exist. The folder is only listed again when its mtime
+    changes.
+    """
+    branch_folder_path = os.path.join(TB_BASE_DIR, branch_folder)
+    try:
+        folder_mtime = os.stat(branch_folder_path).st_mtime
+    except OSError:
+        return None
+    with _tb_lock:
+        cached = _tb_listings.get(branch_folder)
+    if cached is not None and cached[0] == folder_mtime:
+        return cached[1]
+
+    candidates = {}
+    for filename in os.listdir(branch_folder_path):
+        base_name, extension = os.path.splitext(filename)
+        if extension.lower() in TB_FILE_EXTENSIONS and not filename.startswith('~'):
+            candidates.setdefault(base_name, []).append((TB_FILE_EXTENSIONS.index(extension.lower()), filename))
+    sources = {base_name: os.path.join(branch_folder_path, min(files)[1]) for base_name, files in candidates.items()}
+
+    with _tb_lock:
+        _tb_listings[branch_folder] = (folder_mtime, sources)
+    return sources
+
+
+def read_tb_file(file_to_read, log_label="TB Process"):
+    """
+    Reads Column A (GLACC), C (TITLE), D (DR) and E (CR) of a TB CSV/Excel file, skipping the
+    first row. Returns a DataFrame with GLACC, TITLE, DR_RAW and CR_RAW as strings, or None.
+    """
+    df = None
+    if file_to_read.lower().endswith('.csv'):
+        for encoding in TB_ENCODINGS:
+            try:
+                df = pd.read_csv(file_to_read, encoding=encoding, header=None, usecols=[0, 2, 3, 4], dtype=str, skiprows=1)
+                print(f"Server Log ({log_label}): Read CSV file: {file_to_read} with encoding {encoding}, skipping first row.")
+                break
+            except UnicodeDecodeError:
+                pass
+            except Exception as e:
+                print(f"Server Log ({log_label}): Error reading CSV file {file_to_read} with {encoding}: {e}")
+    else:
+        try:
+            df = pd.read_excel(file_to_read, header=None, usecols=[0, 2, 3, 4], dtype=str, skiprows=1)
+            print(f"Server Log ({log_label}): Read Excel file: {file_to_read}, skipping first row.")
+        except Exception as e:
+            print(f"Server Log ({log_label}): Error reading Excel file {file_to_read}: {e}")
+
+    if df is None:
+        print(f"Server Log ({log_label}): Failed to read TB file: {file_to_read}")
+        return None
+    return df.rename(columns={0: 'GLACC', 2: 'TITLE', 3: 'DR_RAW', 4: 'CR_RAW'})
+
+
+def _to_number(series):
+    """Strips thousands separators and converts to float, with unparseable values as 0."""
+    return pd.to_numeric(series.astype(str).str.replace(',', '', regex=False), errors='coerce').fillna(0)
+
+
+def _type_tb_frame(df, as_of_name):
+    as_of_date = parse_as_of_date(as_of_name)
+    return pd.DataFrame({
+        'AS_OF_FILE': as_of_name,
+        'AS_OF_DATE': pd.Timestamp(as_of_date) if as_of_date else pd.NaT,
+        'GLACC': df['GLACC'],
+        'TITLE': df['TITLE'],
+        'DR_VAL': _to_number(df['DR_RAW']),
+        'CR_VAL': _to_number(df['CR_RAW']),
+    }, columns=TB_STORE_COLUMNS)
+
+
+def _store_file_path(branch_folder):
+    return os.path.join(TB_CACHE_DIR, f"{branch_folder}.pkl")
+
+
+def _load_persisted_store(branch_folder):
+    store_path = _store_file_path(branch_folder)
+    if not os.path.exists(store_path):
+        return None
+    try:
+        store = pd.read_pickle(store_path)
+    except Exception as e:
+        print(f"Server Log (TB Store): Ignoring unreadable store {store_path}: {e}")
+        return None
+    if not isinstance(store, dict) or store.get('version') != TB_STORE_VERSION:
+        return None
+    return store
+
+
+def _save_store(branch_folder, store):
+    """Writes the store atomically so a concurrent reader never sees a half-written file."""
+    store_path = _store_file_path(branch_folder)
+    temp_path = f"{store_path}.tmp"
+    try:
+        os.makedirs(TB_CACHE_DIR, exist_ok=True)
+        pd.to_pickle(store, temp_path)
+        os.replace(temp_path, store_path)
+    except OSError as e:
+        # The in-memory store still works; it just has to be rebuilt after a restart
+        print(f"Server Log (TB Store): Could not save store {store_path}: {e}")
+
+
+def _sync_tb_store(branch_folder, sources, as_of_names):
+    """
+    Brings the requested as-of dates of the branch store up to date: files that are new or
+    whose path, size or mtime changed are (re)parsed, and dates whose file is gone are dropped.
+    """
+    with _tb_lock:
+        store = _tb_stores.get(branch_folder)
+    if store is None:
+        store = _load_persisted_store(branch_folder) or {
+            'version': TB_STORE_VERSION, 'sources': {}, 'frame': pd.DataFrame(columns=TB_STORE_COLUMNS)
+        }
+
+    removed_names = [name for name in store['sources'] if name not in sources]
+    stale_names = list(removed_names)
+    new_frames = []
+    new_sources = {}
+    for as_of_name in as_of_names:
+        file_path = sources.get(as_of_name)
+        if file_path is None:
+            continue
+        try:
+            stat_result = os.stat(file_path)
+        except OSError:
+            continue
+        version = {'path': file_path, 'size': stat_result.st_size, 'mtime': stat_result.st_mtime}
+        if store['sources'].get(as_of_name) == version:
+            continue
+        if as_of_name in store['sources']:
+            stale_names.append(as_of_name)
+        df = read_tb_file(file_path, log_label="TB Store")
+        if df is None:
+            continue
+        new_frames.append(_type_tb_frame(df, as_of_name))
+        new_sources[as_of_name] = version
+
+    if stale_names or new_frames:
+        frame = store['frame']
+        frame = frame[~frame['AS_OF_FILE'].isin(stale_names)]
+        # An empty store frame has untyped columns; leave it out so DR_VAL/CR_VAL stay float
+        frames = ([frame] if not frame.empty else []) + new_frames
+        frame = pd.concat(frames, ignore_index=True) if frames else frame.reset_index(drop=True)
+        store_sources = {name: version for name, version in store['sources'].items() if name not in stale_names}
+        store_sources.update(new_sources)
+        store = {'version': TB_STORE_VERSION, 'sources': store_sources, 'frame': frame}
+        _save_store(branch_folder, store)
+        print(f"Server Log (TB Store): Updated store for {branch_folder}: {len(new_frames)} as-of dates ingested, {len(removed_names)} removed, {len(store_sources)} stored.")
+
+    with _tb_lock:
+        _tb_stores[branch_folder] = store
+    return store
+
+
+def load_tb_rows(branch_folder, as_of_names):
+    """
+    Returns the typed TB rows (TB_STORE_COLUMNS) of the given as-of dates in one selection
+    from the branch store, ingesting any requested file that is new or changed first.
+    Rows keep each file's original order. Returns None if the branch folder does not exist;
+    as-of dates without a readable file are simply absent from the result.
+    """
+    sources = list_tb_sources(branch_folder)
+    if sources is None:
+        return None
+    with _get_branch_lock(branch_folder):
+        store = _sync_tb_store(branch_folder, sources, as_of_names)
+    frame = store['frame']
+    return frame[frame['AS_OF_FILE'].isin(as_of_names)].reset_index(drop=True)
+
+
+def clear_tb_store_cache(branch_folder=None):
+    """Drops in-memory stores and folder listings (all, or one branch); persisted stores are kept."""
+    with _tb_lock:
+        for cache in (_tb_listings, _tb_stores):
+            if branch_folder is None:
+                cache.clear()
+            else:
+                cache.pop(branch_folder, None)
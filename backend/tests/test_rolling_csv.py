@@ -0,0 +1,47 @@
+# audit_tool/backend/tests/test_rolling_csv.py
+import os
+import re
+import pandas as pd
+
+from backend.gl_catalog import parse_gl_filename_dates
+from backend.utils.rolling_csv import RollingCsvWriter
+
+COLUMNS = ['DOCDATE', 'TRN', 'AMT']
+# The 'latest file' pattern gl_dos_process/gl_win_process resume from
+GL_LATEST_FILE_PATTERN = r'TO (\d{2}-\d{2}-\d{4})\.csv$'
+
+
+def _rows(*rows):
+    frame = pd.DataFrame(list(rows), columns=COLUMNS)
+    return frame, pd.to_datetime(frame['DOCDATE'], format='%m/%d/%Y')
+
+
+def _write(output_dir, *rows, resume_path=None):
+    with RollingCsvWriter(str(output_dir), 'BR', COLUMNS) as writer:
+        if resume_path:
+            writer.resume(resume_path, 'DOCDATE')
+        writer.write(*_rows(*rows))
+    return writer.paths
+
+
+def test_same_date_range_file_keeps_a_parseable_name(tmp_path):
+    first, = _write(tmp_path, ('01/01/2024', '1', '10.00'), ('01/31/2024', '2', '20.00'))
+    second, = _write(tmp_path, ('01/01/2024', '3', '30.00'), ('01/31/2024', '4', '40.00'))
+
+    assert os.path.basename(first) == 'BR - 01-01-2024 TO 01-31-2024.csv'
+    assert os.path.basename(second) == 'BR (2) - 01-01-2024 TO 01-31-2024.csv'
+    for path in (first, second):
+        name = os.path.basename(path)
+        assert parse_gl_filename_dates(name) == (pd.Timestamp('2024-01-01'), pd.Timestamp('2024-01-31'))
+        assert re.search(GL_LATEST_FILE_PATTERN, name).group(1) == '01-31-2024'
+
+
+def test_resume_drops_duplicates_across_the_whole_file(tmp_path):
+    existing, = _write(tmp_path, ('01/01/2024', '1', '10.00'), ('01/01/2024', '1', '10.00'), ('01/02/2024', '2', '20.00'))
+    resumed, = _write(tmp_path, ('01/02/2024', '2', '20.00'), ('01/03/2024', '3', '30.00'), ('01/03/2024', '3', '30.00'), resume_path=existing)
+
+    expected = pd.DataFrame([['01/01/2024', '1', '10.00'], ['01/02/2024', '2', '20.00'], ['01/03/2024', '3', '30.00']], columns=COLUMNS)
+    result = pd.read_csv(resumed, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    pd.testing.assert_frame_equal(result, expected)
+    assert os.path.basename(resumed) == 'BR - 01-01-2024 TO 01-03-2024.csv'
+    assert os.listdir(tmp_path) == [os.path.basename(resumed)]
@@ -2,11 +2,11 @@
 import os
 import pandas as pd
 from datetime import datetime, timedelta
-import re
 from dateutil.relativedelta import relativedelta
 
-# Define the base directory where accounting data is stored
-ACCOUNTING_BASE_DIR = r"C:\xampp\htdocs\audit_tool\ACCOUTNING\GENERAL LEDGER"
+# GL folder location comes from the shared GL catalog; balances from the GL balance snapshots
+from backend.gl_catalog import ACCOUNTING_BASE_DIR, sanitize_gl_branch_folder
+from backend.gl_balance_snapshots import load_balance_snapshots, closing_balance, daily_balances
 
 # Helper function for currency formatting (copied from accounting_process for self-containment)
 def format_currency(value):
@@ -25,46 +25,37 @@ def format_currency(value):
     else:
         return "{:,.2f}".format(num_val)
 
-def process_trend_report(branch, from_date_str, to_date_str, gl_code_lookup, frequency):
-    """
-    Processes GL data for a specific branch, date range, GL Code, and frequency.
-    Generates a trend report showing the last transaction's balance for each period.
-    Includes logic for previous period balance, GL code multipliers, and nominal account rules.
+TREND_FREQUENCIES = ['daily', 'monthly', 'semi-annually', 'annually']
 
-    Args:
-        branch (str): The selected branch name.
-        from_date_str (str): Start date in MM/DD/YYYY format.
-        to_date_str (str): End date in MM/DD/YYYY format.
-        gl_code_lookup (str): The GL Code to filter by (without hyphens).
-        frequency (str): 'daily', 'monthly', 'semi-annually', 'annually'.
-
-    Returns:
-        list: A list of dictionaries representing the processed table data (Date, Balance, Change).
-              Returns an empty list if no data is found or an error occurs.
+def get_period_closing_balances(snapshots, glacc, from_date, to_date, frequency):
     """
-    sanitized_branch_name = "".join([c for c in branch if c.isalnum() or c in (' ', '_')]).strip().replace(' ', '_')
-    if not sanitized_branch_name:
-        print("Server Log (TREND Report): Invalid branch name provided.")
-        return []
-
-    branch_folder_path = os.path.join(ACCOUNTING_BASE_DIR, sanitized_branch_name.upper())
-    print(f"Server Log (TREND Report): Processing TREND report for branch: {branch_folder_path}")
-    print(f"Server Log (TREND Report): Date Range: {from_date_str} to {to_date_str}, GL Code: {gl_code_lookup}, Frequency: {frequency}")
-
-    if not os.path.isdir(branch_folder_path):
-        print(f"Server Log (TREND Report): Branch folder not found: {branch_folder_path}")
-        return []
-
-    all_gl_data_raw = [] # To store all relevant GL data before filtering by GLACC and date range
-    encodings_to_try = ['utf-8', 'latin1', 'cp1252', 'iso-8859-1', 'utf-8-sig']
-
-    try:
-        from_date = datetime.strptime(from_date_str, '%m/%d/%Y')
-        to_date = datetime.strptime(to_date_str, '%m/%d/%Y')
-    except ValueError as e:
-        print(f"Server Log (TREND Report): Invalid date format received from frontend: {e}")
-        return []
+    Returns [(period end date, closing balance)] for each period of the frequency that has a
+    transaction of `glacc` within [from_date, to_date]; the first and last periods only count
+    the days inside the range. Returns None for an unknown frequency.
+    """
+    if frequency == 'daily':
+        return daily_balances(snapshots, glacc, from_date, to_date)
 
+    if frequency == 'monthly':
+        period_start, period_months = from_date.replace(day=1), 1
+    elif frequency == 'semi-annually':
+        period_start, period_months = datetime(from_date.year, 1 if from_date.month <= 6 else 7, 1), 6
+    elif frequency == 'annually':
+        period_start, period_months = datetime(from_date.year, 1, 1), 12
+    else:
+        return None
+
+    period_balances = []
+    while period_start <= to_date:
+        period_end = period_start + relativedelta(months=period_months, days=-1) # End of month / semi-annual period / year
+        balance = closing_balance(snapshots, glacc, max(period_start, from_date), min(period_end, to_date))
+        if balance is not None:
+            period_balances.append((period_end, balance))
+        period_start += relativedelta(months=period_months)
+    return period_balances
+
+def _get_extended_from_date(from_date, frequency):
+    """Start of the period before from_date's period, so the previous-period balance is covered."""
     # Calculate the extended_from_date to include the previous period for initial balance calculation
     extended_from_date = from_date
     if frequency == 'daily':
@@ -79,116 +70,10 @@ def process_trend_report(branch, from_date_str, to_date_str, gl_code_lookup, fre
         extended_from_date = current_semi_annual_start - relativedelta(months=6)
     elif frequency == 'annually':
         extended_from_date = datetime(from_date.year - 1, 1, 1) # Start of previous year
+    return extended_from_date
 
-    print(f"Server Log (TREND Report): Extended date range for file selection: {extended_from_date.strftime('%m/%d/%Y')} to {to_date.strftime('%m/%d/%Y')}")
-
-
-    def parse_filename_dates(filename):
-        match_month_year = re.match(r'.* - (\w{3} \d{4}) to (\w{3} \d{4})\.csv$', filename, re.IGNORECASE)
-        if match_month_year:
-            start_date_str = match_month_year.group(1)
-            end_date_str = match_month_year.group(2)
-            try:
-                file_start_date = datetime.strptime(start_date_str, '%b %Y').replace(day=1)
-                temp_end_date = datetime.strptime(end_date_str, '%b %Y').replace(day=1)
-                file_end_date = temp_end_date + relativedelta(months=1, days=-1)
-                return file_start_date, file_end_date
-            except ValueError:
-                return None, None
-        match_full_date = re.match(r'.* - (\d{2}-\d{2}-\d{4}) to (\d{2}-\d{2}-\d{4})\.csv$', filename, re.IGNORECASE)
-        if match_full_date:
-            start_date_str = match_full_date.group(1)
-            end_date_str = match_full_date.group(2)
-            try:
-                file_start_date = datetime.strptime(start_date_str, '%m-%d-%Y')
-                file_end_date = datetime.strptime(end_date_str, '%m-%d-%Y')
-                return file_start_date, file_end_date
-            except ValueError:
-                return None, None
-        return None, None
-
-    for filename in os.listdir(branch_folder_path):
-        lower_filename = filename.lower()
-        if not lower_filename.endswith('.csv'):
-            continue
-
-        file_path = os.path.join(branch_folder_path, filename)
-        file_start_date, file_end_date = parse_filename_dates(filename)
-
-        if file_start_date is None or file_end_date is None:
-            print(f"Server Log (TREND Report): Skipping file {filename}: Could not parse date range from filename.")
-            continue
-
-        # Check for overlap with the *extended* date range for efficient file loading
-        if not (file_start_date <= to_date and file_end_date >= extended_from_date):
-            print(f"Server Log (TREND Report): Skipping file {filename}: Date range from filename ({file_start_date.strftime('%Y-%m-%d')} to {file_end_date.strftime('%Y-%m-%d')}) does not overlap with extended requested range.")
-            continue
-
-        df = None
-        read_success = False
-        if lower_filename.endswith(('.xlsx', '.xls')): # Although only CSV is expected, keep for robustness
-            try:
-                df = pd.read_excel(file_path)
-                read_success = True
-            except Exception as e:
-                print(f"Server Log (TREND Report): Error reading Excel file {filename}: {e}")
-        elif lower_filename.endswith('.csv'):
-            for encoding in encodings_to_try:
-                try:
-                    df = pd.read_csv(file_path, encoding=encoding)
-                    read_success = True
-                    break
-                except UnicodeDecodeError:
-                    pass
-                except Exception as e:
-                    print(f"Server Log (TREND Report): Error reading CSV file {filename} with {encoding}: {e}")
-        
-        if read_success and df is not None:
-            df.columns = [col.strip().upper() for col in df.columns]
-            required_cols = ['DOCDATE', 'TRN', 'DESC', 'REF', 'AMT', 'BAL', 'GLACC'] 
-            if not all(col in df.columns for col in required_cols):
-                print(f"Server Log (TREND Report): Skipping {filename}: Missing required columns.")
-                continue
-
-            df['DOCDATE_DT'] = pd.to_datetime(df['DOCDATE'], errors='coerce')
-            df.dropna(subset=['DOCDATE_DT'], inplace=True)
-            
-            # Convert AMT and BAL to numeric, handling missing values
-            df['AMT_NUM'] = df['AMT'].astype(str).str.replace(',', '', regex=False).apply(pd.to_numeric, errors='coerce').fillna(0)
-            df['BAL_NUM'] = df['BAL'].astype(str).str.replace(',', '', regex=False).apply(pd.to_numeric, errors='coerce').fillna(0)
-            
-            all_gl_data_raw.append(df)
-            print(f"Server Log (TREND Report): Added raw data from {filename} ({len(df)} rows).")
-        else:
-            print(f"Server Log (TREND Report): Could not read file: {filename}")
-
-    if not all_gl_data_raw:
-        print("Server Log (TREND Report): No raw GL data found in any files.")
-        return []
-
-    combined_df_raw = pd.concat(all_gl_data_raw, ignore_index=True)
-    
-    # Filter by GLACC (raw, no hyphens) across all loaded data
-    gl_code_lookup_clean = gl_code_lookup.replace('-', '').strip()
-    combined_df_gl_filtered = combined_df_raw[
-        combined_df_raw['GLACC'].astype(str).str.replace('-', '').str.strip() == gl_code_lookup_clean
-    ].copy()
-    
-    if combined_df_gl_filtered.empty:
-        print(f"Server Log (TREND Report): No data found for GLACC '{gl_code_lookup_clean}' after initial filtering.")
-        return []
-
-    # Sort by DOCDATE_DT and then by TRN for consistent "last transaction" logic
-    if 'TRN' in combined_df_gl_filtered.columns:
-        combined_df_gl_filtered['TRN_NUM_SORT'] = pd.to_numeric(combined_df_gl_filtered['TRN'], errors='coerce').fillna(0)
-        combined_df_gl_filtered.sort_values(by=['DOCDATE_DT', 'TRN_NUM_SORT'], ascending=[True, True], inplace=True)
-    else:
-        combined_df_gl_filtered.sort_values(by=['DOCDATE_DT'], ascending=[True], inplace=True)
-
-    # --- Calculate initial_previous_balance for the very first period's 'Change' calculation ---
-    initial_previous_balance = 0.0
-    
-    # Determine the start and end date of the period *before* the 'from_date'
+def _get_previous_period(from_date, frequency):
+    """Returns (start, end) of the period *before* the 'from_date', or (None, None) for an unknown frequency."""
     prev_period_start_date = None
     prev_period_end_date = None
 
@@ -206,16 +91,27 @@ def process_trend_report(branch, from_date_str, to_date_str, gl_code_lookup, fre
     elif frequency == 'annually':
         prev_period_end_date = datetime(from_date.year - 1, 12, 31)
         prev_period_start_date = datetime(from_date.year - 1, 1, 1)
+    return prev_period_start_date, prev_period_end_date
+
+def _build_trend_entries(snapshots, gl_code_lookup_clean, from_date, to_date, frequency, extended_from_date):
+    """
+    Builds the trend rows (Date, Balance, Change) of one GL code from the balance snapshots,
+    applying the previous-period balance, the -1 multiplier for GL codes starting with 2/3/4
+    and the nominal-account January rule. Returns an empty list if the code has no data.
+    """
+    if closing_balance(snapshots, gl_code_lookup_clean, extended_from_date, to_date) is None:
+        print(f"Server Log (TREND Report): No data found for GLACC '{gl_code_lookup_clean}' after initial filtering.")
+        return []
+
+    # --- Calculate initial_previous_balance for the very first period's 'Change' calculation ---
+    initial_previous_balance = 0.0
+    prev_period_start_date, prev_period_end_date = _get_previous_period(from_date, frequency)
 
     if prev_period_start_date and prev_period_end_date:
-        # Filter for the previous period's data
-        df_prev_period = combined_df_gl_filtered[ # This is correct, it uses the already filtered-by-GLACC data
-            (combined_df_gl_filtered['DOCDATE_DT'] >= prev_period_start_date) &
-            (combined_df_gl_filtered['DOCDATE_DT'] <= prev_period_end_date)
-        ]
-        if not df_prev_period.empty:
-            # Get the last balance of the previous period
-            initial_previous_balance = df_prev_period['BAL_NUM'].iloc[-1]
+        # Get the last balance of the previous period
+        prev_period_balance = closing_balance(snapshots, gl_code_lookup_clean, prev_period_start_date, prev_period_end_date)
+        if prev_period_balance is not None:
+            initial_previous_balance = prev_period_balance
             print(f"Server Log (TREND Report): Found initial previous balance of {initial_previous_balance} for GLACC '{gl_code_lookup_clean}' from {prev_period_start_date.strftime('%m/%d/%Y')} to {prev_period_end_date.strftime('%m/%d/%Y')}.")
         else:
             print(f"Server Log (TREND Report): No data found for GLACC '{gl_code_lookup_clean}' in previous period ({prev_period_start_date.strftime('%m/%d/%Y')} to {prev_period_end_date.strftime('%m/%d/%Y')}). Initial previous balance remains 0.")
@@ -224,24 +120,22 @@ def process_trend_report(branch, from_date_str, to_date_str, gl_code_lookup, fre
 
     # --- Apply -1 multiplier based on GL Code prefix (2, 3, or 4) ---
     gl_code_prefix = gl_code_lookup_clean[0]
+    balance_multiplier = 1
     if gl_code_prefix in ['2', '3', '4']:
         print(f"Server Log (TREND Report): Applying -1 multiplier for GL Code prefix '{gl_code_prefix}'.")
-        combined_df_gl_filtered['BAL_NUM'] *= -1
-        combined_df_gl_filtered['AMT_NUM'] *= -1 # Also flip AMT for consistency if needed later
+        balance_multiplier = -1
         initial_previous_balance *= -1 # Apply multiplier to initial previous balance as well
 
-    # Filter for the main report date range
-    combined_df = combined_df_gl_filtered[
-        (combined_df_gl_filtered['DOCDATE_DT'] >= from_date) & 
-        (combined_df_gl_filtered['DOCDATE_DT'] <= to_date)
-    ].copy()
+    # Last balance of each period within the main report date range
+    period_balances = get_period_closing_balances(snapshots, gl_code_lookup_clean, from_date, to_date, frequency)
+    if period_balances is None:
+        print("Server Log (TREND Report): Invalid frequency specified.")
+        return []
 
-    if combined_df.empty:
+    if not period_balances:
         print(f"Server Log (TREND Report): No data within main date range for GLACC '{gl_code_lookup_clean}'.")
         return []
 
-    # Determine period start/end dates based on frequency
-    # Group by period and get the last balance for each period
     trend_data = []
     
     previous_balance = initial_previous_balance # Start with the balance from the period before from_date
@@ -249,41 +143,8 @@ def process_trend_report(branch, from_date_str, to_date_str, gl_code_lookup, fre
     # Track if it's the very first entry in the report to handle special January rule
     is_first_report_entry = True
 
-    if frequency == 'daily':
-        # Group by actual date
-        grouped = combined_df.groupby(combined_df['DOCDATE_DT'].dt.date)
-    elif frequency == 'monthly':
-        # Group by year and month
-        grouped = combined_df.groupby([combined_df['DOCDATE_DT'].dt.year, combined_df['DOCDATE_DT'].dt.month])
-    elif frequency == 'semi-annually':
-        # Group by year and semi-annual period (1-6, 7-12)
-        combined_df['SEMI_ANNUAL_PERIOD'] = combined_df['DOCDATE_DT'].dt.month.apply(lambda x: 1 if x <= 6 else 2)
-        grouped = combined_df.groupby([combined_df['DOCDATE_DT'].dt.year, combined_df['SEMI_ANNUAL_PERIOD']])
-    elif frequency == 'annually':
-        # Group by year
-        grouped = combined_df.groupby(combined_df['DOCDATE_DT'].dt.year)
-    else:
-        print("Server Log (TREND Report): Invalid frequency specified.")
-        return []
-
-    for name, group in grouped:
-        # Get the last transaction in the group
-        last_transaction = group.iloc[-1]
-        current_balance = last_transaction['BAL_NUM']
-        
-        # Determine the display date for the period
-        period_date = None
-        if frequency == 'daily':
-            period_date = datetime(name.year, name.month, name.day)
-        elif frequency == 'monthly':
-            period_date = datetime(name[0], name[1], 1) + relativedelta(months=1, days=-1) # End of month
-        elif frequency == 'semi-annually':
-            year, period_num = name
-            start_month = 1 if period_num == 1 else 7
-            period_date = datetime(year, start_month, 1) + relativedelta(months=6, days=-1) # End of semi-annual period
-        elif frequency == 'annually':
-            year = name
-            period_date = datetime(year, 12, 31) # End of year
+    for period_date, period_balance in period_balances:
+        current_balance = period_balance * balance_multiplier
 
         change = 0.0
         # --- Nominal Accounts (GL Code starts with 4 or 5) and First January Transaction Rule ---
@@ -305,5 +166,136 @@ def process_trend_report(branch, from_date_str, to_date_str, gl_code_lookup, fre
         })
         previous_balance = current_balance
 
-    print(f"Server Log (TREND Report): Processed {len(trend_data)} trend entries.")
+    print(f"Server Log (TREND Report): Processed {len(trend_data)} trend entries for GLACC '{gl_code_lookup_clean}'.")
     return trend_data
+
+def process_trend_report(branch, from_date_str, to_date_str, gl_code_lookup, frequency):
+    """
+    Processes GL data for a specific branch, date range, GL Code, and frequency.
+    Generates a trend report showing the last transaction's balance for each period.
+    Includes logic for previous period balance, GL code multipliers, and nominal account rules.
+
+    Args:
+        branch (str): The selected branch name.
+        from_date_str (str): Start date in MM/DD/YYYY format.
+        to_date_str (str): End date in MM/DD/YYYY format.
+        gl_code_lookup (str): The GL Code to filter by (without hyphens).
+        frequency (str): 'daily', 'monthly', 'semi-annually', 'annually'.
+
+    Returns:
+        list: A list of dictionaries representing the processed table data (Date, Balance, Change).
+              Returns an empty list if no data is found or an error occurs.
+    """
+    branch_folder = sanitize_gl_branch_folder(branch)
+    if not branch_folder:
+        print("Server Log (TREND Report): Invalid branch name provided.")
+        return []
+
+    branch_folder_path = os.path.join(ACCOUNTING_BASE_DIR, branch_folder)
+    print(f"Server Log (TREND Report): Processing TREND report for branch: {branch_folder_path}")
+    print(f"Server Log (TREND Report): Date Range: {from_date_str} to {to_date_str}, GL Code: {gl_code_lookup}, Frequency: {frequency}")
+
+    try:
+        from_date = datetime.strptime(from_date_str, '%m/%d/%Y')
+        to_date = datetime.strptime(to_date_str, '%m/%d/%Y')
+    except ValueError as e:
+        print(f"Server Log (TREND Report): Invalid date format received from frontend: {e}")
+        return []
+
+    extended_from_date = _get_extended_from_date(from_date, frequency)
+    print(f"Server Log (TREND Report): Extended date range for file selection: {extended_from_date.strftime('%m/%d/%Y')} to {to_date.strftime('%m/%d/%Y')}")
+
+    # Closing balances come from the per-GLACC snapshots of the files overlapping the *extended* range
+    snapshots = load_balance_snapshots(branch_folder, extended_from_date, to_date)
+    if snapshots is None:
+        print(f"Server Log (TREND Report): Branch folder not found: {branch_folder_path}")
+        return []
+
+    gl_code_lookup_clean = gl_code_lookup.replace('-', '').strip()
+    return _build_trend_entries(snapshots, gl_code_lookup_clean, from_date, to_date, frequency, extended_from_date)
+
+def process_trend_report_batch(branch, from_date_str, to_date_str, gl_code_lookups, frequency):
+    """
+    Batch variant of process_trend_report: builds the trend of several GL codes from one load
+    of the branch's balance snapshots, with the previous-period, multiplier and nominal-account
+    rules applied per code.
+
+    Args:
+        branch (str): The selected branch name.
+        from_date_str (str): Start date in MM/DD/YYYY format.
+        to_date_str (str): End date in MM/DD/YYYY format.
+        gl_code_lookups (list): GL Codes (hyphens are ignored); duplicates are dropped.
+        frequency (str): 'daily', 'monthly', 'semi-annually', 'annually'.
+
+    Returns:
+        dict: A period x GL code matrix:
+              'periods' (period end dates, MM/DD/YYYY, ascending), 'gl_codes',
+              'balance' / 'change' (GL code -> raw values aligned to 'periods', None where the
+              code had no transaction in that period) and 'no_data_gl_codes'.
+              Returns an empty dict if no GL code has data or an error occurs.
+    """
+    branch_folder = sanitize_gl_branch_folder(branch)
+    if not branch_folder:
+        print("Server Log (TREND Batch): Invalid branch name provided.")
+        return {}
+
+    if frequency not in TREND_FREQUENCIES:
+        print(f"Server Log (TREND Batch): Invalid frequency specified: {frequency}.")
+        return {}
+
+    try:
+        from_date = datetime.strptime(from_date_str, '%m/%d/%Y')
+        to_date = datetime.strptime(to_date_str, '%m/%d/%Y')
+    except ValueError as e:
+        print(f"Server Log (TREND Batch): Invalid date format received from frontend: {e}")
+        return {}
+
+    gl_codes = []
+    for gl_code in gl_code_lookups:
+        gl_code_clean = str(gl_code).replace('-', '').strip()
+        if gl_code_clean and gl_code_clean not in gl_codes:
+            gl_codes.append(gl_code_clean)
+    if not gl_codes:
+        print("Server Log (TREND Batch): No GL codes provided.")
+        return {}
+
+    branch_folder_path = os.path.join(ACCOUNTING_BASE_DIR, branch_folder)
+    print(f"Server Log (TREND Batch): Processing {len(gl_codes)} GL codes for branch: {branch_folder_path}, {from_date_str} to {to_date_str}, Frequency: {frequency}")
+
+    # One snapshot load serves every GL code
+    extended_from_date = _get_extended_from_date(from_date, frequency)
+    snapshots = load_balance_snapshots(branch_folder, extended_from_date, to_date)
+    if snapshots is None:
+        print(f"Server Log (TREND Batch): Branch folder not found: {branch_folder_path}")
+        return {}
+
+    entries_by_code = {}
+    no_data_gl_codes = []
+    for gl_code_clean in gl_codes:
+        entries = _build_trend_entries(snapshots, gl_code_clean, from_date, to_date, frequency, extended_from_date)
+        if entries:
+            entries_by_code[gl_code_clean] = {entry['DATE']: entry for entry in entries}
+        else:
+            no_data_gl_codes.append(gl_code_clean)
+
+    if not entries_by_code:
+        print("Server Log (TREND Batch): No trend data found for any of the requested GL codes.")
+        return {}
+
+    periods = sorted({period for entries in entries_by_code.values() for period in entries},
+                     key=lambda period: datetime.strptime(period, '%m/%d/%Y'))
+    balance_matrix = {}
+    change_matrix = {}
+    for gl_code_clean in gl_codes:
+        entries = entries_by_code.get(gl_code_clean, {})
+        balance_matrix[gl_code_clean] = [entries[period]['BALANCE_RAW'] if period in entries else None for period in periods]
+        change_matrix[gl_code_clean] = [entries[period]['CHANGE_RAW'] if period in entries else None for period in periods]
+
+    print(f"Server Log (TREND Batch): Built {len(periods)} periods x {len(gl_codes)} GL codes ({len(no_data_gl_codes)} without data).")
+    return {
+        'periods': periods,
+        'gl_codes': gl_codes,
+        'balance': balance_matrix,
+        'change': change_matrix,
+        'no_data_gl_codes': no_data_gl_codes,
+    }
@@ -1,11 +1,11 @@
 # audit_tool/backend/trial_balance_process.py
 import os
+import numpy as np
 import pandas as pd
-import re
 from datetime import datetime # Import datetime for date parsing
 
-# Define the base directory where Trial Balance data is stored
-TB_BASE_DIR = r"C:\xampp\htdocs\audit_tool\ACCOUTNING\TRIAL BALANCE"
+# TB folder location and typed TB rows come from the shared TB store
+from backend.tb_store import TB_BASE_DIR, sanitize_tb_branch_folder, list_tb_sources, load_tb_rows
 
 # List of branches that should NOT have GL Code formatting
 BRANCHES_NO_GL_FORMATTING = ['BAYUGAN', 'BALINGASAG', 'TORIL', 'ILUSTRE', 'TUBIGON']
@@ -76,6 +76,13 @@ def format_currency(value):
     else:
         return "{:,.2f}".format(num_val)
 
+def _as_of_sort_key(filename_str):
+    """MM-DD-YYYY names sort chronologically; any other name (date ranges, etc.) sorts alphabetically after them."""
+    try:
+        return (0, datetime.strptime(filename_str, '%m-%d-%Y'), '')
+    except ValueError:
+        return (1, datetime.min, filename_str)
+
 def get_tb_as_of_dates(branch_name):
     """
     Lists CSV and Excel filenames (representing "As Of Dates") within a specific branch folder
@@ -94,41 +101,16 @@ def get_tb_as_of_dates(branch_name):
         return []
 
     branch_folder_path = os.path.join(TB_BASE_DIR, sanitized_branch.upper())
-    
-    if not os.path.isdir(branch_folder_path):
+    # Cached folder listing (refreshed when the folder changes); one entry per as-of date
+    sources = list_tb_sources(sanitized_branch.upper())
+    if sources is None:
         print(f"Server Log (TB Process - get_tb_as_of_dates): Branch folder not found: {branch_folder_path}")
         return []
 
-    as_of_date_files = []
-    print(f"Server Log (TB Process - get_tb_as_of_dates): Scanning directory: {branch_folder_path}")
-    for filename in os.listdir(branch_folder_path):
-        lower_filename = filename.lower()
-        print(f"Server Log (TB Process - get_tb_as_of_dates): Found file: {filename}")
-        
-        # Include .xlsx and .xls now
-        if lower_filename.endswith(('.csv', '.xlsx', '.xls')) and not filename.startswith('~'):
-            base_name = os.path.splitext(filename)[0]
-            print(f"Server Log (TB Process - get_tb_as_of_dates): Processing base_name: {base_name}")
-            
-            # Directly add the base_name to the list without strict date validation here.
-            # Validation will happen during actual report processing.
-            as_of_date_files.append(base_name)
-            print(f"Server Log (TB Process - get_tb_as_of_dates): Added {base_name} to list.")
-        else:
-            print(f"Server Log (TB Process - get_tb_as_of_dates): Skipping file {filename}: Not a valid CSV/Excel extension or is a temp file.")
-            continue
+    as_of_date_files = list(sources)
     
     # Sort the dates chronologically if they are in MM-DD-YYYY format, otherwise sort alphabetically
-    def sort_key(filename_str):
-        try:
-            # Attempt to parse as MM-DD-YYYY for sorting
-            return datetime.strptime(filename_str, '%m-%d-%Y')
-        except ValueError:
-            # If it's not a valid MM-DD-YYYY date, fall back to alphabetical sort
-            # This handles date range filenames or other non-standard names gracefully in sort order
-            return filename_str 
-
-    as_of_date_files.sort(key=sort_key)
+    as_of_date_files.sort(key=_as_of_sort_key)
     
     print(f"Server Log (TB Process - get_tb_as_of_dates): Found {len(as_of_date_files)} valid TB files for branch '{branch_name}'. Final list: {as_of_date_files}")
     return as_of_date_files
@@ -151,63 +133,12 @@ def process_trial_balance_data(branch_name, as_of_date_filename):
         print("Server Log (TB Process): Invalid branch name provided.")
         return []
 
-    # Dynamically determine file extension for processing
-    file_path_csv = os.path.join(TB_BASE_DIR, sanitized_branch.upper(), as_of_date_filename + '.csv')
-    file_path_xlsx = os.path.join(TB_BASE_DIR, sanitized_branch.upper(), as_of_date_filename + '.xlsx')
-    file_path_xls = os.path.join(TB_BASE_DIR, sanitized_branch.upper(), as_of_date_filename + '.xls')
-    
-    file_to_read = None
-    if os.path.exists(file_path_csv):
-        file_to_read = file_path_csv
-    elif os.path.exists(file_path_xlsx):
-        file_to_read = file_path_xlsx
-    elif os.path.exists(file_path_xls):
-        file_to_read = file_path_xls
-
-    if not file_to_read:
-        print(f"Server Log (TB Process): TB file not found (CSV, XLSX, or XLS) for: {as_of_date_filename} in branch {sanitized_branch}.")
+    # Typed rows of this as-of date from the TB store (the file is parsed only when new or changed)
+    df = load_tb_rows(sanitized_branch.upper(), [as_of_date_filename])
+    if df is None or df.empty:
+        print(f"Server Log (TB Process): TB file not found (CSV, XLSX, or XLS) or unreadable for: {as_of_date_filename} in branch {sanitized_branch}.")
         return []
 
-    df = None
-    read_success = False
-    
-    # Usecols for specified columns: Column A (0) for GLACC, Column C (2) for GL Name,
-    # Column D (3) for DR, Column E (4) for CR.
-    # Header=None because the first row is data, not headers.
-    # ADDED: skiprows=1 to start reading from the second row (index 1)
-    if file_to_read.endswith('.csv'):
-        encodings_to_try = ['utf-8', 'latin1', 'cp1252', 'iso-8859-1', 'utf-8-sig']
-        for encoding in encodings_to_try:
-            try:
-                df = pd.read_csv(file_to_read, encoding=encoding, header=None, usecols=[0, 2, 3, 4], dtype=str, skiprows=1)
-                print(f"Server Log (TB Process): Read CSV file: {file_to_read} with encoding {encoding}, skipping first row.")
-                read_success = True
-                break
-            except UnicodeDecodeError:
-                pass
-            except Exception as e:
-                print(f"Server Log (TB Process): Error reading CSV file {file_to_read} with {encoding}: {e}")
-    elif file_to_read.endswith(('.xlsx', '.xls')):
-        try:
-            df = pd.read_excel(file_to_read, header=None, usecols=[0, 2, 3, 4], dtype=str, skiprows=1)
-            print(f"Server Log (TB Process): Read Excel file: {file_to_read}, skipping first row.")
-            read_success = True
-        except Exception as e:
-            print(f"Server Log (TB Process): Error reading Excel file {file_to_read}: {e}")
-    
-    if not read_success or df is None:
-        print(f"Server Log (TB Process): Failed to read TB file: {file_to_read}")
-        return []
-
-    # Rename columns for clarity: Column A (0) is GLACC, Column C (2) is TITLE,
-    # Column D (3) is DR, Column E (4) is CR.
-    df.rename(columns={0: 'GLACC', 2: 'TITLE', 3: 'DR_RAW', 4: 'CR_RAW'}, inplace=True)
-
-    required_cols = ['GLACC', 'TITLE', 'DR_RAW', 'CR_RAW']
-    if not all(col in df.columns for col in required_cols):
-        print(f"Server Log (TB Process): Missing required columns in {file_to_read}. Expected: {', '.join(required_cols)}")
-        return []
-    
     # DEBUG: Print sample of raw GLACC data before formatting
     print("Server Log (TB Process - Debug): Sample raw GLACC (Column A) before formatting:")
     print(df['GLACC'].head().to_string())
@@ -223,14 +154,7 @@ def process_trial_balance_data(branch_name, as_of_date_filename):
     # Apply GL Name from TITLE
     df['GL NAME'] = df['TITLE'].astype(str).str.strip()
 
-    # Convert DR_RAW and CR_RAW to numeric and apply currency formatting
-    df['DR_VAL'] = df['DR_RAW'].astype(str).str.replace(',', '', regex=False).apply(pd.to_numeric, errors='coerce').fillna(0)
-    df['CR_VAL'] = df['CR_RAW'].astype(str).str.replace(',', '', regex=False).apply(pd.to_numeric, errors='coerce').fillna(0)
-
-    # NEW: Divide DR_VAL and CR_VAL by 100 as per previous instructions for TRNM, applying here for TB
-    df['DR_VAL'] = df['DR_VAL'] 
-    df['CR_VAL'] = df['CR_VAL'] 
-
+    # DR_VAL and CR_VAL are already numeric in the store; apply currency formatting
     df['DR'] = df['DR_VAL'].apply(format_currency)
     df['CR'] = df['CR_VAL'].apply(format_currency)
 
@@ -243,3 +167,83 @@ def process_trial_balance_data(branch_name, as_of_date_filename):
 
     print(f"Server Log (TB Process): Processed {len(report_df)} rows for Trial Balance report.")
     return report_df.to_dict(orient='records')
+
+def _to_json_values(values):
+    """Rounds a float row to centavos, with NaN (no previous balance) as None."""
+    return [None if np.isnan(value) else round(float(value), 2) for value in values]
+
+def process_trial_balance_variance(branch_name, as_of_date_filenames):
+    """
+    Compares several Trial Balance "As Of Dates" of a branch: one row per GL account with DR,
+    CR and net balance (DR - CR) per date, plus the change in net balance from each date to
+    the next. All dates are read from the TB store in one selection; an account missing from
+    a date counts as zero on that date.
+
+    Args:
+        branch_name (str): The name of the branch.
+        as_of_date_filenames (list): "As Of Date" filenames (without extension); duplicates are dropped.
+
+    Returns:
+        dict: 'as_of_dates' (the dates found, in chronological order), 'missing_as_of_dates',
+              and 'rows' sorted by GL ACCOUNT, each with 'GL ACCOUNT', 'GL NAME' and lists
+              aligned to 'as_of_dates': 'DR', 'CR', 'BALANCE', 'VARIANCE' and 'VARIANCE_PCT'
+              (None for the first date, and for the percentage when the previous balance is zero).
+              Returns an empty dict if no requested date has data or an error occurs.
+    """
+    branch_folder = sanitize_tb_branch_folder(branch_name)
+    if not branch_folder:
+        print("Server Log (TB Variance): Invalid branch name provided.")
+        return {}
+
+    as_of_names = sorted({str(name).strip() for name in as_of_date_filenames if str(name).strip()}, key=_as_of_sort_key)
+    if not as_of_names:
+        print("Server Log (TB Variance): No As Of Dates provided.")
+        return {}
+
+    rows = load_tb_rows(branch_folder, as_of_names)
+    if rows is None:
+        print(f"Server Log (TB Variance): Branch folder not found: {os.path.join(TB_BASE_DIR, branch_folder)}")
+        return {}
+
+    loaded_names = set(rows['AS_OF_FILE'])
+    found_names = [name for name in as_of_names if name in loaded_names]
+    missing_names = [name for name in as_of_names if name not in loaded_names]
+    rows = rows.dropna(subset=['GLACC'])
+    rows = rows.assign(GLACC=rows['GLACC'].astype(str).str.strip(), ORDER=rows['AS_OF_FILE'].map({name: i for i, name in enumerate(found_names)}))
+    rows = rows[rows['GLACC'] != '']
+    if rows.empty:
+        print(f"Server Log (TB Variance): No TB data found for As Of Dates {as_of_names}.")
+        return {}
+
+    totals = rows.groupby(['GLACC', 'AS_OF_FILE'], sort=False)[['DR_VAL', 'CR_VAL']].sum()
+    dr = totals['DR_VAL'].unstack('AS_OF_FILE').reindex(columns=found_names).astype(float).fillna(0)
+    cr = totals['CR_VAL'].unstack('AS_OF_FILE').reindex(columns=found_names).astype(float).fillna(0)
+    balance = dr - cr
+    variance = balance.diff(axis=1)
+    previous = balance.shift(1, axis=1)
+    variance_pct = (variance / previous.abs().where(previous != 0)) * 100
+
+    # GL Name from the latest date that lists the account
+    names = rows.sort_values('ORDER', kind='mergesort').groupby('GLACC')['TITLE'].last()
+    gl_accounts = {glacc: format_gl_code(glacc, branch_name) for glacc in balance.index}
+
+    report_rows = []
+    for position, glacc in enumerate(balance.index):
+        title = names.get(glacc)
+        report_rows.append({
+            'GL ACCOUNT': gl_accounts[glacc],
+            'GL NAME': str(title).strip() if pd.notna(title) else '',
+            'DR': _to_json_values(dr.iloc[position].to_numpy()),
+            'CR': _to_json_values(cr.iloc[position].to_numpy()),
+            'BALANCE': _to_json_values(balance.iloc[position].to_numpy()),
+            'VARIANCE': _to_json_values(variance.iloc[position].to_numpy()),
+            'VARIANCE_PCT': _to_json_values(variance_pct.iloc[position].to_numpy()),
+        })
+    report_rows.sort(key=lambda row: row['GL ACCOUNT'])
+
+    print(f"Server Log (TB Variance): Compared {len(report_rows)} GL accounts across {len(found_names)} As Of Dates ({len(missing_names)} missing).")
+    return {
+        'as_of_dates': found_names,
+        'missing_as_of_dates': missing_names,
+        'rows': report_rows,
+    }
@@ -0,0 +1,145 @@
+# audit_tool/backend/utils/date_parsing.py
+# Shared vectorized date parsing for CSV/MySQL report columns.
+import threading
+import warnings
+from datetime import date
+import pandas as pd
+
+# Formats seen in the aging, TRNM, SVACC, LNACC and GL exports, in the order the old
+# per-module parsers tried them. Callers may pass their own candidate list.
+DEFAULT_DATE_FORMATS = [
+    '%m/%d/%Y %I:%M:%S %p',
+    '%m/%d/%Y',
+    '%Y-%m-%d',
+    '%m-%d-%Y',
+    '%Y/%m/%d',
+    '%m/%d/%y',
+]
+
+DATE_SAMPLE_SIZE = 500
+# A cached format is reused without re-sampling while it still parses this share of the sample
+CACHED_FORMAT_MIN_HIT_RATE = 0.9
+
+_format_cache = {}
+_format_cache_lock = threading.Lock()
+
+
+def _clean_date_strings(series, strip_pattern=None, normalize_delimiters=False):
+    """Strips whitespace (and optionally other characters), turning blank strings into NaN."""
+    cleaned = series.astype(str).str.strip()
+    if strip_pattern:
+        cleaned = cleaned.str.replace(strip_pattern, '', regex=True)
+    if normalize_delimiters:
+        cleaned = cleaned.str.replace('-', '/', regex=False)
+    return cleaned.mask(cleaned == '')
+
+
+def _rank_formats(sample, formats):
+    """Returns (format, hits) pairs for the sample, best first; ties keep the candidate order."""
+    scores = []
+    for position, fmt in enumerate(formats):
+        hits = int(pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum())
+        scores.append((hits, -position, fmt))
+    scores.sort(reverse=True)
+    return [(fmt, hits) for hits, _, fmt in scores]
+
+
+def _get_format_order(family, sample, formats):
+    """Orders candidate formats by how well they parse the sample, reusing the family's cached choice."""
+    if family is not None:
+        with _format_cache_lock:
+            cached = _format_cache.get(family)
+        if cached in formats and len(sample):
+            hits = pd.to_datetime(sample, format=cached, errors='coerce').notna().sum()
+            if hits >= CACHED_FORMAT_MIN_HIT_RATE * len(sample):
+                return [cached] + [fmt for fmt in formats if fmt != cached]
+
+    ranked = _rank_formats(sample, formats)
+    if family is not None and ranked and ranked[0][1] > 0:
+        with _format_cache_lock:
+            _format_cache[family] = ranked[0][0]
+    return [fmt for fmt, _ in ranked]
+
+
+def parse_date_series(series, formats=None, family=None, infer_fallback=True,
+                      strip_pattern=None, normalize_delimiters=False, log_label=None):
+    """
+    Parses a Series of date strings into datetime64 in a few vectorized passes.
+
+    The dominant format is detected from a sample of the column (or taken from the cache
+    for `family`, e.g. 'aging_csv.DATE') and applied to the whole column. Only the rows it
+    leaves unparsed are retried with the remaining formats, then with pandas' general
+    inference when infer_fallback is True. Values that are already dates/datetimes are
+    converted directly; other non-string values and unparseable strings become NaT.
+
+    Args:
+        series (pd.Series): The column to parse.
+        formats (list, optional): Candidate strptime formats. Defaults to DEFAULT_DATE_FORMATS.
+        family (str, optional): Cache key for the format decision, shared across files/chunks.
+        infer_fallback (bool): Whether residual rows fall back to pd.to_datetime inference.
+        strip_pattern (str, optional): Regex of characters removed before parsing.
+        normalize_delimiters (bool): Replace '-' with '/' before parsing.
+        log_label (str, optional): When given, parse statistics are logged under this label.
+
+    Returns:
+        pd.Series: datetime64 values aligned to the input index.
+    """
+    formats = formats or DEFAULT_DATE_FORMATS
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+
+    original_index = series.index
+    series = series.reset_index(drop=True) # Positional labels, safe with duplicate indexes
+    result = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+    if series.empty:
+        return result.set_axis(original_index)
+
+    # MySQL DATE columns and Excel reads hand back date/datetime objects, not strings
+    if pd.api.types.is_string_dtype(series) and series.dtype != object:
+        is_text = series.notna()
+    else:
+        value_kinds = series.map(lambda value: 'text' if isinstance(value, str) else ('date' if isinstance(value, date) else None))
+        is_text = value_kinds == 'text'
+        is_date = value_kinds == 'date'
+        if is_date.any():
+            result[is_date] = pd.to_datetime(series[is_date], errors='coerce')
+
+    text_values = _clean_date_strings(series[is_text], strip_pattern, normalize_delimiters).dropna()
+    if text_values.empty:
+        return result.set_axis(original_index)
+
+    sample = text_values.iloc[:DATE_SAMPLE_SIZE]
+    remaining = text_values
+    format_hits = []
+    for fmt in _get_format_order(family, sample, formats):
+        parsed = pd.to_datetime(remaining, format=fmt, errors='coerce')
+        matched = parsed.notna()
+        if matched.any():
+            result[parsed.index[matched]] = parsed[matched]
+            format_hits.append((fmt, int(matched.sum())))
+            remaining = remaining[~matched]
+        if remaining.empty:
+            break
+
+    if infer_fallback and not remaining.empty:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning) # Per-element dateutil fallback is expected here
+            parsed = pd.to_datetime(remaining, errors='coerce')
+        matched = parsed.notna()
+        if matched.any():
+            result[parsed.index[matched]] = parsed[matched]
+            format_hits.append(('inferred', int(matched.sum())))
+            remaining = remaining[~matched]
+
+    if log_label:
+        summary = ', '.join(f"{fmt}: {hits}" for fmt, hits in format_hits) or 'none'
+        print(f"Server Log: ({log_label}) Parsed {len(text_values) - len(remaining)} of {len(text_values)} dates ({summary}).")
+        if not remaining.empty:
+            print(f"Server Log: ({log_label}) Warning: {len(remaining)} dates could not be parsed. Sample: {remaining.head(5).tolist()}")
+    return result.set_axis(original_index)
+
+
+def clear_date_format_cache():
+    """Forgets all cached per-family format decisions."""
+    with _format_cache_lock:
+        _format_cache.clear()
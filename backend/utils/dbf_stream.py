@@ -0,0 +1,223 @@
+# audit_tool/backend/utils/dbf_stream.py
+# Streaming DBF ingestion shared by convert_dbf and the DOS processors: records are read from
+# disk in fixed-size batches (never the whole table at once), and several DBF files can be
+# read or converted in parallel worker processes.
+import os
+import csv
+import time
+import pandas as pd
+from dbfread import DBF
+
+from backend.utils.parallel_ingest import run_ordered_jobs
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Records per batch; bounds memory to one batch of the requested columns per file being read
+DBF_BATCH_ROWS = 50000
+# Worker processes for multi-file reads/conversions (DBF record parsing is CPU-bound Python)
+DBF_MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+# pandas dtype per DBF field type for typed batches; other types are left as Python objects
+DBF_FIELD_DTYPES = {
+    'C': 'string', 'M': 'string', 'V': 'string',
+    'N': 'float64', 'F': 'float64', 'B': 'float64', 'O': 'float64', 'Y': 'float64',
+    'I': 'Int64', '+': 'Int64',
+    'D': 'datetime64[ns]', 'T': 'datetime64[ns]', '@': 'datetime64[ns]',
+    'L': 'boolean',
+}
+
+
+def open_dbf(dbf_path, encoding='latin-1'):
+    """Opens a DBF for streaming: records are parsed from disk as they are iterated (load=False)."""
+    return DBF(dbf_path, encoding=encoding, ignore_missing_memofile=True, load=False,
+               recfactory=lambda items: [value for _, value in items])
+
+
+def _type_batch(df, field_types):
+    """Casts a batch to DBF_FIELD_DTYPES so every batch of a file has the same column types."""
+    for column, field_type in field_types.items():
+        dtype = DBF_FIELD_DTYPES.get(field_type)
+        if dtype is None:
+            continue
+        if dtype == 'float64':
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('float64')
+        elif dtype == 'Int64':
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('Int64')
+        elif dtype == 'datetime64[ns]':
+            df[column] = pd.to_datetime(df[column], errors='coerce').astype('datetime64[ns]')
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def iter_dbf_batches(dbf_path, encoding='latin-1', columns=None, batch_size=DBF_BATCH_ROWS, typed=False):
+    """
+    Yields the records of a DBF as DataFrames of at most batch_size rows, with upper-case
+    column names in file order. An empty table yields one empty batch, so the columns are known.
+
+    Args:
+        columns (list, optional): Upper-case field names to keep; the others are dropped as each
+            record is read. Fields the file does not have are simply absent.
+        typed (bool): Cast columns by DBF field type (DBF_FIELD_DTYPES). Without it the values
+            are those dbfread produces, as pd.DataFrame(list(DBF(...))) would hold them.
+    """
+    table = open_dbf(dbf_path, encoding)
+    field_names = [name.upper() for name in table.field_names]
+    wanted = set(columns) if columns is not None else None
+    positions = [i for i, name in enumerate(field_names) if wanted is None or name in wanted]
+    names = [field_names[i] for i in positions]
+    field_types = {field.name.upper(): field.type for field in table.fields if field.name.upper() in names}
+    keep_all = len(positions) == len(field_names)
+
+    rows = []
+    batch_count = 0
+    for record in table:
+        rows.append(record if keep_all else [record[i] for i in positions])
+        if len(rows) >= batch_size:
+            batch = pd.DataFrame.from_records(rows, columns=names)
+            yield _type_batch(batch, field_types) if typed else batch
+            batch_count += 1
+            rows = []
+    if rows or batch_count == 0:
+        batch = pd.DataFrame.from_records(rows, columns=names)
+        yield _type_batch(batch, field_types) if typed else batch
+
+
+def read_dbf_frame(dbf_path, encoding='latin-1', columns=None, batch_size=DBF_BATCH_ROWS, typed=False, log_label="DBF"):
+    """
+    Reads a DBF into one DataFrame through iter_dbf_batches, so only the requested columns are
+    ever held (not a dict per record). Logs the read throughput in rows per second.
+    """
+    started = time.perf_counter()
+    batches = list(iter_dbf_batches(dbf_path, encoding, columns, batch_size, typed))
+    df = batches[0] if len(batches) == 1 else pd.concat(batches, ignore_index=True)
+    _log_throughput(log_label, os.path.basename(dbf_path), len(df), time.perf_counter() - started)
+    return df
+
+
+def _log_throughput(log_label, name, row_count, seconds):
+    rate = row_count / seconds if seconds > 0 else float(row_count)
+    print(f"Server Log ({log_label}): {name}: {row_count:,} rows in {seconds:.2f}s ({rate:,.0f} rows/s)")
+
+
+def write_dbf_csv(dbf_path, csv_path, encoding, log_label="Convert DBF"):
+    """
+    Streams a DBF into a CSV (header, then one line per record, values as csv.writer renders
+    them). Rows that cannot be written are skipped with a log line. Returns the rows written.
+    """
+    table = open_dbf(dbf_path, encoding)
+    row_count = 0
+    with open(csv_path, 'w', newline='', encoding='utf-8') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(table.field_names) # Write header row
+        for record in table:
+            try:
+                writer.writerow(record)
+                row_count += 1
+            except Exception as e:
+                print(f'Server Log ({log_label}): ⚠️ Skipping corrupted record in {os.path.basename(dbf_path)}: {e}')
+    return row_count
+
+
+def _parquet_schema(table):
+    arrow_types = {
+        'string': pa.string(), 'float64': pa.float64(), 'Int64': pa.int64(),
+        'datetime64[ns]': pa.timestamp('ns'), 'boolean': pa.bool_(),
+    }
+    return pa.schema([
+        (field.name.upper(), arrow_types.get(DBF_FIELD_DTYPES.get(field.type), pa.string()))
+        for field in table.fields
+    ])
+
+
+def write_dbf_parquet(dbf_path, parquet_path, encoding, batch_size=DBF_BATCH_ROWS):
+    """
+    Streams a DBF into a Parquet file one typed batch (row group) at a time. Field types
+    without a typed mapping are stored as text. Returns the rows written.
+    """
+    if not PARQUET_AVAILABLE:
+        raise RuntimeError("pyarrow is not installed; DBF files can only be converted to CSV.")
+    table = open_dbf(dbf_path, encoding)
+    schema = _parquet_schema(table)
+    untyped = [field.name.upper() for field in table.fields if DBF_FIELD_DTYPES.get(field.type) is None]
+    row_count = 0
+    with pq.ParquetWriter(parquet_path, schema) as writer:
+        for batch in iter_dbf_batches(dbf_path, encoding, batch_size=batch_size, typed=True):
+            for column in untyped:
+                batch[column] = batch[column].map(lambda value: None if value is None else str(value))
+            writer.write_table(pa.Table.from_pandas(batch, schema=schema, preserve_index=False))
+            row_count += len(batch)
+    return row_count
+
+
+def _convert_dbf_job(job):
+    """
+    Worker-process entry point: converts one DBF, trying each encoding in turn (a failed attempt
+    is simply rewritten by the next). Returns a result dict instead of raising, so one bad file
+    does not lose the results of the others.
+    """
+    dbf_path, output_path, output_format, encodings, log_label = job
+    file_name = os.path.basename(dbf_path)
+    result = {'dbf_path': dbf_path, 'output_path': output_path, 'rows': 0, 'seconds': 0.0, 'encoding': None, 'error': None}
+    started = time.perf_counter()
+    for encoding in encodings:
+        try:
+            if output_format == 'parquet':
+                result['rows'] = write_dbf_parquet(dbf_path, output_path, encoding)
+            else:
+                result['rows'] = write_dbf_csv(dbf_path, output_path, encoding, log_label)
+            result['encoding'] = encoding
+            break
+        except UnicodeDecodeError as e:
+            print(f'Server Log ({log_label}): ⚠️ Encoding {encoding} failed for {file_name}: {e}')
+        except Exception as e:
+            print(f'Server Log ({log_label}): ⚠️ Failed on encoding {encoding} for {file_name}: {e}')
+    if result['encoding'] is None:
+        result['error'] = f'Could not decode {file_name} with known encodings.'
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def _read_dbf_job(job):
+    """Worker-process entry point for read_dbf_frames: returns (frame, error message)."""
+    dbf_path, encoding, columns, typed, log_label = job
+    try:
+        return read_dbf_frame(dbf_path, encoding, columns, typed=typed, log_label=log_label), None
+    except Exception as e:
+        return None, str(e)
+
+
+def convert_dbf_files(dbf_paths, output_dir, output_format='csv', encodings=('latin-1',), max_workers=DBF_MAX_WORKERS, log_label="Convert DBF"):
+    """
+    Converts DBF files to CSV or Parquet (same base name) in output_dir, several files at once
+    in worker processes. Returns one result dict per file, in order: dbf_path, output_path,
+    rows, seconds, encoding and error (None on success).
+    """
+    extension = '.parquet' if output_format == 'parquet' else '.csv'
+    jobs = [(dbf_path, os.path.join(output_dir, os.path.splitext(os.path.basename(dbf_path))[0] + extension),
+             output_format, list(encodings), log_label) for dbf_path in dbf_paths]
+    started = time.perf_counter()
+    results = run_ordered_jobs(_convert_dbf_job, jobs, max_workers)
+    for result in results:
+        if result['error'] is None:
+            _log_throughput(log_label, os.path.basename(result['dbf_path']), result['rows'], result['seconds'])
+    converted_rows = sum(result['rows'] for result in results if result['error'] is None)
+    _log_throughput(log_label, f"{len(results)} files", converted_rows, time.perf_counter() - started)
+    return results
+
+
+def read_dbf_frames(dbf_paths, encoding='latin-1', columns=None, typed=False, max_workers=DBF_MAX_WORKERS, log_label="DBF"):
+    """
+    Reads several DBF files (see read_dbf_frame) in worker processes. Returns a list of
+    (frame, error message) in the order of dbf_paths; frame is None when the file failed.
+    """
+    started = time.perf_counter()
+    results = run_ordered_jobs(_read_dbf_job, [(dbf_path, encoding, columns, typed, log_label) for dbf_path in dbf_paths], max_workers)
+    total_rows = sum(len(frame) for frame, _ in results if frame is not None)
+    _log_throughput(log_label, f"{len(dbf_paths)} files", total_rows, time.perf_counter() - started)
+    return results
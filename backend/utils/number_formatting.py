@@ -0,0 +1,82 @@
+# audit_tool/backend/utils/number_formatting.py
+# Shared vectorized amount formatting for report columns ("1,234.56" / "(1,234.56)").
+import numpy as np
+import pandas as pd
+
+
+def _format_cents(cents):
+    """
+    Renders non-negative whole cents as "1,234.56" strings. The characters are built as a
+    (rows x width) byte matrix, one digit column at a time, instead of formatting row by row.
+    """
+    whole = cents // 100
+    fraction = cents % 100
+    n_digits = len(str(int(whole.max()))) if len(whole) else 1
+    width = n_digits + (n_digits - 1) // 3 + 3
+    chars = np.full((len(cents), width), ord(' '), dtype=np.uint8)
+    chars[:, -1] = ord('0') + fraction % 10
+    chars[:, -2] = ord('0') + fraction // 10
+    chars[:, -3] = ord('.')
+
+    position = width - 4
+    remaining = whole.copy()
+    for digit_index in range(n_digits):
+        # The units digit is always written; higher digits only while the number still has them
+        present = remaining > 0 if digit_index else np.ones(len(cents), dtype=bool)
+        if digit_index and digit_index % 3 == 0:
+            chars[present, position] = ord(',')
+            position -= 1
+        chars[present, position] = ord('0') + remaining[present] % 10
+        remaining //= 10
+        position -= 1
+    return np.char.lstrip(chars.view(f'S{width}').ravel()).astype(str)
+
+
+def _format_amount(value, negative_parentheses):
+    if negative_parentheses and value < 0:
+        return "({:,.2f})".format(abs(value))
+    return "{:,.2f}".format(value)
+
+
+def format_amount_series(values, negative_parentheses=False, missing=''):
+    """
+    Formats a whole column of amounts like "{:,.2f}" without a per-row Python call.
+
+    Args:
+        values (pd.Series): Numbers, Decimals or numeric strings; anything else counts as missing.
+        negative_parentheses (bool): Show negative amounts as "(1,234.56)" instead of "-1,234.56".
+        missing (str): Text for NaN/None/non-numeric values.
+
+    Returns:
+        pd.Series: Strings, aligned with the input index.
+
+    Amounts are rounded to whole cents in bulk; the rare value whose cents land too close to a
+    half cent to decide in float arithmetic (and inf) is formatted by Python itself, so the
+    output always matches "{:,.2f}".
+    """
+    numbers = pd.to_numeric(pd.Series(values), errors='coerce').astype(np.float64)
+    raw = numbers.to_numpy()
+    finite = np.isfinite(raw)
+
+    amounts = raw[finite]
+    scaled = np.abs(amounts) * 100
+    cents = np.floor(scaled)
+    remainder = scaled - cents
+    text = _format_cents((cents + (remainder > 0.5)).astype(np.int64))
+    if negative_parentheses:
+        negative = amounts < 0
+        text = np.where(negative, np.char.add(np.char.add('(', text), ')'), text)
+        text = np.where(np.signbit(amounts) & ~negative, np.char.add('-', text), text)
+    else:
+        text = np.where(np.signbit(amounts), np.char.add('-', text), text)
+
+    formatted = np.full(len(raw), missing, dtype=object)
+    formatted[finite] = text.tolist()
+
+    # Half-cent ties (within the rounding error of the * 100 above) and inf/-inf
+    undecided = np.zeros(len(raw), dtype=bool)
+    undecided[finite] = np.abs(remainder - 0.5) <= 2 * np.spacing(scaled)
+    undecided |= np.isinf(raw)
+    if undecided.any():
+        formatted[undecided] = [_format_amount(value, negative_parentheses) for value in raw[undecided]]
+    return pd.Series(formatted, index=numbers.index, dtype=object)
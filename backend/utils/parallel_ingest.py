@@ -0,0 +1,57 @@
+# audit_tool/backend/utils/parallel_ingest.py
+# Parallel multi-file ingestion: each uploaded file is parsed and normalized in its own worker
+# process, chunk by chunk, and the results come back in the order the files were given.
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+# Worker processes for multi-file ingestion (CSV parsing and row normalization are CPU-bound)
+INGEST_MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+# Rows parsed and normalized at a time per file; bounds each worker to one chunk of raw text columns
+INGEST_CHUNK_ROWS = 200000
+
+
+def parse_ingest_settings(max_workers=None, chunk_size=None):
+    """
+    Returns (max_workers, chunk_size) from optional form values, each at least 1 and defaulting
+    to INGEST_MAX_WORKERS / INGEST_CHUNK_ROWS; raises ValueError if a value is not a number.
+    """
+    workers = INGEST_MAX_WORKERS if max_workers in (None, '') else max(int(max_workers), 1)
+    rows = INGEST_CHUNK_ROWS if chunk_size in (None, '') else max(int(chunk_size), 1)
+    return workers, rows
+
+
+def log_once(warned, message):
+    """Prints a per-file warning only for the first chunk that raises it (warned is the file's set)."""
+    if message not in warned:
+        warned.add(message)
+        print(message)
+
+
+def run_ordered_jobs(worker, jobs, max_workers=INGEST_MAX_WORKERS):
+    """Runs jobs in worker processes (in this process when there is only one), keeping job order."""
+    if len(jobs) <= 1 or max_workers <= 1:
+        return [worker(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+        return list(executor.map(worker, jobs))
+
+
+def read_csv_normalized(path, normalize, encodings, chunk_size=INGEST_CHUNK_ROWS, **read_kwargs):
+    """
+    Reads a CSV chunk by chunk, passing each chunk through normalize(chunk), and returns the
+    normalized chunks as one DataFrame. A UnicodeDecodeError (which may only show up after some
+    chunks were read) restarts the file with the next encoding; other read errors are raised.
+
+    Args:
+        encodings (list): Encodings to try in turn; None means the pandas default.
+        read_kwargs: Passed to pd.read_csv for every chunk.
+    """
+    for attempt, encoding in enumerate(encodings):
+        try:
+            with pd.read_csv(path, encoding=encoding, chunksize=chunk_size, **read_kwargs) as reader:
+                chunks = [normalize(chunk) for chunk in reader]
+            return chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+        except UnicodeDecodeError:
+            if attempt == len(encodings) - 1:
+                raise
+            print(f"Server Log (Ingest): {os.path.basename(path)} could not be read as {encoding or 'utf-8'}, retrying as {encodings[attempt + 1]}.")
@@ -0,0 +1,88 @@
+# audit_tool/backend/utils/report_pagination.py
+# Keyset pagination and NDJSON streaming shared by the SOA and GL/REF/DESC reports.
+import base64
+import json
+import traceback
+import numpy as np
+import pandas as pd
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+
+def parse_page_size(value):
+    """Returns the requested page size clamped to [1, MAX_PAGE_SIZE], DEFAULT_PAGE_SIZE when not given; raises ValueError if not a number."""
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    return min(max(int(value), 1), MAX_PAGE_SIZE)
+
+
+def encode_cursor(cursor):
+    """Packs a cursor dict into the opaque token handed to the client as next_cursor."""
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token, required_keys):
+    """Unpacks a next_cursor token; returns None for an empty token and raises ValueError for a malformed one."""
+    if not token:
+        return None
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(cursor, dict) or any(key not in cursor for key in required_keys):
+        raise ValueError("Invalid cursor: missing keys.")
+    return cursor
+
+
+FRAME_CURSOR_KEYS = ['date', 'trn', 'offset']
+
+
+def frame_page_bounds(dates, trn_numbers, cursor, page_size):
+    """
+    Returns (start, stop, next cursor) of one page of a frame sorted by (date, numeric TRN).
+
+    The cursor is the (date, TRN) key of the page's last row plus how many rows with that key
+    were already returned, so rows sharing a key are never skipped or repeated across pages.
+    The next cursor is None on the last page.
+    """
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    trn_numbers = np.asarray(trn_numbers, dtype=np.float64)
+    start = 0
+    if cursor is not None:
+        cursor_date = np.datetime64(cursor['date'], 'ns')
+        cursor_trn = float(cursor['trn'])
+        # First row whose key is not below the cursor key; the frame is sorted, so this is a boundary
+        not_before = (dates > cursor_date) | ((dates == cursor_date) & (trn_numbers >= cursor_trn))
+        start = int(np.argmax(not_before)) if not_before.any() else len(dates)
+        start = min(start + int(cursor['offset']), len(dates))
+    stop = min(start + page_size, len(dates))
+    if stop >= len(dates):
+        return start, stop, None
+
+    last_date, last_trn = dates[stop - 1], trn_numbers[stop - 1]
+    same_key = (dates[:stop] == last_date) & (trn_numbers[:stop] == last_trn)
+    next_cursor = {
+        'date': pd.Timestamp(last_date).isoformat(),
+        'trn': float(last_trn),
+        'offset': int(same_key.sum()),
+    }
+    return start, stop, next_cursor
+
+
+def iter_ndjson(pages):
+    """
+    Yields one JSON line per row of each page (a list of row dicts), for application/x-ndjson responses.
+    If producing the pages fails mid-stream, a final {"error": message} line is sent instead of just
+    ending the response, so the client can tell a failure from a short result.
+    """
+    try:
+        for rows in pages:
+            for row in rows:
+                yield json.dumps(row, default=str) + '\n'
+    except Exception as e:
+        print(f"Server Log (NDJSON Stream): Stream failed after it started: {e}")
+        traceback.print_exc()
+        yield json.dumps({'error': str(e)}) + '\n'
@@ -0,0 +1,229 @@
+# audit_tool/backend/utils/rolling_csv.py
+# Size-rolling CSV output shared by the TRNM WIN and GL processors: formatted rows are streamed to
+# disk and a new file is started exactly when the next row would pass the byte limit. Each file is
+# named after the dates it actually holds ("PREFIX - MM-DD-YYYY TO MM-DD-YYYY.csv"); a second file
+# with the same range gets a copy number before the range ("PREFIX (2) - ...") so the name still ends
+# in the date range the GL/TRNM readers parse.
+import codecs
+import csv
+import io
+import os
+import numpy as np
+import pandas as pd
+
+# 49.9 MB, the upload limit the output files are split for
+MAX_FILE_SIZE_BYTES = 49.9 * 1024 * 1024
+# Rows formatted and serialized at a time by the callers; bounds the formatted copy held in memory
+WRITE_BATCH_ROWS = 50000
+
+_QUOTE_BYTE = ord('"')
+_NEWLINE_BYTE = ord('\n')
+
+
+def _row_end_offsets(data):
+    """
+    Returns the byte offset just past each CSV record in data. A line break inside a quoted field
+    has an odd number of quotes before it (escaped quotes come in pairs), so it is not a record end.
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    breaks = np.flatnonzero(raw == _NEWLINE_BYTE)
+    quotes = np.flatnonzero(raw == _QUOTE_BYTE)
+    quotes_before = np.searchsorted(quotes, breaks)
+    return breaks[quotes_before % 2 == 0] + 1
+
+
+def _format_file_date(value, missing):
+    return pd.Timestamp(value).strftime('%m-%d-%Y') if value is not None else missing
+
+
+class RollingCsvWriter:
+    """
+    Writes CSV files of at most max_bytes (UTF-8 with BOM, header in every file, values quoted as
+    to_csv(quoting=csv.QUOTE_NONNUMERIC) does) into output_dir, in a single pass over the rows.
+
+    A file in progress is written under a temporary name and renamed when it is full or the writer
+    is closed. Use it as a context manager: on an error the file in progress is discarded (a resumed
+    file is cut back to its original size) and the finished files are kept. The paths of the files
+    written are in .paths.
+    """
+
+    def __init__(self, output_dir, name_prefix, columns, max_bytes=MAX_FILE_SIZE_BYTES, log_label="CSV"):
+        self.output_dir = output_dir
+        self.name_prefix = name_prefix
+        self.columns = list(columns)
+        self.max_bytes = max_bytes
+        self.log_label = log_label
+        self.paths = []
+        self._header = pd.DataFrame(columns=self.columns).to_csv(index=False, quoting=csv.QUOTE_NONNUMERIC, lineterminator=os.linesep).encode('utf-8')
+        self._seen_rows = None
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._abort()
+        return False
+
+    def resume(self, path, date_column, date_format='%m/%d/%Y'):
+        """
+        Continues an existing output file: new rows are appended to it while it has room, and it is
+        renamed for its new date range. Rows it already holds (compared as text, as
+        drop_duplicates on a dtype=str read would) are not written again by this writer, and when
+        the file is finished, duplicate rows anywhere in it are dropped (first one kept).
+        """
+        existing_df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+        self._seen_rows = set(existing_df.itertuples(index=False, name=None))
+        dates = pd.to_datetime(existing_df[date_column], errors='coerce', format=date_format).dropna() if date_column in existing_df.columns else pd.Series(dtype='datetime64[ns]')
+
+        self._file = open(path, 'ab')
+        self._path = path
+        self._resumed_size = os.path.getsize(path)
+        self._size = self._resumed_size
+        self._file_rows = len(existing_df)
+        self._appended_rows = 0
+        self._min_date = dates.min() if not dates.empty else None
+        self._max_date = dates.max() if not dates.empty else None
+        print(f"Server Log ({self.log_label}): Continuing {path} ({self._size / (1024 * 1024):.2f} MB, {self._file_rows} rows).")
+
+    def write(self, frame, dates):
+        """
+        Appends formatted rows (self.columns, values as they should appear in the file), rolling to
+        a new file at the byte limit. A single row larger than the limit still gets a file of its own.
+
+        Args:
+            frame (pd.DataFrame): The rows to write.
+            dates (pd.Series): Each row's date for the file names (NaT is ignored), aligned with frame.
+        """
+        if frame.empty:
+            return
+        text = frame[self.columns].to_csv(index=False, header=False, quoting=csv.QUOTE_NONNUMERIC, lineterminator=os.linesep)
+        data = text.encode('utf-8')
+        ends = _row_end_offsets(data)
+        starts = np.concatenate(([0], ends[:-1]))
+        row_dates = pd.to_datetime(pd.Series(dates), errors='coerce').to_numpy(dtype='datetime64[ns]')
+
+        if self._seen_rows is not None:
+            keep = np.fromiter((tuple(row) not in self._seen_rows for row in csv.reader(io.StringIO(text, newline=''))), dtype=bool, count=len(ends))
+            if not keep.all():
+                print(f"Server Log ({self.log_label}): Skipped {int((~keep).sum())} rows already in the continued file.")
+                data = b''.join(data[start:end] for start, end in zip(starts[keep], ends[keep]))
+                ends = np.cumsum((ends - starts)[keep])
+                starts = np.concatenate(([0], ends[:-1]))
+                row_dates = row_dates[keep]
+                if not len(ends):
+                    return
+
+        sizes = ends - starts
+        position = 0
+        while position < len(sizes):
+            if self._file is None:
+                self._open_new_file()
+            # Rows that still fit, found on the running byte total from this row on
+            count = int(np.searchsorted(np.cumsum(sizes[position:]), self.max_bytes - self._size, side='right'))
+            if count == 0:
+                if self._file_rows:
+                    self._finish_file()
+                    continue
+                count = 1
+            self._file.write(data[starts[position]:ends[position + count - 1]])
+            self._record_rows(row_dates[position:position + count], int(ends[position + count - 1] - starts[position]), count)
+            position += count
+            if position < len(sizes):
+                self._finish_file()
+
+    def close(self):
+        """Finishes the file in progress; returns the paths of all files written."""
+        if self._file is not None:
+            self._finish_file()
+        return self.paths
+
+    def _open_new_file(self):
+        self._path = os.path.join(self.output_dir, f"{self.name_prefix} - part {len(self.paths) + 1}.csv.tmp")
+        self._file = open(self._path, 'wb')
+        self._file.write(codecs.BOM_UTF8 + self._header)
+        self._resumed_size = None
+        self._size = len(codecs.BOM_UTF8) + len(self._header)
+        self._file_rows = 0
+        self._appended_rows = 0
+        self._min_date = None
+        self._max_date = None
+
+    def _record_rows(self, row_dates, byte_count, row_count):
+        self._size += byte_count
+        self._file_rows += row_count
+        self._appended_rows += row_count
+        valid_dates = row_dates[~np.isnat(row_dates)]
+        if len(valid_dates):
+            low, high = pd.Timestamp(valid_dates.min()), pd.Timestamp(valid_dates.max())
+            self._min_date = low if self._min_date is None else min(self._min_date, low)
+            self._max_date = high if self._max_date is None else max(self._max_date, high)
+
+    def _finish_file(self):
+        """Closes the file in progress and gives it its date-range name (a resumed file left unchanged keeps its own)."""
+        self._file.close()
+        self._file = None
+        if self._resumed_size is not None and self._appended_rows == 0:
+            return
+        if self._resumed_size is not None:
+            self._drop_duplicate_rows()
+
+        date_range = f"{_format_file_date(self._min_date, 'UNKNOWN_START')} TO {_format_file_date(self._max_date, 'UNKNOWN_END')}"
+        target_path = os.path.join(self.output_dir, f"{self.name_prefix} - {date_range}.csv")
+        copy_number = 2
+        # Never overwrite another file: only possible when two files cover exactly the same dates
+        while os.path.exists(target_path) and os.path.normcase(os.path.abspath(target_path)) != os.path.normcase(os.path.abspath(self._path)):
+            target_path = os.path.join(self.output_dir, f"{self.name_prefix} ({copy_number}) - {date_range}.csv")
+            copy_number += 1
+        os.replace(self._path, target_path)
+        self.paths.append(target_path)
+        action = "Updated" if self._resumed_size is not None else "Saved"
+        print(f"Server Log ({self.log_label}): ✅ {action} file: {target_path} ({self._file_rows} rows, Size: {self._size / (1024 * 1024):.2f} MB)")
+
+    def _drop_duplicate_rows(self):
+        """
+        Rewrites the finished resumed file without repeated rows, keeping each row's first occurrence
+        and its original bytes; rows are compared as text, like drop_duplicates on a dtype=str read.
+        """
+        with open(self._path, 'rb') as f:
+            data = f.read()
+        header_end = int(_row_end_offsets(data)[0]) if _NEWLINE_BYTE in data else len(data)
+        body = data[header_end:]
+        ends = _row_end_offsets(body)
+        if len(body) and (not len(ends) or ends[-1] != len(body)):
+            ends = np.append(ends, len(body)) # Last row without a line break
+        starts = np.concatenate(([0], ends[:-1]))
+
+        seen = set()
+        keep = np.zeros(len(ends), dtype=bool)
+        for i, row in enumerate(csv.reader(io.StringIO(body.decode('utf-8'), newline=''))):
+            row = tuple(row)
+            if i < len(keep) and row not in seen:
+                seen.add(row)
+                keep[i] = True
+        if keep.all():
+            return
+
+        temp_path = f"{self._path}.dedup.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data[:header_end])
+            for start, end in zip(starts[keep], ends[keep]):
+                f.write(body[start:end])
+        os.replace(temp_path, self._path)
+        print(f"Server Log ({self.log_label}): Dropped {int((~keep).sum())} duplicate rows from {self._path}.")
+        self._file_rows = int(keep.sum())
+        self._size = os.path.getsize(self._path)
+
+    def _abort(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if self._resumed_size is not None:
+            with open(self._path, 'r+b') as f:
+                f.truncate(self._resumed_size)
+        elif os.path.exists(self._path):
+            os.remove(self._path)
@@ -3,8 +3,10 @@ import os
 import pandas as pd
 from datetime import datetime, timedelta
 import re # Import regex module
-import io # For in-memory file size estimation
-import csv # For quoting in CSV writes
+from pandas.tseries.api import guess_datetime_format
+from backend.utils.number_formatting import format_amount_series
+from backend.utils.rolling_csv import RollingCsvWriter, MAX_FILE_SIZE_BYTES, WRITE_BATCH_ROWS
+from backend.utils.parallel_ingest import INGEST_MAX_WORKERS, INGEST_CHUNK_ROWS, log_once, read_csv_normalized, run_ordered_jobs
 
 # Define the fixed base output directory for TRNM WIN
 FIXED_BASE_OUTPUT_DIR = r"C:\\xampp\\htdocs\\audit_tool\\OPERATIONS\\TRNM"
@@ -13,8 +15,6 @@ FIXED_BASE_OUTPUT_DIR = r"C:\\xampp\\htdocs\\audit_tool\\OPERATIONS\\TRNM"
 LOAN_CATEGORIES_LIST = ['40-45', '46-49', '50-70', '71', '72-73', '74-79', '80 AND ABOVE']
 DEPOSIT_CATEGORIES_LIST = ['20', '11', '12', '13', '15', 'SC', '30', 'SD'] # '30' covers 30-33, 'SC' covers 10, 'SD' covers others
 
-MAX_FILE_SIZE_BYTES = 49.9 * 1024 * 1024 # 49.9 MB
-
 # Excel's epoch start date (December 30, 1899) for converting numeric dates
 EXCEL_EPOCH = datetime(1899, 12, 30)
 
@@ -52,7 +52,147 @@ def convert_trndate_serial(serial):
     except (ValueError, TypeError):
         return pd.NaT
 
-def process_win_data_web(input_dir, branch): # Simplified parameters
+# Define the exact names for the output columns after processing
+# These are the target headers for the final CSV files
+OUTPUT_COLUMNS_MAPPING = {
+    "Trn": "TRN",
+    "TrnType": "TRNTYPE",
+    "Tlr": "TLR",
+    "TrnDate": "TRNDATE",
+    "TrnAmt": "TRNAMT",
+    "TrnPriAmt": "TRNNONC", # Renamed based on internal mapping
+    "TrnIntAmt": "TRNINT",
+    "TrnPenAmt": "TRNTAXPEN", # Renamed based on internal mapping
+    "BalAmt": "BAL",
+    "Seq": "SEQ",
+    "TrnDesc": "TRNDESC",
+    "AppType": "APPTYPE"
+}
+# Other accepted (lowercased) source names for the mapped columns
+COLUMN_ALIASES = {
+    "TrnDate": ["transaction_date"],
+    "TrnAmt": ["transaction_amount"],
+    "TrnPriAmt": ["principal_amount", "trnnoc", "trntaxpen"],
+    "TrnIntAmt": ["interest_amount", "trnint"],
+    "TrnPenAmt": ["penalty_amount"],
+    "BalAmt": ["balance_amount"],
+    "TrnDesc": ["transaction_description"],
+    "AppType": ["application_type"]
+}
+REQUIRED_COLUMNS = [
+    "TRN", "ACC", "TRNTYPE", "TLR", "LEVEL", "TRNDATE",
+    "TRNAMT", "TRNNONC", "TRNINT", "TRNTAXPEN", "BAL",
+    "SEQ", "TRNDESC", "APPTYPE"
+]
+NUMERIC_COLUMNS = ['TRNAMT', 'TRNNONC', 'TRNINT', 'TRNTAXPEN', 'BAL', 'SEQ']
+COLUMNS_DIVIDED_BY_100 = ['TRNAMT', 'TRNNONC', 'TRNINT', 'TRNTAXPEN', 'BAL']
+
+def format_acc_chd(acc, chd):
+    """Formats raw ACC and CHD values as XX-XXXXX-Y (ACC digits padded to 7, first CHD digit or '0')."""
+    acc_val_raw = str(acc).strip() if pd.notna(acc) else ''
+    chd_val_raw = str(chd).strip() if pd.notna(chd) else ''
+
+    # Extract only digits from acc_val_raw and pad the string of digits directly to 7
+    acc_seven_digits = ''.join(filter(str.isdigit, acc_val_raw)).zfill(7)
+
+    # Extract only digits from chd_val_raw. If it's empty, default to '0'.
+    # If it contains digits, take the first one.
+    chd_formatted = ''.join(filter(str.isdigit, chd_val_raw))
+    chd_formatted = chd_formatted[0] if chd_formatted else '0'
+
+    # acc_seven_digits is guaranteed to be 7 characters due to zfill(7)
+    return f"{acc_seven_digits[:2]}-{acc_seven_digits[2:7]}-{chd_formatted}"
+
+def normalize_win_chunk(df, sanitized_branch, state):
+    """
+    Normalizes one chunk of a WIN CSV (read as text): keeps the branch's rows, maps the source
+    columns (and their aliases) to the TRNM headers, formats ACC from Acc/Chd, scales the amounts,
+    and adds TRNDATE_DT. Every row is handled on its own, so chunks of any size give the same rows.
+
+    Args:
+        state (dict): Per-file state shared by its chunks: 'date_format' (guessed from the file's
+            first TRNDATE, as pd.to_datetime would for the whole column) and 'warned'.
+    """
+    # Filter by branch first
+    if 'BRANCH' in df.columns:
+        df = df[df['BRANCH'].astype(str).str.strip().str.upper() == sanitized_branch]
+    else:
+        log_once(state['warned'], "Server Log (TRNM WIN): Warning: 'BRANCH' column not found in combined data. Cannot filter by branch.")
+
+    # Standardize column names to lowercase for easier mapping
+    df = df.rename(columns=str.lower)
+
+    # Map columns to desired output names
+    mapped_df = pd.DataFrame(index=df.index)
+    for original_col_base, new_col_name in OUTPUT_COLUMNS_MAPPING.items():
+        # Start with the lowercased original_col_base itself, then the other defined aliases
+        possible_aliases = [original_col_base.lower()] + [alias.lower() for alias in COLUMN_ALIASES.get(original_col_base, [])]
+        found_col = next((alias for alias in possible_aliases if alias in df.columns), None)
+        mapped_df[new_col_name] = df[found_col] if found_col else '' # Add empty column if not found
+
+    # Handle ACC and CHD combination
+    if 'acc' in df.columns and 'chd' in df.columns:
+        mapped_df["ACC"] = [format_acc_chd(acc, chd) for acc, chd in zip(df['acc'], df['chd'])]
+    elif 'acc' in df.columns:
+        # If only ACC is found, format it as XX-XXXXX-0 (defaulting CHD to 0)
+        mapped_df["ACC"] = [format_acc_chd(acc, None) for acc in df['acc']]
+        log_once(state['warned'], "Server Log (TRNM WIN): ⚠️ 'Chd' column not found for ACC formatting. Using ACC as XX-XXXXX-0 or padded raw ACC-0.")
+    else:
+        log_once(state['warned'], "Server Log (TRNM WIN): ⚠️ Neither 'Acc' nor 'Chd' column found for ACC creation. ACC column will be empty.")
+        mapped_df["ACC"] = '' # Ensure ACC column exists even if empty
+
+    # Add 'LEVEL' column (empty as per previous logic)
+    mapped_df['LEVEL'] = ''
+
+    # Convert numeric columns (before formatting to string)
+    for col in NUMERIC_COLUMNS:
+        mapped_df[col] = pd.to_numeric(mapped_df[col], errors='coerce').fillna(0)
+        if col in COLUMNS_DIVIDED_BY_100: # Apply division by 100 here
+            mapped_df[col] = mapped_df[col] / 100
+
+    # Convert APPTYPE to integer
+    mapped_df['APPTYPE'] = pd.to_numeric(mapped_df['APPTYPE'], errors='coerce').fillna(0).astype(int)
+
+    # Date conversion: TRNDATE to datetime object for sorting and range calculation.
+    # The format is fixed per file so that every chunk parses its dates the same way.
+    if 'date_format' not in state:
+        first_dates = mapped_df['TRNDATE'].dropna()
+        if first_dates.empty:
+            return mapped_df.assign(TRNDATE_DT=pd.to_datetime(mapped_df['TRNDATE'], errors='coerce'))
+        state['date_format'] = guess_datetime_format(str(first_dates.iloc[0]))
+    date_format = state['date_format']
+    if date_format:
+        mapped_df['TRNDATE_DT'] = pd.to_datetime(mapped_df['TRNDATE'], format=date_format, errors='coerce')
+    else:
+        mapped_df['TRNDATE_DT'] = pd.to_datetime(mapped_df['TRNDATE'], errors='coerce')
+    return mapped_df
+
+def _ingest_win_file(job):
+    """
+    Worker-process entry point: reads one WIN CSV in chunks (as text, then as latin1 if it is not
+    UTF-8) and normalizes them. Returns (frame, error message); frame is None when the file failed.
+    """
+    path, sanitized_branch, chunk_size = job
+    state = {'warned': set()}
+    try:
+        frame = read_csv_normalized(path, lambda chunk: normalize_win_chunk(chunk, sanitized_branch, state),
+                                    [None, 'latin1'], chunk_size, dtype=str, low_memory=False)
+        return frame, None
+    except Exception as e:
+        return None, str(e)
+
+def format_win_output_rows(df):
+    """Formats normalized rows for the output CSV: amounts as "1,234.56", TRNDATE as MM/DD/YYYY, and
+    TRNDESC/ACC values starting with '=' wrapped as ="..." so spreadsheets keep them as text."""
+    formatted = df[REQUIRED_COLUMNS].copy()
+    for col in NUMERIC_COLUMNS:
+        formatted[col] = format_amount_series(df[col])
+    formatted['TRNDATE'] = df['TRNDATE_DT'].dt.strftime('%m/%d/%Y').fillna('')
+    formatted['TRNDESC'] = formatted['TRNDESC'].astype(str).apply(lambda x: f'="{x}"' if x.startswith('=') else x)
+    formatted['ACC'] = formatted['ACC'].astype(str).apply(lambda x: f'="{x}"' if x.startswith('=') else x)
+    return formatted
+
+def process_win_data_web(input_dir, branch, max_workers=INGEST_MAX_WORKERS, chunk_size=INGEST_CHUNK_ROWS): # Simplified parameters
     """
     Processes WIN CSV files from input_dir, combines data,
     filters by branch, processes all app types and categories,
@@ -62,9 +202,14 @@ def process_win_data_web(input_dir, branch): # Simplified parameters
     Output filename format: BRANCH (3 CHAR) DEP/LN CATEGORY - MM-DD-YYYY TO MM-DD-YYYY.csv
     No _part_X suffix is used. If splitting occurs, date ranges differentiate files.
 
+    The CSV files are parsed and normalized in parallel worker processes (see normalize_win_chunk)
+    and combined in file name order, so the output does not depend on the worker count.
+
     Args:
         input_dir (str): The directory containing the WIN CSV files.
         branch (str): Branch code for filtering and filename.
+        max_workers (int): Worker processes used to read the files.
+        chunk_size (int): Rows read and normalized at a time per file.
     """
     # Sanitize the branch name for use in filenames and folder names
     sanitized_branch = "".join([c for c in str(branch) if c.isalnum() or c in (' ', '_')]).strip().replace(' ', '_').upper()
@@ -90,183 +235,38 @@ def process_win_data_web(input_dir, branch): # Simplified parameters
 
     print(f"Server Log (TRNM WIN): Processing started for Branch: {branch}. Output will be saved to: {branch_output_dir}")
 
-    # Define the exact names for the output columns after processing
-    # These are the target headers for the final CSV files
-    output_columns_mapping = {
-        "Trn": "TRN",
-        "TrnType": "TRNTYPE",
-        "Tlr": "TLR",
-        "TrnDate": "TRNDATE",
-        "TrnAmt": "TRNAMT",
-        "TrnPriAmt": "TRNNONC", # Renamed based on internal mapping
-        "TrnIntAmt": "TRNINT",
-        "TrnPenAmt": "TRNTAXPEN", # Renamed based on internal mapping
-        "BalAmt": "BAL",
-        "Seq": "SEQ",
-        "TrnDesc": "TRNDESC",
-        "AppType": "APPTYPE"
-    }
-    required_columns = [
-        "TRN", "ACC", "TRNTYPE", "TLR", "LEVEL", "TRNDATE",
-        "TRNAMT", "TRNNONC", "TRNINT", "TRNTAXPEN", "BAL",
-        "SEQ", "TRNDESC", "APPTYPE"
-    ]
-
-
-    # Read and combine CSV files from selected input folder
-    combined_data = []
+    # Read and normalize CSV files from selected input folder, several at a time
+    csv_filenames = sorted(filename for filename in os.listdir(input_dir) if filename.lower().endswith('.csv'))
     print(f"Server Log (TRNM WIN): Scanning for CSV files in: {input_dir}")
-    files_processed = 0
-    win_files_found = False # Track if any WIN files were found
 
-    for filename in os.listdir(input_dir):
-        if not filename.lower().endswith('.csv'):
-            continue
-        
-        win_files_found = True # Found at least one WIN CSV
+    if not csv_filenames:
+        raise Exception("No CSV files found in the specified input directory for TRNM WIN processing.")
 
-        path = os.path.join(input_dir, filename)
-        print(f"Server Log (TRNM WIN): Processing file: {path}")
-        try:
-            df = pd.read_csv(path, dtype=str, low_memory=False) # Read all as string to prevent issues
-            combined_data.append(df)
-            files_processed += 1
-        except UnicodeDecodeError:
-            print(f"Server Log (TRNM WIN): Error reading file {path} with default encoding, trying latin1")
-            try:
-                df = pd.read_csv(path, encoding='latin1', low_memory=False)
-                combined_data.append(df)
-                files_processed += 1
-            except Exception as e:
-                print(f"Server Log (TRNM WIN): Error reading file {path}: {e}. Skipping.")
-                continue
-        except Exception as e:
-            print(f"Server Log (TRNM WIN): Error reading file {path}: {e}. Skipping.")
+    for filename in csv_filenames:
+        print(f"Server Log (TRNM WIN): Processing file: {os.path.join(input_dir, filename)}")
+    results = run_ordered_jobs(_ingest_win_file, [(os.path.join(input_dir, filename), sanitized_branch, chunk_size) for filename in csv_filenames], max_workers)
+
+    combined_data = []
+    for filename, (df, error) in zip(csv_filenames, results):
+        if df is None:
+            print(f"Server Log (TRNM WIN): Error reading file {os.path.join(input_dir, filename)}: {error}. Skipping.")
             continue
+        combined_data.append(df)
+    files_processed = len(combined_data)
 
-    if not win_files_found:
-        raise Exception("No CSV files found in the specified input directory for TRNM WIN processing.")
-    
     if not combined_data:
         raise Exception("No valid WIN CSV files found in the input folder.")
 
-    final_df = pd.concat(combined_data, ignore_index=True)
+    non_empty_data = [df for df in combined_data if not df.empty]
+    if not non_empty_data:
+        print(f"Server Log (TRNM WIN): No data found for branch '{sanitized_branch}' after filtering.")
+        return {"message": f"No data found for branch '{sanitized_branch}'.", "output_path": branch_output_dir}
+    mapped_df = pd.concat(non_empty_data, ignore_index=True)
     print(f"Server Log (TRNM WIN): Combined data from {files_processed} files.")
 
-    # Filter by branch first
-    if 'BRANCH' in final_df.columns:
-        final_df['BRANCH'] = final_df['BRANCH'].astype(str).str.strip().str.upper()
-        final_df = final_df[final_df['BRANCH'] == sanitized_branch]
-        if final_df.empty:
-            print(f"Server Log (TRNM WIN): No data found for branch '{sanitized_branch}' after filtering.")
-            return {"message": f"No data found for branch '{sanitized_branch}'.", "output_path": branch_output_dir}
-    else:
-        print("Server Log (TRNM WIN): Warning: 'BRANCH' column not found in combined data. Cannot filter by branch.")
-
-    # Standardize column names to lowercase for easier mapping
-    final_df.columns = [col.lower() for col in final_df.columns]
-
-    # Map columns to desired output names
-    mapped_df = pd.DataFrame()
-    # Define a dictionary for column aliases (moved here for clarity)
-    column_aliases = {
-        "TrnDate": ["transaction_date"],
-        "TrnAmt": ["transaction_amount"],
-        "TrnPriAmt": ["principal_amount", "trnnoc", "trntaxpen"],
-        "TrnIntAmt": ["interest_amount", "trnint"],
-        "TrnPenAmt": ["penalty_amount"],
-        "BalAmt": ["balance_amount"],
-        "TrnDesc": ["transaction_description"],
-        "AppType": ["application_type"]
-    }
-
-    for original_col_base, new_col_name in output_columns_mapping.items():
-        found_col = None
-        # Start with the lowercased original_col_base itself
-        possible_aliases = [original_col_base.lower()]
-        # Extend with other defined aliases, ensuring they are lowercased
-        possible_aliases.extend([alias.lower() for alias in column_aliases.get(original_col_base, [])])
-
-        for alias in possible_aliases:
-            if alias in final_df.columns:
-                found_col = alias
-                break
-        
-        if found_col:
-            mapped_df[new_col_name] = final_df[found_col]
-        else:
-            mapped_df[new_col_name] = '' # Add empty column if not found
-
-    # Helper function for ACC and CHD formatting
-    def format_acc_chd(row):
-        acc_val_raw = str(row['acc']).strip() if pd.notna(row['acc']) else ''
-        chd_val_raw = str(row['chd']).strip() if pd.notna(row['chd']) else ''
-
-        # Extract only digits from acc_val_raw
-        acc_digits_only = ''.join(filter(str.isdigit, acc_val_raw))
-        
-        # Convert to int then format to 7 digits with leading zeros
-        # This handles cases like "700014" -> 700014 -> "00700014" (incorrect, should be 0700014)
-        # Correct approach: Pad the string of digits directly to 7, then slice
-        acc_seven_digits = acc_digits_only.zfill(7)
-        
-        # Extract only digits from chd_val_raw. If it's empty, default to '0'.
-        # If it contains digits, take the first one.
-        chd_formatted = ''.join(filter(str.isdigit, chd_val_raw))
-        if chd_formatted:
-            chd_formatted = chd_formatted[0] # Take only the first digit
-        else:
-            chd_formatted = '0' # Default to '0' if no digits or empty
-
-        # Format as XX-XXXXX-Y
-        # acc_seven_digits is guaranteed to be 7 characters due to zfill(7)
-        return f"{acc_seven_digits[:2]}-{acc_seven_digits[2:7]}-{chd_formatted}"
-            
-    # Handle ACC and CHD combination
-    acc_col_found = 'acc' in final_df.columns
-    chd_col_found = 'chd' in final_df.columns
-
-    if acc_col_found and chd_col_found:
-        mapped_df["ACC"] = final_df.apply(format_acc_chd, axis=1)
-    elif acc_col_found:
-        # If only ACC is found, format it as XX-XXXXX-0 (defaulting CHD to 0)
-        mapped_df["ACC"] = final_df['acc'].astype(str).strip()
-        mapped_df["ACC"] = mapped_df["ACC"].apply(
-            # Extract digits from ACC, pad to 7, then format XX-XXXXX-0
-            lambda x: f"{''.join(filter(str.isdigit, x)).zfill(7)[:2]}-{''.join(filter(str.isdigit, x)).zfill(7)[2:7]}-0"
-        )
-        print(f"Server Log (TRNM WIN): ⚠️ 'Chd' column not found for ACC formatting. Using ACC as XX-XXXXX-0 or padded raw ACC-0.")
-    else:
-        print(f"Server Log (TRNM WIN): ⚠️ Neither 'Acc' nor 'Chd' column found for ACC creation. ACC column will be empty.")
-        mapped_df["ACC"] = '' # Ensure ACC column exists even if empty
-
-    # Add 'LEVEL' column (empty as per previous logic)
-    mapped_df['LEVEL'] = ''
-
-    # Convert numeric columns (before formatting to string)
-    numeric_cols_pre_format = ['TRNAMT', 'TRNNONC', 'TRNINT', 'TRNTAXPEN', 'BAL', 'SEQ']
-    columns_to_divide_by_100 = ['TRNAMT', 'TRNNONC', 'TRNINT', 'TRNTAXPEN', 'BAL'] # Define columns to divide by 100
-
-    for col in numeric_cols_pre_format:
-        if col in mapped_df.columns:
-            mapped_df[col] = pd.to_numeric(mapped_df[col], errors='coerce').fillna(0)
-            if col in columns_to_divide_by_100: # Apply division by 100 here
-                mapped_df[col] = mapped_df[col] / 100
-        else:
-            mapped_df[col] = 0 # Ensure numeric columns exist and are initialized
-
-    # Convert APPTYPE to integer
-    if 'APPTYPE' in mapped_df.columns:
-        mapped_df['APPTYPE'] = pd.to_numeric(mapped_df['APPTYPE'], errors='coerce').fillna(0).astype(int)
-    else:
-        mapped_df['APPTYPE'] = 0 # Default to 0 if APPTYPE is missing
-
-    # Date conversion: TRNDATE to datetime object for sorting and range calculation
-    mapped_df['TRNDATE_DT'] = pd.to_datetime(mapped_df['TRNDATE'], errors='coerce')
-
     # Sort the entire combined DataFrame by 'TRNDATE_DT' in ascending order
     print("Server Log (TRNM WIN): Sorting combined data by TRNDATE...")
-    mapped_df.sort_values(by='TRNDATE_DT', inplace=True)
+    mapped_df.sort_values(by='TRNDATE_DT', kind='stable', inplace=True)
     mapped_df.reset_index(drop=True, inplace=True)
 
     # Filter out rows where TRNDATE_DT is NaT after sorting to avoid issues with date range calculations
@@ -350,32 +350,18 @@ def process_win_data_web(input_dir, branch): # Simplified parameters
             continue
 
         # Sort by TRNDATE_DT before saving/splitting to ensure proper appending order
-        df_to_process_for_category.sort_values(by='TRNDATE_DT', inplace=True)
+        df_to_process_for_category.sort_values(by='TRNDATE_DT', kind='stable', inplace=True)
         df_to_process_for_category.reset_index(drop=True, inplace=True)
 
-        # Apply final formatting for numeric and date columns before saving
-        # This DataFrame will be the source for chunks
-        df_to_save_formatted = df_to_process_for_category.copy()
-        for col in numeric_cols_pre_format: # Use the list of numeric columns
-            if col in df_to_save_formatted.columns:
-                df_to_save_formatted[col] = df_to_save_formatted[col].apply(lambda x: f"{x:,.2f}" if pd.notnull(x) else '')
-        df_to_save_formatted['TRNDATE'] = df_to_save_formatted['TRNDATE_DT'].dt.strftime('%m/%d/%Y').fillna('')
-        
-        # Ensure 'TRNDESC' and 'ACC' are treated as strings and quoted if they start with '='
-        if 'TRNDESC' in df_to_save_formatted.columns:
-            df_to_save_formatted['TRNDESC'] = df_to_save_formatted['TRNDESC'].astype(str).apply(lambda x: f'="{x}"' if x.startswith('=') else x)
-        if 'ACC' in df_to_save_formatted.columns:
-            df_to_save_formatted['ACC'] = df_to_save_formatted['ACC'].astype(str).apply(lambda x: f'="{x}"' if x.startswith('=') else x)
-
-
         file_type_abbr = 'LN' if app_type == 'LOAN' else 'DEP'
         
         # Base filename prefix (e.g., YAC LN 40-45) - without date range or part number
         base_filename_prefix = f"{branch_abbr_for_filename} {file_type_abbr} {category}"
         
         # Regex to match files starting with the base_filename_prefix and having a date range suffix
-        # The regex should only match the base prefix and the date format, not the part_X suffix
-        existing_file_regex = re.compile(rf'^{re.escape(base_filename_prefix)} - \d{{2}}-\d{{2}}-\d{{4}} TO \d{{2}}-\d{{2}}-\d{{4}}\.csv$', re.IGNORECASE)
+        # The regex should only match the base prefix (plus the writer's optional " (n)" copy number)
+        # and the date format, not the part_X suffix
+        existing_file_regex = re.compile(rf'^{re.escape(base_filename_prefix)}(?: \(\d+\))? - \d{{2}}-\d{{2}}-\d{{4}} TO \d{{2}}-\d{{2}}-\d{{4}}\.csv$', re.IGNORECASE)
         
         files_removed_for_category = 0
         for existing_file_name in os.listdir(branch_output_dir):
@@ -391,80 +377,17 @@ def process_win_data_web(input_dir, branch): # Simplified parameters
             print(f"Server Log (TRNM WIN): Removed {files_removed_for_category} old files for category {base_filename_prefix}.")
 
 
-        # Estimate rows per chunk for the *entire* df_to_save_formatted
-        if not df_to_save_formatted.empty:
-            # Estimate size of a typical row by converting a small sample to CSV
-            sample_df_for_size = df_to_save_formatted.head(min(100, len(df_to_save_formatted)))
-            s_buf_sample = io.StringIO()
-            sample_df_for_size.to_csv(s_buf_sample, index=False, quoting=csv.QUOTE_NONNUMERIC, encoding='utf-8-sig')
-            estimated_bytes_per_row = len(s_buf_sample.getvalue().encode('utf-8-sig')) / len(sample_df_for_size) if len(sample_df_for_size) > 0 else MAX_FILE_SIZE_BYTES / 1000 # Fallback
-        else:
-            estimated_bytes_per_row = MAX_FILE_SIZE_BYTES / 1000 # Default if empty data
-
-        # Adjust the estimated bytes per row to try and get closer to the target file size
-        # If files are consistently much smaller, reduce this factor (e.g., 0.8 to make rows_per_chunk larger)
-        # If files are overshooting, increase this factor (e.g., 1.1 to make rows_per_chunk smaller)
-        SIZE_ADJUSTMENT_FACTOR = 0.9 # Example: try to make chunks ~10% larger in terms of rows
-        adjusted_estimated_bytes_per_row = estimated_bytes_per_row * SIZE_ADJUSTMENT_FACTOR
-
-        # Calculate approximate rows per chunk for each file
-        rows_per_chunk = int(MAX_FILE_SIZE_BYTES / adjusted_estimated_bytes_per_row) if adjusted_estimated_bytes_per_row > 0 else len(df_to_save_formatted)
-        if rows_per_chunk <= 0: # Ensure at least 1 row per chunk
-             rows_per_chunk = len(df_to_save_formatted) if len(df_to_save_formatted) > 0 else 1
-
-        print(f"Server Log (TRNM WIN): Estimated bytes per row: {estimated_bytes_per_row:.2f}. Adjusted bytes per row: {adjusted_estimated_bytes_per_row:.2f}. Rows per chunk: {rows_per_chunk}.")
-
-
-        # --- Split df_to_save_formatted into chunks and save with dynamic date ranges ---
-        
-        if df_to_save_formatted.empty:
-            print(f"Server Log (TRNM WIN): No data to save for {app_type} - {category} after formatting.")
-            continue # Skip to next category
-
-        num_chunks = (len(df_to_save_formatted) + rows_per_chunk - 1) // rows_per_chunk
-        
-        for i in range(num_chunks):
-            start_idx = i * rows_per_chunk
-            end_idx = min((i + 1) * rows_per_chunk, len(df_to_save_formatted))
-            current_chunk_df = df_to_save_formatted.iloc[start_idx:end_idx].copy()
-
-            if current_chunk_df.empty:
-                continue
-
-            # Ensure TRNDATE_DT column is datetime objects for min/max operations
-            if not pd.api.types.is_datetime64_any_dtype(current_chunk_df['TRNDATE_DT']):
-                current_chunk_df['TRNDATE_DT'] = pd.to_datetime(current_chunk_df['TRNDATE_DT'], errors='coerce')
-
-
-            # Determine date range for the current chunk
-            valid_dates_in_chunk = current_chunk_df['TRNDATE_DT'].dropna()
-
-            chunk_min_date_val = None
-            chunk_max_date_val = None
-
-            if not valid_dates_in_chunk.empty:
-                chunk_min_date_val = valid_dates_in_chunk.min()
-                chunk_max_date_val = valid_dates_in_chunk.max()
-            
-            # Format dates for filename
-            min_trn_date_str_chunk = chunk_min_date_val.strftime('%m-%d-%Y') if pd.notna(chunk_min_date_val) else "UNKNOWN_START"
-            max_trn_date_str_chunk = chunk_max_date_val.strftime('%m-%d-%Y') if pd.notna(chunk_max_date_val) else "UNKNOWN_END"
-            
-            # Construct filename without _part_X suffix
-            new_filename_date_range = f"{min_trn_date_str_chunk} TO {max_trn_date_str_chunk}"
-            output_file_name = f"{base_filename_prefix} - {new_filename_date_range}.csv"
-            output_file_path = os.path.join(branch_output_dir, output_file_name)
-
-            try:
-                # Save the current chunk to CSV
-                # Reindex current_chunk_df to ensure only output_headers are present and in order
-                current_chunk_df[required_columns].to_csv(output_file_path, index=False, quoting=csv.QUOTE_NONNUMERIC, encoding='utf-8-sig')
-                print(f"Server Log (TRNM WIN): Saved chunk {i+1}/{num_chunks} to: {output_file_path} (Size: {os.path.getsize(output_file_path)/ (1024 * 1024):.2f} MB)")
-                total_files_generated += 1
-            except Exception as e:
-                print(f"Server Log (TRNM WIN): ❌ Error writing CSV chunk '{output_file_name}': {e}")
-                # Continue to next chunk/category even if one fails
-                continue
+        # --- Stream the formatted rows into files of at most MAX_FILE_SIZE_BYTES, named by their TRNDATE range ---
+        writer = RollingCsvWriter(branch_output_dir, base_filename_prefix, REQUIRED_COLUMNS, MAX_FILE_SIZE_BYTES, log_label="TRNM WIN")
+        try:
+            with writer:
+                for start in range(0, len(df_to_process_for_category), WRITE_BATCH_ROWS):
+                    batch = df_to_process_for_category.iloc[start:start + WRITE_BATCH_ROWS]
+                    writer.write(format_win_output_rows(batch), batch['TRNDATE_DT'])
+        except Exception as e:
+            # Files finished before the error are kept; continue to next category even if one fails
+            print(f"Server Log (TRNM WIN): ❌ Error writing CSV files for {base_filename_prefix}: {e}")
+        total_files_generated += len(writer.paths)
 
     print(f"\nServer Log (TRNM WIN): Processing complete! Total files generated: {total_files_generated}")
     return {"message": f"TRNM WIN processing completed. Total files generated: {total_files_generated}. Output saved to {branch_output_dir}", "output_path": branch_output_dir}